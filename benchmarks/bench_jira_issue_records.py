@@ -0,0 +1,178 @@
+"""Micro-benchmark: Jira issue -> row, previous `_build_issue_record` vs the compiled builder.
+
+    python benchmarks/bench_jira_issue_records.py [--n 20000] [--repeat 5]
+
+The "previous" functions are verbatim copies of what `ingest-jira.py` used
+before `_compile_issue_record_builder` (bound to the loaded module's helpers).
+Issues are the recorded search fixtures (`benchmarks/fixtures.py`), with
+labels, components, affected versions and a sprint added so every extractor
+does work. Before timing, every row is checked against the previous builder:
+all columns must match exactly except `raw_json`, which must decode to the
+same value (it is now compact), and `_ingested_at`.
+
+The compiled builder is timed twice: with orjson (if installed) and with the
+stdlib fallback.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import random
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks import fixtures  # noqa: E402
+
+_SPEC = importlib.util.spec_from_file_location("ingest_jira", REPO_ROOT / "ingest-jira.py")
+assert _SPEC and _SPEC.loader
+jira = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(jira)
+
+SEVERITY_FIELD_ID = "customfield_10074"
+
+
+def previous_extract_severity(fields: Dict[str, Any]) -> Optional[str]:
+    candidate_keys: List[str] = []
+    if jira.RESOLVED_SEVERITY_FIELD_ID:
+        candidate_keys.append(jira.RESOLVED_SEVERITY_FIELD_ID)
+
+    # Fallbacks commonly present in some Jira setups.
+    candidate_keys.extend(["severity", "customfield_severity"])
+
+    raw = None
+    for field_key in candidate_keys:
+        raw = fields.get(field_key)
+        if raw is not None:
+            break
+
+    if raw is None:
+        return None
+
+    # Severity could be {"value": "(S1) Critical"} or {"name": "..."}
+    if isinstance(raw, dict):
+        return raw.get("value") or raw.get("name") or raw.get("displayName")
+
+    # Or already a string
+    if isinstance(raw, str):
+        return raw
+
+    # Or list (rare)
+    if isinstance(raw, list) and raw:
+        first = raw[0]
+        if isinstance(first, dict):
+            return first.get("value") or first.get("name")
+        if isinstance(first, str):
+            return first
+
+    return None
+
+
+def previous_build_issue_record(issue: Dict[str, Any]) -> Dict[str, Any]:
+    fields = issue.get("fields", {})
+
+    status_obj = fields.get("status") or {}
+    status_cat = status_obj.get("statusCategory") or {}
+
+    rec = {
+        "issue_key": issue.get("key"),
+        "project_key": (fields.get("project") or {}).get("key"),
+        "issue_type": (fields.get("issuetype") or {}).get("name"),
+        "summary": fields.get("summary"),
+        "status": status_obj.get("name"),
+        "status_category": status_cat.get("name"),
+        "status_category_key": status_cat.get("key"),
+        "priority": (fields.get("priority") or {}).get("name"),
+        "severity": previous_extract_severity(fields),
+        "created_at": jira._iso(jira._parse_jira_ts(fields.get("created"))),
+        "updated_at": jira._iso(jira._parse_jira_ts(fields.get("updated"))),
+        "resolved_at": jira._iso(jira._parse_jira_ts(fields.get("resolutiondate"))),
+        "reporter": jira._extract_user_display(fields.get("reporter")),
+        "assignee": jira._extract_user_display(fields.get("assignee")),
+        "team": jira._extract_team(fields.get(jira.TEAM_FIELD_ID)),
+        "labels": json.dumps(fields.get("labels") or []),
+        "components": json.dumps([c.get("name") for c in (fields.get("components") or []) if isinstance(c, dict)]),
+        "fix_versions": json.dumps([v.get("name") for v in (fields.get("fixVersions") or []) if isinstance(v, dict)]),
+        "affects_versions": json.dumps([v.get("name") for v in (fields.get("versions") or []) if isinstance(v, dict)]),
+        "sprint": jira._extract_sprint(fields.get(jira.SPRINT_FIELD_ID) or fields.get("sprint")),
+        "resolution": (fields.get("resolution") or {}).get("name"),
+        "raw_json": json.dumps(issue, ensure_ascii=False),
+        "_ingested_at": jira._iso(jira._utc_now()),
+    }
+
+    return rec
+
+
+def sample_issues(n: int, seed: int = 11) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    issues = [issue for _, issue in fixtures.jira_issues(n)]
+    for i, issue in enumerate(issues):
+        fields = issue["fields"]
+        if i % 2:
+            fields["labels"] = rng.sample(["regression", "crash", "ux", "économie", "live-ops"], rng.randrange(1, 4))
+            fields["components"] = [{"id": "1", "name": rng.choice(["Store", "Arena", "Login"])}]
+            fields["versions"] = [{"id": "20000", "name": "1.41.0"}]
+            fields[jira.SPRINT_FIELD_ID] = [{"id": 7, "name": f"Sprint {i % 9}", "state": "active"}]
+        if i % 5 == 0:
+            fields["resolution"] = {"name": "Fixed"}
+            fields["resolutiondate"] = fields["updated"]
+    return issues
+
+
+def check_parity(before: Callable, after: Callable, issues: List[Dict[str, Any]]) -> None:
+    for issue in issues:
+        old, new = before(issue), after(issue)
+        assert old.keys() == new.keys(), issue["key"]
+        for column in old:
+            if column == "_ingested_at":
+                continue
+            if column == "raw_json":
+                assert json.loads(old[column]) == json.loads(new[column]), (issue["key"], column)
+            else:
+                assert old[column] == new[column], (issue["key"], column, old[column], new[column])
+
+
+def _bench(fn: Callable[[Dict[str, Any]], object], issues: List[Dict[str, Any]], repeat: int) -> float:
+    def run() -> None:
+        for issue in issues:
+            fn(issue)
+
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    jira.RESOLVED_SEVERITY_FIELD_ID = SEVERITY_FIELD_ID
+    issues = sample_issues(args.n)
+    compiled = jira._compile_issue_record_builder()
+    check_parity(previous_build_issue_record, compiled, issues[:2000])
+
+    timings = [("previous", _bench(previous_build_issue_record, issues, args.repeat))]
+    if jira.orjson is not None:
+        timings.append(("compiled+orjson", _bench(compiled, issues, args.repeat)))
+    saved, jira.orjson = jira.orjson, None
+    try:
+        check_parity(previous_build_issue_record, compiled, issues[:200])
+        timings.append(("compiled+json", _bench(compiled, issues, args.repeat)))
+    finally:
+        jira.orjson = saved
+
+    t_before = timings[0][1]
+    print(f"{args.n} issues, best of {args.repeat}")
+    for name, t in timings:
+        print(f"{name:16s} {t / args.n * 1e6:7.2f} us/issue   {args.n / t:9.0f} issues/s   x{t_before / t:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
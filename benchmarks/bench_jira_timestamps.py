@@ -0,0 +1,106 @@
+"""Micro-benchmark: Jira timestamp parsing, previous helpers vs `time_utils`.
+
+    python benchmarks/bench_jira_timestamps.py [--n 200000]
+
+The "previous" functions are verbatim copies of the helpers `time_utils`
+replaced (`ingest-jira.py::_parse_jira_ts`, `simple/jira/time_utils.py::jira_to_rfc3339`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import time_utils  # noqa: E402
+
+
+def previous_parse_jira_ts(value: Optional[str]) -> Optional[dt.datetime]:
+    if not value:
+        return None
+    try:
+        match = re.search(r"([+-]\d{2})(\d{2})$", value)
+        if match:
+            value = f"{value[:-5]}{match.group(1)}:{match.group(2)}"
+        if value.endswith("Z"):
+            return dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return dt.datetime.fromisoformat(value)
+    except Exception:
+        return None
+
+
+_PREVIOUS_TZ_RE = re.compile(r"([+-])(\d{2})(\d{2})$")
+
+
+def previous_jira_to_rfc3339(ts: Optional[str]) -> Optional[str]:
+    if not ts:
+        return None
+    ts = ts.strip()
+    if ts.endswith("Z") or re.search(r"[+-]\d{2}:\d{2}$", ts):
+        return ts
+    m = _PREVIOUS_TZ_RE.search(ts)
+    if m:
+        sign, hh, mm = m.group(1), m.group(2), m.group(3)
+        ts = _PREVIOUS_TZ_RE.sub(f"{sign}{hh}:{mm}", ts)
+    try:
+        d = dt.datetime.fromisoformat(ts)
+    except ValueError:
+        return ts
+    return d.astimezone(dt.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def sample_timestamps(n: int, seed: int = 7) -> List[str]:
+    """Changelog-like mix: mostly +0000, some other offsets and ms=000."""
+    rng = random.Random(seed)
+    start = dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)
+    offsets = ["+0000"] * 8 + ["-0700", "+0530"]
+    out = []
+    for _ in range(n):
+        ts = start + dt.timedelta(seconds=rng.randrange(3 * 365 * 86400), milliseconds=rng.choice([0, rng.randrange(1000)]))
+        out.append(ts.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ts.microsecond // 1000:03d}" + rng.choice(offsets))
+    return out
+
+
+def _bench(fn: Callable[[str], object], values: List[str], repeat: int) -> float:
+    def run() -> None:
+        for v in values:
+            fn(v)
+
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    values = sample_timestamps(args.n)
+    for v in values[:1000]:
+        assert previous_parse_jira_ts(v) == time_utils.parse_jira_ts(v), v
+        assert previous_jira_to_rfc3339(v) == time_utils.jira_to_rfc3339(v), v
+
+    pairs = [
+        ("parse_jira_ts", previous_parse_jira_ts, time_utils.parse_jira_ts),
+        ("jira_to_rfc3339", previous_jira_to_rfc3339, time_utils.jira_to_rfc3339),
+    ]
+    print(f"{args.n} timestamps, best of {args.repeat}")
+    for name, before, after in pairs:
+        t_before = _bench(before, values, args.repeat)
+        t_after = _bench(after, values, args.repeat)
+        print(
+            f"{name:16s} previous {t_before / args.n * 1e9:7.0f} ns/call   "
+            f"time_utils {t_after / args.n * 1e9:7.0f} ns/call   x{t_before / t_after:.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
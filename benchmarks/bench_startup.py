@@ -0,0 +1,108 @@
+"""Cold-start benchmark: import + first healthz of each root `ingest-*.py` script.
+
+    python benchmarks/bench_startup.py [--runs 5] [--script ingest-bugsnag.py,...]
+
+Each run starts a fresh interpreter (the cost a scaled-from-zero Cloud Run
+instance pays), imports the script the way functions-framework does and
+answers one `GET /healthz`. Reported per script (median of the runs):
+
+- import: seconds to execute the module.
+- healthz: seconds for the first healthz response.
+- heavy modules: which of google.auth / google.cloud.bigquery /
+  google.cloud.secretmanager were loaded by then. Scripts that build their
+  GCP clients lazily load none of them until the first ingest request.
+
+No credentials are needed: a script that still resolves them at import time
+shows up as `import failed`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS = sorted(p.name for p in REPO_ROOT.glob("ingest-*.py"))
+HEAVY_MODULES = ("google.auth", "google.cloud.bigquery", "google.cloud.secretmanager")
+
+
+def run_child(script: str) -> Dict[str, Any]:
+    sys.path.insert(0, str(REPO_ROOT))
+    started = time.perf_counter()
+    spec = importlib.util.spec_from_file_location("main", REPO_ROOT / script)
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    imported = time.perf_counter()
+
+    import flask
+
+    app = flask.Flask("bench_startup")
+    with app.test_request_context("/healthz", method="GET"):
+        response = module.hello_http(flask.request)
+    answered = time.perf_counter()
+    status = response[1] if isinstance(response, tuple) else getattr(response, "status_code", 200)
+    return {
+        "import_s": imported - started,
+        "healthz_s": answered - imported,
+        "status": status,
+        "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+    }
+
+
+def measure(script: str, runs: int) -> Dict[str, Any]:
+    samples: List[Dict[str, Any]] = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--child", script],
+            cwd=str(REPO_ROOT),
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if proc.returncode != 0:
+            last = (proc.stderr.strip().splitlines() or ["?"])[-1]
+            return {"script": script, "error": last}
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {
+        "script": script,
+        "import_s": statistics.median(s["import_s"] for s in samples),
+        "healthz_s": statistics.median(s["healthz_s"] for s in samples),
+        "status": samples[-1]["status"],
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--script", default=",".join(SCRIPTS), help="CSV of root scripts (default: all ingest-*.py)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child)))
+        return 0
+
+    header = f"{'script':28s} {'import':>8s} {'healthz':>8s}  heavy modules loaded"
+    print(header)
+    print("-" * len(header))
+    for script in [s.strip() for s in args.script.split(",") if s.strip()]:
+        r = measure(script, max(1, args.runs))
+        if "error" in r:
+            print(f"{script:28s} import failed: {r['error']}")
+            continue
+        heavy = ", ".join(r["heavy_modules"]) or "-"
+        print(f"{script:28s} {r['import_s'] * 1000:6.0f}ms {r['healthz_s'] * 1000:6.1f}ms  {heavy}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
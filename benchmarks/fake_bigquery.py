@@ -0,0 +1,129 @@
+"""In-memory stand-in for `google.cloud.bigquery.Client` used by the benchmarks.
+
+Covers the calls the `simple/*` services and the legacy `ingest-*.py` scripts
+make: `query` (every query returns no rows, so watermarks and existing-id
+lookups start from scratch; `answers` maps a SQL fragment to the rows an
+aggregate over an empty table would return), `insert_rows_json`,
+`load_table_from_file`, `get_dataset`, `dataset`, and an in-memory catalog
+behind `create_table` / `get_table` / `update_table` / `delete_table`. Inserted rows
+are JSON-encoded like the real client does before sending them, so the
+serialization cost stays in the measurement; only counts and byte totals are kept.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from google.api_core.exceptions import Conflict, NotFound
+from google.cloud import bigquery
+
+
+def _table_name(table: Any) -> str:
+    if isinstance(table, str):
+        return table
+    return f"{table.project}.{table.dataset_id}.{table.table_id}"
+
+
+class FakeJob:
+    def __init__(self, rows: Optional[List[Any]] = None, *, output_rows: int = 0) -> None:
+        self._rows = rows or []
+        self.output_rows = output_rows
+        self.num_dml_affected_rows = 0
+        self.job_id = f"bench_{uuid.uuid4().hex[:12]}"
+
+    def result(self, *args: Any, **kwargs: Any) -> List[Any]:
+        return list(self._rows)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._rows)
+
+
+class FakeBigQueryClient:
+    def __init__(self, project: str = "bench", location: str = "EU", *, answers: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> None:
+        self.project = project
+        self.location = location
+        self.answers = dict(answers or {})
+        self.tables: Dict[str, Any] = {}
+        self.rows: Counter = Counter()
+        self.bytes_written = 0
+        self.queries = 0
+        self.insert_calls = 0
+        self.load_jobs = 0
+        self._lock = threading.Lock()
+
+    def query(self, sql: str, job_config: Any = None, location: Optional[str] = None, **kwargs: Any) -> FakeJob:
+        with self._lock:
+            self.queries += 1
+        for fragment, rows in self.answers.items():
+            if fragment in sql:
+                return FakeJob(rows)
+        return FakeJob()
+
+    def insert_rows_json(self, table: Any, json_rows: List[Dict[str, Any]], **kwargs: Any) -> List[Any]:
+        size = len(json.dumps({"rows": [{"json": row} for row in json_rows]}, default=str))
+        with self._lock:
+            self.insert_calls += 1
+            self.rows[_table_name(table)] += len(json_rows)
+            self.bytes_written += size
+        return []
+
+    def load_table_from_file(self, file_obj: Any, destination: Any, job_config: Any = None, **kwargs: Any) -> FakeJob:
+        data = file_obj.read()
+        raw = gzip.decompress(data) if data[:2] == b"\x1f\x8b" else data
+        count = raw.count(b"\n")
+        with self._lock:
+            self.load_jobs += 1
+            self.rows[_table_name(destination)] += count
+            self.bytes_written += len(data)
+        return FakeJob(output_rows=count)
+
+    def get_dataset(self, dataset_ref: Any, **kwargs: Any) -> Any:
+        return SimpleNamespace(dataset_id=str(dataset_ref).split(".")[-1], location=self.location)
+
+    def dataset(self, dataset_id: str, project: Optional[str] = None) -> bigquery.DatasetReference:
+        return bigquery.DatasetReference(project or self.project, dataset_id)
+
+    def create_table(self, table: Any, exists_ok: bool = False, **kwargs: Any) -> Any:
+        table = bigquery.Table(table) if isinstance(table, str) else table
+        name = _table_name(table)
+        with self._lock:
+            if name in self.tables:
+                if not exists_ok:
+                    raise Conflict(f"Already Exists: Table {name}")
+                return self.tables[name]
+            self.tables[name] = table
+        return table
+
+    def get_table(self, table: Any, **kwargs: Any) -> Any:
+        name = _table_name(table)
+        with self._lock:
+            if name not in self.tables:
+                raise NotFound(f"Not found: Table {name}")
+            return self.tables[name]
+
+    def update_table(self, table: Any, fields: List[str], **kwargs: Any) -> Any:
+        with self._lock:
+            self.tables[_table_name(table)] = table
+        return table
+
+    def delete_table(self, table: Any, not_found_ok: bool = False, **kwargs: Any) -> None:
+        with self._lock:
+            if self.tables.pop(_table_name(table), None) is None and not not_found_ok:
+                raise NotFound(f"Not found: Table {_table_name(table)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rows_by_table": {name.split(".")[-1]: n for name, n in sorted(self.rows.items())},
+                "rows_written": sum(self.rows.values()),
+                "bytes_written": self.bytes_written,
+                "queries": self.queries,
+                "insert_calls": self.insert_calls,
+                "load_jobs": self.load_jobs,
+            }
@@ -0,0 +1,224 @@
+"""Scaled API fixtures for the ingest benchmarks.
+
+`benchmarks/fixtures/*.json` hold one recorded response entity per upstream
+(anonymized, full field set as the APIs return it). The builders below clone a
+template N times, varying only ids, timestamps and a few categorical fields,
+so every scale replays the same payload shape and size. Output is
+deterministic for a given (n, seed, now).
+"""
+
+from __future__ import annotations
+
+import copy
+import datetime as dt
+import json
+import random
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+JIRA_PROJECT = "PC"
+TESTRAIL_PROJECT_ID = 7
+TESTRAIL_RESULTS_PER_RUN = 100
+BUGSNAG_ERRORS_PER_PROJECT = 10_000
+GAMEBENCH_PACKAGES = ("com.scopely.internal.wwedomination", "com.scopely.wwedomination")
+
+_STATUSES = [("Open", "To Do"), ("In Progress", "In Progress"), ("In Review", "In Progress"), ("Closed", "Done")]
+_PRIORITIES = ["Highest", "High", "Medium", "Low"]
+_SEVERITIES = ["S1 - Critical", "S2 - Major", "S3 - Minor", "S4 - Trivial"]
+_PODS = ["POD Arena", "POD Economy", "POD Live Ops"]
+
+
+@lru_cache(maxsize=None)
+def _template_text(name: str) -> str:
+    return (FIXTURES_DIR / f"{name}.json").read_text(encoding="utf-8")
+
+
+def template(name: str) -> Dict[str, Any]:
+    """Fresh copy of `fixtures/<name>.json`."""
+    return json.loads(_template_text(name))
+
+
+def _now(now: Optional[dt.datetime]) -> dt.datetime:
+    return (now or dt.datetime.now(dt.timezone.utc)).replace(microsecond=0)
+
+
+def _jira_ts(ts: dt.datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ts.microsecond // 1000:03d}+0000"
+
+
+def _iso_z(ts: dt.datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def jira_issues(n: int, *, seed: int = 1, now: Optional[dt.datetime] = None) -> List[Tuple[dt.datetime, Dict[str, Any]]]:
+    """`n` search-result issues of project PC as (updated, issue), oldest first.
+
+    `updated` is spread over the last 80 days so the partitioned search gets
+    every slice populated.
+    """
+    rng = random.Random(seed)
+    now = _now(now)
+    base = template("jira_issue")
+    out: List[Tuple[dt.datetime, Dict[str, Any]]] = []
+    for i in range(n):
+        issue = copy.deepcopy(base)
+        updated = now - dt.timedelta(seconds=rng.randrange(60, 80 * 86400), milliseconds=rng.randrange(1000))
+        created = updated - dt.timedelta(seconds=rng.randrange(3600, 30 * 86400))
+        status, category = rng.choice(_STATUSES)
+        issue_id = str(100000 + i)
+        issue["id"] = issue_id
+        issue["key"] = f"{JIRA_PROJECT}-{i + 1}"
+        issue["self"] = issue["self"].rsplit("/", 1)[0] + "/" + issue_id
+        fields = issue["fields"]
+        fields["summary"] = f"{fields['summary']} #{i + 1}"
+        fields["status"]["name"] = status
+        fields["status"]["statusCategory"]["name"] = category
+        fields["priority"]["name"] = rng.choice(_PRIORITIES)
+        fields["customfield_10074"]["value"] = rng.choice(_SEVERITIES)
+        fields["customfield_10001"]["name"] = rng.choice(_PODS)
+        fields["created"] = _jira_ts(created)
+        fields["updated"] = _jira_ts(updated)
+        fields["statuscategorychangedate"] = _jira_ts(created + (updated - created) / 2)
+        histories = issue["changelog"]["histories"]
+        for j, history in enumerate(histories):
+            history["id"] = f"{issue_id}{j}"
+            history["created"] = _jira_ts(created + (updated - created) * (j + 1) / len(histories))
+        histories[-2]["items"][-1]["toString"] = status
+        out.append((updated, issue))
+    out.sort(key=lambda pair: pair[0])
+    return out
+
+
+def bugsnag_errors(n: int, *, seed: int = 2, now: Optional[dt.datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """`n` errors spread over ceil(n / 10000) projects (200 pages of 100 is the per-project cap)."""
+    rng = random.Random(seed)
+    now = _now(now)
+    base = template("bugsnag_error")
+    project_count = max(1, -(-n // BUGSNAG_ERRORS_PER_PROJECT))
+    projects: Dict[str, List[Dict[str, Any]]] = {f"5f0c1e2d3a4b5c00{p:08x}": [] for p in range(project_count)}
+    project_ids = list(projects)
+    for i in range(n):
+        pid = project_ids[i % project_count]
+        error = copy.deepcopy(base)
+        last_seen = now - dt.timedelta(seconds=rng.randrange(60, 25 * 86400))
+        first_seen = last_seen - dt.timedelta(seconds=rng.randrange(0, 60 * 86400))
+        error_id = f"65f1c2a9{i:016x}"
+        error["id"] = error_id
+        error["project_id"] = pid
+        error["url"] = f"https://api.bugsnag.com/projects/{pid}/errors/{error_id}"
+        error["project_url"] = f"https://api.bugsnag.com/projects/{pid}"
+        error["events_url"] = f"{error['url']}/events"
+        error["error_class"] = rng.choice(["java.lang.NullPointerException", "NSInvalidArgumentException", "SIGABRT", "OutOfMemoryError"])
+        error["severity"] = rng.choice(["error", "error", "warning", "info"])
+        error["status"] = rng.choice(["open", "open", "fixed", "snoozed"])
+        error["events"] = error["unthrottled_occurrence_count"] = rng.randrange(1, 5000)
+        error["users"] = rng.randrange(1, max(2, error["events"]))
+        error["first_seen"] = error["first_seen_unfiltered"] = _iso_z(first_seen)
+        error["last_seen"] = error["last_seen_unfiltered"] = _iso_z(last_seen)
+        projects[pid].append(error)
+    return projects
+
+
+def testrail_project(
+    n: int, *, seed: int = 3, now: Optional[dt.datetime] = None
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[int, List[Dict[str, Any]]]]:
+    """(suites, runs, results by run id) holding `n` results, 100 per run."""
+    rng = random.Random(seed)
+    now = _now(now)
+    suites = [
+        {"id": 301, "name": "Basic BVT", "project_id": TESTRAIL_PROJECT_ID, "is_master": False, "is_baseline": False},
+        {"id": 302, "name": "Regression", "project_id": TESTRAIL_PROJECT_ID, "is_master": False, "is_baseline": False},
+    ]
+    run_base = template("testrail_run")
+    result_base = template("testrail_result")
+    runs: List[Dict[str, Any]] = []
+    results: Dict[int, List[Dict[str, Any]]] = {}
+    run_count = max(1, -(-n // TESTRAIL_RESULTS_PER_RUN))
+    for r in range(run_count):
+        run = copy.deepcopy(run_base)
+        run_id = 81000 + r
+        created_on = int((now - dt.timedelta(seconds=rng.randrange(3600, 80 * 86400))).timestamp())
+        suite = suites[r % len(suites)]
+        run.update(
+            id=run_id,
+            suite_id=suite["id"],
+            name=f"{suite['name']} - 1.{40 + r % 5}.0 ({'Android' if r % 2 else 'iOS'})",
+            project_id=TESTRAIL_PROJECT_ID,
+            created_on=created_on,
+            updated_on=created_on + 86400,
+            url=f"https://example.testrail.io/index.php?/runs/view/{run_id}",
+        )
+        runs.append(run)
+        in_run = min(TESTRAIL_RESULTS_PER_RUN, n - r * TESTRAIL_RESULTS_PER_RUN)
+        run_results = []
+        for k in range(in_run):
+            result = copy.deepcopy(result_base)
+            idx = r * TESTRAIL_RESULTS_PER_RUN + k
+            result.update(
+                id=5400000 + idx,
+                test_id=9100000 + idx,
+                status_id=rng.choice([1, 1, 1, 1, 5, 2, 4]),
+                created_on=created_on + 60 * (k + 1),
+            )
+            run_results.append(result)
+        results[run_id] = run_results
+    return suites, runs, results
+
+
+def testrail_users(n: int, *, seed: int = 5) -> List[Dict[str, Any]]:
+    """`n` users of the TestRail project, as `get_users/<project_id>` lists them."""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": 1000 + i,
+            "name": f"QA Tester {i + 1}",
+            "email": f"qa.tester{i + 1}@example.com",
+            "is_active": rng.random() > 0.1,
+            "is_admin": i % 50 == 0,
+            "role_id": rng.choice([1, 2, 3, 4]),
+            "role": rng.choice(["Lead", "Tester", "Designer", "Guest"]),
+            "email_notifications": True,
+            "mfa_required": False,
+        }
+        for i in range(n)
+    ]
+
+
+def gamebench_sessions(n: int, *, seed: int = 4, now: Optional[dt.datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """`n` search hits split over the two default app packages, newest first."""
+    rng = random.Random(seed)
+    now = _now(now)
+    base = template("gamebench_session")
+    by_package: Dict[str, List[Dict[str, Any]]] = {pkg: [] for pkg in GAMEBENCH_PACKAGES}
+    for i in range(n):
+        pkg = GAMEBENCH_PACKAGES[i % len(GAMEBENCH_PACKAGES)]
+        session = copy.deepcopy(base)
+        session["sessionId"] = f"6f1e2d3c-4b5a-4968-{i >> 48 & 0xFFFF:04x}-{i & 0xFFFFFFFFFFFF:012x}"
+        session["timePushed"] = int((now - dt.timedelta(seconds=rng.randrange(60, 80 * 86400))).timestamp() * 1000)
+        session["platform"] = rng.choice(["Android", "iOS"])
+        session["app"]["package"] = pkg
+        session["app"]["environment"] = "dev" if ".internal." in pkg else "prod"
+        by_package[pkg].append(session)
+    for sessions in by_package.values():
+        sessions.sort(key=lambda s: s["timePushed"], reverse=True)
+    return by_package
+
+
+def gamebench_session_detail(session: Dict[str, Any]) -> Dict[str, Any]:
+    detail = template("gamebench_session_detail")
+    detail["id"] = session["sessionId"]
+    detail["timePushed"] = session["timePushed"]
+    detail["app"]["package"] = session["app"]["package"]
+    detail["device"]["osName"] = session["platform"]
+    return detail
+
+
+def gamebench_series(session_id: str, *, stability: bool = False) -> List[Dict[str, Any]]:
+    """One-minute FPS (or FPS stability %) series for a session, one point per second."""
+    rng = random.Random(session_id)
+    if stability:
+        return [{"timestamp": t * 1000, "value": round(rng.uniform(70.0, 100.0), 1)} for t in range(60)]
+    return [{"timestamp": t * 1000, "value": round(rng.uniform(45.0, 60.0), 1)} for t in range(60)]
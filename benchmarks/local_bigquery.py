@@ -0,0 +1,1833 @@
+"""Local DuckDB stand-in for `google.cloud.bigquery.Client` (development only).
+
+`bq_backend.get_client()` returns the process-wide `LocalBigQueryClient` from
+here when `BQ_BACKEND=local`, so a full ingest + KPI run executes on one
+machine (load tests, profiling) without GCP. This module lives with the
+benchmarks and is not shipped in the service images: it is only importable
+from a repo checkout with the repo root on `sys.path`, which is how the
+benchmark runner (`python -m benchmarks.run`) and the root scripts started
+from the repo root already run.
+
+The stand-in covers the client surface this repo uses:
+
+- `query(sql, job_config=...)`: GoogleSQL is rewritten to DuckDB SQL statement by
+  statement. Scripts, `DECLARE` / `SET`, `IF ... END IF`, `BEGIN ... END`,
+  `EXECUTE IMMEDIATE`, `CREATE [TEMP] TABLE [AS]`, `ALTER TABLE ADD COLUMN`,
+  `MERGE`, `SELECT * EXCEPT`, `UNNEST [WITH OFFSET]`, `STRUCT`, `[OFFSET(n)]`,
+  named / array query parameters, `INFORMATION_SCHEMA.TABLES|COLUMNS` and the
+  date, timestamp and JSON functions of the KPI scripts are handled.
+  `PARTITION BY`, `CLUSTER BY` and `OPTIONS` are dropped. A script runs in one
+  transaction; its temp tables are dropped when it ends.
+- `insert_rows_json`, `insert_rows`, `load_table_from_file` /
+  `load_table_from_json` (NDJSON, gzip or plain).
+- `get_table` / `create_table` / `update_table` / `delete_table`, `dataset`,
+  `get_dataset` / `create_dataset`. Datasets are DuckDB schemas created on
+  first use; `project.dataset.table` maps to `dataset.table`.
+
+TIMESTAMP columns hold UTC and come back as tz-aware datetimes, like the real
+client. Writes create missing tables from the rows and add columns for new
+fields, as if every write ran with ALLOW_FIELD_ADDITION. The Storage Write API
+sink is not emulated; keep the default `BQ_WRITE_SINK=streaming` locally.
+
+Env vars:
+- BQ_LOCAL_PATH: DuckDB database file (default `:memory:`, one database per
+  process). A file keeps tables and watermarks between runs.
+- BQ_LOCAL_INIT_SQL: CSV of SQL files run once when the client is created,
+  e.g. `simple/setup.sql` for the KPI tables and views.
+- BQ_LOCAL_STRICT: default `true`: SQL that fails locally raises `BadRequest` /
+  `NotFound` (so the handler fails like it would against BigQuery) and writes
+  follow BigQuery's unknown-field rules. `false` rolls the failing script back,
+  logs it (`BQ_LOCAL_QUERY_FAILED`) and returns no rows; only useful to poke at
+  a run against an empty database, since the SQL side then fails silently.
+
+Needs DuckDB (`pip install duckdb`).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import decimal
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from google.api_core.exceptions import BadRequest, Conflict, GoogleAPICallError, NotFound
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Row
+
+LOGGER = logging.getLogger(__name__)
+
+_CLIENTS: Dict[str, "LocalBigQueryClient"] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def _strict() -> bool:
+    return (os.environ.get("BQ_LOCAL_STRICT") or "true").strip().lower() not in ("0", "false", "no", "off")
+
+
+def get_client(project: Optional[str] = None) -> "LocalBigQueryClient":
+    """The process-wide local client for BQ_LOCAL_PATH."""
+    path = (os.environ.get("BQ_LOCAL_PATH") or "").strip() or ":memory:"
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(path)
+        if client is None:
+            client = _CLIENTS[path] = LocalBigQueryClient(path, project=project)
+    return client
+
+
+# -- Values --------------------------------------------------------------------
+
+_UTC = dt.timezone.utc
+_EPOCH = dt.datetime(1970, 1, 1)
+_TS_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|z|[+-]\d{2}:?\d{2}| UTC)?$")
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _to_timestamp(value: Any) -> Optional[dt.datetime]:
+    """UTC as a naive datetime, the way TIMESTAMP columns are stored locally."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, dt.datetime):
+        ts = value
+    elif isinstance(value, dt.date):
+        return dt.datetime(value.year, value.month, value.day)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _EPOCH + dt.timedelta(seconds=value)
+    else:
+        text = str(value).strip()
+        if text.endswith(" UTC"):
+            text = text[:-4]
+        if text[-1:] in ("Z", "z"):
+            text = text[:-1] + "+00:00"
+        ts = dt.datetime.fromisoformat(text)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(_UTC).replace(tzinfo=None)
+    return ts
+
+
+def _to_date(value: Any) -> Optional[dt.date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, dt.datetime):
+        return _to_timestamp(value).date()
+    if isinstance(value, dt.date):
+        return value
+    text = str(value).strip()
+    if _DATE_RE.match(text):
+        return dt.date.fromisoformat(text)
+    return _to_timestamp(text).date()
+
+
+def _to_bool(value: Any) -> Optional[bool]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1")
+    return bool(value)
+
+
+def _to_json_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else json.dumps(value, default=str)
+
+
+def _to_json_value(value: Any) -> Any:
+    # JSON / STRUCT values travel inside the JSON batch, so strings are parsed.
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _coercer(duck_type: str) -> Callable[[Any], Any]:
+    """Python value -> its canonical form for a column of `duck_type` (see `_json_batch`)."""
+    t = duck_type.upper()
+    if t.endswith("[]"):
+        inner = _coercer(duck_type[:-2])
+        return lambda v: None if v is None else [inner(x) for x in (v if isinstance(v, (list, tuple)) else [v])]
+    if t.startswith("STRUCT(") or t == "JSON":
+        return _to_json_value
+    if t.startswith("TIMESTAMP"):
+        return _to_timestamp
+    if t == "DATE":
+        return _to_date
+    if t == "BOOLEAN":
+        return _to_bool
+    if t in ("BIGINT", "INTEGER", "HUGEINT", "SMALLINT", "TINYINT"):
+        return lambda v: None if v is None or v == "" else int(v)
+    if t in ("DOUBLE", "FLOAT", "REAL"):
+        return lambda v: None if v is None or v == "" else float(v)
+    if t.startswith("DECIMAL"):
+        return lambda v: None if v is None or v == "" else decimal.Decimal(str(v))
+    if t == "VARCHAR":
+        return lambda v: v if v is None or isinstance(v, str) else _to_json_text(v)
+    return lambda v: v
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (dt.date, dt.time, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json_structure(duck_type: str) -> Any:
+    """`from_json` structure for a DuckDB type: `VARCHAR[]` -> ["VARCHAR"], STRUCT -> {name: type}."""
+    if duck_type.endswith("[]"):
+        return [_json_structure(duck_type[:-2])]
+    if duck_type.upper().startswith("STRUCT("):
+        fields = {}
+        for part in _split_top(duck_type[7:-1]):
+            if part.startswith('"'):
+                end = part.index('"', 1)
+                name, sub_type = part[1:end], part[end + 1 :].strip()
+            else:
+                name, _, sub_type = part.partition(" ")
+            fields[name] = _json_structure(sub_type.strip())
+        return fields
+    return "VARCHAR" if duck_type.upper() == "BLOB" else duck_type
+
+
+def _json_batch(value: Any) -> str:
+    # DuckDB's Python binding probes for pandas on every list element it
+    # converts, so bulk values (rows, array parameters) go in as one JSON
+    # string and are unpacked with `from_json`.
+    return json.dumps(value, default=_json_default, separators=(",", ":"))
+
+
+def _from_json_sql(param: str, duck_type: str) -> str:
+    structure = json.dumps(_json_structure(duck_type)).replace("'", "''")
+    return f"CAST(from_json({param}, '{structure}') AS {duck_type})"
+
+
+def _infer_type(values: Iterable[Any]) -> str:
+    """DuckDB column type for the values of a new field (STRING when nothing is known)."""
+    kinds = set()
+    items: List[Any] = []
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            kinds.add("BOOLEAN")
+        elif isinstance(v, int):
+            kinds.add("BIGINT")
+        elif isinstance(v, float):
+            kinds.add("DOUBLE")
+        elif isinstance(v, dict):
+            kinds.add("JSON")
+        elif isinstance(v, (list, tuple)):
+            kinds.add("LIST")
+            items.extend(v)
+        elif isinstance(v, dt.datetime):
+            kinds.add("TIMESTAMP")
+        elif isinstance(v, dt.date):
+            kinds.add("DATE")
+        elif isinstance(v, str) and _TS_RE.match(v):
+            kinds.add("TIMESTAMP")
+        elif isinstance(v, str) and _DATE_RE.match(v):
+            kinds.add("DATE")
+        else:
+            kinds.add("VARCHAR")
+    if kinds == {"LIST"}:
+        return _infer_type(items) + "[]"
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds == {"BIGINT", "DOUBLE"}:
+        return "DOUBLE"
+    if kinds == {"TIMESTAMP", "DATE"}:
+        return "TIMESTAMP"
+    return "VARCHAR"
+
+
+# -- Types ---------------------------------------------------------------------
+
+_SCALAR_TYPES = {
+    "STRING": "VARCHAR",
+    "BYTES": "BLOB",
+    "INTEGER": "BIGINT",
+    "INT64": "BIGINT",
+    "INT": "BIGINT",
+    "SMALLINT": "BIGINT",
+    "BIGINT": "BIGINT",
+    "TINYINT": "BIGINT",
+    "BYTEINT": "BIGINT",
+    "FLOAT": "DOUBLE",
+    "FLOAT64": "DOUBLE",
+    "NUMERIC": "DECIMAL(38, 9)",
+    "DECIMAL": "DECIMAL(38, 9)",
+    "BIGNUMERIC": "DOUBLE",
+    "BIGDECIMAL": "DOUBLE",
+    "BOOLEAN": "BOOLEAN",
+    "BOOL": "BOOLEAN",
+    "TIMESTAMP": "TIMESTAMP",
+    "DATETIME": "TIMESTAMP",
+    "DATE": "DATE",
+    "TIME": "TIME",
+    "JSON": "JSON",
+    "GEOGRAPHY": "VARCHAR",
+    "INTERVAL": "INTERVAL",
+}
+
+_BQ_TYPES = {
+    "VARCHAR": "STRING",
+    "BLOB": "BYTES",
+    "BIGINT": "INTEGER",
+    "INTEGER": "INTEGER",
+    "HUGEINT": "INTEGER",
+    "SMALLINT": "INTEGER",
+    "TINYINT": "INTEGER",
+    "UBIGINT": "INTEGER",
+    "UINTEGER": "INTEGER",
+    "DOUBLE": "FLOAT",
+    "FLOAT": "FLOAT",
+    "DECIMAL": "NUMERIC",
+    "BOOLEAN": "BOOLEAN",
+    "TIMESTAMP": "TIMESTAMP",
+    "TIMESTAMP WITH TIME ZONE": "TIMESTAMP",
+    "DATE": "DATE",
+    "TIME": "TIME",
+    "JSON": "JSON",
+    "INTERVAL": "INTERVAL",
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _duck_type_for_field(field: bigquery.SchemaField) -> str:
+    ftype = (field.field_type or "STRING").upper()
+    if ftype in ("RECORD", "STRUCT"):
+        base = "STRUCT(" + ", ".join(f"{_quote(f.name)} {_duck_type_for_field(f)}" for f in field.fields) + ")"
+    else:
+        base = _SCALAR_TYPES.get(ftype, "VARCHAR")
+    return base + "[]" if field.mode == "REPEATED" else base
+
+
+def _split_top(text: str) -> List[str]:
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return [p for p in parts if p]
+
+
+def _field_from_duck(name: str, duck_type: str, nullable: bool = True) -> bigquery.SchemaField:
+    mode = "NULLABLE" if nullable else "REQUIRED"
+    if duck_type.endswith("[]"):
+        inner = _field_from_duck(name, duck_type[:-2])
+        return bigquery.SchemaField(name, inner.field_type, mode="REPEATED", fields=inner.fields)
+    if duck_type.upper().startswith("STRUCT("):
+        fields = []
+        for part in _split_top(duck_type[7:-1]):
+            if part.startswith('"'):
+                end = part.index('"', 1)
+                sub_name, sub_type = part[1:end], part[end + 1 :].strip()
+            else:
+                sub_name, _, sub_type = part.partition(" ")
+            fields.append(_field_from_duck(sub_name, sub_type.strip()))
+        return bigquery.SchemaField(name, "RECORD", mode=mode, fields=fields)
+    base = duck_type.upper().split("(", 1)[0].strip()
+    return bigquery.SchemaField(name, _BQ_TYPES.get(base, "STRING"), mode=mode)
+
+
+# -- GoogleSQL lexer -----------------------------------------------------------
+
+
+class _Unsupported(Exception):
+    """GoogleSQL the local backend cannot run."""
+
+
+class _Tok:
+    __slots__ = ("kind", "text", "up")
+
+    def __init__(self, kind: str, text: str) -> None:
+        self.kind = kind  # word | ident | str | param | num | op | raw
+        self.text = text
+        self.up = text.upper() if kind == "word" else text
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{self.text}"
+
+
+class _Mark(_Tok):
+    """Position of a table-level UNNEST whose alias must be qualified in its scope."""
+
+    __slots__ = ("alias", "table_alias")
+
+    def __init__(self, alias: str, table_alias: str) -> None:
+        super().__init__("mark", "")
+        self.alias = alias
+        self.table_alias = table_alias
+
+
+_LEX = re.compile(
+    r"(?P<ws>\s+)"
+    r"|(?P<comment>--[^\n]*|#[^\n]*|/\*.*?\*/)"
+    r"|(?P<str>(?P<prefix>[rRbB]{1,2})?(?:'''(?P<t1>.*?)'''|\"\"\"(?P<t2>.*?)\"\"\"|'(?P<s1>(?:\\.|[^'\\])*)'|\"(?P<s2>(?:\\.|[^\"\\])*)\"))"
+    r"|(?P<ident>`[^`]*`)"
+    r"|(?P<param>@@?[A-Za-z_][A-Za-z_0-9]*|\?)"
+    r"|(?P<num>0[xX][0-9a-fA-F]+|(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<word>[A-Za-z_][A-Za-z_0-9]*)"
+    r"|(?P<op><=|>=|<>|!=|\|\||//|=>|::|[-+*/%=<>(),.;\[\]{}:&|^~!])",
+    re.S,
+)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "v": "\v", "a": "\a", "0": "\0"}
+
+
+def _unescape(body: str) -> str:
+    def sub(m: "re.Match[str]") -> str:
+        s = m.group(1)
+        if s[0] in "xuU" and len(s) > 1:
+            return chr(int(s[1:], 16))
+        return _ESCAPES.get(s, s)
+
+    return re.sub(r"\\(x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|.)", sub, body, flags=re.S)
+
+
+def _lex(sql: str) -> List[_Tok]:
+    toks: List[_Tok] = []
+    pos = 0
+    while pos < len(sql):
+        m = _LEX.match(sql, pos)
+        if not m:
+            raise _Unsupported(f"unexpected character {sql[pos]!r} at offset {pos}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind in ("ws", "comment"):
+            continue
+        if kind in ("t1", "t2", "s1", "s2", "prefix", "str"):
+            body = next(g for g in (m.group("t1"), m.group("t2"), m.group("s1"), m.group("s2")) if g is not None)
+            raw = "r" in (m.group("prefix") or "").lower()
+            toks.append(_Tok("str", body if raw else _unescape(body)))
+            continue
+        text = m.group(kind)
+        if kind == "ident":
+            # `proj`.dataset.table and `T`.col: fold dotted continuations into one path.
+            path = text[1:-1]
+            while len(sql) > pos and sql[pos] == "." and (m2 := re.match(r"\.(`[^`]*`|[A-Za-z_][A-Za-z_0-9]*)", sql[pos:])):
+                part = m2.group(1)
+                path += "." + (part[1:-1] if part.startswith("`") else part)
+                pos += m2.end()
+            toks.append(_Tok("ident", path))
+            continue
+        toks.append(_Tok(kind, text))
+    return toks
+
+
+def _is(tok: Optional[_Tok], *texts: str) -> bool:
+    return tok is not None and tok.kind in ("op", "word") and tok.up in texts
+
+
+def _match(toks: Sequence[_Tok], i: int) -> int:
+    """Index of the bracket closing the one at `i`."""
+    pairs = {"(": ")", "[": "]", "{": "}"}
+    opener, closer, depth = toks[i].text, pairs[toks[i].text], 0
+    for j in range(i, len(toks)):
+        t = toks[j]
+        if t.kind == "op" and t.text == opener:
+            depth += 1
+        elif t.kind == "op" and t.text == closer:
+            depth -= 1
+            if depth == 0:
+                return j
+    raise _Unsupported(f"unbalanced {opener}")
+
+
+def _split_top_level(toks: Sequence[_Tok], sep: str = ",") -> List[List[_Tok]]:
+    parts: List[List[_Tok]] = [[]]
+    depth = 0
+    for t in toks:
+        if t.kind == "op" and t.text in "([{" and t.text:
+            depth += 1
+        elif t.kind == "op" and t.text in ")]}" and t.text:
+            depth -= 1
+        elif depth == 0 and t.kind == "op" and t.text == sep:
+            parts.append([])
+            continue
+        parts[-1].append(t)
+    return parts if parts != [[]] else []
+
+
+def _find_top(toks: Sequence[_Tok], *words: str, start: int = 0) -> int:
+    """First index >= start of one of `words` outside brackets and CASE blocks, or -1."""
+    depth = 0
+    for j in range(start, len(toks)):
+        t = toks[j]
+        if t.kind == "op" and t.text in ("(", "[", "{"):
+            depth += 1
+        elif t.kind == "op" and t.text in (")", "]", "}"):
+            depth -= 1
+        elif t.kind == "word" and t.up == "CASE":
+            depth += 1
+        elif t.kind == "word" and t.up == "END" and depth > 0:
+            depth -= 1
+        elif depth == 0 and t.kind == "word" and t.up in words:
+            return j
+    return -1
+
+
+def _raw(text: str) -> _Tok:
+    return _Tok("raw", text)
+
+
+def _render(toks: Sequence[_Tok]) -> str:
+    out: List[str] = []
+    prev: Optional[_Tok] = None
+    for t in toks:
+        if t.kind == "mark":
+            continue
+        if t.kind == "str":
+            text = "'" + t.text.replace("'", "''") + "'"
+        elif t.kind == "ident":
+            text = _ident_sql(t.text)
+        else:
+            text = t.text
+        glue = (
+            prev is None
+            or (t.kind == "op" and t.text in (".", ",", ")", "]"))
+            or (prev.kind == "op" and prev.text in (".", "(", "["))
+            or (t.kind == "op" and t.text == "[" and prev.kind in ("word", "ident", "raw") or _is(t, "[") and _is(prev, ")", "]"))
+        )
+        out.append(text if glue else " " + text)
+        prev = t
+    return "".join(out)
+
+
+_INFO_SCHEMA = {
+    "TABLES": "(SELECT table_catalog, table_schema, table_name, table_type FROM information_schema.tables WHERE table_schema = {schema})",
+    "COLUMNS": (
+        "(SELECT table_catalog, table_schema, table_name, column_name, ordinal_position, is_nullable, data_type"
+        " FROM information_schema.columns WHERE table_schema = {schema})"
+    ),
+}
+
+
+def _ident_sql(path: str) -> str:
+    parts = path.split(".")
+    upper = [p.upper() for p in parts]
+    if "INFORMATION_SCHEMA" in upper:
+        k = upper.index("INFORMATION_SCHEMA")
+        view = upper[k + 1] if k + 1 < len(upper) else ""
+        if k == 0 or view not in _INFO_SCHEMA:
+            raise _Unsupported(f"INFORMATION_SCHEMA view {path}")
+        return _INFO_SCHEMA[view].format(schema="'" + parts[k - 1].replace("'", "''") + "'")
+    if len(parts) >= 3:
+        parts = parts[-2:]
+    return ".".join(_quote(p) for p in parts)
+
+
+def _type_sql(toks: Sequence[_Tok]) -> str:
+    """GoogleSQL type tokens (`ARRAY<STRUCT<a INT64>>`, `NUMERIC(10, 2)`) -> DuckDB type."""
+
+    def parse(i: int) -> Tuple[str, int]:
+        if i >= len(toks):
+            raise _Unsupported("missing type")
+        word = toks[i].up
+        i += 1
+        if word in ("ARRAY", "STRUCT"):
+            if not _is(toks[i] if i < len(toks) else None, "<"):
+                raise _Unsupported(f"{word} without element type")
+            i += 1
+            if word == "ARRAY":
+                inner, i = parse(i)
+                if not _is(toks[i] if i < len(toks) else None, ">"):
+                    raise _Unsupported("ARRAY type")
+                return inner + "[]", i + 1
+            fields = []
+            while True:
+                name = toks[i].text
+                inner, i = parse(i + 1)
+                fields.append(f"{_quote(name)} {inner}")
+                if _is(toks[i], ","):
+                    i += 1
+                    continue
+                if _is(toks[i], ">"):
+                    return "STRUCT(" + ", ".join(fields) + ")", i + 1
+                raise _Unsupported("STRUCT type")
+        base = _SCALAR_TYPES.get(word)
+        if base is None:
+            raise _Unsupported(f"type {word}")
+        if i < len(toks) and _is(toks[i], "("):
+            close = _match(toks, i)
+            if base.startswith("DECIMAL"):
+                base = "DECIMAL(" + _render(toks[i + 1 : close]) + ")"
+            i = close + 1
+        return base, i
+
+    out, end = parse(0)
+    if end != len(toks):
+        raise _Unsupported("type " + _render(toks))
+    return out
+
+
+# -- GoogleSQL -> DuckDB expressions -------------------------------------------
+
+_UNITS = {
+    "MICROSECOND", "MILLISECOND", "SECOND", "MINUTE", "HOUR", "DAY", "DAYOFWEEK", "DAYOFYEAR",
+    "WEEK", "ISOWEEK", "MONTH", "QUARTER", "YEAR", "ISOYEAR", "DATE", "TIME", "DATETIME",
+}
+_NOT_ALIAS = {
+    "WHERE", "ON", "LEFT", "RIGHT", "INNER", "FULL", "CROSS", "JOIN", "GROUP", "ORDER", "HAVING", "LIMIT",
+    "WINDOW", "QUALIFY", "UNION", "INTERSECT", "EXCEPT", "WITH", "USING", "SELECT", "FROM", "WHEN", "THEN",
+    "ELSE", "END", "AND", "OR", "NOT",
+}
+_RENAMES = {
+    "LOGICAL_OR": "bool_or",
+    "LOGICAL_AND": "bool_and",
+    "REGEXP_CONTAINS": "regexp_matches",
+    "FORMAT": "printf",
+    "ARRAY_REVERSE": "list_reverse",
+    "ARRAY_CONCAT": "list_concat",
+    "GENERATE_ARRAY": "generate_series",
+    "PERCENTILE_CONT": "quantile_cont",
+    "PERCENTILE_DISC": "quantile_disc",
+    "BYTE_LENGTH": "strlen",
+    "CHAR_LENGTH": "length",
+    "CHARACTER_LENGTH": "length",
+    "FARM_FINGERPRINT": "hash",
+    "SAFE_DIVIDE": "bq_safe_divide",
+    "LN": "ln",
+    "LOG": "ln",
+    "ERROR": "error",
+    "TO_JSON": "to_json",
+    "ARRAY_AGG": "array_agg",
+}
+# Macros backing functions whose DuckDB spelling needs more than a rename.
+_MACROS = (
+    "bq_current_timestamp() AS CAST(current_timestamp AS TIMESTAMP)",
+    "bq_current_date(tz) AS CAST(timezone(tz, current_timestamp) AS DATE)",
+    "bq_timestamp(x) AS CAST(CAST(x AS TIMESTAMPTZ) AS TIMESTAMP)",
+    "bq_timestamp_tz(x, tz) AS CAST(timezone(tz, CAST(x AS TIMESTAMP)) AS TIMESTAMP)",
+    "bq_local(x, tz) AS timezone(tz, CAST(x AS TIMESTAMPTZ))",
+    "bq_safe_divide(a, b) AS CASE WHEN b = 0 THEN NULL ELSE a / b END",
+)
+
+
+def _call(name: str, *args: Sequence[_Tok]) -> List[_Tok]:
+    out: List[_Tok] = [_raw(name + "(")]
+    for k, arg in enumerate(args):
+        if k:
+            out.append(_raw(","))
+        out.extend(arg)
+    out.append(_raw(")"))
+    return out
+
+
+def _unit(toks: Sequence[_Tok]) -> str:
+    if not toks or toks[0].kind != "word":
+        raise _Unsupported("date part " + _render(toks))
+    word = toks[0].up
+    return "'" + {"ISOWEEK": "week", "ISOYEAR": "isoyear"}.get(word, word.lower()) + "'"
+
+
+class _Translator:
+    """Rewrites the expressions of one statement; collects the parameters it binds."""
+
+    def __init__(self, variables: Dict[str, Tuple[Optional[str], Any]], params: Dict[str, Tuple[Optional[str], Any]]) -> None:
+        self.variables = variables
+        self.params = params
+        self.bound: Dict[str, Any] = {}
+        self.positional = False
+        self._aliases = 0
+
+    def sql(self, toks: Sequence[_Tok]) -> str:
+        return _render(_qualify_unnest_aliases(self.expr(toks)))
+
+    # The scan is flat: brackets are copied through, so nested SELECTs are
+    # translated in the same pass; function arguments recurse.
+    def expr(self, toks: Sequence[_Tok]) -> List[_Tok]:
+        out: List[_Tok] = []
+        i, n = 0, len(toks)
+        while i < n:
+            t = toks[i]
+            nxt = toks[i + 1] if i + 1 < n else None
+            prev = out[-1] if out else None
+            if t.kind == "param":
+                out.append(self._param(t.text))
+                i += 1
+                continue
+            if t.kind == "op" and t.text == "*" and _is(nxt, "EXCEPT") and i + 2 < n and _is(toks[i + 2], "("):
+                out.extend([t, _raw("EXCLUDE")])
+                i += 2
+                continue
+            if t.kind == "op" and t.text == "[" and _is(nxt, "OFFSET", "SAFE_OFFSET", "ORDINAL", "SAFE_ORDINAL"):
+                close = _match(toks, i + 2)
+                if close + 1 >= n or not _is(toks[close + 1], "]"):
+                    raise _Unsupported("array subscript")
+                index = self.expr(toks[i + 3 : close])
+                base = " + 1" if nxt.up.endswith("OFFSET") else ""
+                out.extend([_raw("[("), *index, _raw(")" + base + "]")])
+                i = close + 2
+                continue
+            if t.kind != "word":
+                out.append(t)
+                i += 1
+                continue
+            up = t.up
+            safe = False
+            if up == "SAFE" and _is(nxt, ".") and i + 3 < n and toks[i + 2].kind == "word" and _is(toks[i + 3], "("):
+                i += 2
+                t, nxt, up, safe = toks[i], toks[i + 1], toks[i].up, True
+            if _is(nxt, ".") and i + 4 < n and _is(toks[i + 2], "INFORMATION_SCHEMA") and _is(toks[i + 3], "."):
+                out.append(_raw(_ident_sql(f"{t.text}.INFORMATION_SCHEMA.{toks[i + 4].text}")))
+                i += 5
+                continue
+            if up == "UNNEST" and _is(nxt, "("):
+                i = self._unnest(toks, i, out)
+                continue
+            if _is(nxt, "(") and not _is(prev, "."):
+                close = _match(toks, i + 1)
+                out.extend(self._function(up, t, list(toks[i + 2 : close]), safe))
+                i = close + 1
+                continue
+            if up == "INTERVAL":
+                j = i + 1
+                while j < n and not (toks[j].kind == "word" and toks[j].up in _UNITS and j > i + 1):
+                    j += 1
+                if j >= n:
+                    raise _Unsupported("INTERVAL")
+                out.extend([_raw("INTERVAL ("), *self.expr(toks[i + 1 : j]), _raw(") " + toks[j].up)])
+                i = j + 1
+                continue
+            if up in ("DATE", "TIMESTAMP", "DATETIME", "TIME", "JSON", "NUMERIC", "BIGNUMERIC") and nxt is not None and nxt.kind == "str":
+                if up == "TIMESTAMP":
+                    out.extend(_call("bq_timestamp", [nxt]))
+                else:
+                    out.extend([_raw("CAST("), nxt, _raw(f" AS {_SCALAR_TYPES[up]})")])
+                i += 2
+                continue
+            if up in ("UNION", "INTERSECT", "EXCEPT") and _is(nxt, "DISTINCT"):
+                out.append(t)
+                i += 2
+                continue
+            if up in ("CURRENT_TIMESTAMP", "CURRENT_DATETIME"):
+                out.append(_raw("bq_current_timestamp()"))
+                i += 1
+                continue
+            if up == "ARRAY" and _is(nxt, "<"):
+                depth, j = 0, i + 1
+                while j < n:
+                    if _is(toks[j], "<"):
+                        depth += 1
+                    elif _is(toks[j], ">"):
+                        depth -= 1
+                        if depth == 0:
+                            break
+                    j += 1
+                i = j + 1
+                continue
+            key = t.text.lower()
+            if key in self.variables and not _is(prev, ".", "AS") and not _is(nxt, ".", "("):
+                out.append(self._variable(key))
+                i += 1
+                continue
+            out.append(t)
+            i += 1
+        return out
+
+    def _param(self, text: str) -> _Tok:
+        if text == "?":
+            self.positional = True
+            return _raw("?")
+        if text.startswith("@@"):
+            raise _Unsupported(f"system variable {text}")
+        key = text[1:].lower()
+        if key not in self.params:
+            raise BadRequest(f"Query parameter '{text[1:]}' not found")
+        return self._bind("p_" + key, *self.params[key])
+
+    def _variable(self, key: str) -> _Tok:
+        return self._bind("v_" + key, *self.variables[key])
+
+    def _bind(self, name: str, duck_type: Optional[str], value: Any) -> _Tok:
+        if duck_type and duck_type.endswith("[]") and value is not None:
+            self.bound[name] = _json_batch(value)
+            return _raw(_from_json_sql("$" + name, duck_type))
+        self.bound[name] = value
+        return _raw(f"CAST(${name} AS {duck_type})" if duck_type else f"${name}")
+
+    def _unnest(self, toks: Sequence[_Tok], i: int, out: List[_Tok]) -> int:
+        close = _match(toks, i + 1)
+        array = self.expr(toks[i + 2 : close])
+        prev = out[-1] if out else None
+        j = close + 1
+        if _is(prev, "IN"):
+            out.extend([_raw("(SELECT UNNEST("), *array, _raw("))")])
+            return j
+        if not _is(prev, "FROM", "JOIN", ","):
+            out.extend(_call("UNNEST", array))
+            return j
+        alias = offset = None
+        if j < len(toks) and _is(toks[j], "AS"):
+            j += 1
+        if j < len(toks) and toks[j].kind in ("word", "ident") and toks[j].up not in _NOT_ALIAS:
+            alias = toks[j].text
+            j += 1
+        if j + 1 < len(toks) and _is(toks[j], "WITH") and _is(toks[j + 1], "OFFSET"):
+            j += 2
+            offset = "offset"
+            if j < len(toks) and _is(toks[j], "AS"):
+                j += 1
+            if j < len(toks) and toks[j].kind in ("word", "ident") and toks[j].up not in _NOT_ALIAS:
+                offset = toks[j].text
+                j += 1
+        self._aliases += 1
+        column = alias or "unnest"
+        table_alias = f"__unnest_{self._aliases}"
+        if offset:
+            out.extend(
+                [
+                    _raw("(SELECT UNNEST("),
+                    *array,
+                    _raw(f") AS {_quote(column)}, generate_subscripts("),
+                    *array,
+                    _raw(f", 1) - 1 AS {_quote(offset)}) AS {table_alias}"),
+                ]
+            )
+        else:
+            out.extend([_raw("UNNEST("), *array, _raw(f") AS {table_alias}({_quote(column)})")])
+        if alias:
+            out.append(_Mark(alias, table_alias))
+        return j
+
+    def _args(self, inner: Sequence[_Tok]) -> List[List[_Tok]]:
+        return [self.expr(a) for a in _split_top_level(inner)]
+
+    def _function(self, up: str, tok: _Tok, inner: List[_Tok], safe: bool) -> List[_Tok]:
+        if up in ("CAST", "SAFE_CAST"):
+            k = max(j for j, t in enumerate(inner) if _is(t, "AS"))
+            fn = "TRY_CAST" if safe or up == "SAFE_CAST" else "CAST"
+            return [_raw(fn + "("), *self.expr(inner[:k]), _raw(f" AS {_type_sql(inner[k + 1:])})")]
+        if up == "EXTRACT":
+            part = inner[0].up
+            value = inner[2:]
+            at = _find_top(value, "AT")
+            if at >= 0:
+                tz = self.expr(value[at + 3 :])
+                x = _call("bq_local", self.expr(value[:at]), tz)
+            else:
+                x = self.expr(value)
+            if part == "DATE":
+                return [_raw("CAST("), *x, _raw(" AS DATE)")]
+            if part == "DAYOFWEEK":
+                return [_raw("(dayofweek("), *x, _raw(") + 1)")]
+            field = {"ISOWEEK": "week", "WEEK": "week", "DAYOFYEAR": "doy"}.get(part, part.lower())
+            return [_raw(f"EXTRACT({field} FROM "), *x, _raw(")")]
+        if up == "STRUCT":
+            fields: List[_Tok] = [_raw("struct_pack(")]
+            for k, part in enumerate(_split_top_level(inner)):
+                as_idx = _find_top(part, "AS")
+                if as_idx >= 0:
+                    name, value = part[as_idx + 1].text, part[:as_idx]
+                elif len(part) >= 1 and part[-1].kind in ("word", "ident") and (len(part) == 1 or _is(part[-2], ".")):
+                    name, value = part[-1].text.split(".")[-1], part
+                else:
+                    name, value = f"_field_{k + 1}", part
+                if k:
+                    fields.append(_raw(","))
+                fields.extend([_raw(f"{_quote(name)} := "), *self.expr(value)])
+            fields.append(_raw(")"))
+            return fields
+        if up == "ARRAY_AGG":
+            limit = _find_top(inner, "LIMIT")
+            n = None
+            if limit >= 0:
+                n = self.expr(inner[limit + 1 :])
+                inner = inner[:limit]
+            ignore = _find_top(inner, "IGNORE")
+            if ignore >= 0 and _is(inner[ignore + 1] if ignore + 1 < len(inner) else None, "NULLS"):
+                inner = inner[:ignore] + inner[ignore + 2 :]
+                order = _find_top(inner, "ORDER")
+                value = self.expr(inner[: order if order >= 0 else len(inner)])
+                agg = [*_call("array_agg", self.expr(inner)), _raw(" FILTER (WHERE ("), *value, _raw(") IS NOT NULL)")]
+            else:
+                agg = _call("array_agg", self.expr(inner))
+            return _call("list_slice", agg, [_raw("1")], n) if n is not None else agg
+
+        args = self._args(inner)
+        nargs = len(args)
+        if up in ("CURRENT_TIMESTAMP", "CURRENT_DATETIME"):
+            return [_raw("bq_current_timestamp()")]
+        if up == "CURRENT_DATE":
+            return _call("bq_current_date", args[0]) if args else [_raw("current_date")]
+        if up == "TIMESTAMP":
+            return _call("bq_timestamp_tz", *args) if nargs == 2 else _call("bq_timestamp", *args)
+        if up == "DATETIME":
+            if nargs == 2:
+                return _call("bq_local", *args)
+            return [_raw("CAST("), *args[0], _raw(" AS TIMESTAMP)")]
+        if up == "DATE":
+            if nargs == 3:
+                return _call("make_date", *args)
+            if nargs == 2:
+                return [_raw("CAST("), *_call("bq_local", *args), _raw(" AS DATE)")]
+            return [_raw("CAST("), *args[0], _raw(" AS DATE)")]
+        if up in ("TIMESTAMP_SUB", "DATETIME_SUB", "TIMESTAMP_ADD", "DATETIME_ADD", "DATE_SUB", "DATE_ADD"):
+            op = " - " if up.endswith("_SUB") else " + "
+            shifted = [_raw("("), *args[0], _raw(op), *args[1], _raw(")")]
+            return [_raw("CAST("), *shifted, _raw(" AS DATE)")] if up.startswith("DATE_") else shifted
+        if up in ("TIMESTAMP_DIFF", "DATETIME_DIFF", "DATE_DIFF"):
+            fn = "date_diff" if up == "DATE_DIFF" else "date_sub"
+            return _call(fn, [_raw(_unit(_split_top_level(inner)[2]))], args[1], args[0])
+        if up in ("TIMESTAMP_TRUNC", "DATETIME_TRUNC", "DATE_TRUNC"):
+            trunc = _call("date_trunc", [_raw(_unit(_split_top_level(inner)[1]))], args[0])
+            return [_raw("CAST("), *trunc, _raw(" AS DATE)")] if up == "DATE_TRUNC" else trunc
+        if up == "UNIX_SECONDS":
+            return [_raw("CAST(floor(epoch("), *args[0], _raw(")) AS BIGINT)")]
+        if up == "UNIX_MILLIS":
+            return _call("epoch_ms", *args)
+        if up == "UNIX_MICROS":
+            return _call("epoch_us", *args)
+        if up == "UNIX_DATE":
+            return _call("date_diff", [_raw("'day'")], [_raw("DATE '1970-01-01'")], args[0])
+        if up in ("TIMESTAMP_SECONDS", "TIMESTAMP_MILLIS", "TIMESTAMP_MICROS"):
+            scale = {"TIMESTAMP_SECONDS": " * 1000000", "TIMESTAMP_MILLIS": " * 1000", "TIMESTAMP_MICROS": ""}[up]
+            return [_raw("make_timestamp(CAST("), *args[0], _raw(" AS BIGINT)" + scale + ")")]
+        if up in ("FORMAT_TIMESTAMP", "FORMAT_DATETIME", "FORMAT_DATE"):
+            value = _call("bq_local", args[1], args[2]) if nargs == 3 else args[1]
+            return _call("strftime", value, args[0])
+        if up in ("PARSE_TIMESTAMP", "PARSE_DATETIME", "PARSE_DATE"):
+            fn = "try_strptime" if safe else "strptime"
+            target = "DATE" if up == "PARSE_DATE" else "TIMESTAMP"
+            return [_raw("CAST("), *_call(fn, args[1], args[0]), _raw(f" AS {target})")]
+        if up in ("GREATEST", "LEAST"):
+            # NULL if any argument is NULL (DuckDB skips NULLs).
+            out: List[_Tok] = [_raw("CASE WHEN ")]
+            for k, a in enumerate(args):
+                out.extend([_raw(" OR (" if k else "("), *a, _raw(") IS NULL")])
+            out.extend([_raw(" THEN NULL ELSE "), *_call(up.lower(), *args), _raw(" END")])
+            return out
+        if up == "IEEE_DIVIDE":
+            return [_raw("("), *args[0], _raw(" / "), *args[1], _raw(")")]
+        if up == "DIV":
+            return [_raw("("), *args[0], _raw(" // "), *args[1], _raw(")")]
+        if up == "LOG" and nargs == 2:
+            return [_raw("(ln("), *args[0], _raw(") / ln("), *args[1], _raw("))")]
+        if up == "APPROX_QUANTILES":
+            buckets = _split_top_level(inner)[1]
+            if len(buckets) < 1 or buckets[0].kind != "num":
+                raise _Unsupported("APPROX_QUANTILES with a non-literal bucket count")
+            count = int(buckets[0].text)
+            points = ", ".join(repr(k / count) for k in range(count + 1))
+            return [*_call("quantile_disc", args[0], [_raw(f"[{points}]")])]
+        if up == "GENERATE_DATE_ARRAY":
+            step = args[2] if nargs > 2 else [_raw("INTERVAL 1 DAY")]
+            series = _call("generate_series", [_raw("CAST("), *args[0], _raw(" AS DATE)")], [_raw("CAST("), *args[1], _raw(" AS DATE)")], step)
+            return [_raw("CAST("), *series, _raw(" AS DATE[])")]
+        if up == "GENERATE_TIMESTAMP_ARRAY":
+            return _call("generate_series", *args)
+        if up == "SPLIT":
+            return _call("string_split", args[0], args[1] if nargs > 1 else [_raw("','")])
+        if up in ("JSON_VALUE", "JSON_EXTRACT_SCALAR"):
+            return _call("json_extract_string", args[0], args[1] if nargs > 1 else [_raw("'$'")])
+        if up in ("JSON_QUERY", "JSON_EXTRACT"):
+            return [_raw("CAST("), *_call("json_extract", args[0], args[1] if nargs > 1 else [_raw("'$'")]), _raw(" AS VARCHAR)")]
+        if up in ("JSON_EXTRACT_ARRAY", "JSON_QUERY_ARRAY"):
+            path = args[1] if nargs > 1 else [_raw("'$'")]
+            return [_raw("CAST(CAST("), *_call("json_extract", args[0], path), _raw(" AS JSON[]) AS VARCHAR[])")]
+        if up in ("JSON_EXTRACT_STRING_ARRAY", "JSON_VALUE_ARRAY"):
+            path = args[1] if nargs > 1 else [_raw("'$'")]
+            return [_raw("CAST(CAST("), *_call("json_extract", args[0], path), _raw(" AS JSON[]) AS VARCHAR[])")]
+        if up == "PARSE_JSON":
+            return [_raw("CAST("), *args[0], _raw(" AS JSON)")]
+        if up == "TO_JSON_STRING":
+            return [_raw("CAST(to_json("), *args[0], _raw(") AS VARCHAR)")]
+        if up == "REGEXP_EXTRACT" or up == "REGEXP_EXTRACT_ALL":
+            pattern = _split_top_level(inner)[1]
+            group = 0
+            if len(pattern) == 1 and pattern[0].kind == "str":
+                try:
+                    group = 1 if re.compile(pattern[0].text).groups else 0
+                except re.error:
+                    group = 0
+            return _call(up.lower(), args[0], args[1], [_raw(str(group))])
+        if up == "REGEXP_REPLACE":
+            return _call("regexp_replace", *args, [_raw("'g'")])
+        if up == "CONTAINS_SUBSTR":
+            return _call("contains", _call("lower", args[0]), _call("lower", args[1]))
+        if up == "SAFE_CONVERT_BYTES_TO_STRING":
+            return [_raw("CAST("), *args[0], _raw(" AS VARCHAR)")]
+        if up == "SESSION_USER":
+            return [_raw("'local'")]
+        if up in _RENAMES:
+            return _call(_RENAMES[up], *args)
+        # Keywords (IN, AS, OVER, EXISTS, VALUES ...) and functions DuckDB
+        # spells the same way.
+        return [tok, _raw("("), *self.expr(inner), _raw(")")]
+
+
+def _paren_depths(toks: Sequence[_Tok]) -> List[int]:
+    depths, depth = [], 0
+    for t in toks:
+        depths.append(depth)
+        if t.kind in ("op", "raw"):
+            depth += t.text.count("(") - t.text.count(")")
+    return depths
+
+
+def _qualify_unnest_aliases(toks: List[_Tok]) -> List[_Tok]:
+    """Point bare references to an UNNEST alias at its column.
+
+    BigQuery resolves `d` in `FROM UNNEST(days) AS d LEFT JOIN t ON t.d = d` to
+    the range variable; DuckDB reports the name as ambiguous. Within the SELECT
+    that holds the UNNEST, bare uses become `__unnest_N."d"`.
+    """
+    marks = [k for k, t in enumerate(toks) if t.kind == "mark"]
+    if not marks:
+        return toks
+    depths = _paren_depths(toks)
+    out = list(toks)
+    for k in marks:
+        mark = toks[k]
+        level = depths[k]
+        start = k
+        while start > 0 and depths[start - 1] >= level and not (depths[start - 1] == level and _is(toks[start - 1], "UNION", "INTERSECT", "EXCEPT")):
+            start -= 1
+        end = k
+        while end + 1 < len(toks) and depths[end + 1] >= level and not (depths[end + 1] == level and _is(toks[end + 1], "UNION", "INTERSECT", "EXCEPT")):
+            end += 1
+        alias = mark.alias.lower()
+        for j in range(start, end + 1):
+            t = toks[j]
+            if t.kind not in ("word", "ident") or t.text.lower() != alias:
+                continue
+            before = toks[j - 1] if j else None
+            after = toks[j + 1] if j + 1 < len(toks) else None
+            if _is(before, ".", "AS") or _is(after, ".", "("):
+                continue
+            out[j] = _raw(f"{mark.table_alias}.{_quote(mark.alias)}")
+    return out
+
+
+# -- Scripts -------------------------------------------------------------------
+
+_UNSUPPORTED_STATEMENTS = {"LOOP", "WHILE", "REPEAT", "FOR", "CALL", "RAISE", "RETURN", "BREAK", "LEAVE", "CONTINUE", "ITERATE"}
+
+
+def _parse_script(toks: Sequence[_Tok], i: int = 0, stop: Tuple[str, ...] = ()) -> Tuple[List[Any], int]:
+    """Statements as ("stmt", toks) / ("if", [(cond, body)], else_body) / ("block", body)."""
+    nodes: List[Any] = []
+    n = len(toks)
+    while i < n:
+        t = toks[i]
+        if _is(t, ";"):
+            i += 1
+            continue
+        if t.kind == "word" and t.up in stop:
+            return nodes, i
+        if _is(t, "IF") and not _is(toks[i + 1] if i + 1 < n else None, "("):
+            branches = []
+            else_body: List[Any] = []
+            i += 1
+            while True:
+                then = _find_top(toks, "THEN", start=i)
+                if then < 0:
+                    raise _Unsupported("IF without THEN")
+                cond = list(toks[i:then])
+                body, i = _parse_script(toks, then + 1, ("ELSEIF", "ELSE", "END"))
+                branches.append((cond, body))
+                if i >= n:
+                    raise _Unsupported("IF without END IF")
+                if toks[i].up == "ELSEIF":
+                    i += 1
+                    continue
+                if toks[i].up == "ELSE":
+                    else_body, i = _parse_script(toks, i + 1, ("END",))
+                if i + 1 >= n or not _is(toks[i + 1], "IF"):
+                    raise _Unsupported("IF without END IF")
+                i += 2
+                break
+            nodes.append(("if", branches, else_body))
+            continue
+        if _is(t, "BEGIN") and not _is(toks[i + 1] if i + 1 < n else None, "TRANSACTION"):
+            body, i = _parse_script(toks, i + 1, ("END", "EXCEPTION"))
+            if i >= n or toks[i].up != "END":
+                raise _Unsupported("BEGIN ... EXCEPTION")
+            nodes.append(("block", body))
+            i += 1
+            continue
+        if t.kind == "word" and t.up in _UNSUPPORTED_STATEMENTS:
+            raise _Unsupported(f"{t.up} statement")
+        depth, j = 0, i
+        while j < n:
+            if toks[j].kind == "op" and toks[j].text in ("(", "["):
+                depth += 1
+            elif toks[j].kind == "op" and toks[j].text in (")", "]"):
+                depth -= 1
+            elif depth == 0 and _is(toks[j], ";"):
+                break
+            j += 1
+        nodes.append(("stmt", list(toks[i:j])))
+        i = j + 1
+    return nodes, i
+
+
+class _Script:
+    """State of one `query()` call: script variables, temp tables, last result."""
+
+    def __init__(self, params: Dict[str, Tuple[Optional[str], Any]], positional: Optional[List[Any]]) -> None:
+        self.params = params
+        self.positional = positional
+        self.variables: Dict[str, Tuple[Optional[str], Any]] = {}
+        self.temp_tables: List[str] = []
+        self.names: List[str] = []
+        self.types: List[str] = []
+        self.rows: List[tuple] = []
+        self.dml_rows: Optional[int] = None
+
+
+# -- Jobs ----------------------------------------------------------------------
+
+
+class _Rows(list):
+    """`job.result()`: a list of `Row` with the RowIterator attributes callers read."""
+
+    def __init__(self, rows: Iterable[Any], schema: List[bigquery.SchemaField]) -> None:
+        super().__init__(rows)
+        self.schema = schema
+
+    @property
+    def total_rows(self) -> int:
+        return len(self)
+
+
+class LocalQueryJob:
+    def __init__(
+        self,
+        job_id: str,
+        query: str,
+        rows: List[Any],
+        schema: List[bigquery.SchemaField],
+        *,
+        dml_rows: Optional[int] = None,
+        error: Optional[Exception] = None,
+        local_error: Optional[str] = None,
+    ) -> None:
+        self.job_id = job_id
+        self.query = query
+        self.state = "DONE"
+        self.schema = schema
+        self.num_dml_affected_rows = dml_rows
+        self.total_bytes_processed = 0
+        self.total_bytes_billed = 0
+        self.cache_hit = False
+        self.errors = [{"reason": "invalidQuery", "message": str(error)}] if error else None
+        self.error_result = self.errors[0] if self.errors else None
+        # Non-strict mode swallows failures; the message stays inspectable here.
+        self.local_error = local_error
+        self._rows = rows
+        self._error = error
+
+    def done(self, *args: Any, **kwargs: Any) -> bool:
+        return True
+
+    def result(self, *args: Any, max_results: Optional[int] = None, **kwargs: Any) -> _Rows:
+        if self._error is not None:
+            raise self._error
+        rows = self._rows if max_results is None else self._rows[:max_results]
+        return _Rows(rows, self.schema)
+
+    def __iter__(self):
+        return iter(self.result())
+
+
+class LocalLoadJob:
+    def __init__(self, job_id: str, destination: str, output_rows: int) -> None:
+        self.job_id = job_id
+        self.destination = destination
+        self.output_rows = output_rows
+        self.state = "DONE"
+        self.errors = None
+
+    def done(self, *args: Any, **kwargs: Any) -> bool:
+        return True
+
+    def result(self, *args: Any, **kwargs: Any) -> "LocalLoadJob":
+        return self
+
+
+def _job_id(job_id: Optional[str], prefix: Optional[str]) -> str:
+    return job_id or f"{prefix or 'local_'}{uuid.uuid4().hex[:16]}"
+
+
+def _api_error(exc: Exception) -> Exception:
+    if isinstance(exc, GoogleAPICallError):
+        return exc
+    if isinstance(exc, _Unsupported):
+        return BadRequest(f"Not supported by the local BigQuery backend: {exc}")
+    msg = str(exc)
+    if type(exc).__name__ == "CatalogException" and "does not exist" in msg:
+        return NotFound(f"Not found: {msg}")
+    return BadRequest(msg)
+
+
+def _preview(sql: str, limit: int = 300) -> str:
+    flat = " ".join(sql.split())
+    return flat if len(flat) <= limit else flat[:limit] + "..."
+
+
+# -- Client --------------------------------------------------------------------
+
+
+class LocalBigQueryClient:
+    """`bigquery.Client` look-alike over one DuckDB database; thread-safe (one lock)."""
+
+    def __init__(self, path: str = ":memory:", project: Optional[str] = None, location: Optional[str] = None) -> None:
+        try:
+            import duckdb
+        except ImportError as exc:  # pragma: no cover - depends on the environment
+            raise RuntimeError("BQ_BACKEND=local needs the duckdb package (pip install duckdb)") from exc
+        self.project = project or os.environ.get("BQ_PROJECT") or "local"
+        self.location = location or os.environ.get("BQ_LOCATION") or "US"
+        self.path = path
+        self.strict = _strict()
+        self._lock = threading.RLock()
+        self._conn = duckdb.connect(path)
+        self._conn.execute("SET TimeZone = 'UTC'")
+        for macro in _MACROS:
+            self._conn.execute(f"CREATE OR REPLACE TEMP MACRO {macro}")
+        self.rows_written: Counter = Counter()
+        self.queries = 0
+        self.failed_queries = 0
+        self.insert_calls = 0
+        self.load_jobs = 0
+        for init_path in (os.environ.get("BQ_LOCAL_INIT_SQL") or "").split(","):
+            if init_path.strip():
+                with open(init_path.strip(), encoding="utf-8") as fh:
+                    self.query(fh.read()).result()
+
+    # -- names
+
+    def _parts(self, table: Any) -> Tuple[str, str, str]:
+        if isinstance(table, str):
+            parts = table.replace(":", ".").split(".")
+            if len(parts) == 2:
+                return self.project, parts[0], parts[1]
+            if len(parts) != 3:
+                raise BadRequest(f"Invalid table id {table!r}")
+            return parts[0], parts[1], parts[2]
+        reference = getattr(table, "reference", table)
+        return reference.project, reference.dataset_id, reference.table_id
+
+    def _columns(self, dataset: str, name: str) -> Optional[List[Tuple[str, str, bool]]]:
+        rows = self._conn.execute(
+            "SELECT column_name, data_type, is_nullable FROM duckdb_columns()"
+            " WHERE lower(schema_name) = lower(?) AND lower(table_name) = lower(?) ORDER BY column_index",
+            [dataset, name],
+        ).fetchall()
+        if rows:
+            return [(r[0], r[1], bool(r[2])) for r in rows]
+        return None
+
+    def _ensure_dataset(self, dataset: str) -> None:
+        self._conn.execute(f"CREATE SCHEMA IF NOT EXISTS {_quote(dataset)}")
+
+    # -- tables
+
+    def dataset(self, dataset_id: str, project: Optional[str] = None) -> bigquery.DatasetReference:
+        return bigquery.DatasetReference(project or self.project, dataset_id)
+
+    def get_dataset(self, dataset_ref: Any, **kwargs: Any) -> bigquery.Dataset:
+        if isinstance(dataset_ref, str):
+            parts = dataset_ref.replace(":", ".").split(".")
+            dataset_ref = bigquery.DatasetReference(parts[0] if len(parts) > 1 else self.project, parts[-1])
+        dataset_ref = getattr(dataset_ref, "reference", dataset_ref)
+        with self._lock:
+            self._ensure_dataset(dataset_ref.dataset_id)
+        dataset = bigquery.Dataset(dataset_ref)
+        dataset.location = self.location
+        return dataset
+
+    def create_dataset(self, dataset: Any, exists_ok: bool = False, **kwargs: Any) -> bigquery.Dataset:
+        return self.get_dataset(dataset)
+
+    def get_table(self, table: Any, **kwargs: Any) -> bigquery.Table:
+        project, dataset, name = self._parts(table)
+        with self._lock:
+            columns = self._columns(dataset, name)
+            if columns is None:
+                raise NotFound(f"Not found: Table {project}:{dataset}.{name}")
+            count = self._conn.execute(f"SELECT count(*) FROM {_quote(dataset)}.{_quote(name)}").fetchone()[0]
+        result = bigquery.Table(f"{project}.{dataset}.{name}", schema=[_field_from_duck(c, t, nullable) for c, t, nullable in columns])
+        result._properties["numRows"] = str(count)
+        return result
+
+    def create_table(self, table: Any, exists_ok: bool = False, **kwargs: Any) -> bigquery.Table:
+        project, dataset, name = self._parts(table)
+        schema = list(getattr(table, "schema", None) or [])
+        with self._lock:
+            if self._columns(dataset, name) is not None:
+                if not exists_ok:
+                    raise Conflict(f"Already Exists: Table {project}:{dataset}.{name}")
+                return self.get_table(table)
+            if not schema:
+                raise BadRequest(f"Local BigQuery backend cannot create {project}:{dataset}.{name} without a schema")
+            self._ensure_dataset(dataset)
+            cols = ", ".join(
+                f"{_quote(f.name)} {_duck_type_for_field(f)}" + (" NOT NULL" if f.mode == "REQUIRED" else "") for f in schema
+            )
+            self._conn.execute(f"CREATE TABLE {_quote(dataset)}.{_quote(name)} ({cols})")
+        return self.get_table(table)
+
+    def update_table(self, table: Any, fields: Sequence[str], **kwargs: Any) -> bigquery.Table:
+        project, dataset, name = self._parts(table)
+        if "schema" in fields:
+            with self._lock:
+                columns = self._columns(dataset, name)
+                if columns is None:
+                    raise NotFound(f"Not found: Table {project}:{dataset}.{name}")
+                existing = {c.lower(): nullable for c, _, nullable in columns}
+                target = f"{_quote(dataset)}.{_quote(name)}"
+                for f in table.schema:
+                    key = f.name.lower()
+                    if key not in existing:
+                        self._conn.execute(f"ALTER TABLE {target} ADD COLUMN {_quote(f.name)} {_duck_type_for_field(f)}")
+                    elif not existing[key] and f.mode != "REQUIRED":
+                        self._conn.execute(f"ALTER TABLE {target} ALTER COLUMN {_quote(f.name)} DROP NOT NULL")
+        return self.get_table(table)
+
+    def delete_table(self, table: Any, not_found_ok: bool = False, **kwargs: Any) -> None:
+        project, dataset, name = self._parts(table)
+        with self._lock:
+            kind = self._conn.execute(
+                "SELECT 'TABLE' FROM duckdb_tables() WHERE lower(schema_name) = lower(?) AND lower(table_name) = lower(?)"
+                " UNION ALL SELECT 'VIEW' FROM duckdb_views() WHERE lower(schema_name) = lower(?) AND lower(view_name) = lower(?)",
+                [dataset, name, dataset, name],
+            ).fetchone()
+            if kind is None:
+                if not_found_ok:
+                    return
+                raise NotFound(f"Not found: Table {project}:{dataset}.{name}")
+            self._conn.execute(f"DROP {kind[0]} {_quote(dataset)}.{_quote(name)}")
+
+    # -- writes
+
+    def _write_rows(self, dataset: str, name: str, rows: List[Dict[str, Any]], *, ignore_unknown: bool, skip_invalid: bool) -> List[Dict[str, Any]]:
+        target = f"{_quote(dataset)}.{_quote(name)}"
+        keys: Dict[str, str] = {}
+        for row in rows:
+            for key in row:
+                keys.setdefault(key.lower(), key)
+        columns = self._columns(dataset, name)
+        if columns is None:
+            self._ensure_dataset(dataset)
+            cols = ", ".join(f"{_quote(k)} {_infer_type(r.get(k) for r in rows)}" for k in keys.values())
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {target} ({cols})")
+            columns = self._columns(dataset, name) or []
+        known = {c.lower(): (c, t) for c, t, _ in columns}
+        unknown = [k for k in keys if k not in known]
+        if unknown and not self.strict:
+            for k in unknown:
+                col = keys[k]
+                col_type = _infer_type(r.get(col) for r in rows)
+                self._conn.execute(f"ALTER TABLE {target} ADD COLUMN {_quote(col)} {col_type}")
+                known[k] = (col, col_type)
+            unknown = []
+        errors: List[Dict[str, Any]] = []
+        if unknown and not ignore_unknown:
+            for index, row in enumerate(rows):
+                bad = [key for key in row if key.lower() in unknown]
+                if bad:
+                    errors.append({"index": index, "errors": [{"reason": "invalid", "location": bad[0], "message": f"no such field: {bad[0]}."}]})
+        write_keys = [k for k in keys if k in known]
+        coercers = [_coercer(known[k][1]) for k in write_keys]
+        sources = [keys[k] for k in write_keys]
+        fields = [f"c{k}" for k in range(len(write_keys))]
+        batch: List[Dict[str, Any]] = []
+        bad_rows = {e["index"] for e in errors}
+        for index, row in enumerate(rows):
+            if index in bad_rows:
+                continue
+            try:
+                batch.append({f: fn(row.get(src)) for f, fn, src in zip(fields, coercers, sources)})
+            except (TypeError, ValueError, decimal.InvalidOperation) as exc:
+                errors.append({"index": index, "errors": [{"reason": "invalid", "message": str(exc)}]})
+        if errors and not skip_invalid:
+            failed = {e["index"] for e in errors}
+            errors.extend({"index": k, "errors": [{"reason": "stopped", "message": ""}]} for k in range(len(rows)) if k not in failed)
+            return sorted(errors, key=lambda e: e["index"])
+        if batch and write_keys:
+            row_type = "STRUCT(" + ", ".join(f"{f} {known[key][1]}" for f, key in zip(fields, write_keys)) + ")[]"
+            cols = ", ".join(_quote(known[key][0]) for key in write_keys)
+            values = ", ".join(f"u.{f}" for f in fields)
+            self._conn.execute(
+                f"INSERT INTO {target} ({cols}) SELECT {values} FROM (SELECT UNNEST({_from_json_sql('$1', row_type)}) AS u)",
+                [_json_batch(batch)],
+            )
+        good = len(batch)
+        self.rows_written[f"{dataset}.{name}"] += good
+        return errors
+
+    def insert_rows_json(
+        self,
+        table: Any,
+        json_rows: Sequence[Dict[str, Any]],
+        row_ids: Any = None,
+        skip_invalid_rows: Optional[bool] = None,
+        ignore_unknown_values: Optional[bool] = None,
+        template_suffix: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[Dict[str, Any]]:
+        rows = list(json_rows)
+        _, dataset, name = self._parts(table)
+        with self._lock:
+            self.insert_calls += 1
+            if not rows:
+                return []
+            try:
+                return self._write_rows(dataset, name, rows, ignore_unknown=bool(ignore_unknown_values), skip_invalid=bool(skip_invalid_rows))
+            except Exception as exc:  # noqa: BLE001 - surface DuckDB errors as API errors
+                raise _api_error(exc) from exc
+
+    def insert_rows(self, table: Any, rows: Sequence[Any], selected_fields: Any = None, **kwargs: Any) -> List[Dict[str, Any]]:
+        fields = selected_fields or getattr(table, "schema", None)
+        if rows and not isinstance(rows[0], dict):
+            if not fields:
+                fields = self.get_table(table).schema
+            rows = [dict(zip((f.name for f in fields), row)) for row in rows]
+        return self.insert_rows_json(table, rows, **kwargs)
+
+    def _load(self, rows: List[Dict[str, Any]], destination: Any, job_config: Any, job_id: Optional[str], job_id_prefix: Optional[str]) -> LocalLoadJob:
+        project, dataset, name = self._parts(destination)
+        disposition = getattr(job_config, "write_disposition", None)
+        with self._lock:
+            self.load_jobs += 1
+            try:
+                schema = getattr(job_config, "schema", None)
+                if schema and self._columns(dataset, name) is None:
+                    self.create_table(bigquery.Table(f"{project}.{dataset}.{name}", schema=schema))
+                if self._columns(dataset, name) is not None:
+                    if disposition == "WRITE_TRUNCATE":
+                        self._conn.execute(f"DELETE FROM {_quote(dataset)}.{_quote(name)}")
+                    elif disposition == "WRITE_EMPTY" and self.get_table(destination).num_rows:
+                        raise BadRequest(f"Already Exists: Table {project}:{dataset}.{name} is not empty")
+                errors = self._write_rows(
+                    dataset,
+                    name,
+                    rows,
+                    ignore_unknown=bool(getattr(job_config, "ignore_unknown_values", False)),
+                    skip_invalid=False,
+                ) if rows else []
+            except Exception as exc:  # noqa: BLE001 - surface DuckDB errors as API errors
+                raise _api_error(exc) from exc
+        if errors:
+            raise BadRequest(f"Error while reading data, error message: {errors[0]['errors'][0]['message']}")
+        return LocalLoadJob(_job_id(job_id, job_id_prefix), f"{project}.{dataset}.{name}", len(rows))
+
+    def load_table_from_file(
+        self,
+        file_obj: Any,
+        destination: Any,
+        rewind: bool = False,
+        size: Optional[int] = None,
+        num_retries: int = 6,
+        job_id: Optional[str] = None,
+        job_id_prefix: Optional[str] = None,
+        location: Optional[str] = None,
+        project: Optional[str] = None,
+        job_config: Any = None,
+        **kwargs: Any,
+    ) -> LocalLoadJob:
+        if rewind:
+            file_obj.seek(0)
+        data = file_obj.read(size) if size else file_obj.read()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if data[:2] == b"\x1f\x8b":
+            data = gzip.decompress(data)
+        source_format = getattr(job_config, "source_format", None)
+        if source_format not in (None, "NEWLINE_DELIMITED_JSON"):
+            raise BadRequest(f"Local BigQuery backend only loads NEWLINE_DELIMITED_JSON, got {source_format}")
+        rows = [json.loads(line) for line in data.splitlines() if line.strip()]
+        return self._load(rows, destination, job_config, job_id, job_id_prefix)
+
+    def load_table_from_json(self, json_rows: Iterable[Dict[str, Any]], destination: Any, job_config: Any = None, job_id: Optional[str] = None, job_id_prefix: Optional[str] = None, **kwargs: Any) -> LocalLoadJob:
+        return self._load(list(json_rows), destination, job_config, job_id, job_id_prefix)
+
+    # -- queries
+
+    def query(
+        self,
+        query: str,
+        job_config: Any = None,
+        job_id: Optional[str] = None,
+        job_id_prefix: Optional[str] = None,
+        location: Optional[str] = None,
+        project: Optional[str] = None,
+        **kwargs: Any,
+    ) -> LocalQueryJob:
+        job = _job_id(job_id, job_id_prefix)
+        if getattr(job_config, "dry_run", False):
+            return LocalQueryJob(job, query, [], [])
+        params, positional = self._query_params(job_config)
+        with self._lock:
+            self.queries += 1
+            try:
+                script = self._run_script(query, params, positional)
+            except Exception as exc:  # noqa: BLE001 - mapped to BigQuery API errors
+                error = _api_error(exc)
+                if self.strict:
+                    return LocalQueryJob(job, query, [], [], error=error)
+                self.failed_queries += 1
+                LOGGER.warning("BQ_LOCAL_QUERY_FAILED job_id=%s error=%s sql=%s", job, error, _preview(query))
+                return LocalQueryJob(job, query, [], [], local_error=str(error))
+        schema = [_field_from_duck(name, t) for name, t in zip(script.names, script.types)]
+        index = {name: k for k, name in enumerate(script.names)}
+        ts_columns = [k for k, t in enumerate(script.types) if t.upper().startswith("TIMESTAMP")]
+        rows = []
+        for values in script.rows:
+            if ts_columns:
+                values = list(values)
+                for k in ts_columns:
+                    if isinstance(values[k], dt.datetime):
+                        values[k] = values[k].replace(tzinfo=_UTC)
+            rows.append(Row(tuple(values), index))
+        return LocalQueryJob(job, query, rows, schema, dml_rows=script.dml_rows)
+
+    def _query_params(self, job_config: Any) -> Tuple[Dict[str, Tuple[Optional[str], Any]], Optional[List[Any]]]:
+        params: Dict[str, Tuple[Optional[str], Any]] = {}
+        positional: List[Any] = []
+        for p in getattr(job_config, "query_parameters", None) or []:
+            if isinstance(p, bigquery.ArrayQueryParameter):
+                array_type = p.array_type if isinstance(p.array_type, str) else "STRING"
+                duck_type = _SCALAR_TYPES.get(array_type.upper(), "VARCHAR") + "[]"
+                value = _coercer(duck_type)(list(p.values))
+            elif isinstance(p, bigquery.ScalarQueryParameter):
+                duck_type = _SCALAR_TYPES.get((p.type_ or "STRING").upper(), "VARCHAR")
+                value = _coercer(duck_type)(p.value)
+            else:
+                raise BadRequest(f"Local BigQuery backend does not support {type(p).__name__}")
+            if p.name:
+                params[p.name.lower()] = (duck_type, value)
+            else:
+                positional.append(value)
+        return params, positional or None
+
+    def _run_script(self, sql: str, params: Dict[str, Tuple[Optional[str], Any]], positional: Optional[List[Any]]) -> _Script:
+        nodes, _ = _parse_script(_lex(sql))
+        script = _Script(params, positional)
+        self._conn.execute("BEGIN TRANSACTION")
+        try:
+            self._run_nodes(nodes, script)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        finally:
+            for name in script.temp_tables:
+                self._conn.execute(f"DROP TABLE IF EXISTS temp.main.{_quote(name)}")
+        return script
+
+    def _run_nodes(self, nodes: List[Any], script: _Script) -> None:
+        for node in nodes:
+            if node[0] == "block":
+                self._run_nodes(node[1], script)
+            elif node[0] == "if":
+                for cond, body in node[1]:
+                    if self._scalar(cond, script, "BOOLEAN"):
+                        self._run_nodes(body, script)
+                        break
+                else:
+                    self._run_nodes(node[2], script)
+            elif node[1]:
+                self._statement(node[1], script)
+
+    def _exec(self, sql: str, translator: Optional[_Translator], script: _Script) -> Any:
+        LOGGER.debug("BQ_LOCAL_SQL %s", sql)
+        if translator is not None and translator.positional:
+            return self._conn.execute(sql, script.positional or [])
+        if translator is not None and translator.bound:
+            return self._conn.execute(sql, translator.bound)
+        return self._conn.execute(sql)
+
+    def _scalar(self, toks: Sequence[_Tok], script: _Script, duck_type: Optional[str] = None) -> Any:
+        tr = _Translator(script.variables, script.params)
+        body = tr.sql(toks)
+        sql = f"SELECT CAST(({body}) AS {duck_type})" if duck_type else f"SELECT ({body})"
+        return self._exec(sql, tr, script).fetchone()[0]
+
+    def _statement(self, toks: List[_Tok], script: _Script) -> None:
+        first = toks[0].up if toks[0].kind == "word" else toks[0].text
+        second = toks[1].up if len(toks) > 1 and toks[1].kind == "word" else ""
+        if first == "DECLARE":
+            default = _find_top(toks, "DEFAULT")
+            head = toks[1 : default if default >= 0 else len(toks)]
+            names = [head[0].text]
+            k = 1
+            while k + 1 < len(head) and _is(head[k], ","):
+                names.append(head[k + 1].text)
+                k += 2
+            duck_type = _type_sql(head[k:]) if head[k:] else None
+            value = self._scalar(toks[default + 1 :], script, duck_type) if default >= 0 else None
+            for name in names:
+                script.variables[name.lower()] = (duck_type, value)
+            return
+        if first == "SET":
+            if toks[1].kind != "word" or not _is(toks[2] if len(toks) > 2 else None, "="):
+                raise _Unsupported("SET " + _render(toks[1:3]))
+            key = toks[1].text.lower()
+            if key not in script.variables:
+                raise BadRequest(f"Unrecognized name: {toks[1].text}")
+            duck_type = script.variables[key][0]
+            script.variables[key] = (duck_type, self._scalar(toks[3:], script, duck_type))
+            return
+        if first in ("BEGIN", "COMMIT", "ROLLBACK") and second in ("", "TRANSACTION"):
+            return
+        if first == "EXECUTE" and second == "IMMEDIATE":
+            if _find_top(toks, "USING", "INTO") >= 0:
+                raise _Unsupported("EXECUTE IMMEDIATE ... USING/INTO")
+            nodes, _ = _parse_script(_lex(str(self._scalar(toks[2:], script, "VARCHAR"))))
+            self._run_nodes(nodes, script)
+            return
+        if first == "ASSERT":
+            as_idx = _find_top(toks, "AS")
+            if not self._scalar(toks[1 : as_idx if as_idx >= 0 else len(toks)], script, "BOOLEAN"):
+                raise BadRequest(f"Assertion failed: {_render(toks[1:])}")
+            return
+        if first == "CREATE":
+            self._create(toks, script)
+            return
+        if first == "ALTER":
+            self._alter(toks, script)
+            return
+        if first == "DROP":
+            kind = _find_top(toks, "TABLE", "VIEW", "SCHEMA")
+            if kind < 0:
+                raise _Unsupported("DROP " + second)
+            tr = _Translator(script.variables, script.params)
+            rest = toks[kind + 1 :]
+            modifiers = rest[:2] if _is(rest[0], "IF") else []
+            name_toks = rest[len(modifiers) : len(modifiers) + 1]
+            tail = " CASCADE" if _find_top(rest, "CASCADE") >= 0 else ""
+            name = _name_sql(name_toks[0], schema=toks[kind].up == "SCHEMA")
+            self._exec(f"DROP {toks[kind].up} {'IF EXISTS ' if modifiers else ''}{name}{tail}", tr, script)
+            return
+        if first == "TRUNCATE":
+            self._exec(f"DELETE FROM {_name_sql(toks[2])}", None, script)
+            return
+        if first in ("INSERT", "UPDATE", "DELETE", "MERGE"):
+            toks = _dml_fixups(first, toks)
+            tr = _Translator(script.variables, script.params)
+            row = self._exec(tr.sql(toks), tr, script).fetchone()
+            script.dml_rows = (script.dml_rows or 0) + (int(row[0]) if row and row[0] is not None else 0)
+            script.names, script.types, script.rows = [], [], []
+            return
+        if first in ("SELECT", "WITH", "(", "VALUES"):
+            tr = _Translator(script.variables, script.params)
+            sql = tr.sql(toks)
+            cursor = self._exec(sql, tr, script)
+            types = [str(d[1]) for d in cursor.description or []]
+            names = [d[0] for d in cursor.description or []]
+            if any(t == "TIMESTAMP WITH TIME ZONE" for t in types):
+                # DuckDB can only hand TIMESTAMPTZ to Python through pytz; fetch as UTC.
+                replace = ", ".join(
+                    f"CAST({_quote(n)} AS TIMESTAMP) AS {_quote(n)}" for n, t in zip(names, types) if t == "TIMESTAMP WITH TIME ZONE"
+                )
+                cursor = self._exec(f"SELECT * REPLACE ({replace}) FROM ({sql})", tr, script)
+                types = [str(d[1]) for d in cursor.description or []]
+            script.names, script.types, script.rows = names, types, cursor.fetchall()
+            return
+        raise _Unsupported(f"{first} statement")
+
+    def _create(self, toks: List[_Tok], script: _Script) -> None:
+        i = 1
+        replace = temp = if_not_exists = False
+        if _is(toks[i], "OR") and _is(toks[i + 1], "REPLACE"):
+            replace, i = True, i + 2
+        if _is(toks[i], "TEMP", "TEMPORARY"):
+            temp, i = True, i + 1
+        if _is(toks[i], "MATERIALIZED"):
+            i += 1
+        kind = toks[i].up
+        if kind not in ("TABLE", "VIEW", "SCHEMA"):
+            raise _Unsupported(f"CREATE {kind}")
+        i += 1
+        if _is(toks[i], "IF") and _is(toks[i + 1], "NOT") and _is(toks[i + 2], "EXISTS"):
+            if_not_exists, i = True, i + 3
+        name_tok = toks[i]
+        i += 1
+        if kind == "SCHEMA":
+            self._exec(f"CREATE SCHEMA IF NOT EXISTS {_name_sql(name_tok, schema=True)}", None, script)
+            return
+        name = _name_sql(name_tok)
+        dataset = _dataset_of(name_tok)
+        columns: Optional[List[_Tok]] = None
+        if i < len(toks) and _is(toks[i], "(") and not _is(toks[i + 1], "SELECT", "WITH"):
+            close = _match(toks, i)
+            columns = toks[i + 1 : close]
+            i = close + 1
+        query: Optional[List[_Tok]] = None
+        while i < len(toks):
+            word = toks[i].up
+            if word == "AS":
+                query = toks[i + 1 :]
+                break
+            if word in ("PARTITION", "CLUSTER"):
+                nxt = _find_top(toks, "CLUSTER", "OPTIONS", "AS", start=i + 2)
+                i = nxt if nxt >= 0 else len(toks)
+                continue
+            if word == "OPTIONS":
+                i = _match(toks, i + 1) + 1
+                continue
+            if word == "DEFAULT" and _is(toks[i + 1], "COLLATE"):
+                i += 3
+                continue
+            raise _Unsupported(f"CREATE {kind} ... {word}")
+        if dataset and not temp:
+            self._ensure_dataset(dataset)
+        tr = _Translator(script.variables, script.params)
+        head = "CREATE " + ("OR REPLACE " if replace else "") + ("TEMP " if temp else "")
+        if kind == "VIEW":
+            if query is None:
+                raise _Unsupported("CREATE VIEW without AS")
+            self._exec(f"{head}VIEW {'IF NOT EXISTS ' if if_not_exists else ''}{name} AS {tr.sql(query)}", tr, script)
+            return
+        if temp:
+            script.temp_tables.append(name_tok.text.split(".")[-1])
+        head += "TABLE " + ("IF NOT EXISTS " if if_not_exists else "") + name
+        if columns is None:
+            if query is None:
+                raise _Unsupported("CREATE TABLE without columns or AS")
+            self._exec(f"{head} AS {tr.sql(query)}", tr, script)
+            return
+        existed = if_not_exists and dataset is not None and self._columns(dataset, name_tok.text.split(".")[-1]) is not None
+        self._exec(f"{head} ({_column_defs(columns, tr)})", tr, script)
+        if query is not None and not existed:
+            self._exec(f"INSERT INTO {name} {tr.sql(query)}", tr, script)
+
+    def _alter(self, toks: List[_Tok], script: _Script) -> None:
+        if not _is(toks[1], "TABLE"):
+            return  # ALTER SCHEMA / VIEW ... SET OPTIONS: nothing to keep locally
+        i = 2
+        if_exists = _is(toks[i], "IF") and _is(toks[i + 1], "EXISTS")
+        if if_exists:
+            i += 2
+        target = f"ALTER TABLE {'IF EXISTS ' if if_exists else ''}{_name_sql(toks[i])}"
+        tr = _Translator(script.variables, script.params)
+        for action in _split_top_level(toks[i + 1 :]):
+            words = [t.up for t in action[:4]]
+            if words[:2] == ["SET", "OPTIONS"] or (words[:1] == ["ALTER"] and "OPTIONS" in [t.up for t in action]):
+                continue
+            if words[:2] == ["ADD", "COLUMN"]:
+                k = 2
+                exists = words[2:4] == ["IF", "NOT"]
+                if exists:
+                    k = 5
+                self._exec(f"{target} ADD COLUMN {'IF NOT EXISTS ' if exists else ''}{_column_defs(action[k:], tr)}", tr, script)
+                continue
+            if words[:1] == ["ALTER"] and "TYPE" in [t.up for t in action]:
+                k = max(j for j, t in enumerate(action) if _is(t, "TYPE"))
+                self._exec(f"{target} {_render(action[:k + 1])} {_type_sql(action[k + 1:])}", tr, script)
+                continue
+            self._exec(f"{target} {tr.sql(action)}", tr, script)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rows_by_table": {name.split(".")[-1]: n for name, n in sorted(self.rows_written.items())},
+                "rows_written": sum(self.rows_written.values()),
+                "queries": self.queries,
+                "failed_queries": self.failed_queries,
+                "insert_calls": self.insert_calls,
+                "load_jobs": self.load_jobs,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _name_sql(tok: _Tok, *, schema: bool = False) -> str:
+    if schema:
+        return _quote(tok.text.split(".")[-1])
+    return _ident_sql(tok.text) if tok.kind == "ident" else tok.text
+
+
+def _dataset_of(tok: _Tok) -> Optional[str]:
+    parts = tok.text.split(".")
+    return parts[-2] if len(parts) >= 2 else None
+
+
+def _column_defs(toks: Sequence[_Tok], tr: _Translator) -> str:
+    defs = []
+    for part in _split_top_level(toks):
+        if not part or part[0].up in ("PRIMARY", "FOREIGN", "CONSTRAINT"):
+            continue
+        end = len(part)
+        for word in ("NOT", "OPTIONS", "DEFAULT", "COLLATE"):
+            k = _find_top(part, word, start=1)
+            if k >= 0:
+                end = min(end, k)
+        text = f"{_quote(part[0].text)} {_type_sql(part[1:end])}"
+        if _find_top(part, "NOT", start=end) >= 0:
+            text += " NOT NULL"
+        default = _find_top(part, "DEFAULT", start=end)
+        if default >= 0:
+            stop = _find_top(part, "OPTIONS", "NOT", start=default + 1)
+            text += " DEFAULT " + tr.sql(part[default + 1 : stop if stop >= 0 else len(part)])
+        defs.append(text)
+    return ", ".join(defs)
+
+
+def _dml_fixups(first: str, toks: List[_Tok]) -> List[_Tok]:
+    """Spellings DuckDB needs: `INSERT INTO`, `DELETE FROM`, `MERGE INTO`, unqualified SET targets."""
+    toks = list(toks)
+    if first in ("INSERT", "MERGE") and not _is(toks[1], "INTO"):
+        toks.insert(1, _Tok("word", "INTO"))
+    if first == "DELETE" and not _is(toks[1], "FROM"):
+        toks.insert(1, _Tok("word", "FROM"))
+    out: List[_Tok] = []
+    i = 0
+    in_set = False
+    depth = 0
+    while i < len(toks):
+        t = toks[i]
+        if t.kind == "op" and t.text in ("(", "["):
+            depth += 1
+        elif t.kind == "op" and t.text in (")", "]"):
+            depth -= 1
+        if depth == 0 and _is(t, "SET"):
+            in_set = True
+        elif depth == 0 and _is(t, "WHEN", "WHERE", "FROM"):
+            in_set = False
+        if first == "MERGE" and depth == 0 and _is(t, "INSERT") and i + 1 < len(toks) and _is(toks[i + 1], "ROW"):
+            out.extend([t, _Tok("word", "BY"), _Tok("word", "NAME")])
+            i += 2
+            continue
+        if first == "MERGE" and depth == 0 and _is(t, "MATCHED") and i + 2 < len(toks) and _is(toks[i + 1], "BY") and _is(toks[i + 2], "TARGET"):
+            out.append(t)
+            i += 3
+            continue
+        # `SET T.col = ...` -> `SET col = ...`
+        if (
+            in_set
+            and depth == 0
+            and (_is(out[-1] if out else None, "SET", ","))
+            and i + 3 < len(toks)
+            and toks[i].kind in ("word", "ident")
+            and _is(toks[i + 1], ".")
+            and _is(toks[i + 3], "=")
+        ):
+            i += 2
+            continue
+        if in_set and depth == 0 and t.kind == "ident" and "." in t.text and _is(out[-1] if out else None, "SET", ",") and i + 1 < len(toks) and _is(toks[i + 1], "="):
+            out.append(_Tok("ident", t.text.split(".")[-1]))
+            i += 1
+            continue
+        out.append(t)
+        i += 1
+    return out
@@ -0,0 +1,366 @@
+"""End-to-end ingest benchmarks: every `hello_http` against recorded fixtures.
+
+    python -m benchmarks.run                                  # everything, 1k/10k/100k
+    python -m benchmarks.run --service jira,testrail --scale 1k,10k --json out.json
+    python -m benchmarks.run --service legacy --scale 1k      # only the root ingest-*.py scripts
+
+Targets are the `simple/*` services (`jira`, `bugsnag`, `testrail`,
+`gamebench`) and the legacy root scripts, named after their file
+(`ingest-jira`, `ingest-jira-changelog`, `ingest-bugsnag`, `ingest-testrail`,
+`ingest-testrail-results`, `ingest-testrail-users`, `ingest-gamebench`);
+`simple` and `legacy` select either group.
+
+For each (target, scale) the runner builds N fixture entities (see
+`benchmarks/fixtures.py`), serves them from the local stub API
+(`benchmarks/stub_server.py`) and runs the target's `hello_http` once in a
+fresh subprocess, with BigQuery replaced by `FakeBigQueryClient`. A fresh
+process per run keeps peak RSS and module-level caches (HTTP sessions, rate
+limiters) independent between runs. The legacy scripts read their Secret
+Manager secrets from the same env vars instead (see `service_env`).
+
+With `BQ_BACKEND=local` the service keeps its own `get_client()`, i.e. the
+DuckDB stand-in from `benchmarks/local_bigquery.py`: every watermark query,
+MERGE and KPI script actually runs, so the numbers include the SQL side of the
+pipeline. SQL that fails locally fails the run (status 500), unless
+`BQ_LOCAL_STRICT=false`.
+
+Reported per run:
+- rows/s: BigQuery rows written (all tables) per wall-clock second.
+- requests: HTTP requests the stub API answered.
+- peak RSS: high-water RSS of the service process (interpreter and imports included).
+- wall: seconds spent inside `hello_http`.
+
+`--profile` sends `{"profile": true}` (see `profiling.py`): each run also writes
+collapsed stacks to PROFILE_DIR and the top hotspots are printed after the table.
+
+Rate limiting is disabled (`RATE_LIMIT_*_RPS=0`) so the
+numbers measure the service, not its pacing. Other env vars are passed through,
+e.g. `BQ_WRITE_SINK=bulk` or `JIRA_SEARCH_CONCURRENCY=1` to compare modes.
+
+GameBench caps a run at 10 search pages of 50 sessions per environment, so its
+row count stays at 1000 from the 1k scale up; larger scales only grow the
+search result set it pages through. The legacy scripts keep their own caps too
+(e.g. `MAX_ERRORS_PER_RUN`, `MAX_SESSIONS_PER_RUN`, `MAX_RUNS_PER_INVOCATION`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SERVICES = ("jira", "bugsnag", "testrail", "gamebench")
+# Legacy root script -> (upstream API it calls, fixture set it reads).
+LEGACY = {
+    "ingest-jira": ("jira", "jira"),
+    "ingest-jira-changelog": ("jira", "jira"),
+    "ingest-bugsnag": ("bugsnag", "bugsnag"),
+    "ingest-testrail": ("testrail", "testrail"),
+    "ingest-testrail-results": ("testrail", "testrail"),
+    "ingest-testrail-users": ("testrail", "testrail_users"),
+    "ingest-gamebench": ("gamebench", "gamebench"),
+}
+TARGETS = SERVICES + tuple(LEGACY)
+_GROUPS = {"simple": SERVICES, "legacy": tuple(LEGACY)}
+# Watermark aggregates return one row even on an empty table.
+_LEGACY_ANSWERS = {
+    "AS last_seen_max": [{"last_seen_max": None}],
+    "AS last_created": [{"last_created": None}],
+}
+# Tables bigquery/setup.sql provisions and the legacy scripts only look up.
+_LEGACY_SETUP_TABLES = {
+    "jira_status_changes": (
+        ("issue_key", "STRING", "REQUIRED"),
+        ("history_id", "STRING", "REQUIRED"),
+        ("changed_at", "TIMESTAMP", "NULLABLE"),
+        ("from_status", "STRING", "NULLABLE"),
+        ("to_status", "STRING", "NULLABLE"),
+        ("_ingested_at", "TIMESTAMP", "NULLABLE"),
+    ),
+}
+_SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+
+def parse_scale(value: str) -> int:
+    raw = value.strip().lower()
+    if raw in _SCALES:
+        return _SCALES[raw]
+    if raw.endswith("k"):
+        return int(float(raw[:-1]) * 1000)
+    return int(raw)
+
+
+def upstream(target: str) -> str:
+    return LEGACY[target][0] if target in LEGACY else target
+
+
+def service_env(service: str, base_url: str, data: Any) -> Dict[str, str]:
+    """Env for one target run: stub endpoints, fake credentials, no pacing."""
+    if service in LEGACY:
+        return _legacy_env(service, base_url, data)
+    env = {
+        "BQ_PROJECT": "bench",
+        "BQ_DATASET": "qa_metrics_simple",
+        "BQ_LOCATION": "EU",
+        "K_SERVICE": f"bench-{service}",
+        "NO_PROXY": "127.0.0.1,localhost",
+        "no_proxy": "127.0.0.1,localhost",
+    }
+    for name in SERVICES:
+        env[f"RATE_LIMIT_{name.upper()}_RPS"] = "0"
+    if service == "jira":
+        env.update(JIRA_SITE=base_url, JIRA_USER="bench@example.com", JIRA_API_TOKEN="bench", JIRA_PROJECT_KEYS="PC")
+    elif service == "bugsnag":
+        env.update(BUGSNAG_BASE_URL=base_url, BUGSNAG_TOKEN="bench", BUGSNAG_PROJECT_IDS=",".join(data.bugsnag))
+    elif service == "testrail":
+        from benchmarks import fixtures
+
+        env.update(
+            TESTRAIL_BASE_URL=base_url,
+            TESTRAIL_EMAIL="bench@example.com",
+            TESTRAIL_API_KEY="bench",
+            TESTRAIL_PROJECT_IDS=str(fixtures.TESTRAIL_PROJECT_ID),
+        )
+    elif service == "gamebench":
+        env.update(GAMEBENCH_USER="bench@example.com", GAMEBENCH_TOKEN="bench", GAMEBENCH_BASE_URL=base_url)
+    return env
+
+
+def _legacy_env(target: str, base_url: str, data: Any) -> Dict[str, str]:
+    # Secrets the legacy scripts would read from Secret Manager come from the
+    # same names in the env (see `_env_secret`).
+    env = service_env(upstream(target), base_url, data)
+    # Their own dataset: the legacy tables share names with the /simple ones but not schemas.
+    env.update(GCP_PROJECT_ID="bench", BQ_DATASET="qa_metrics")
+    if upstream(target) == "jira":
+        env.update(
+            JIRA_BASE_URL=base_url,
+            JIRA_EMAIL="bench@example.com",
+            JIRA_SEVERITY_FIELD_ID="customfield_10074",
+        )
+    elif upstream(target) == "testrail":
+        env.update(TESTRAIL_URL=base_url, TESTRAIL_USER="bench@example.com")
+    elif upstream(target) == "gamebench":
+        # The legacy client appends /v1 itself.
+        env["GAMEBENCH_BASE_URL"] = base_url[: -len("/v1")] if base_url.endswith("/v1") else base_url
+    return env
+
+
+def _env_secret(name: str) -> str:
+    import secret_cache
+
+    try:
+        return os.environ[name]
+    except KeyError:
+        raise secret_cache.SecretNotFound(name) from None
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss survives fork+exec on Linux, so it would report the runner's
+    # fixture memory; VmHWM is reset for the new process image.
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _local_backend() -> bool:
+    return os.environ.get("BQ_BACKEND", "").strip().lower() == "local"
+
+
+def _load_simple(service: str) -> Tuple[Any, Any]:
+    from benchmarks.fake_bigquery import FakeBigQueryClient
+
+    sys.path.insert(0, str(REPO_ROOT / "simple" / service))
+    main = importlib.import_module("main")
+    bq = importlib.import_module("bq")
+
+    if _local_backend():
+        client = bq.get_client()
+    else:
+        client = FakeBigQueryClient()
+        main.get_client = bq.get_client = lambda: client
+    if service == "gamebench":
+        main.GameBenchClient.BASE_URL = os.environ["GAMEBENCH_BASE_URL"]
+    return main.hello_http, client
+
+
+def _load_legacy(target: str) -> Tuple[Any, Any]:
+    from benchmarks.fake_bigquery import FakeBigQueryClient
+
+    sys.path.insert(0, str(REPO_ROOT))
+    import bq_backend
+    import secret_cache
+
+    spec = importlib.util.spec_from_file_location(target.replace("-", "_"), REPO_ROOT / f"{target}.py")
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    if _local_backend():
+        client = bq_backend.get_client("bench")
+    else:
+        client = FakeBigQueryClient(answers=_LEGACY_ANSWERS)
+        bq_backend.get_client = lambda project=None: client
+    from google.cloud import bigquery
+
+    for name, fields in _LEGACY_SETUP_TABLES.items():
+        schema = [bigquery.SchemaField(*field) for field in fields]
+        client.create_table(bigquery.Table(f"bench.qa_metrics.{name}", schema=schema), exists_ok=True)
+    if hasattr(module, "_SECRETS"):
+        module._SECRETS = secret_cache.SecretCache(_env_secret)
+    if hasattr(module, "_project_id"):
+        module._project_id = lambda: "bench"
+    return module.hello_http, client
+
+
+def run_child(service: str) -> Dict[str, Any]:
+    """Import the target, point it at the fake (or local) client and call `hello_http` once."""
+    import logging
+
+    import flask
+
+    logging.basicConfig(level=os.environ.get("BENCH_LOG_LEVEL", "WARNING"))
+    hello_http, client = _load_legacy(service) if service in LEGACY else _load_simple(service)
+
+    app = flask.Flask(f"bench_{service}")
+    rss_before = _peak_rss_mb()
+    body = {"profile": True} if os.environ.get("BENCH_PROFILE") == "1" else {}
+    with app.test_request_context("/", method="POST", json=body):
+        started = time.perf_counter()
+        response = hello_http(flask.request)
+        wall = time.perf_counter() - started
+        status = 200
+        if isinstance(response, tuple):
+            response, status = response[0], response[1]
+        if isinstance(response, flask.Response):
+            status = response.status_code if status == 200 else status
+            body = response.get_json(silent=True)
+        elif isinstance(response, str):
+            # The Functions Framework scripts return pre-serialized JSON.
+            body = json.loads(response)
+        else:
+            body = response
+    return {
+        "status_code": status,
+        "response": body,
+        "wall_s": wall,
+        "peak_rss_mb": _peak_rss_mb(),
+        "import_rss_mb": rss_before,
+        **client.stats(),
+    }
+
+
+def run_one(server: Any, service: str, n: int) -> Dict[str, Any]:
+    from benchmarks.stub_server import Fixtures
+
+    api = upstream(service)
+    started = time.perf_counter()
+    data = Fixtures.build(LEGACY[service][1] if service in LEGACY else service, n)
+    fixture_s = time.perf_counter() - started
+    server.reset(data)
+
+    env = dict(os.environ)
+    env.update(service_env(service, server.base_url(api), data))
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--child", service],
+        cwd=str(REPO_ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{service} benchmark process failed ({proc.returncode}):\n{proc.stderr[-4000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result.update(
+        service=service,
+        entities=n,
+        requests=server.requests[api],
+        fixture_build_s=fixture_s,
+        rows_per_s=result["rows_written"] / result["wall_s"] if result["wall_s"] else 0.0,
+    )
+    return result
+
+
+def _print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'service':23s} {'entities':>9s} {'status':>6s} {'rows':>8s} {'rows/s':>10s} {'requests':>8s} {'peak RSS':>10s} {'wall':>8s}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['service']:23s} {r['entities']:9d} {r['status_code']:6d} {r['rows_written']:8d} "
+            f"{r['rows_per_s']:10.0f} {r['requests']:8d} {r['peak_rss_mb']:8.1f}MB {r['wall_s']:7.2f}s"
+        )
+
+
+def _print_hotspots(results: List[Dict[str, Any]], top_n: int = 8) -> None:
+    for r in results:
+        profile = (r.get("response") or {}).get("profile")
+        if not profile:
+            continue
+        print(f"\n{r['service']} n={r['entities']}: {profile['samples']} samples -> {profile['output']}")
+        for spot in profile["top"][:top_n]:
+            print(f"  {spot['self_pct']:5.1f}% self {spot['total_pct']:5.1f}% total  {spot['frame']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--service", default="simple,legacy", help="CSV of targets, or simple / legacy (default: all)")
+    parser.add_argument("--scale", default="1k,10k,100k", help="CSV of entity counts, e.g. 1k,10k,100k or 2500")
+    parser.add_argument("--json", dest="json_path", help="also write the full results to this file")
+    parser.add_argument("--profile", action="store_true", help="profile each run and print its hotspots")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child), default=str))
+        return 0
+
+    from benchmarks.stub_server import StubServer
+
+    services: List[str] = []
+    for name in (s.strip() for s in args.service.split(",")):
+        for target in _GROUPS.get(name, (name,) if name else ()):
+            if target not in services:
+                services.append(target)
+    unknown = sorted(set(services) - set(TARGETS))
+    if unknown:
+        parser.error(f"unknown service(s): {', '.join(unknown)}")
+    scales = [parse_scale(s) for s in args.scale.split(",") if s.strip()]
+    if args.profile:
+        os.environ["BENCH_PROFILE"] = "1"
+
+    results: List[Dict[str, Any]] = []
+    with StubServer() as server:
+        for service in services:
+            for n in scales:
+                result = run_one(server, service, n)
+                results.append(result)
+                if result["status_code"] != 200:
+                    print(f"warning: {service} n={n} answered {result['status_code']}: {result['response']}", file=sys.stderr)
+
+    _print_table(results)
+    _print_hotspots(results)
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2, default=str), encoding="utf-8")
+    return 0 if all(r["status_code"] == 200 for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
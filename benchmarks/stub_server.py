@@ -0,0 +1,334 @@
+"""Local stand-in for the Jira, Bugsnag, TestRail and GameBench REST APIs.
+
+One threaded HTTP server on 127.0.0.1 serves every upstream under its own
+prefix (`/jira`, `/bugsnag`, `/testrail`, `/gamebench/v1`), speaking just
+enough of each API for the `simple/*` services and the legacy root
+`ingest-*.py` scripts to page through a fixture set:
+
+- Jira `GET /rest/api/3/search/jql` (pages use `nextPageToken`) and the older
+  `GET /rest/api/3/search` (`startAt` / `total`): `project = X` /
+  `project in (...)` and quoted `updated >= "..."` / `<` / `<=` bounds are
+  honoured (the partitioned search relies on them).
+  `POST /rest/api/3/changelog/bulkfetch` returns the fixture histories of the
+  requested keys in one page. Jira only sends `issueId` per entry; `issueKey`
+  is echoed too because `ingest-jira-changelog.py` reads it.
+- Bugsnag `GET /projects/<id>/errors`: `page` / `per_page`, empty page at the
+  end, and a `Link: rel="next"` header while more pages remain.
+- TestRail `index.php?/api/v2/get_suites|get_runs|get_results_for_run|get_users`,
+  with `created_after` / `updated_after`, and `limit` / `offset` (plus
+  `_links.next`) on runs and results.
+- GameBench `POST /advanced-search/sessions` (package filter, `page` /
+  `pageSize`, `totalPages`), the legacy `POST /sessions` search (`apps`
+  filter, `page` / `pageSize`) and `GET /sessions/<id>[/fps|/fpsStability]`.
+
+Requests are counted per service so the runner can report them.
+"""
+
+from __future__ import annotations
+
+import bisect
+import datetime as dt
+import json
+import re
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks import fixtures
+
+_PROJECT_RE = re.compile(r"project\s*(?:=\s*([\w-]+)|in\s*\(([^)]*)\))", re.IGNORECASE)
+_BOUND_RE = re.compile(r'updated\s*(>=|<=|<)\s*"([^"]+)"', re.IGNORECASE)
+
+
+class Fixtures:
+    """The entity set currently served; empty services answer with empty pages."""
+
+    def __init__(self) -> None:
+        self.jira: List[Tuple[dt.datetime, Dict[str, Any]]] = []
+        self.bugsnag: Dict[str, List[Dict[str, Any]]] = {}
+        self.testrail_suites: List[Dict[str, Any]] = []
+        self.testrail_runs: List[Dict[str, Any]] = []
+        self.testrail_results: Dict[int, List[Dict[str, Any]]] = {}
+        self.testrail_users: List[Dict[str, Any]] = []
+        self.gamebench: Dict[str, List[Dict[str, Any]]] = {}
+        self._gamebench_by_id: Dict[str, Dict[str, Any]] = {}
+        self._jira_updated: List[dt.datetime] = []
+        self._jira_by_key: Dict[str, Dict[str, Any]] = {}
+        self._jql_cache: Dict[str, List[Dict[str, Any]]] = {}
+
+    @classmethod
+    def build(cls, service: str, n: int) -> "Fixtures":
+        data = cls()
+        if service == "jira":
+            data.jira = fixtures.jira_issues(n)
+            data._jira_updated = [updated for updated, _ in data.jira]
+            data._jira_by_key = {issue["key"]: issue for _, issue in data.jira}
+        elif service == "bugsnag":
+            data.bugsnag = fixtures.bugsnag_errors(n)
+        elif service == "testrail":
+            data.testrail_suites, data.testrail_runs, data.testrail_results = fixtures.testrail_project(n)
+        elif service == "testrail_users":
+            data.testrail_users = fixtures.testrail_users(n)
+        elif service == "gamebench":
+            data.gamebench = fixtures.gamebench_sessions(n)
+            data._gamebench_by_id = {s["sessionId"]: s for sessions in data.gamebench.values() for s in sessions}
+        else:
+            raise ValueError(f"Unknown service {service!r}")
+        return data
+
+    def jira_search(self, jql: str) -> List[Dict[str, Any]]:
+        cached = self._jql_cache.get(jql)
+        if cached is not None:
+            return cached
+        m = _PROJECT_RE.search(jql)
+        projects = None
+        if m:
+            raw = m.group(1) or m.group(2) or ""
+            projects = {p.strip().strip("'\"") for p in raw.split(",") if p.strip()}
+        lo, hi = 0, len(self.jira)
+        for op, value in _BOUND_RE.findall(jql):
+            # JQL accepts both yyyy-MM-dd and yyyy/MM/dd; times are to the minute.
+            bound = dt.datetime.strptime(value.replace("/", "-"), "%Y-%m-%d %H:%M").replace(tzinfo=dt.timezone.utc)
+            if op == ">=":
+                lo = max(lo, bisect.bisect_left(self._jira_updated, bound))
+            elif op == "<=":
+                hi = min(hi, bisect.bisect_left(self._jira_updated, bound + dt.timedelta(minutes=1)))
+            else:
+                hi = min(hi, bisect.bisect_left(self._jira_updated, bound))
+        issues = [
+            issue
+            for _, issue in reversed(self.jira[lo:hi])
+            if projects is None or issue["key"].split("-", 1)[0] in projects
+        ]
+        self._jql_cache[jql] = issues
+        return issues
+
+    def jira_issue(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._jira_by_key.get(key)
+
+    def gamebench_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._gamebench_by_id.get(session_id)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubServer"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, keep-alive
+    # clients stall ~40 ms per request on Nagle + delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - BaseHTTPRequestHandler signature
+        pass
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw) if raw else None
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        parts = urlsplit(self.path)
+        service = parts.path.strip("/").split("/", 1)[0]
+        body = self._read_json() if method == "POST" else None
+        self.server.count(service)
+        handler = getattr(self, f"_{service}", None)
+        try:
+            result = handler(method, parts.path, parts.query, body) if handler else None
+        except (KeyError, ValueError) as exc:
+            self._send(400, {"error": str(exc)})
+            return
+        if result is None:
+            self._send(404, {"error": f"No stub route for {method} {self.path}"})
+            return
+        if isinstance(result, _WithHeaders):
+            self._send(200, result.payload, result.headers)
+            return
+        self._send(200, result)
+
+    # -- Jira ----------------------------------------------------------------
+
+    def _jira(self, method: str, path: str, query: str, body: Any) -> Any:
+        if method == "POST" and path.endswith("/rest/api/3/changelog/bulkfetch"):
+            return self._jira_changelog(body or {})
+        if method != "GET" or not path.endswith(("/rest/api/3/search/jql", "/rest/api/3/search")):
+            return None
+        params = parse_qs(query)
+        issues = self.server.data.jira_search(params["jql"][0])
+        max_results = int(params.get("maxResults", ["50"])[0])
+        token = params.get("nextPageToken", [None])[0]
+        start = int(token) if token else int(params.get("startAt", ["0"])[0])
+        page = issues[start:start + max_results]
+        end = start + len(page)
+        if path.endswith("/search"):
+            return {"startAt": start, "maxResults": max_results, "total": len(issues), "issues": page}
+        out: Dict[str, Any] = {"issues": page, "isLast": end >= len(issues)}
+        if end < len(issues):
+            out["nextPageToken"] = str(end)
+        return out
+
+    def _jira_changelog(self, body: Dict[str, Any]) -> Any:
+        fields = set(body.get("fieldIds") or [])
+        logs = []
+        for key in body.get("issueIdsOrKeys") or []:
+            issue = self.server.data.jira_issue(str(key))
+            if issue is None:
+                continue
+            histories = [
+                {**h, "items": [item for item in h["items"] if not fields or item.get("field") in fields]}
+                for h in issue["changelog"]["histories"]
+            ]
+            logs.append({"issueId": issue["id"], "issueKey": issue["key"], "changeHistories": [h for h in histories if h["items"]]})
+        return {"issueChangeLogs": logs}
+
+    # -- Bugsnag -------------------------------------------------------------
+
+    def _bugsnag(self, method: str, path: str, query: str, body: Any) -> Any:
+        m = re.fullmatch(r"/bugsnag/projects/([^/]+)/errors", path)
+        if method != "GET" or not m:
+            return None
+        errors = self.server.data.bugsnag.get(m.group(1), [])
+        params = parse_qs(query)
+        per_page = int(params.get("per_page", ["30"])[0])
+        page = int(params.get("page", ["1"])[0])
+        out = errors[(page - 1) * per_page:page * per_page]
+        if page * per_page >= len(errors):
+            return out
+        host = self.headers.get("Host", "127.0.0.1")
+        next_url = f"http://{host}{path}?per_page={per_page}&page={page + 1}"
+        return _WithHeaders(out, {"Link": f'<{next_url}>; rel="next"'})
+
+    # -- TestRail ------------------------------------------------------------
+
+    def _testrail(self, method: str, path: str, query: str, body: Any) -> Any:
+        # index.php?/api/v2/<endpoint>/<id>&key=value...
+        if method != "GET" or not path.endswith("/index.php"):
+            return None
+        endpoint, _, rest = query.partition("&")
+        params = {k: v[0] for k, v in parse_qs(rest).items()}
+        m = re.fullmatch(r"/api/v2/(get_suites|get_runs|get_results_for_run|get_users)/(\d+)", endpoint)
+        if not m:
+            return None
+        data = self.server.data
+        name, ident = m.group(1), int(m.group(2))
+        if name == "get_suites":
+            return data.testrail_suites if ident == fixtures.TESTRAIL_PROJECT_ID else []
+        if name == "get_users":
+            return data.testrail_users if ident == fixtures.TESTRAIL_PROJECT_ID else []
+        created_after = int(params.get("created_after", 0))
+        updated_after = int(params.get("updated_after", 0))
+        if name == "get_runs":
+            runs = [
+                r
+                for r in data.testrail_runs
+                if ident == fixtures.TESTRAIL_PROJECT_ID and r["created_on"] > created_after and r["updated_on"] > updated_after
+            ]
+            if "limit" not in params:
+                return {"offset": 0, "limit": 250, "size": len(runs), "_links": {"next": None, "prev": None}, "runs": runs}
+            return _testrail_page("runs", runs, endpoint, params)
+        results = [r for r in data.testrail_results.get(ident, []) if r["created_on"] > created_after]
+        return _testrail_page("results", results, endpoint, params)
+
+    # -- GameBench -----------------------------------------------------------
+
+    def _gamebench(self, method: str, path: str, query: str, body: Any) -> Any:
+        data = self.server.data
+        if method == "POST" and path == "/gamebench/v1/advanced-search/sessions":
+            params = parse_qs(query)
+            page = int(params.get("page", ["0"])[0])
+            page_size = int(params.get("pageSize", ["50"])[0])
+            packages = ((body or {}).get("appInfo") or {}).get("package") or []
+            sessions = [s for pkg in packages for s in data.gamebench.get(pkg, [])]
+            total_pages = -(-len(sessions) // page_size) if sessions else 0
+            return {"results": sessions[page * page_size:(page + 1) * page_size], "totalPages": total_pages, "page": page}
+        if method == "POST" and path == "/gamebench/v1/sessions":
+            params = parse_qs(query)
+            page = int(params.get("page", ["0"])[0])
+            page_size = int(params.get("pageSize", ["50"])[0])
+            sessions = [s for pkg in (body or {}).get("apps") or [] for s in data.gamebench.get(pkg, [])]
+            sessions.sort(key=lambda s: s["timePushed"], reverse=True)
+            return {"sessions": sessions[page * page_size:(page + 1) * page_size], "total": len(sessions)}
+        m = re.fullmatch(r"/gamebench/v1/sessions/([^/]+)(/fps|/fpsStability)?", path)
+        if method != "GET" or not m:
+            return None
+        session = data.gamebench_session(m.group(1))
+        if session is None:
+            return None
+        if m.group(2) == "/fps":
+            return fixtures.gamebench_series(session["sessionId"])
+        if m.group(2) == "/fpsStability":
+            return fixtures.gamebench_series(session["sessionId"], stability=True)
+        return fixtures.gamebench_session_detail(session)
+
+
+class _WithHeaders:
+    """A JSON payload plus extra response headers (e.g. a pagination `Link`)."""
+
+    def __init__(self, payload: Any, headers: Dict[str, str]) -> None:
+        self.payload = payload
+        self.headers = headers
+
+
+def _testrail_page(entity: str, items: List[Dict[str, Any]], endpoint: str, params: Dict[str, str]) -> Dict[str, Any]:
+    limit = int(params.get("limit", 250))
+    offset = int(params.get("offset", 0))
+    page = items[offset:offset + limit]
+    next_link = f"{endpoint}&limit={limit}&offset={offset + limit}" if offset + limit < len(items) else None
+    return {"offset": offset, "limit": limit, "size": len(page), "_links": {"next": next_link, "prev": None}, entity: page}
+
+
+class StubServer(ThreadingHTTPServer):
+    """Background stub API server; `base_url(service)` is what the service env should point at."""
+
+    daemon_threads = True
+
+    def __init__(self, data: Optional[Fixtures] = None) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.data = data or Fixtures()
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def count(self, service: str) -> None:
+        with self._lock:
+            self.requests[service] += 1
+
+    def reset(self, data: Fixtures) -> None:
+        with self._lock:
+            self.data = data
+            self.requests.clear()
+
+    def base_url(self, service: str) -> str:
+        root = f"http://127.0.0.1:{self.server_address[1]}"
+        return f"{root}/gamebench/v1" if service == "gamebench" else f"{root}/{service}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
@@ -0,0 +1,18 @@
+-- Points the *_latest helper views at the MERGE-maintained *_current tables.
+-- Run once after the ingests have created them (BQ_CURRENT_TABLES=true, see
+-- bq_current.py); each *_current table holds one row per key, so Looker reads
+-- it directly instead of ranking the full raw history with ROW_NUMBER().
+-- Re-running bigquery/setup.sql restores the ROW_NUMBER views; run this script
+-- again afterwards.
+
+CREATE OR REPLACE VIEW `qa_metrics.jira_issues_latest` AS
+SELECT * FROM `qa_metrics.jira_issues_current`;
+
+CREATE OR REPLACE VIEW `qa_metrics.testrail_runs_latest` AS
+SELECT * FROM `qa_metrics.testrail_runs_current`;
+
+CREATE OR REPLACE VIEW `qa_metrics.bugsnag_errors_latest` AS
+SELECT * FROM `qa_metrics.bugsnag_errors_current`;
+
+CREATE OR REPLACE VIEW `qa_metrics.gamebench_sessions_latest` AS
+SELECT * FROM `qa_metrics.gamebench_sessions_current`;
@@ -0,0 +1,130 @@
+-- Refreshes qa_metrics.jira_active_bug_count_daily incrementally.
+-- Run by ingest-jira.py / ingest-jira-changelog.py after a successful ingest
+-- (jira_rollups.py); safe to run by hand for a backfill.
+--
+-- Each bug is a +1 event on its created date and a -1 event on its first
+-- done_or_fixed transition, so active_bug_count is a running SUM of daily deltas
+-- (O(days + bugs) instead of the old date_spine x bug_lifecycle COUNTIF).
+-- Only days from the first one whose opened/fixed counts changed (or the first
+-- day not stored yet) are recomputed and merged.
+-- Self-heal legacy environments where the object is still the old VIEW.
+DECLARE active_bug_count_type STRING;
+DECLARE last_stored_date DATE;
+DECLARE first_changed_date DATE;
+DECLARE refresh_from DATE;
+
+SET active_bug_count_type = (
+  SELECT table_type
+  FROM `qa_metrics.INFORMATION_SCHEMA.TABLES`
+  WHERE table_name = 'jira_active_bug_count_daily'
+  LIMIT 1
+);
+
+IF active_bug_count_type = 'VIEW' THEN
+  EXECUTE IMMEDIATE 'DROP VIEW `qa_metrics.jira_active_bug_count_daily`';
+END IF;
+
+CREATE TABLE IF NOT EXISTS `qa_metrics.jira_active_bug_count_daily` (
+  metric_date DATE,
+  opened_count INT64,
+  fixed_count INT64,
+  active_bug_count INT64,
+  _updated_at TIMESTAMP
+)
+PARTITION BY DATE_TRUNC(metric_date, MONTH);
+
+CREATE TEMP TABLE bug_event_days AS
+WITH status_sets AS (
+  SELECT ARRAY_AGG(normalized_status) AS done_or_fixed_statuses
+  FROM `qa_metrics.jira_status_category_map`
+  WHERE status_category = 'done_or_fixed'
+),
+bug_lifecycle AS (
+  SELECT
+    ji.issue_key,
+    DATE(ji.created) AS created_date,
+    DATE(MIN(sc.changed_at)) AS fixed_date
+  FROM `qa_metrics.jira_issues_latest` ji
+  CROSS JOIN status_sets ss
+  LEFT JOIN `qa_metrics.jira_status_changes` sc
+    ON sc.issue_key = ji.issue_key
+   AND LOWER(TRIM(COALESCE(sc.to_status, ''))) IN UNNEST(ss.done_or_fixed_statuses)
+  WHERE LOWER(TRIM(ji.issue_type)) IN ('bug', 'defect')
+    AND ji.created IS NOT NULL
+  GROUP BY 1, 2
+),
+bug_events AS (
+  SELECT created_date AS metric_date, 1 AS opened, 0 AS fixed
+  FROM bug_lifecycle
+  UNION ALL
+  -- A fix recorded before the created date means the bug was never active.
+  SELECT GREATEST(fixed_date, created_date), 0, 1
+  FROM bug_lifecycle
+  WHERE fixed_date IS NOT NULL
+)
+SELECT
+  metric_date,
+  SUM(opened) AS opened_count,
+  SUM(fixed) AS fixed_count
+FROM bug_events
+GROUP BY metric_date;
+
+SET last_stored_date = (SELECT MAX(metric_date) FROM `qa_metrics.jira_active_bug_count_daily`);
+
+SET first_changed_date = (
+  SELECT MIN(COALESCE(e.metric_date, t.metric_date))
+  FROM bug_event_days e
+  FULL OUTER JOIN `qa_metrics.jira_active_bug_count_daily` t
+    ON t.metric_date = e.metric_date
+  WHERE IFNULL(e.opened_count, 0) != IFNULL(t.opened_count, 0)
+     OR IFNULL(e.fixed_count, 0) != IFNULL(t.fixed_count, 0)
+);
+
+SET refresh_from = IF(
+  last_stored_date IS NULL,
+  (SELECT MIN(metric_date) FROM bug_event_days),
+  LEAST(
+    COALESCE(first_changed_date, DATE_ADD(last_stored_date, INTERVAL 1 DAY)),
+    DATE_ADD(last_stored_date, INTERVAL 1 DAY)
+  )
+);
+
+IF refresh_from IS NOT NULL AND refresh_from <= CURRENT_DATE() THEN
+  MERGE `qa_metrics.jira_active_bug_count_daily` AS target
+  USING (
+    WITH active_before AS (
+      SELECT IFNULL(SUM(opened_count - fixed_count), 0) AS n
+      FROM bug_event_days
+      WHERE metric_date < refresh_from
+    ),
+    days AS (
+      SELECT
+        day AS metric_date,
+        IFNULL(e.opened_count, 0) AS opened_count,
+        IFNULL(e.fixed_count, 0) AS fixed_count
+      FROM UNNEST(GENERATE_DATE_ARRAY(refresh_from, CURRENT_DATE(), INTERVAL 1 DAY)) AS day
+      LEFT JOIN bug_event_days e
+        ON e.metric_date = day
+    )
+    SELECT
+      d.metric_date,
+      d.opened_count,
+      d.fixed_count,
+      ab.n + SUM(d.opened_count - d.fixed_count) OVER (ORDER BY d.metric_date) AS active_bug_count,
+      CURRENT_TIMESTAMP() AS _updated_at
+    FROM days d
+    CROSS JOIN active_before ab
+  ) AS source
+  ON target.metric_date = source.metric_date
+  WHEN MATCHED THEN
+    UPDATE SET
+      opened_count = source.opened_count,
+      fixed_count = source.fixed_count,
+      active_bug_count = source.active_bug_count,
+      _updated_at = source._updated_at
+  WHEN NOT MATCHED THEN
+    INSERT (metric_date, opened_count, fixed_count, active_bug_count, _updated_at)
+    VALUES (source.metric_date, source.opened_count, source.fixed_count, source.active_bug_count, source._updated_at);
+END IF;
+
+SELECT refresh_from;
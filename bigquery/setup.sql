@@ -10,10 +10,18 @@ DECLARE keep_objects ARRAY<STRING> DEFAULT [
   -- Raw ingestion tables (as used by current code defaults)
   'jira_issues_v2',
   'jira_changelog_v2',
+  'jira_changelog_issue_state',
   'testrail_runs',
   'testrail_results',
   'bugsnag_errors',
   'gamebench_sessions_v1',
+  'raw_payloads',
+
+  -- Latest-state tables MERGEd by the ingests (BQ_CURRENT_TABLES, bq_current.py)
+  'jira_issues_current',
+  'testrail_runs_current',
+  'bugsnag_errors_current',
+  'gamebench_sessions_current',
 
   -- Manual/mapping/source tables
   'manual_kpi_values',
@@ -295,16 +303,42 @@ WHERE rn = 1;
 -- -----------------------------
 -- Jira status changes (one row per status transition)
 -- -----------------------------
-CREATE OR REPLACE VIEW `qa_metrics.jira_status_changes` AS
-SELECT
-  c.issue_key,
-  c.history_id,
-  c.history_created AS changed_at,
-  JSON_VALUE(item, '$.fromString') AS from_status,
-  JSON_VALUE(item, '$.toString') AS to_status
-FROM `qa_metrics.jira_changelog_v2` c,
-UNNEST(JSON_EXTRACT_ARRAY(c.items_json)) AS item
-WHERE JSON_VALUE(item, '$.field') = 'status';
+-- Materialized: ingest-jira-changelog.py appends the flattened status items of every
+-- new history. Legacy deployments still have a VIEW with this name; it is replaced
+-- and the table is backfilled from jira_changelog_v2 once.
+IF EXISTS (
+  SELECT 1
+  FROM `qa_metrics.INFORMATION_SCHEMA.TABLES`
+  WHERE table_name = 'jira_status_changes'
+    AND table_type = 'VIEW'
+) THEN
+  DROP VIEW `qa_metrics.jira_status_changes`;
+END IF;
+
+CREATE TABLE IF NOT EXISTS `qa_metrics.jira_status_changes` (
+  issue_key STRING NOT NULL,
+  history_id STRING NOT NULL,
+  changed_at TIMESTAMP,
+  from_status STRING,
+  to_status STRING,
+  _ingested_at TIMESTAMP
+)
+PARTITION BY DATE(changed_at)
+CLUSTER BY issue_key;
+
+IF NOT EXISTS (SELECT 1 FROM `qa_metrics.jira_status_changes` LIMIT 1) THEN
+  INSERT INTO `qa_metrics.jira_status_changes` (issue_key, history_id, changed_at, from_status, to_status, _ingested_at)
+  SELECT
+    c.issue_key,
+    c.history_id,
+    c.history_created,
+    JSON_VALUE(item, '$.fromString'),
+    JSON_VALUE(item, '$.toString'),
+    c._ingested_at
+  FROM `qa_metrics.jira_changelog_v2` c,
+  UNNEST(JSON_EXTRACT_ARRAY(c.items_json)) AS item
+  WHERE JSON_VALUE(item, '$.field') = 'status';
+END IF;
 
 -- -----------------------------
 -- LookML helper objects (explicit definitions)
@@ -510,45 +544,25 @@ JOIN bugs b
 WHERE cfe.claimed_fixed_at >= b.created
 GROUP BY 1;
 
-CREATE OR REPLACE VIEW `qa_metrics.jira_active_bug_count_daily` AS
-WITH status_sets AS (
-  SELECT ARRAY_AGG(normalized_status) AS done_or_fixed_statuses
-  FROM `qa_metrics.jira_status_category_map`
-  WHERE status_category = 'done_or_fixed'
-),
-bug_lifecycle AS (
-  SELECT
-    ji.issue_key,
-    DATE(ji.created) AS created_date,
-    DATE(MIN(sc.changed_at)) AS fixed_date
-  FROM `qa_metrics.jira_issues_latest` ji
-  CROSS JOIN status_sets ss
-  LEFT JOIN `qa_metrics.jira_status_changes` sc
-    ON sc.issue_key = ji.issue_key
-   AND LOWER(TRIM(COALESCE(sc.to_status, ''))) IN UNNEST(ss.done_or_fixed_statuses)
-  WHERE LOWER(TRIM(ji.issue_type)) IN ('bug', 'defect')
-    AND ji.created IS NOT NULL
-  GROUP BY 1,2
-),
-date_spine AS (
-  SELECT metric_date
-  FROM UNNEST(
-    GENERATE_DATE_ARRAY(
-      (SELECT MIN(created_date) FROM bug_lifecycle),
-      CURRENT_DATE(),
-      INTERVAL 1 DAY
-    )
-  ) AS metric_date
+-- Materialized: one row per day, kept current by jira_active_bug_count_daily_refresh.sql
+-- (run by the Jira ingests). Legacy deployments still have a VIEW with this name.
+IF EXISTS (
+  SELECT 1
+  FROM `qa_metrics.INFORMATION_SCHEMA.TABLES`
+  WHERE table_name = 'jira_active_bug_count_daily'
+    AND table_type = 'VIEW'
+) THEN
+  DROP VIEW `qa_metrics.jira_active_bug_count_daily`;
+END IF;
+
+CREATE TABLE IF NOT EXISTS `qa_metrics.jira_active_bug_count_daily` (
+  metric_date DATE,
+  opened_count INT64,
+  fixed_count INT64,
+  active_bug_count INT64,
+  _updated_at TIMESTAMP
 )
-SELECT
-  d.metric_date,
-  COUNTIF(
-    b.created_date <= d.metric_date
-    AND (b.fixed_date IS NULL OR b.fixed_date > d.metric_date)
-  ) AS active_bug_count
-FROM date_spine d
-CROSS JOIN bug_lifecycle b
-GROUP BY 1;
+PARTITION BY DATE_TRUNC(metric_date, MONTH);
 
 CREATE OR REPLACE VIEW `qa_metrics.testrail_bvt_latest` AS
 SELECT
@@ -657,7 +671,9 @@ jira_done_story_points AS (
     AND LOWER(issue_type) IN ('story','task','improvement')
 ),
 status_changes AS (
-  SELECT * FROM `qa_metrics.jira_status_changes`
+  -- Appends are not deduplicated on every write path (load jobs, storage_write).
+  SELECT DISTINCT issue_key, history_id, changed_at, from_status, to_status
+  FROM `qa_metrics.jira_status_changes`
 ),
 triage_times AS (
   SELECT
@@ -0,0 +1,171 @@
+"""Keyed `*_current` tables kept up to date by MERGE (opt-in).
+
+The `*_latest` views in `bigquery/setup.sql` pick the newest row per key with
+`ROW_NUMBER()` over the whole append-only raw table, so every dashboard query
+pays for the full ingest history. With `BQ_CURRENT_TABLES=true` (or request body
+`{"merge_current": true}`) an ingest run additionally MERGEs the rows it just
+appended into a `<name>_current` table holding one row per key:
+
+- The run's batch is staged by the raw write itself: the MERGE source is the raw
+  rows ingested since the newest `_ingested_at` already in the current table
+  (minus `BQ_CURRENT_OVERLAP_MIN`, default 60, for slow concurrent writers),
+  deduped per key with the same ordering as the `*_latest` view. A failed MERGE
+  is therefore caught up by the next run.
+- A matched row is only replaced when the staged row is at least as new on the
+  view's version column (e.g. Jira `updated`), so replays and overlapping
+  windows never roll an entity back.
+- On first use the table is created (clustered by the key) and seeded from the
+  whole raw table; new raw columns are added to it before each MERGE.
+- MERGE failures are reported in the ingest response but do not fail the run;
+  the raw rows are already written.
+
+`bigquery/current_tables.sql` points the `*_latest` views at these tables once
+they exist, so Looker keeps reading the same view names.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import timedelta
+from typing import Any, Dict, Optional, Sequence
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CurrentTableSpec:
+    def __init__(self, current_table: str, keys: Sequence[str], order_by: Sequence[str], version_column: Optional[str]) -> None:
+        self.current_table = current_table
+        self.keys = tuple(keys)
+        self.order_by = tuple(order_by)
+        self.version_column = version_column
+
+
+# raw table name -> how its `*_latest` view picks the newest row.
+SPECS: Dict[str, CurrentTableSpec] = {
+    "jira_issues_v2": CurrentTableSpec("jira_issues_current", ["issue_key"], ["updated DESC", "_ingested_at DESC"], "updated"),
+    "testrail_runs": CurrentTableSpec("testrail_runs_current", ["run_id"], ["_ingested_at DESC"], None),
+    "bugsnag_errors": CurrentTableSpec(
+        "bugsnag_errors_current", ["project_id", "error_id"], ["last_seen DESC", "_ingested_at DESC"], "last_seen"
+    ),
+    "gamebench_sessions_v1": CurrentTableSpec(
+        "gamebench_sessions_current", ["session_id"], ["time_pushed DESC", "_ingested_at DESC"], "time_pushed"
+    ),
+}
+
+
+def merge_enabled(request_json: Optional[Dict[str, Any]] = None) -> bool:
+    override = (request_json or {}).get("merge_current")
+    if override is not None:
+        return str(override).strip().lower() in {"1", "true", "yes", "on"}
+    raw = (os.environ.get("BQ_CURRENT_TABLES") or "false").strip().lower()
+    return raw in {"1", "true", "yes", "on"}
+
+
+def _overlap() -> timedelta:
+    try:
+        return timedelta(minutes=max(0, int(os.environ.get("BQ_CURRENT_OVERLAP_MIN", "60"))))
+    except ValueError:
+        return timedelta(minutes=60)
+
+
+def _table_fqn(table_id: Any) -> str:
+    """`project.dataset.table` for a string id or a TableReference."""
+    if isinstance(table_id, str):
+        return table_id
+    return f"{table_id.project}.{table_id.dataset_id}.{table_id.table_id}"
+
+
+def _ensure_current_table(client: Any, raw_fqn: str, current_fqn: str, keys: Sequence[str]) -> None:
+    """Create the current table from the raw schema, or add raw columns it is missing."""
+    from google.api_core.exceptions import NotFound
+    from google.cloud import bigquery
+
+    raw = client.get_table(raw_fqn)
+    try:
+        current = client.get_table(current_fqn)
+    except NotFound:
+        table = bigquery.Table(current_fqn, schema=raw.schema)
+        table.clustering_fields = list(keys)
+        client.create_table(table)
+        LOGGER.info("BQ_CURRENT_CREATED table=%s", current_fqn)
+        return
+    existing = {f.name for f in current.schema}
+    missing = [f for f in raw.schema if f.name not in existing]
+    if missing:
+        current.schema = list(current.schema) + [
+            bigquery.SchemaField(f.name, f.field_type, mode="REPEATED" if f.mode == "REPEATED" else "NULLABLE", fields=f.fields)
+            for f in missing
+        ]
+        client.update_table(current, ["schema"])
+
+
+def merge_sql(raw_fqn: str, current_fqn: str, spec: CurrentTableSpec, columns: Sequence[str], *, incremental: bool) -> str:
+    """MERGE statement; `incremental` reads only raw rows with `_ingested_at >= @since`."""
+    cols = [f"`{c}`" for c in columns]
+    on = " AND ".join(f"T.`{k}` = S.`{k}`" for k in spec.keys)
+    newer = ""
+    if spec.version_column:
+        v = spec.version_column
+        newer = f" AND (T.`{v}` IS NULL OR (S.`{v}` IS NOT NULL AND S.`{v}` >= T.`{v}`))"
+    window = "\n      WHERE _ingested_at >= @since" if incremental else ""
+    set_cols = ",\n    ".join(f"T.{c} = S.{c}" for c, name in zip(cols, columns) if name not in spec.keys)
+    return f"""
+MERGE `{current_fqn}` T
+USING (
+  SELECT * EXCEPT(rn)
+  FROM (
+    SELECT
+      {", ".join(cols)},
+      ROW_NUMBER() OVER (PARTITION BY {", ".join(spec.keys)} ORDER BY {", ".join(spec.order_by)}) AS rn
+    FROM `{raw_fqn}`{window}
+  )
+  WHERE rn = 1
+) S
+ON {on}
+WHEN MATCHED{newer} THEN
+  UPDATE SET
+    {set_cols}
+WHEN NOT MATCHED THEN
+  INSERT ({", ".join(cols)})
+  VALUES ({", ".join(f"S.{c}" for c in cols)})
+"""
+
+
+def merge_run(client: Any, raw_table_id: Any) -> Dict[str, Any]:
+    """MERGE raw rows ingested since the last MERGE into the raw table's `*_current` table.
+
+    Best effort: returns a summary for the HTTP response (`ok: false` on failure).
+    """
+    from google.cloud import bigquery
+
+    raw_fqn = _table_fqn(raw_table_id)
+    project, dataset, name = raw_fqn.split(".")
+    spec = SPECS.get(name)
+    if spec is None:
+        return {"ok": False, "error": f"No *_current table configured for {raw_fqn}"}
+    current_fqn = f"{project}.{dataset}.{spec.current_table}"
+
+    try:
+        _ensure_current_table(client, raw_fqn, current_fqn, spec.keys)
+        rows = list(client.query(f"SELECT MAX(_ingested_at) FROM `{current_fqn}`").result())
+        last = rows[0][0] if rows else None
+        since = last - _overlap() if last is not None else None
+        columns = [f.name for f in client.get_table(current_fqn).schema]
+        params = [bigquery.ScalarQueryParameter("since", "TIMESTAMP", since)] if since is not None else []
+        job = client.query(
+            merge_sql(raw_fqn, current_fqn, spec, columns, incremental=since is not None),
+            job_config=bigquery.QueryJobConfig(query_parameters=params),
+        )
+        job.result()
+    except Exception as exc:  # noqa: BLE001 - raw rows are written; the next run catches up
+        LOGGER.warning("BQ_CURRENT_MERGE_FAILED table=%s error=%s", current_fqn, exc)
+        return {"ok": False, "table": current_fqn, "error": str(exc)[:500]}
+    affected = int(getattr(job, "num_dml_affected_rows", 0) or 0)
+    LOGGER.info("BQ_CURRENT_MERGED table=%s since=%s affected=%s", current_fqn, since, affected)
+    return {
+        "ok": True,
+        "table": current_fqn,
+        "since": since.isoformat() if since is not None else None,
+        "affected_rows": affected,
+    }
@@ -0,0 +1,129 @@
+"""Skip re-inserting entities whose content has not changed since their last row.
+
+Every ingest run re-reads its lookback window, so unchanged Jira issues, TestRail
+runs and Bugsnag errors used to get a fresh row each time (insertId dedup only
+covers a few minutes). Each record now carries `content_hash`: a sha256 over its
+JSON with sorted keys, ignoring per-run fields (`_ingested_at`, `payload_hash`,
+`content_hash`). At the start of a run `load_cache` reads the newest
+`content_hash` per key from the raw table once. `HashCache.seen` then drops
+records whose hash matches, and also repeats of the same record within a run.
+
+The newest row per key therefore always reflects the current content, which is
+all the `*_latest` views and `*_current` tables look at.
+
+Env vars:
+- CONTENT_HASH_SKIP (default true): "false" writes every record again.
+- CONTENT_HASH_CACHE_DAYS (default 90): only rows ingested this recently are
+  preloaded. Older entities are written once more and cached from then on.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+HASH_COLUMN = "content_hash"
+_VOLATILE = frozenset({"_ingested_at", "payload_hash", HASH_COLUMN})
+
+
+def skip_enabled() -> bool:
+    raw = (os.environ.get("CONTENT_HASH_SKIP") or "true").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _cache_days() -> int:
+    try:
+        return max(0, int(os.environ.get("CONTENT_HASH_CACHE_DAYS", "90")))
+    except ValueError:
+        return 90
+
+
+def record_hash(record: Dict[str, Any]) -> str:
+    """Stable hash of a record's content, independent of key order and per-run fields."""
+    content = {k: v for k, v in record.items() if k not in _VOLATILE}
+    text = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _table_fqn(table_id: Any) -> str:
+    if isinstance(table_id, str):
+        return table_id
+    return f"{table_id.project}.{table_id.dataset_id}.{table_id.table_id}"
+
+
+class HashCache:
+    """Newest known `content_hash` per entity key for one raw table."""
+
+    def __init__(self, key_fields: Sequence[str], hashes: Optional[Dict[Tuple[str, ...], str]] = None, *, enabled: bool = True) -> None:
+        self.key_fields = tuple(key_fields)
+        self.hashes: Dict[Tuple[str, ...], str] = dict(hashes or {})
+        self.enabled = enabled
+        self.skipped = 0
+
+    def _key(self, record: Dict[str, Any]) -> Optional[Tuple[str, ...]]:
+        values = [record.get(f) for f in self.key_fields]
+        if any(v is None for v in values):
+            return None
+        return tuple(str(v) for v in values)
+
+    def seen(self, record: Dict[str, Any]) -> bool:
+        """Stamp `content_hash` on the record; True when it is unchanged and can be skipped."""
+        digest = record_hash(record)
+        record[HASH_COLUMN] = digest
+        if not self.enabled:
+            return False
+        key = self._key(record)
+        if key is None:
+            return False
+        if self.hashes.get(key) == digest:
+            self.skipped += 1
+            return True
+        self.hashes[key] = digest
+        return False
+
+    def changed(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [r for r in records if not self.seen(r)]
+
+
+def ensure_column(client: Any, table_id: Any) -> None:
+    """Add `content_hash STRING` to a raw table created before this column existed."""
+    from google.cloud import bigquery
+
+    table = client.get_table(_table_fqn(table_id))
+    if all(f.name != HASH_COLUMN for f in table.schema):
+        table.schema = list(table.schema) + [bigquery.SchemaField(HASH_COLUMN, "STRING")]
+        client.update_table(table, ["schema"])
+        LOGGER.info("CONTENT_HASH_COLUMN_ADDED table=%s", _table_fqn(table_id))
+
+
+def load_cache(client: Any, table_id: Any, key_fields: Sequence[str]) -> HashCache:
+    """Preload the newest `content_hash` per key from `table_id` (one query per run).
+
+    A failed preload degrades to an empty cache: the run writes everything, as before.
+    """
+    if not skip_enabled():
+        return HashCache(key_fields, enabled=False)
+    fqn = _table_fqn(table_id)
+    keys = ", ".join(f"CAST({k} AS STRING) AS {k}" for k in key_fields)
+    group = ", ".join(str(i + 1) for i in range(len(key_fields)))
+    days = _cache_days()
+    window = f"\n        AND _ingested_at >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL {days} DAY)" if days else ""
+    sql = f"""
+      SELECT {keys}, ARRAY_AGG({HASH_COLUMN} ORDER BY _ingested_at DESC LIMIT 1)[OFFSET(0)] AS {HASH_COLUMN}
+      FROM `{fqn}`
+      WHERE {HASH_COLUMN} IS NOT NULL{window}
+      GROUP BY {group}
+    """
+    try:
+        rows = list(client.query(sql).result())
+    except Exception as exc:  # noqa: BLE001 - skipping is an optimisation, never a reason to fail
+        LOGGER.warning("CONTENT_HASH_PRELOAD_FAILED table=%s error=%s", fqn, exc)
+        return HashCache(key_fields)
+    hashes = {tuple(str(row[k]) for k in key_fields): row[HASH_COLUMN] for row in rows}
+    LOGGER.info("CONTENT_HASH_PRELOADED table=%s keys=%s", fqn, len(hashes))
+    return HashCache(key_fields, hashes)
@@ -4,22 +4,25 @@ import os
 import time
 import random
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 from email.utils import parsedate_to_datetime
 from typing import Any, Dict, List, Optional
 
-import google.auth
 import requests
 from flask import jsonify
-from google.cloud import bigquery, secretmanager
 
-_, PROJECT_ID = google.auth.default()
+import bq_current
+import bq_sink
+import content_hash
+import http_session
+import instrumentation
+import payload_store
+import profiling
+import rate_limit
+import secret_cache
 
 DATASET_ID = os.environ.get("BQ_DATASET", "qa_metrics")
 TABLE_NAME = os.environ.get("BQ_TABLE", "bugsnag_errors")
-TABLE_ID = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_NAME}"
-
-bq = bigquery.Client(project=PROJECT_ID)
-sm = secretmanager.SecretManagerServiceClient()
 
 HTTP_TIMEOUT = int(os.environ.get("HTTP_TIMEOUT_SECONDS", "900"))
 MAX_RETRIES = int(os.environ.get("MAX_RETRIES", "6"))
@@ -41,12 +44,54 @@ MAX_PAGE_SIZE_OVERRIDE = int(os.environ.get("BUGSNAG_MAX_PAGE_SIZE_OVERRIDE", "1
 
 logger = logging.getLogger(__name__)
 
-def get_secret(name: str) -> str:
-    secret_name = f"projects/{PROJECT_ID}/secrets/{name}/versions/latest"
-    response = sm.access_secret_version(request={"name": secret_name})
+# GCP clients, the project and secrets are resolved on first use, so importing
+# the module and answering healthz never touch credentials or the metadata server.
+@lru_cache(maxsize=1)
+def _project_id() -> str:
+    import google.auth
+
+    return google.auth.default()[1]
+
+@lru_cache(maxsize=1)
+def _bq():
+    import bq_backend
+
+    return bq_backend.get_client(_project_id())
+
+@lru_cache(maxsize=1)
+def _sm():
+    from google.cloud import secretmanager
+
+    return secretmanager.SecretManagerServiceClient()
+
+def _table_id() -> str:
+    return f"{_project_id()}.{DATASET_ID}.{TABLE_NAME}"
+
+@lru_cache(maxsize=1)
+def _payloads() -> payload_store.PayloadStore:
+    # PAYLOAD_STORE=table|blob moves `payload` out of the rows (see payload_store.py).
+    return payload_store.PayloadStore(_bq(), "bugsnag_errors")
+
+def _access_secret(name: str) -> str:
+    secret_name = f"projects/{_project_id()}/secrets/{name}/versions/latest"
+    response = _sm().access_secret_version(request={"name": secret_name})
     return response.payload.data.decode("utf-8").strip()
 
+def _secret_clients() -> None:
+    # Build the lru_cache'd project id and client before prefetch starts its threads.
+    _project_id()
+    _sm()
+
+# Everything a run reads, prefetched in parallel when the run starts.
+SECRET_NAMES = ("BUGSNAG_BASE_URL", "BUGSNAG_TOKEN", "BUGSNAG_PROJECT_IDS")
+_SECRETS = secret_cache.SecretCache(_access_secret, prepare=_secret_clients)
+
+def get_secret(name: str) -> str:
+    return _SECRETS.get(name)
+
 def ensure_table():
+    from google.cloud import bigquery
+
     schema = [
         bigquery.SchemaField("project_id","STRING"),
         bigquery.SchemaField("error_id","STRING"),
@@ -61,21 +106,23 @@ def ensure_table():
         bigquery.SchemaField("url","STRING"),
         bigquery.SchemaField("_ingested_at","TIMESTAMP"),
         bigquery.SchemaField("payload","STRING"),
+        bigquery.SchemaField("content_hash","STRING"),
     ]
 
-    table = bigquery.Table(TABLE_ID, schema=schema)
+    table = bigquery.Table(_table_id(), schema=schema)
     table.time_partitioning = bigquery.TimePartitioning(
         type_=bigquery.TimePartitioningType.DAY, field="last_seen"
     )
     table.clustering_fields = ["project_id", "error_id", "status", "severity"]
-    bq.create_table(table, exists_ok=True)
+    _bq().create_table(table, exists_ok=True)
+    content_hash.ensure_column(_bq(), _table_id())
 
 def get_last_seen() -> datetime:
     sql = f"""
       SELECT COALESCE(MAX(last_seen), TIMESTAMP('1970-01-01')) AS last_seen_max
-      FROM `{TABLE_ID}`
+      FROM `{_table_id()}`
     """
-    rows = list(bq.query(sql))
+    rows = list(_bq().query(sql))
     last = rows[0]["last_seen_max"]
     if last is None or getattr(last, "year", 1970) == 1970:
         last = datetime.now(timezone.utc) - timedelta(days=LOOKBACK_DAYS)
@@ -110,14 +157,22 @@ def _parse_retry_after(header_value: Optional[str]) -> Optional[float]:
     return max(0.0, (retry_at - now).total_seconds())
 
 
-def request_with_retries(method: str, url: str, *, headers: Dict[str, str], params: Optional[Dict[str, Any]] = None) -> requests.Response:
+def request_with_retries(
+    method: str,
+    url: str,
+    *,
+    headers: Dict[str, str],
+    params: Optional[Dict[str, Any]] = None,
+    limiter: Optional[rate_limit.AdaptiveRateLimiter] = None,
+) -> requests.Response:
+    limiter = limiter or rate_limit.get_limiter("bugsnag")
     last_exc: Optional[Exception] = None
     attempt_started = time.monotonic()
     for attempt in range(MAX_RETRIES):
         if (time.monotonic() - attempt_started) >= MAX_RETRY_TOTAL_SECONDS:
             break
         try:
-            r = requests.request(method, url, headers=headers, params=params, timeout=HTTP_TIMEOUT)
+            r = http_session.request(method, url, headers=headers, params=params, timeout=HTTP_TIMEOUT, limiter=limiter)
 
             if r.status_code in (429, 500, 502, 503, 504):
                 retry_after_seconds = _parse_retry_after(r.headers.get("Retry-After"))
@@ -149,9 +204,12 @@ def request_with_retries(method: str, url: str, *, headers: Dict[str, str], para
 
     raise RuntimeError(f"HTTP failed after retries/time budget ({MAX_RETRY_TOTAL_SECONDS}s): {last_exc}")
 
-def insert_rows(rows: List[Dict[str, Any]]) -> None:
+def insert_rows(rows: List[Dict[str, Any]], bulk: Optional[bq_sink.BulkLoader] = None) -> None:
     if not rows:
         return
+    _payloads().offload(_table_id(), rows, "payload")
+    if bulk is not None and bulk.route(_table_id(), rows):
+        return
     row_ids = []
     for r in rows:
         if r.get("error_id") and r.get("last_seen"):
@@ -159,11 +217,39 @@ def insert_rows(rows: List[Dict[str, Any]]) -> None:
         else:
             row_ids.append(None)
 
-    errors = bq.insert_rows_json(TABLE_ID, rows, row_ids=row_ids)
+    errors = bq_sink.write_rows(_bq(), _table_id(), rows, row_ids=row_ids)
     if errors:
         raise RuntimeError(errors)
 
-def fetch_and_insert_bugsnag_errors(since_ts: datetime, started_monotonic: float, *, page_size: int, max_projects: int) -> int:
+def fetch_and_insert_bugsnag_errors(
+    since_ts: datetime,
+    started_monotonic: float,
+    *,
+    page_size: int,
+    max_projects: int,
+    hashes: content_hash.HashCache,
+) -> int:
+    # Past BQ_BULK_THRESHOLD_ROWS the remaining chunks are spooled and appended with one load job.
+    bulk = bq_sink.BulkLoader(lambda table, path: bq_sink.load_ndjson_file(_bq(), table, path))
+    try:
+        total_inserted = _fetch_and_insert(
+            since_ts, started_monotonic, page_size=page_size, max_projects=max_projects, bulk=bulk, hashes=hashes
+        )
+        instrumentation.phase("bq_write")
+        bulk.finish()
+        return total_inserted
+    finally:
+        bulk.abort()
+
+def _fetch_and_insert(
+    since_ts: datetime,
+    started_monotonic: float,
+    *,
+    page_size: int,
+    max_projects: int,
+    bulk: bq_sink.BulkLoader,
+    hashes: content_hash.HashCache,
+) -> int:
     base_url = get_secret("BUGSNAG_BASE_URL").rstrip("/")
     api_token = get_secret("BUGSNAG_TOKEN")
     project_ids = [p.strip() for p in get_secret("BUGSNAG_PROJECT_IDS").split(",") if p.strip()]
@@ -180,6 +266,7 @@ def fetch_and_insert_bugsnag_errors(since_ts: datetime, started_monotonic: float
     # opción B (más exacta): ISO UTC desde since_ts
     since_filter = since_ts.replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
+    instrumentation.phase("api_fetch")
     for project_id in project_ids:
         page_number = 1
         # IMPORTANTE: paginar con Link header (next), no con page++
@@ -195,7 +282,7 @@ def fetch_and_insert_bugsnag_errors(since_ts: datetime, started_monotonic: float
             if (time.monotonic() - started_monotonic) > (MAX_RUNTIME_SECONDS - 5):
                 # flush lo que tengamos y cortar
                 if buffer:
-                    insert_rows(buffer)
+                    insert_rows(buffer, bulk)
                     total_inserted += len(buffer)
                 return total_inserted
 
@@ -219,15 +306,16 @@ def fetch_and_insert_bugsnag_errors(since_ts: datetime, started_monotonic: float
             if not data:
                 break
 
+            instrumentation.incr("records_parsed", len(data))
             for e in data:
                 in_flight = total_inserted + len(buffer)
                 if in_flight >= MAX_ERRORS_PER_RUN:
                     if buffer:
-                        insert_rows(buffer)
+                        insert_rows(buffer, bulk)
                         total_inserted += len(buffer)
                     return total_inserted
 
-                buffer.append({
+                row = {
                     "project_id": str(project_id),
                     "error_id": e.get("id"),
                     "error_class": e.get("error_class"),
@@ -241,10 +329,14 @@ def fetch_and_insert_bugsnag_errors(since_ts: datetime, started_monotonic: float
                     "url": e.get("events_url") or e.get("url"),
                     "_ingested_at": ingested_at,
                     "payload": json.dumps(e, separators=(",", ":")),
-                })
+                }
+                # Errors unchanged since their newest stored row are not re-inserted.
+                if hashes.seen(row):
+                    continue
+                buffer.append(row)
 
                 if len(buffer) >= BQ_INSERT_CHUNK_SIZE:
-                    insert_rows(buffer)
+                    insert_rows(buffer, bulk)
                     total_inserted += len(buffer)
                     buffer = []
 
@@ -258,16 +350,20 @@ def fetch_and_insert_bugsnag_errors(since_ts: datetime, started_monotonic: float
             page_number += 1
 
     if buffer:
-        insert_rows(buffer)
+        insert_rows(buffer, bulk)
         total_inserted += len(buffer)
 
     return total_inserted
 
+@profiling.profiled("ingest-bugsnag")
 def hello_http(request):
     if request.path.endswith("/healthz") or request.method == "GET":
         return (jsonify({"status": "OK", "service": "ingest-bugsnag", "ready": True}), 200)
 
     started = time.monotonic()
+    instrumentation.start_run("ingest-bugsnag")
+    instrumentation.phase("config")
+    _SECRETS.prefetch(SECRET_NAMES)
     now = datetime.now(timezone.utc)
     days_applied: Optional[int] = None
     page_size_applied: int = PER_PAGE
@@ -307,6 +403,7 @@ def hello_http(request):
             max_projects_applied = min(max_projects_applied, MAX_PROJECTS_PER_RUN)
 
         ensure_table()
+        hashes = content_hash.load_cache(_bq(), _table_id(), ["project_id", "error_id"])
         last_seen_ts = get_last_seen()
         since_ts = last_seen_ts
         if days_applied is not None:
@@ -318,15 +415,21 @@ def hello_http(request):
             started_monotonic=started,
             page_size=page_size_applied,
             max_projects=max_projects_applied,
+            hashes=hashes,
         )
+        instrumentation.phase("bq_merge")
+        current_table = bq_current.merge_run(_bq(), _table_id()) if bq_current.merge_enabled(payload) else None
         return (jsonify({
             "status": "OK",
             "rows_inserted": inserted,
+            "skipped_unchanged": hashes.skipped,
+            "current_table": current_table,
             "days_applied": days_applied,
             "page_size_applied": page_size_applied,
             "max_projects_applied": max_projects_applied,
             "effective_since": since_ts.isoformat(),
             "runtime_seconds": round(time.monotonic() - started, 2),
+            "instrumentation": instrumentation.finish(status="ok"),
         }), 200)
     except ValueError as e:
         return (jsonify({
@@ -334,6 +437,7 @@ def hello_http(request):
             "message": str(e),
             "days_applied": days_applied,
             "runtime_seconds": round(time.monotonic() - started, 2),
+            "instrumentation": instrumentation.finish(status="error"),
         }), 400)
     except Exception as e:
         return (jsonify({
@@ -341,4 +445,5 @@ def hello_http(request):
             "message": str(e),
             "days_applied": days_applied,
             "runtime_seconds": round(time.monotonic() - started, 2),
+            "instrumentation": instrumentation.finish(status="error"),
         }), 500)
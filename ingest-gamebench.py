@@ -3,22 +3,30 @@ import os
 import time
 import random
 import re
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
-import google.auth
 import requests
 from flask import jsonify
-from google.cloud import bigquery, secretmanager
+
+import bq_current
+import bq_sink
+import http_session
+import instrumentation
+import payload_store
+import profiling
+import rate_limit
+import secret_cache
 
 # ----------------- GCP / BigQuery -----------------
-_, PROJECT_ID = google.auth.default()
 DATASET_ID = os.environ.get("BQ_DATASET", "qa_metrics")
-TABLE_ID = f"{PROJECT_ID}.{DATASET_ID}.gamebench_sessions_v1"
+TABLE_NAME = "gamebench_sessions_v1"
 
-bq = bigquery.Client(project=PROJECT_ID)
-sm = secretmanager.SecretManagerServiceClient()
+# PAYLOAD_STORE=table|blob moves `raw_json` out of the rows (see payload_store.py);
+# only inline payloads are truncated to fit the row.
+RAW_JSON_MAX_CHARS = None if payload_store.store_mode() != "inline" else 500000
 
 BASE_URL = os.environ.get("GAMEBENCH_BASE_URL", "https://web.gamebench.net")
 DEFAULT_COMPANY_ID = os.environ.get("GAMEBENCH_COMPANY_ID", "AWGaWNjXBxsUazsJuoUp")
@@ -38,20 +46,68 @@ BASE_BACKOFF = float(os.environ.get("BASE_BACKOFF_SECONDS", "1.0"))
 MAX_BACKOFF = float(os.environ.get("MAX_BACKOFF_SECONDS", "30.0"))
 PAGE_SIZE = int(os.environ.get("GAMEBENCH_PAGE_SIZE", "50"))
 MAX_SESSIONS_PER_RUN = int(os.environ.get("MAX_SESSIONS_PER_RUN", "200"))
+# Per-session detail calls run on a bounded pool; http_session caps per-host
+# concurrency and shares 429 Retry-After cooldowns across the workers.
+FETCH_WORKERS = max(1, int(os.environ.get("GAMEBENCH_FETCH_WORKERS", "4")))
 
-def _secret(name: str) -> str:
-    sname = f"projects/{PROJECT_ID}/secrets/{name}/versions/latest"
-    return sm.access_secret_version(request={"name": sname}).payload.data.decode("utf-8").strip()
+# GCP clients, the project and secrets are resolved on first use, so importing
+# the module and answering healthz never touch credentials or the metadata server.
+@lru_cache(maxsize=1)
+def _project_id() -> str:
+    import google.auth
+
+    return google.auth.default()[1]
 
 @lru_cache(maxsize=1)
+def _bq():
+    import bq_backend
+
+    return bq_backend.get_client(_project_id())
+
+@lru_cache(maxsize=1)
+def _sm():
+    from google.cloud import secretmanager
+
+    return secretmanager.SecretManagerServiceClient()
+
+def _table_id() -> str:
+    return f"{_project_id()}.{DATASET_ID}.{TABLE_NAME}"
+
+@lru_cache(maxsize=1)
+def _payloads() -> payload_store.PayloadStore:
+    return payload_store.PayloadStore(_bq(), "gamebench_sessions")
+
+def _access_secret(name: str) -> str:
+    sname = f"projects/{_project_id()}/secrets/{name}/versions/latest"
+    return _sm().access_secret_version(request={"name": sname}).payload.data.decode("utf-8").strip()
+
+def _secret_clients() -> None:
+    # Build the lru_cache'd project id and client before prefetch starts its threads.
+    _project_id()
+    _sm()
+
+SECRET_NAMES = ("GAMEBENCH_TOKEN",)
+_SECRETS = secret_cache.SecretCache(_access_secret, prepare=_secret_clients)
+
+def _secret(name: str) -> str:
+    return _SECRETS.get(name)
+
 def _token() -> str:
     return _secret("GAMEBENCH_TOKEN")
 
-def _req(method: str, url: str, *, json_body: Optional[Dict[str, Any]] = None, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+def _req(
+    method: str,
+    url: str,
+    *,
+    json_body: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    limiter: Optional[rate_limit.AdaptiveRateLimiter] = None,
+) -> requests.Response:
+    limiter = limiter or rate_limit.get_limiter("gamebench")
     last_exc: Optional[Exception] = None
     for attempt in range(MAX_RETRIES):
         try:
-            r = requests.request(
+            r = http_session.request(
                 method,
                 url,
                 headers={
@@ -62,6 +118,7 @@ def _req(method: str, url: str, *, json_body: Optional[Dict[str, Any]] = None, p
                 params=params,
                 json=json_body,
                 timeout=HTTP_TIMEOUT,
+                limiter=limiter,
             )
             if r.status_code in (429, 500, 502, 503, 504):
                 backoff = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt))
@@ -194,12 +251,22 @@ def get_session(session_id: str) -> Dict[str, Any]:
     url = f"{BASE_URL.rstrip('/')}/v1/sessions/{session_id}"
     return _req("GET", url).json()
 
+def _map_ordered(fn: Callable[[Any], Any], items: List[Any], *, max_workers: int) -> Iterator[Any]:
+    """Yield fn(item) for each item in input order, running up to max_workers calls at once."""
+    if max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gamebench-fetch") as pool:
+        yield from pool.map(fn, items)
+
 def upsert_rows(rows: List[Dict[str, Any]]) -> int:
     if not rows:
         return 0
     # best-effort de-dupe using insertId=session_id
     row_ids = [r.get("session_id") for r in rows]
-    errors = bq.insert_rows_json(TABLE_ID, rows, row_ids=row_ids)
+    _payloads().offload(_table_id(), rows, "raw_json")
+    errors = bq_sink.write_rows(_bq(), _table_id(), rows, row_ids=row_ids)
     if errors:
         raise RuntimeError(str(errors)[:1200])
     return len(rows)
@@ -282,6 +349,10 @@ def ingest(days: int, platform: Optional[str], company_id: str, collection_id: s
 
         rows_to_insert: List[Dict[str, Any]] = []
 
+        # Sessions come newest first: everything up to the first one older than
+        # `since` is fetched concurrently, and the run stops after this page.
+        page_sessions: List[Any] = []
+        reached_since = False
         for s in sessions:
             sid = _get(s, "id") or _get(s, "sessionId") or _get(s, "_id")
             if not sid:
@@ -289,17 +360,13 @@ def ingest(days: int, platform: Optional[str], company_id: str, collection_id: s
 
             dtp = _to_dt(_get(s, "timePushed") or _get(s, "time_pushed"))
             if dtp and dtp < since:
-                if rows_to_insert:
-                    inserted += upsert_rows(rows_to_insert)
-                return {
-                    "pages": pages,
-                    "sessions_fetched": fetched,
-                    "rows_inserted": inserted,
-                    "rows_skipped_platform": rows_skipped_platform,
-                }
+                reached_since = True
+                break
+            page_sessions.append((s, str(sid)))
 
-            # Fetch details for metrics
-            detail = get_session(str(sid))
+        details = _map_ordered(get_session, [sid for _, sid in page_sessions], max_workers=FETCH_WORKERS)
+
+        for (s, sid), detail in zip(page_sessions, details):
             fetched += 1
 
             app_pkg = _s(_get(detail, "appPackage") or _get(detail, "app_package") or _get(detail, "app") or _get(s, "app"))
@@ -341,11 +408,12 @@ def ingest(days: int, platform: Optional[str], company_id: str, collection_id: s
                 "download_mb": _f(_get(detail, "downloadMb") or _get(detail, "download_mb")),
                 "upload_mb": _f(_get(detail, "uploadMb") or _get(detail, "upload_mb")),
                 "session_url": _get(detail, "url") or _session_dashboard_url(str(sid), company_id, collection_id),
-                "raw_json": json.dumps(detail, ensure_ascii=False)[:500000],
+                "raw_json": json.dumps(detail, ensure_ascii=False)[:RAW_JSON_MAX_CHARS],
                 "_ingested_at": ingested_at,
             }
 
             rows_to_insert.append(row)
+            instrumentation.incr("records_parsed")
 
             if len(rows_to_insert) >= 100:
                 inserted += upsert_rows(rows_to_insert)
@@ -365,6 +433,14 @@ def ingest(days: int, platform: Optional[str], company_id: str, collection_id: s
         if rows_to_insert:
             inserted += upsert_rows(rows_to_insert)
 
+        if reached_since:
+            return {
+                "pages": pages,
+                "sessions_fetched": fetched,
+                "rows_inserted": inserted,
+                "rows_skipped_platform": rows_skipped_platform,
+            }
+
         if inserted >= MAX_SESSIONS_PER_RUN:
             return {
                 "pages": pages,
@@ -392,6 +468,9 @@ def healthz(_request):
     }), 200
 
 def ingest_gamebench(request):
+    instrumentation.start_run("ingest-gamebench")
+    instrumentation.phase("config")
+    _SECRETS.prefetch(SECRET_NAMES)
     body = request.get_json(silent=True) or {}
     days = _sanitize_days(body.get("days", 7))
     platform = body.get("platform")  # android/ios or None
@@ -402,14 +481,19 @@ def ingest_gamebench(request):
         apps = _default_apps_for_platform(platform)
 
     try:
+        instrumentation.phase("api_fetch")
         result = ingest(days=days, platform=platform, company_id=company_id, collection_id=collection_id, app_packages=apps)
         result["platform"] = _normalize_platform_target(platform) or "all"
         result["app_packages"] = apps
-        return jsonify({"status": "OK", **result}), 200
+        if bq_current.merge_enabled(body):
+            instrumentation.phase("bq_merge")
+            result["current_table"] = bq_current.merge_run(_bq(), _table_id())
+        return jsonify({"status": "OK", **result, "instrumentation": instrumentation.finish(status="ok")}), 200
     except Exception as e:
-        return jsonify({"status": "ERROR", "error": str(e)}), 500
+        return jsonify({"status": "ERROR", "error": str(e), "instrumentation": instrumentation.finish(status="error")}), 500
 
 # Default Functions Framework target
+@profiling.profiled("ingest-gamebench")
 def hello_http(request):
     if request.path.endswith("/healthz") or request.method == "GET":
         return healthz(request)
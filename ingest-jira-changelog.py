@@ -4,12 +4,23 @@ Key improvements:
 - Processes most recently updated issues first (ORDER BY updated DESC) so partial runs still capture newest data.
 - Supports incremental ingestion by looking at the latest `history_created` in BigQuery and using an overlap window.
 - Uses Jira changelog bulk fetch endpoint to ingest status transitions for many issues per call.
+- Dedups against history ids preloaded once per run into an in-process index (no per-page BigQuery query).
+- Skips the bulkfetch for issues whose Jira `updated` has not moved since their last successful ingest.
+- Also writes flattened status transitions to `jira_status_changes` (created by bigquery/setup.sql,
+  partitioned by `changed_at`, clustered by `issue_key`) so KPI views stop re-parsing `items_json`.
 
 Env vars:
 - JIRA_BASE_URL / JIRA_EMAIL / JIRA_API_TOKEN
 - JIRA_PROJECT_KEYS (comma-separated)
 - LOOKBACK_DAYS (default 14)   # used if BigQuery table is empty
 - OVERLAP_DAYS (default 7)     # safety overlap for incremental pulls
+- HISTORY_INDEX_CACHE_PATH     # optional, e.g. /tmp/jira_changelog_index.bin; keeps the dedup index warm
+- HISTORY_INDEX_CACHE_MAX_DAYS (default 7)  # rebuild the cached index after it drifts this far behind `since`
+- ISSUE_STATE_TABLE_ID (default jira_changelog_issue_state)  # per-issue last_seen_updated
+- ISSUE_STATE_CACHE_PATH       # optional, e.g. /tmp/jira_changelog_issue_state.json
+- STATUS_CHANGES_TABLE_ID (default jira_status_changes)  # status transitions, partitioned by changed_at
+- JIRA_ROLLUPS_REFRESH (default true)  # refresh `jira_active_bug_count_daily` after each run
+- PAYLOAD_STORE (default inline)  # `table`/`blob` moves raw_json out of the rows (payload_store.py)
 
 BQ:
 - BQ_DATASET_ID (default qa_metrics)
@@ -19,19 +30,33 @@ HTTP body overrides:
 - lookback_days
 - overlap_days
 - project_keys
+- ignore_issue_state (true re-fetches every issue in the window)
 """
 
+import hashlib
 import json
 import os
 import time
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional, Set, Tuple
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import functions_framework
 import requests
 from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 
+import bq_backend
+import bq_sink
+import http_session
+import instrumentation
+import jira_rollups
+import payload_store
+import profiling
+import rate_limit
+import time_utils
+
 
 DEFAULT_LOOKBACK_DAYS = int(os.environ.get("LOOKBACK_DAYS", "14"))
 DEFAULT_OVERLAP_DAYS = int(os.environ.get("OVERLAP_DAYS", "7"))
@@ -44,6 +69,19 @@ JIRA_EMAIL = os.environ.get("JIRA_EMAIL")
 JIRA_API_TOKEN = os.environ.get("JIRA_API_TOKEN")
 JIRA_PROJECT_KEYS = os.environ.get("JIRA_PROJECT_KEYS", "").strip()
 
+# Optional local file keeping the history-id dedup index between warm invocations.
+HISTORY_INDEX_CACHE_PATH = os.environ.get("HISTORY_INDEX_CACHE_PATH", "").strip()
+HISTORY_INDEX_CACHE_MAX_DAYS = int(os.environ.get("HISTORY_INDEX_CACHE_MAX_DAYS", "7"))
+HISTORY_INDEX_SKEW = timedelta(hours=1)
+
+# Per-issue `updated` stamp of the last successful changelog ingest (skips unchanged issues).
+ISSUE_STATE_TABLE_ID = os.environ.get("ISSUE_STATE_TABLE_ID", "jira_changelog_issue_state")
+ISSUE_STATE_CACHE_PATH = os.environ.get("ISSUE_STATE_CACHE_PATH", "").strip()
+ISSUE_STATE_MERGE_CHUNK = 5000
+
+# Flattened status transitions (one row per status item), read by the KPI views.
+STATUS_CHANGES_TABLE_ID = os.environ.get("STATUS_CHANGES_TABLE_ID", "jira_status_changes")
+
 JIRA_CALLS = 0
 JIRA_CHANGELOG_BULK_ISSUE_BATCH = 1000
 JIRA_CHANGELOG_BULK_PAGE_SIZE = 1000
@@ -60,6 +98,7 @@ def _error_response(error_type: str, code: str, message: str, status_code: int,
     }
     if details is not None:
         payload["error"]["details"] = details
+    payload["instrumentation"] = instrumentation.finish(status="error")
     return (json.dumps(payload), status_code, {"Content-Type": "application/json"})
 
 
@@ -82,16 +121,23 @@ def _jira_headers() -> Dict[str, str]:
     return {"Accept": "application/json"}
 
 
+@lru_cache(maxsize=1)
 def _jira_auth() -> requests.auth.HTTPBasicAuth:
     if not (JIRA_EMAIL and JIRA_API_TOKEN):
         raise RuntimeError("Missing JIRA_EMAIL or JIRA_API_TOKEN env vars")
     return requests.auth.HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN)
 
 
-def _jira_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def _jira_get(
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    limiter: Optional[rate_limit.AdaptiveRateLimiter] = None,
+) -> Dict[str, Any]:
     if not JIRA_BASE_URL:
         raise RuntimeError("Missing JIRA_BASE_URL env var")
     url = JIRA_BASE_URL.rstrip("/") + path
+    # 429 waits: the shared limiter's pause (Retry-After), never below exponential backoff.
+    limiter = limiter or rate_limit.get_limiter("jira")
     max_attempts = 5
     attempt = 0
 
@@ -100,7 +146,9 @@ def _jira_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, A
     while True:
         attempt += 1
         JIRA_CALLS += 1
-        r = requests.get(url, headers=_jira_headers(), auth=_jira_auth(), params=params, timeout=60)
+        r = http_session.request(
+            "GET", url, headers=_jira_headers(), auth=_jira_auth(), params=params, timeout=60, limiter=limiter
+        )
         if r.status_code != 429:
             r.raise_for_status()
             return r.json()
@@ -108,19 +156,21 @@ def _jira_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, A
         if attempt >= max_attempts:
             r.raise_for_status()
 
-        retry_after = r.headers.get("Retry-After")
-        if retry_after and retry_after.isdigit():
-            sleep_s = max(1, int(retry_after))
-        else:
-            sleep_s = min(16, 2 ** (attempt - 1))
-        print(f"Jira rate-limited on {path}; sleeping {sleep_s}s before retry {attempt + 1}/{max_attempts}")
+        sleep_s = rate_limit.retry_delay(limiter, attempt, base_s=1.0, cap_s=16.0)
+        print(f"Jira rate-limited on {path}; sleeping {sleep_s:.1f}s before retry {attempt + 1}/{max_attempts}")
         time.sleep(sleep_s)
 
 
-def _jira_post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+def _jira_post(
+    path: str,
+    payload: Dict[str, Any],
+    limiter: Optional[rate_limit.AdaptiveRateLimiter] = None,
+) -> Dict[str, Any]:
     if not JIRA_BASE_URL:
         raise RuntimeError("Missing JIRA_BASE_URL env var")
     url = JIRA_BASE_URL.rstrip("/") + path
+    # 429 waits: the shared limiter's pause (Retry-After), never below exponential backoff.
+    limiter = limiter or rate_limit.get_limiter("jira")
     max_attempts = 5
     attempt = 0
 
@@ -129,7 +179,9 @@ def _jira_post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
     while True:
         attempt += 1
         JIRA_CALLS += 1
-        r = requests.post(url, headers=_jira_headers(), auth=_jira_auth(), json=payload, timeout=60)
+        r = http_session.request(
+            "POST", url, headers=_jira_headers(), auth=_jira_auth(), json=payload, timeout=60, limiter=limiter
+        )
         if r.status_code != 429:
             r.raise_for_status()
             return r.json()
@@ -137,12 +189,8 @@ def _jira_post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         if attempt >= max_attempts:
             r.raise_for_status()
 
-        retry_after = r.headers.get("Retry-After")
-        if retry_after and retry_after.isdigit():
-            sleep_s = max(1, int(retry_after))
-        else:
-            sleep_s = min(16, 2 ** (attempt - 1))
-        print(f"Jira rate-limited on {path}; sleeping {sleep_s}s before retry {attempt + 1}/{max_attempts}")
+        sleep_s = rate_limit.retry_delay(limiter, attempt, base_s=1.0, cap_s=16.0)
+        print(f"Jira rate-limited on {path}; sleeping {sleep_s:.1f}s before retry {attempt + 1}/{max_attempts}")
         time.sleep(sleep_s)
 
 
@@ -155,6 +203,7 @@ def _ensure_table(bq: bigquery.Client, table_ref: bigquery.TableReference) -> No
         bigquery.SchemaField("author", "STRING"),
         bigquery.SchemaField("items_json", "STRING"),
         bigquery.SchemaField("raw_json", "STRING"),
+        bigquery.SchemaField("payload_hash", "STRING"),
         bigquery.SchemaField("_ingested_at", "TIMESTAMP"),
     ]
 
@@ -173,17 +222,8 @@ def _ensure_table(bq: bigquery.Client, table_ref: bigquery.TableReference) -> No
         print(f"Created table {table_ref}")
 
 
-def _parse_jira_ts(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    try:
-        if value.endswith("+0000"):
-            value = value[:-5] + "+00:00"
-        if value.endswith("Z"):
-            return datetime.fromisoformat(value.replace("Z", "+00:00"))
-        return datetime.fromisoformat(value)
-    except Exception:
-        return None
+# Shared fast-path parser for Jira's `2025-02-01T12:34:56.789+0000` timestamps.
+_parse_jira_ts = time_utils.parse_jira_ts
 
 
 def _get_latest_history_ts(bq: bigquery.Client, table_ref: bigquery.TableReference) -> Optional[datetime]:
@@ -205,41 +245,287 @@ def _get_latest_history_ts(bq: bigquery.Client, table_ref: bigquery.TableReferen
         return None
 
 
-def _get_existing_history_ids_batch(
-    bq: bigquery.Client,
-    table_ref: bigquery.TableReference,
-    page_histories: Dict[str, List[str]],
-) -> Dict[str, Set[str]]:
-    """Fetch existing history ids for issues in one page to keep ingestion idempotent across reruns."""
-    issue_keys = [k for k, ids in page_histories.items() if ids]
-    if not issue_keys:
-        return {}
+class _HistoryIdIndex:
+    """In-process set of (issue_key, history_id) already stored in BigQuery.
+
+    Entries are 64-bit blake2b hashes of ``issue_key:history_id`` kept in a Python set,
+    so membership is O(1) and a run over ~1M histories stays well under 100 MB.
+    A false positive needs a 64-bit collision, negligible at these sizes.
+    """
+
+    def __init__(self, hashes: Iterable[int] = ()) -> None:
+        self._hashes: Set[int] = set(hashes)
+
+    @staticmethod
+    def key(issue_key: str, history_id: str) -> int:
+        digest = hashlib.blake2b(f"{issue_key}:{history_id}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def add(self, issue_key: str, history_id: str) -> None:
+        self._hashes.add(self.key(issue_key, history_id))
+
+    def __contains__(self, item: Tuple[str, str]) -> bool:
+        return self.key(*item) in self._hashes
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def to_bytes(self) -> bytes:
+        return array("Q", sorted(self._hashes)).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "_HistoryIdIndex":
+        hashes = array("Q")
+        hashes.frombytes(data)
+        return cls(hashes)
+
+
+def _table_fqn(table_ref: bigquery.TableReference) -> str:
+    return f"{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}"
 
-    all_history_ids = sorted({hid for ids in page_histories.values() for hid in ids})
-    if not all_history_ids:
-        return {}
 
+def _read_history_index_cache(path: str, table_fqn: str) -> Optional[Tuple[_HistoryIdIndex, datetime, datetime]]:
+    """Return (index, covered_since, loaded_until) from the local cache file, if usable."""
+    try:
+        with open(path, "rb") as fh:
+            header = json.loads(fh.readline().decode("utf-8"))
+            body = fh.read()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: ignoring unreadable history index cache {path}: {e}")
+        return None
+    if header.get("table") != table_fqn:
+        return None
+    covered_since = _parse_jira_ts(header.get("since"))
+    loaded_until = _parse_jira_ts(header.get("loaded_until"))
+    if covered_since is None or loaded_until is None:
+        return None
+    return _HistoryIdIndex.from_bytes(body), covered_since, loaded_until
+
+
+def _write_history_index_cache(
+    path: str,
+    table_fqn: str,
+    index: _HistoryIdIndex,
+    covered_since: datetime,
+    loaded_until: datetime,
+) -> None:
+    header = {"table": table_fqn, "since": _iso(covered_since), "loaded_until": _iso(loaded_until), "count": len(index)}
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as fh:
+            fh.write(json.dumps(header).encode("utf-8") + b"\n")
+            fh.write(index.to_bytes())
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Warning: could not write history index cache {path}: {e}")
+
+
+def _query_history_ids(
+    bq: bigquery.Client,
+    table_ref: bigquery.TableReference,
+    since: datetime,
+    ingested_from: datetime,
+    index: _HistoryIdIndex,
+) -> int:
+    """Add stored (issue_key, history_id) pairs with history_created >= since to ``index``."""
     sql = f"""
       SELECT issue_key, history_id
-      FROM `{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}`
-      WHERE issue_key IN UNNEST(@issue_keys)
-        AND history_id IN UNNEST(@history_ids)
+      FROM `{_table_fqn(table_ref)}`
+      WHERE _ingested_at >= @ingested_from
+        AND (history_created >= @since OR history_created IS NULL)
     """
     job_config = bigquery.QueryJobConfig(
         query_parameters=[
-            bigquery.ArrayQueryParameter("issue_keys", "STRING", issue_keys),
-            bigquery.ArrayQueryParameter("history_ids", "STRING", all_history_ids),
+            bigquery.ScalarQueryParameter("ingested_from", "TIMESTAMP", ingested_from),
+            bigquery.ScalarQueryParameter("since", "TIMESTAMP", since),
         ]
     )
-    rows = bq.query(sql, job_config=job_config).result()
-    existing: Dict[str, Set[str]] = {}
-    for row in rows:
+    added = 0
+    for row in bq.query(sql, job_config=job_config).result():
         issue_key = row.get("issue_key")
         history_id = row.get("history_id")
         if issue_key is None or history_id is None:
             continue
-        existing.setdefault(str(issue_key), set()).add(str(history_id))
-    return existing
+        index.add(str(issue_key), str(history_id))
+        added += 1
+    return added
+
+
+def _load_history_index(
+    bq: bigquery.Client,
+    table_ref: bigquery.TableReference,
+    since: datetime,
+) -> Tuple[_HistoryIdIndex, datetime]:
+    """Preload the dedup index once per run for every history created since ``since``.
+
+    A stored history created at/after ``since`` was ingested after it, so
+    ``_ingested_at`` prunes partitions (minus a skew margin). With
+    HISTORY_INDEX_CACHE_PATH set, a warm instance reuses the cached index and only
+    queries rows ingested after its last load. The cache is rebuilt once it covers
+    more than HISTORY_INDEX_CACHE_MAX_DAYS before ``since``.
+    Returns (index, covered_since).
+    """
+    fqn = _table_fqn(table_ref)
+    if HISTORY_INDEX_CACHE_PATH:
+        cached = _read_history_index_cache(HISTORY_INDEX_CACHE_PATH, fqn)
+        if cached:
+            index, covered_since, cached_until = cached
+            if since - timedelta(days=HISTORY_INDEX_CACHE_MAX_DAYS) <= covered_since <= since:
+                added = _query_history_ids(bq, table_ref, since, cached_until - HISTORY_INDEX_SKEW, index)
+                print(f"History index: {len(index)} ids from cache {HISTORY_INDEX_CACHE_PATH} (+{added} new)")
+                return index, covered_since
+
+    index = _HistoryIdIndex()
+    added = _query_history_ids(bq, table_ref, since, since - HISTORY_INDEX_SKEW, index)
+    print(f"History index: preloaded {added} ids since {_iso(since)}")
+    return index, since
+
+
+def _ensure_issue_state_table(bq: bigquery.Client, state_ref: bigquery.TableReference) -> None:
+    try:
+        bq.get_table(state_ref)
+    except NotFound:
+        table = bigquery.Table(
+            state_ref,
+            schema=[
+                bigquery.SchemaField("issue_key", "STRING", mode="REQUIRED"),
+                bigquery.SchemaField("last_seen_updated", "TIMESTAMP", mode="REQUIRED"),
+                bigquery.SchemaField("_updated_at", "TIMESTAMP"),
+            ],
+        )
+        table.clustering_fields = ["issue_key"]
+        bq.create_table(table)
+        print(f"Created table {state_ref}")
+
+
+def _check_status_changes_table(bq: bigquery.Client, status_ref: bigquery.TableReference) -> Optional[str]:
+    """Return why `status_ref` cannot take appends, or None when it is ready.
+
+    The table (and the one-off migration from the legacy view) belongs to
+    bigquery/setup.sql; doing it here would race between concurrent instances.
+    """
+    try:
+        table = bq.get_table(status_ref)
+    except NotFound:
+        return f"{_table_fqn(status_ref)} does not exist; run bigquery/setup.sql"
+    if table.table_type == "VIEW":
+        return f"{_table_fqn(status_ref)} is still the legacy view; run bigquery/setup.sql"
+    return None
+
+
+def _status_change_rows(issue_key: str, history: Dict[str, Any], ingested_at: datetime) -> List[Dict[str, Any]]:
+    changed_at = _iso(_parse_jira_ts(history.get("created")))
+    rows = []
+    for item in history.get("items") or []:
+        if not isinstance(item, dict) or item.get("field") != "status":
+            continue
+        rows.append(
+            {
+                "issue_key": issue_key,
+                "history_id": str(history.get("id")),
+                "changed_at": changed_at,
+                "from_status": item.get("fromString"),
+                "to_status": item.get("toString"),
+                "_ingested_at": _iso(ingested_at),
+            }
+        )
+    return rows
+
+
+def _read_issue_state_cache(path: str, table_fqn: str) -> Optional[Dict[str, datetime]]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: ignoring unreadable issue state cache {path}: {e}")
+        return None
+    if data.get("table") != table_fqn:
+        return None
+    state: Dict[str, datetime] = {}
+    for key, value in (data.get("issues") or {}).items():
+        ts = _parse_jira_ts(value)
+        if ts is not None:
+            state[key] = ts
+    return state
+
+
+def _write_issue_state_cache(path: str, table_fqn: str, state: Dict[str, datetime], since: datetime) -> None:
+    # Stamps older than the window can never skip anything, so they are not kept.
+    issues = {k: _iso(v) for k, v in state.items() if v >= since}
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({"table": table_fqn, "issues": issues}, fh, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Warning: could not write issue state cache {path}: {e}")
+
+
+def _load_issue_state(bq: bigquery.Client, state_ref: bigquery.TableReference, since: datetime) -> Dict[str, datetime]:
+    """Return {issue_key: last_seen_updated} for issues stamped at/after ``since``.
+
+    Older stamps never match: anything Jira returns for this window has ``updated >= since``.
+    A warm instance with ISSUE_STATE_CACHE_PATH reuses its cache instead of querying;
+    the cache only ever lags the table, which at worst re-fetches an issue.
+    """
+    fqn = _table_fqn(state_ref)
+    if ISSUE_STATE_CACHE_PATH:
+        cached = _read_issue_state_cache(ISSUE_STATE_CACHE_PATH, fqn)
+        if cached is not None:
+            print(f"Issue state: {len(cached)} issues from cache {ISSUE_STATE_CACHE_PATH}")
+            return cached
+
+    sql = f"""
+      SELECT issue_key, last_seen_updated
+      FROM `{fqn}`
+      WHERE last_seen_updated >= @since
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("since", "TIMESTAMP", since)]
+    )
+    state: Dict[str, datetime] = {}
+    for row in bq.query(sql, job_config=job_config).result():
+        ts = row.get("last_seen_updated")
+        if row.get("issue_key") is None or ts is None:
+            continue
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        state[str(row.get("issue_key"))] = ts
+    print(f"Issue state: loaded {len(state)} issues since {_iso(since)}")
+    return state
+
+
+def _save_issue_state(bq: bigquery.Client, state_ref: bigquery.TableReference, updates: Dict[str, datetime]) -> None:
+    """MERGE new per-issue stamps into the state table (only ever moves them forward)."""
+    items = sorted(updates.items())
+    for i in range(0, len(items), ISSUE_STATE_MERGE_CHUNK):
+        chunk = items[i : i + ISSUE_STATE_MERGE_CHUNK]
+        sql = f"""
+          MERGE `{_table_fqn(state_ref)}` T
+          USING (
+            SELECT issue_key, last_seen_updated
+            FROM UNNEST(@issue_keys) AS issue_key WITH OFFSET i
+            JOIN UNNEST(@updated) AS last_seen_updated WITH OFFSET j
+            ON i = j
+          ) S
+          ON T.issue_key = S.issue_key
+          WHEN MATCHED AND S.last_seen_updated > T.last_seen_updated THEN
+            UPDATE SET last_seen_updated = S.last_seen_updated, _updated_at = CURRENT_TIMESTAMP()
+          WHEN NOT MATCHED THEN
+            INSERT (issue_key, last_seen_updated, _updated_at)
+            VALUES (S.issue_key, S.last_seen_updated, CURRENT_TIMESTAMP())
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[
+                bigquery.ArrayQueryParameter("issue_keys", "STRING", [k for k, _ in chunk]),
+                bigquery.ArrayQueryParameter("updated", "TIMESTAMP", [v for _, v in chunk]),
+            ]
+        )
+        bq.query(sql, job_config=job_config).result()
 
 
 def _search_issue_keys(
@@ -347,6 +633,8 @@ def _history_to_rows(issue_key: str, project_key: str, history: Dict[str, Any],
 def ingest_jira_changelog(request):
     global JIRA_CALLS
     JIRA_CALLS = 0
+    instrumentation.start_run("ingest-jira-changelog")
+    instrumentation.phase("config")
 
     req_json = request.get_json(silent=True) or {}
 
@@ -365,11 +653,18 @@ def ingest_jira_changelog(request):
 
     until = _utc_now()
 
-    bq = bigquery.Client(project=_get_project_id())
+    bq = bq_backend.get_client(_get_project_id())
     table_ref = bq.dataset(BQ_DATASET_ID).table(BQ_TABLE_ID)
     _ensure_table(bq, table_ref)
 
     latest_ts = _get_latest_history_ts(bq, table_ref)
+    state_ref = bq.dataset(BQ_DATASET_ID).table(ISSUE_STATE_TABLE_ID)
+    _ensure_issue_state_table(bq, state_ref)
+    status_ref = bq.dataset(BQ_DATASET_ID).table(STATUS_CHANGES_TABLE_ID)
+    status_table_problem = _check_status_changes_table(bq, status_ref)
+    if status_table_problem:
+        print(f"Status changes table not ready: {status_table_problem}")
+        return _error_response("config_error", "status_changes_table_missing", status_table_problem, 500)
 
     if latest_ts:
         since = latest_ts - timedelta(days=overlap_days)
@@ -384,13 +679,21 @@ def ingest_jira_changelog(request):
     print(f"Changelog ingest mode={mode} since={since} until={until} overlap_days={overlap_days}")
 
     ingested_at = _utc_now()
+    payloads = payload_store.PayloadStore(bq, "jira_changelog")
+    history_index, index_since = _load_history_index(bq, table_ref, since)
+    ignore_issue_state = bool(req_json.get("ignore_issue_state"))
+    issue_state = {} if ignore_issue_state else _load_issue_state(bq, state_ref, since)
+    state_updates: Dict[str, datetime] = {}
+    skipped_by_state = 0
 
     inserted = 0
+    status_inserted = 0
     issue_count = 0
     skipped_unchanged = 0
     processed_issue_keys: Dict[str, Optional[datetime]] = {}
     overlap_since = latest_ts - timedelta(days=overlap_days) if latest_ts else since
 
+    instrumentation.phase("api_fetch")
     for project_key in project_keys:
         print(f"Processing project {project_key}")
         start_at = 0
@@ -404,8 +707,8 @@ def ingest_jira_changelog(request):
             print(f"Project {project_key}: issues page startAt={start_at} got={len(keys)} total={total}")
 
             page_histories: Dict[str, List[Dict[str, Any]]] = {}
-            page_history_ids: Dict[str, List[str]] = {}
             keys_to_fetch: List[str] = []
+            page_updated: Dict[str, datetime] = {}
 
             for issue_key, updated_ts in keys:
                 issue_count += 1
@@ -419,7 +722,14 @@ def ingest_jira_changelog(request):
                     ):
                         skipped_unchanged += 1
                         continue
+                last_seen = issue_state.get(issue_key)
+                if updated_ts is not None and last_seen is not None and updated_ts <= last_seen:
+                    skipped_unchanged += 1
+                    skipped_by_state += 1
+                    continue
                 keys_to_fetch.append(issue_key)
+                if updated_ts is not None:
+                    page_updated[issue_key] = updated_ts
                 prev_updated = processed_issue_keys.get(issue_key)
                 if prev_updated is None or (updated_ts and updated_ts > prev_updated):
                     processed_issue_keys[issue_key] = updated_ts
@@ -435,36 +745,72 @@ def ingest_jira_changelog(request):
                 for issue_key in chunk:
                     histories = chunk_histories.get(issue_key, [])
                     page_histories[issue_key] = histories
-                    page_history_ids[issue_key] = [str(h.get("id")) for h in histories if h.get("id") is not None]
-
-            existing_by_issue = _get_existing_history_ids_batch(bq, table_ref, page_history_ids)
 
             rows = []
-            for issue_key, histories in page_histories.items():
-                existing_ids = existing_by_issue.get(issue_key, set())
-                for h in histories:
-                    hid = h.get("id")
-                    if hid is None:
-                        continue
-                    hid = str(hid)
-                    if hid in existing_ids:
-                        continue
-                    created_ts = _parse_jira_ts(h.get("created"))
-                    if created_ts and created_ts < since:
-                        continue
-                    rows.append(_history_to_rows(issue_key, project_key, h, ingested_at))
+            status_rows = []
+            status_row_ids = []
+            with instrumentation.span("parse"):
+                for issue_key, histories in page_histories.items():
+                    for h in histories:
+                        hid = h.get("id")
+                        if hid is None:
+                            continue
+                        hid = str(hid)
+                        if (issue_key, hid) in history_index:
+                            continue
+                        created_ts = _parse_jira_ts(h.get("created"))
+                        if created_ts and created_ts < since:
+                            continue
+                        rows.append(_history_to_rows(issue_key, project_key, h, ingested_at))
+                        for n, status_row in enumerate(_status_change_rows(issue_key, h, ingested_at)):
+                            status_rows.append(status_row)
+                            status_row_ids.append(f"{issue_key}:{hid}:{n}")
+            instrumentation.incr("records_parsed", len(rows))
 
             if rows:
-                errors = bq.insert_rows_json(table_ref, rows)
+                try:
+                    payloads.offload(table_ref, rows, "raw_json")
+                except Exception as e:
+                    print("Payload store write failed:", e)
+                    return _error_response("runtime_error", "payload_store_failed", "Payload store write failed", 500, str(e))
+                errors = bq_sink.write_rows(bq, table_ref, rows)
                 if errors:
                     print("BigQuery insert errors (first 3):", errors[:3])
                     return _error_response("runtime_error", "bigquery_insert_failed", "BigQuery insert failed", 500, errors[:3])
                 inserted += len(rows)
+                # Status rows follow the changelog rows they derive from: a page that fails
+                # before this point is re-read whole next run without re-appending transitions.
+                if status_rows:
+                    errors = bq_sink.write_rows(bq, status_ref, status_rows, row_ids=status_row_ids)
+                    if errors:
+                        print("BigQuery status change insert errors (first 3):", errors[:3])
+                        return _error_response("runtime_error", "bigquery_insert_failed", "BigQuery insert failed", 500, errors[:3])
+                    status_inserted += len(status_rows)
+                for r in rows:
+                    history_index.add(r["issue_key"], r["history_id"])
+
+            # Stamp only issues whose histories were fetched and stored successfully.
+            for issue_key in page_histories:
+                if issue_key in page_updated:
+                    state_updates[issue_key] = max(page_updated[issue_key], state_updates.get(issue_key, page_updated[issue_key]))
 
             start_at += len(keys)
             if total is not None and start_at >= total:
                 break
 
+    instrumentation.phase("bq_write")
+    if state_updates:
+        _save_issue_state(bq, state_ref, state_updates)
+        issue_state.update(state_updates)
+    if ISSUE_STATE_CACHE_PATH and not ignore_issue_state:
+        _write_issue_state_cache(ISSUE_STATE_CACHE_PATH, _table_fqn(state_ref), issue_state, since)
+    if HISTORY_INDEX_CACHE_PATH:
+        _write_history_index_cache(HISTORY_INDEX_CACHE_PATH, _table_fqn(table_ref), history_index, index_since, ingested_at)
+
+    instrumentation.phase("kpis")
+    active_bug_count_refresh = jira_rollups.refresh_active_bug_count_daily(bq, BQ_DATASET_ID)
+    print(f"Active bug count refresh: {active_bug_count_refresh}")
+
     return (
         json.dumps(
             {
@@ -477,9 +823,15 @@ def ingest_jira_changelog(request):
                 "rows_inserted": inserted,
                 "issues_scanned": issue_count,
                 "issues_skipped_unchanged": skipped_unchanged,
+                "issues_skipped_by_state": skipped_by_state,
+                "issue_state_updates": len(state_updates),
                 "histories_inserted": inserted,
+                "status_changes_inserted": status_inserted,
                 "jira_calls": JIRA_CALLS,
+                "history_index_size": len(history_index),
+                "active_bug_count_refresh": active_bug_count_refresh,
                 "bq_table": f"{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}",
+                "instrumentation": instrumentation.finish(status="ok"),
             }
         ),
         200,
@@ -487,6 +839,7 @@ def ingest_jira_changelog(request):
     )
 
 
+@profiling.profiled("ingest-jira-changelog")
 def hello_http(request):
     if request.path.endswith("/healthz") or request.method == "GET":
         return (json.dumps({"ok": True, "service": "ingest-jira-changelog", "ready": True}), 200, {"Content-Type": "application/json"})
@@ -16,23 +16,45 @@ BQ env vars:
 - GCP_PROJECT_ID (optional, else derived)
 - BQ_DATASET_ID (default qa_metrics)
 - BQ_TABLE_ID (default jira_issues_v2)
+- JIRA_ROLLUPS_REFRESH (default true): refresh `jira_active_bug_count_daily` after a successful run
+- CONTENT_HASH_SKIP (default true): skip issues whose content_hash matches their newest row (see content_hash.py)
+- PAYLOAD_STORE (default inline): `table`/`blob` moves raw_json out of the rows (see payload_store.py)
+- BQ_CURRENT_TABLES (default false): MERGE the run into `jira_issues_current` (see bq_current.py)
 
 HTTP:
-- POST body can override lookback_days and project_keys.
+- POST body can override lookback_days, project_keys and merge_current.
 """
 
 import json
 import os
-import re
 import time
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Iterable, List, Optional
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 import functions_framework
 import requests
 from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 
+import bq_backend
+import bq_current
+import bq_sink
+import content_hash
+import http_session
+import instrumentation
+import jira_rollups
+import payload_store
+import profiling
+import rate_limit
+import time_utils
+
+try:
+    import orjson
+except ImportError:  # optional: `_dumps_compact` falls back to the same text via json
+    orjson = None
+
 
 # ----------------------------
 # Config
@@ -67,6 +89,7 @@ def _error_response(error_type: str, code: str, message: str, status_code: int,
     }
     if details is not None:
         payload["error"]["details"] = details
+    payload["instrumentation"] = instrumentation.finish(status="error")
     return (json.dumps(payload), status_code, {"Content-Type": "application/json"})
 
 
@@ -126,27 +149,39 @@ def _jira_headers() -> Dict[str, str]:
     return {"Accept": "application/json"}
 
 
+@lru_cache(maxsize=1)
 def _jira_auth() -> requests.auth.HTTPBasicAuth:
     if not (JIRA_EMAIL and JIRA_API_TOKEN):
         raise RuntimeError("Missing JIRA_EMAIL or JIRA_API_TOKEN env vars")
     return requests.auth.HTTPBasicAuth(JIRA_EMAIL, JIRA_API_TOKEN)
 
 
-def _jira_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def _jira_get(
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    limiter: Optional[rate_limit.AdaptiveRateLimiter] = None,
+) -> Dict[str, Any]:
     if not JIRA_BASE_URL:
         raise RuntimeError("Missing JIRA_BASE_URL env var")
     url = JIRA_BASE_URL.rstrip("/") + path
+    # The shared Jira limiter paces every call and learns 429 pauses from Retry-After.
+    limiter = limiter or rate_limit.get_limiter("jira")
 
     max_attempts = 5
     backoff = 1.0
     for attempt in range(1, max_attempts + 1):
-        r = requests.get(url, headers=_jira_headers(), auth=_jira_auth(), params=params, timeout=60)
+        r = http_session.request(
+            "GET", url, headers=_jira_headers(), auth=_jira_auth(), params=params, timeout=60, limiter=limiter
+        )
 
-        if r.status_code in (429, 500, 502, 503, 504) and attempt < max_attempts:
-            retry_after = r.headers.get("Retry-After")
-            wait_seconds = float(retry_after) if retry_after and retry_after.isdigit() else backoff
-            print(f"Jira request retryable status={r.status_code}. attempt={attempt}/{max_attempts}, waiting {wait_seconds}s")
+        if r.status_code == 429 and attempt < max_attempts:
+            wait_seconds = rate_limit.retry_delay(limiter, attempt, base_s=1.0)
+            print(f"Jira rate-limited. attempt={attempt}/{max_attempts}, waiting {wait_seconds:.1f}s, limiter rate={limiter.rate:.2f}/s")
             time.sleep(wait_seconds)
+            continue
+        if r.status_code in (500, 502, 503, 504) and attempt < max_attempts:
+            print(f"Jira request retryable status={r.status_code}. attempt={attempt}/{max_attempts}, waiting {backoff}s")
+            time.sleep(backoff)
             backoff *= 2
             continue
 
@@ -173,13 +208,11 @@ def _is_production_env() -> bool:
     return env_name in {"prod", "production"}
 
 
-def _extract_severity(fields: Dict[str, Any]) -> Optional[str]:
-    """Extract severity from a configured custom field.
+def _severity_field_keys() -> List[str]:
+    """Fields severity is read from, in priority order.
 
     Many Jira instances implement Severity as a customfield.
     We support the explicit field id via JIRA_SEVERITY_FIELD_ID.
-
-    If not configured, we return None (caller can fall back to priority logic).
     """
     candidate_keys: List[str] = []
     if RESOLVED_SEVERITY_FIELD_ID:
@@ -187,16 +220,14 @@ def _extract_severity(fields: Dict[str, Any]) -> Optional[str]:
 
     # Fallbacks commonly present in some Jira setups.
     candidate_keys.extend(["severity", "customfield_severity"])
+    return candidate_keys
 
-    raw = None
-    for field_key in candidate_keys:
-        raw = fields.get(field_key)
-        if raw is not None:
-            break
 
-    if raw is None:
-        return None
+def _severity_value(raw: Any) -> Optional[str]:
+    """Severity text from the first non-null severity field value.
 
+    Returns None when it has no usable value (caller can fall back to priority logic).
+    """
     # Severity could be {"value": "(S1) Critical"} or {"name": "..."}
     if isinstance(raw, dict):
         return raw.get("value") or raw.get("name") or raw.get("displayName")
@@ -291,6 +322,8 @@ def _ensure_table(bq: bigquery.Client, table_ref: bigquery.TableReference) -> No
         bigquery.SchemaField("sprint", "STRING"),
         bigquery.SchemaField("resolution", "STRING"),
         bigquery.SchemaField("raw_json", "STRING"),
+        bigquery.SchemaField("payload_hash", "STRING"),
+        bigquery.SchemaField("content_hash", "STRING"),
         bigquery.SchemaField("_ingested_at", "TIMESTAMP"),
     ]
 
@@ -311,20 +344,8 @@ def _ensure_table(bq: bigquery.Client, table_ref: bigquery.TableReference) -> No
         print(f"Created table {table_ref}")
 
 
-def _parse_jira_ts(value: Optional[str]) -> Optional[datetime]:
-    if not value:
-        return None
-    # Jira timestamps are ISO8601 with milliseconds and timezone, e.g. 2025-02-01T12:34:56.789+0000
-    # Normalize timezone format for offsets without ":" (e.g. +0000, -0700).
-    try:
-        match = re.search(r"([+-]\d{2})(\d{2})$", value)
-        if match:
-            value = f"{value[:-5]}{match.group(1)}:{match.group(2)}"
-        if value.endswith("Z"):
-            return datetime.fromisoformat(value.replace("Z", "+00:00"))
-        return datetime.fromisoformat(value)
-    except Exception:
-        return None
+# Shared fast-path parser for Jira's `2025-02-01T12:34:56.789+0000` timestamps.
+_parse_jira_ts = time_utils.parse_jira_ts
 
 
 def _extract_team(team_val: Any) -> Optional[str]:
@@ -351,39 +372,89 @@ def _extract_sprint(sprint_val: Any) -> Optional[str]:
     return None
 
 
-def _build_issue_record(issue: Dict[str, Any]) -> Dict[str, Any]:
-    fields = issue.get("fields", {})
-
-    status_obj = fields.get("status") or {}
-    status_cat = status_obj.get("statusCategory") or {}
-
-    rec = {
-        "issue_key": issue.get("key"),
-        "project_key": (fields.get("project") or {}).get("key"),
-        "issue_type": (fields.get("issuetype") or {}).get("name"),
-        "summary": fields.get("summary"),
-        "status": status_obj.get("name"),
-        "status_category": status_cat.get("name"),
-        "status_category_key": status_cat.get("key"),
-        "priority": (fields.get("priority") or {}).get("name"),
-        "severity": _extract_severity(fields),
-        "created_at": _iso(_parse_jira_ts(fields.get("created"))),
-        "updated_at": _iso(_parse_jira_ts(fields.get("updated"))),
-        "resolved_at": _iso(_parse_jira_ts(fields.get("resolutiondate"))),
-        "reporter": _extract_user_display(fields.get("reporter")),
-        "assignee": _extract_user_display(fields.get("assignee")),
-        "team": _extract_team(fields.get(TEAM_FIELD_ID)),
-        "labels": json.dumps(fields.get("labels") or []),
-        "components": json.dumps([c.get("name") for c in (fields.get("components") or []) if isinstance(c, dict)]),
-        "fix_versions": json.dumps([v.get("name") for v in (fields.get("fixVersions") or []) if isinstance(v, dict)]),
-        "affects_versions": json.dumps([v.get("name") for v in (fields.get("versions") or []) if isinstance(v, dict)]),
-        "sprint": _extract_sprint(fields.get(SPRINT_FIELD_ID) or fields.get("sprint")),
-        "resolution": (fields.get("resolution") or {}).get("name"),
-        "raw_json": json.dumps(issue, ensure_ascii=False),
-        "_ingested_at": _iso(_utc_now()),
-    }
-
-    return rec
+def _dumps_compact(value: Any) -> str:
+    """Compact JSON text (`{"a":1}`, non-ASCII kept as is); orjson when installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode("utf-8")
+        except TypeError:  # non-str keys, ints beyond 64 bits: let json decide
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _dumps_names(values: Any) -> str:
+    """`json.dumps(values)` for a list of strings, without the encoder round-trip."""
+    if not values:
+        return "[]"
+    if type(values) is list:
+        try:
+            return "[" + ", ".join(map(encode_basestring_ascii, values)) + "]"
+        except TypeError:  # a None/non-str entry
+            pass
+    return json.dumps(values)
+
+
+def _compile_issue_record_builder() -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Build the issue -> row function for this run, in one pass per issue.
+
+    Call it once per run, after RESOLVED_SEVERITY_FIELD_ID is known. The custom
+    field ids requested by `_jira_search_fields()` (team, sprint, severity) and
+    the severity candidate keys are bound here, so the per-issue work is a single
+    dict build:
+    - labels/components/fix_versions/affects_versions are written as the same
+      text `json.dumps` produced, without the encoder round-trip;
+    - `raw_json` is compact JSON from orjson (stdlib fallback, same text).
+    """
+    team_key = TEAM_FIELD_ID
+    sprint_key = SPRINT_FIELD_ID
+    severity_keys = tuple(dict.fromkeys(_severity_field_keys()))
+    parse_ts = _parse_jira_ts
+
+    def names(items: Any) -> str:
+        return _dumps_names([i.get("name") for i in items if isinstance(i, dict)]) if items else "[]"
+
+    def build(issue: Dict[str, Any]) -> Dict[str, Any]:
+        fields = issue.get("fields", {})
+        get = fields.get
+
+        status_obj = get("status") or {}
+        status_cat = status_obj.get("statusCategory") or {}
+
+        severity = None
+        for key in severity_keys:
+            raw = get(key)
+            if raw is not None:
+                severity = _severity_value(raw)
+                break
+
+        created, updated, resolved = get("created"), get("updated"), get("resolutiondate")
+        return {
+            "issue_key": issue.get("key"),
+            "project_key": (get("project") or {}).get("key"),
+            "issue_type": (get("issuetype") or {}).get("name"),
+            "summary": get("summary"),
+            "status": status_obj.get("name"),
+            "status_category": status_cat.get("name"),
+            "status_category_key": status_cat.get("key"),
+            "priority": (get("priority") or {}).get("name"),
+            "severity": severity,
+            "created_at": _iso(parse_ts(created)) if created else None,
+            "updated_at": _iso(parse_ts(updated)) if updated else None,
+            "resolved_at": _iso(parse_ts(resolved)) if resolved else None,
+            "reporter": _extract_user_display(get("reporter")),
+            "assignee": _extract_user_display(get("assignee")),
+            "team": _extract_team(get(team_key)),
+            "labels": _dumps_names(get("labels")),
+            "components": names(get("components")),
+            "fix_versions": names(get("fixVersions")),
+            "affects_versions": names(get("versions")),
+            "sprint": _extract_sprint(get(sprint_key) or get("sprint")),
+            "resolution": (get("resolution") or {}).get("name"),
+            "raw_json": _dumps_compact(issue),
+            "_ingested_at": _iso(_utc_now()),
+        }
+
+    return build
 
 
 def _search_issues(project_key: str, since: datetime, until: datetime) -> Iterable[Dict[str, Any]]:
@@ -427,6 +498,8 @@ def _search_issues(project_key: str, since: datetime, until: datetime) -> Iterab
 def ingest_jira(request):
     """Cloud Run / Functions Framework entrypoint."""
 
+    instrumentation.start_run("ingest-jira")
+    instrumentation.phase("config")
     req_json = request.get_json(silent=True) or {}
 
     lookback_days = int(req_json.get("lookback_days") or DEFAULT_LOOKBACK_DAYS)
@@ -470,7 +543,7 @@ def ingest_jira(request):
             "and may degrade reporting quality."
         )
 
-    bq = bigquery.Client(project=_get_project_id())
+    bq = bq_backend.get_client(_get_project_id())
     table_ref = bq.dataset(BQ_DATASET_ID).table(BQ_TABLE_ID)
     _ensure_table(bq, table_ref)
 
@@ -478,11 +551,20 @@ def ingest_jira(request):
     inserted = 0
     processed_issues = 0
     severity_null_issues = 0
+    # Large lookbacks switch to a single load job once BQ_BULK_THRESHOLD_ROWS is crossed.
+    bulk = bq_sink.BulkLoader(lambda table, path: bq_sink.load_ndjson_file(bq, table, path))
+    payloads = payload_store.PayloadStore(bq, "jira_issues")
+    hashes = content_hash.load_cache(bq, table_ref, ["issue_key"])
+
+    build_record = _compile_issue_record_builder()
 
+    instrumentation.phase("api_fetch")
     for project_key in project_keys:
         print(f"Ingesting Jira issues for {project_key} from {since} to {until} (lookback {lookback_days}d)")
         for issue in _search_issues(project_key, since, until):
-            rec = _build_issue_record(issue)
+            with instrumentation.span("parse"):
+                rec = build_record(issue)
+            instrumentation.incr("records_parsed")
             if not rec.get("issue_key"):
                 continue
 
@@ -490,29 +572,53 @@ def ingest_jira(request):
             if not rec.get("severity"):
                 severity_null_issues += 1
 
+            # Unchanged since its newest stored row: nothing to write.
+            if hashes.seen(rec):
+                continue
             rows.append(rec)
 
             # Batch insert
             if len(rows) >= 500:
-                row_ids = [f"{r['issue_key']}:{r.get('updated_at') or ''}" for r in rows]
-                errors = bq.insert_rows_json(table_ref, rows, row_ids=row_ids)
-                if errors:
-                    print("BigQuery insert errors:", errors[:3])
-                    return _error_response("runtime_error", "bigquery_insert_failed", "BigQuery insert failed", 500, errors[:3])
+                try:
+                    payloads.offload(table_ref, rows, "raw_json")
+                except Exception as e:
+                    bulk.abort()
+                    print("Payload store write failed:", e)
+                    return _error_response("runtime_error", "payload_store_failed", "Payload store write failed", 500, str(e))
+                if not bulk.route(table_ref, rows):
+                    row_ids = [f"{r['issue_key']}:{r.get('updated_at') or ''}" for r in rows]
+                    errors = bq_sink.write_rows(bq, table_ref, rows, row_ids=row_ids)
+                    if errors:
+                        bulk.abort()
+                        print("BigQuery insert errors:", errors[:3])
+                        return _error_response("runtime_error", "bigquery_insert_failed", "BigQuery insert failed", 500, errors[:3])
                 inserted += len(rows)
                 print(f"Inserted {inserted} rows so far")
                 rows.clear()
 
-        # gentle pause to avoid Jira throttling
-        time.sleep(0.25)
-
+    instrumentation.phase("bq_write")
     if rows:
+        try:
+            payloads.offload(table_ref, rows, "raw_json")
+        except Exception as e:
+            bulk.abort()
+            print("Payload store write failed:", e)
+            return _error_response("runtime_error", "payload_store_failed", "Payload store write failed", 500, str(e))
+    if rows and not bulk.route(table_ref, rows):
         row_ids = [f"{r['issue_key']}:{r.get('updated_at') or ''}" for r in rows]
-        errors = bq.insert_rows_json(table_ref, rows, row_ids=row_ids)
+        errors = bq_sink.write_rows(bq, table_ref, rows, row_ids=row_ids)
         if errors:
+            bulk.abort()
             print("BigQuery insert errors:", errors[:3])
             return _error_response("runtime_error", "bigquery_insert_failed", "BigQuery insert failed", 500, errors[:3])
-        inserted += len(rows)
+    inserted += len(rows)
+    if bulk.pending_rows():
+        print(f"Loading {bulk.pending_rows()} rows with a BigQuery load job")
+        try:
+            bulk.finish()
+        except Exception as e:
+            print("BigQuery load job failed:", e)
+            return _error_response("runtime_error", "bigquery_load_failed", "BigQuery load job failed", 500, str(e))
 
     severity_null_pct = (severity_null_issues / processed_issues * 100.0) if processed_issues else 0.0
     print(
@@ -521,6 +627,15 @@ def ingest_jira(request):
         f"{severity_null_issues} null ({severity_null_pct:.2f}%)."
     )
 
+    instrumentation.phase("bq_merge")
+    current_table = bq_current.merge_run(bq, table_ref) if bq_current.merge_enabled(req_json) else None
+    if current_table is not None:
+        print(f"Current table merge: {current_table}")
+
+    instrumentation.phase("kpis")
+    active_bug_count_refresh = jira_rollups.refresh_active_bug_count_daily(bq, BQ_DATASET_ID)
+    print(f"Active bug count refresh: {active_bug_count_refresh}")
+
     return (
         json.dumps(
             {
@@ -529,10 +644,14 @@ def ingest_jira(request):
                 "lookback_days": lookback_days,
                 "inserted_rows": inserted,
                 "processed_issues": processed_issues,
+                "skipped_unchanged": hashes.skipped,
                 "severity_null_issues": severity_null_issues,
                 "severity_null_pct": round(severity_null_pct, 2),
                 "severity_field_source": "explicit" if SEVERITY_FIELD_ID else ("auto-detected" if RESOLVED_SEVERITY_FIELD_ID else "fallback"),
+                "active_bug_count_refresh": active_bug_count_refresh,
+                "current_table": current_table,
                 "bq_table": f"{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}",
+                "instrumentation": instrumentation.finish(status="ok"),
             }
         ),
         200,
@@ -540,6 +659,7 @@ def ingest_jira(request):
     )
 
 
+@profiling.profiled("ingest-jira")
 def hello_http(request):
     if request.path.endswith("/healthz") or request.method == "GET":
         return (json.dumps({"ok": True, "service": "ingest-jira", "ready": True}), 200, {"Content-Type": "application/json"})
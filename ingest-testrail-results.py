@@ -6,22 +6,20 @@ from datetime import datetime, timezone, timedelta
 from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
-import google.auth
 import requests
 from flask import jsonify
-from google.cloud import bigquery, secretmanager
 
-# ----------------- GCP / BigQuery -----------------
-_, PROJECT_ID = google.auth.default()
+import bq_sink
+import http_session
+import instrumentation
+import profiling
+import rate_limit
+import secret_cache
 
+# ----------------- GCP / BigQuery -----------------
 DATASET_ID = os.environ.get("BQ_DATASET", "qa_metrics")
 TABLE_NAME = os.environ.get("BQ_TABLE", "testrail_results")
-TABLE_ID = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_NAME}"
 STATE_TABLE_NAME = os.environ.get("BQ_STATE_TABLE", "testrail_results_state")
-STATE_TABLE_ID = f"{PROJECT_ID}.{DATASET_ID}.{STATE_TABLE_NAME}"
-
-bq = bigquery.Client(project=PROJECT_ID)
-sm = secretmanager.SecretManagerServiceClient()
 
 # Runtime knobs
 MAX_RUNTIME_SECONDS = int(os.environ.get("MAX_RUNTIME_SECONDS", "480"))
@@ -38,18 +36,53 @@ MAX_RETRIES = int(os.environ.get("MAX_RETRIES", "6"))
 BASE_BACKOFF = float(os.environ.get("BASE_BACKOFF_SECONDS", "1.0"))
 MAX_BACKOFF = float(os.environ.get("MAX_BACKOFF_SECONDS", "30.0"))
 
+# GCP clients, the project and secrets are resolved on first use, so importing
+# the module and answering healthz never touch credentials or the metadata server.
+@lru_cache(maxsize=1)
+def _project_id() -> str:
+    import google.auth
+
+    return google.auth.default()[1]
+
+@lru_cache(maxsize=1)
+def _bq():
+    import bq_backend
+
+    return bq_backend.get_client(_project_id())
+
+@lru_cache(maxsize=1)
+def _sm():
+    from google.cloud import secretmanager
+
+    return secretmanager.SecretManagerServiceClient()
+
+def _table_id() -> str:
+    return f"{_project_id()}.{DATASET_ID}.{TABLE_NAME}"
+
+def _state_table_id() -> str:
+    return f"{_project_id()}.{DATASET_ID}.{STATE_TABLE_NAME}"
+
 # ----------------- Secrets -----------------
-@lru_cache(maxsize=None)
-def get_secret(name: str) -> str:
-    secret_name = f"projects/{PROJECT_ID}/secrets/{name}/versions/latest"
-    resp = sm.access_secret_version(request={"name": secret_name})
+def _access_secret(name: str) -> str:
+    secret_name = f"projects/{_project_id()}/secrets/{name}/versions/latest"
+    resp = _sm().access_secret_version(request={"name": secret_name})
     return resp.payload.data.decode("utf-8").strip()
 
-@lru_cache(maxsize=1)
+def _secret_clients() -> None:
+    # Build the lru_cache'd project id and client before prefetch starts its threads.
+    _project_id()
+    _sm()
+
+# Everything a run reads, prefetched in parallel when the run starts.
+SECRET_NAMES = ("TESTRAIL_BASE_URL", "TESTRAIL_USER", "TESTRAIL_API_KEY", "TESTRAIL_PROJECT_IDS", "TESTRAIL_PROJECT_ID")
+_SECRETS = secret_cache.SecretCache(_access_secret, prepare=_secret_clients)
+
+def get_secret(name: str) -> str:
+    return _SECRETS.get(name)
+
 def testrail_auth() -> Tuple[str, str]:
     return (get_secret("TESTRAIL_USER"), get_secret("TESTRAIL_API_KEY"))
 
-@lru_cache(maxsize=1)
 def testrail_base_url() -> str:
     base = get_secret("TESTRAIL_BASE_URL").rstrip("/")
     if not base.endswith("index.php?/api/v2"):
@@ -57,20 +90,26 @@ def testrail_base_url() -> str:
     return base
 
 def testrail_project_ids() -> List[int]:
+    # Missing secrets are negatively cached, so absent ones cost no round-trip on warm instances.
     for key in ("TESTRAIL_PROJECT_IDS", "TESTRAIL_PROJECT_ID"):
         try:
-            s = get_secret(key)
+            s = _SECRETS.get_optional(key)
+            if s is None:
+                continue
             if key == "TESTRAIL_PROJECT_ID":
                 return [int(s)]
             ids = [int(x.strip()) for x in s.split(",") if x.strip()]
             if ids:
                 return ids
-        except Exception:
+        except Exception as exc:
+            print(json.dumps({"event": "testrail_secret_unusable", "secret": key, "error": str(exc)}))
             continue
     return [int(os.environ.get("TESTRAIL_PROJECT_ID", "0"))] if os.environ.get("TESTRAIL_PROJECT_ID") else []
 
 # ----------------- BigQuery -----------------
 def ensure_table() -> None:
+    from google.cloud import bigquery
+
     schema = [
         bigquery.SchemaField("project_id", "INT64"),
         bigquery.SchemaField("run_id", "INT64"),
@@ -98,15 +137,17 @@ def ensure_table() -> None:
         bigquery.SchemaField("payload", "STRING"),
     ]
 
-    table = bigquery.Table(TABLE_ID, schema=schema)
+    table = bigquery.Table(_table_id(), schema=schema)
     table.time_partitioning = bigquery.TimePartitioning(
         type_=bigquery.TimePartitioningType.DAY, field="created_on"
     )
     table.clustering_fields = ["project_id", "run_id", "created_by", "status_id"]
-    bq.create_table(table, exists_ok=True)
+    _bq().create_table(table, exists_ok=True)
 
 
 def ensure_state_table() -> None:
+    from google.cloud import bigquery
+
     schema = [
         bigquery.SchemaField("project_id", "INT64", mode="REQUIRED"),
         bigquery.SchemaField("cursor_result_id", "INT64"),
@@ -116,8 +157,8 @@ def ensure_state_table() -> None:
         bigquery.SchemaField("continuation_token", "STRING"),
         bigquery.SchemaField("updated_at", "TIMESTAMP"),
     ]
-    table = bigquery.Table(STATE_TABLE_ID, schema=schema)
-    bq.create_table(table, exists_ok=True)
+    table = bigquery.Table(_state_table_id(), schema=schema)
+    _bq().create_table(table, exists_ok=True)
 
 def _normalize_ts(ts: Optional[datetime]) -> Optional[datetime]:
     if ts is None:
@@ -128,18 +169,20 @@ def _normalize_ts(ts: Optional[datetime]) -> Optional[datetime]:
 
 
 def load_project_state(project_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    from google.cloud import bigquery
+
     if not project_ids:
         return {}
     sql = f"""
       SELECT project_id, cursor_result_id, cursor_created_on
-      FROM `{STATE_TABLE_ID}`
+      FROM `{_state_table_id()}`
       WHERE project_id IN UNNEST(@project_ids)
     """
     job_config = bigquery.QueryJobConfig(
         query_parameters=[bigquery.ArrayQueryParameter("project_ids", "INT64", project_ids)]
     )
     out: Dict[int, Dict[str, Any]] = {}
-    for row in bq.query(sql, job_config=job_config):
+    for row in _bq().query(sql, job_config=job_config):
         out[int(row["project_id"])] = {
             "cursor_result_id": _safe_int(row["cursor_result_id"]),
             "cursor_created_on": _normalize_ts(row["cursor_created_on"]),
@@ -155,8 +198,10 @@ def upsert_project_state(
     status: str,
     continuation_token: Optional[str],
 ) -> None:
+    from google.cloud import bigquery
+
     sql = f"""
-    MERGE `{STATE_TABLE_ID}` T
+    MERGE `{_state_table_id()}` T
     USING (
       SELECT
         @project_id AS project_id,
@@ -194,7 +239,7 @@ def upsert_project_state(
             bigquery.ScalarQueryParameter("continuation_token", "STRING", continuation_token),
         ]
     )
-    bq.query(sql, job_config=job_config).result()
+    _bq().query(sql, job_config=job_config).result()
 
 # ----------------- HTTP -----------------
 def _is_transient_request_error(exc: requests.RequestException) -> bool:
@@ -204,16 +249,25 @@ def _is_transient_request_error(exc: requests.RequestException) -> bool:
     return bool(resp is not None and resp.status_code in (429, 500, 502, 503, 504))
 
 
-def request_with_retries(method: str, url: str, *, auth: Tuple[str, str], trace: Dict[str, Any]) -> requests.Response:
+def request_with_retries(
+    method: str,
+    url: str,
+    *,
+    auth: Tuple[str, str],
+    trace: Dict[str, Any],
+    limiter: Optional[rate_limit.AdaptiveRateLimiter] = None,
+) -> requests.Response:
+    limiter = limiter or rate_limit.get_limiter("testrail")
     last_exc: Optional[Exception] = None
     for attempt in range(MAX_RETRIES):
         request_started = time.monotonic()
         try:
-            r = requests.request(
+            r = http_session.request(
                 method,
                 url,
                 auth=auth,
                 timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS),
+                limiter=limiter,
             )
             latency_ms = round((time.monotonic() - request_started) * 1000, 2)
             print(json.dumps({
@@ -372,11 +426,15 @@ def _safe_int(value: Any) -> Optional[int]:
         return None
 
 # ----------------- Entry -----------------
+@profiling.profiled("ingest-testrail-results")
 def hello_http(request):
     if request.path.endswith("/healthz") or request.method == "GET":
         return (jsonify({"status": "OK", "service": "ingest-testrail-results", "ready": True}), 200)
 
     started = time.monotonic()
+    instrumentation.start_run("ingest-testrail-results")
+    instrumentation.phase("config")
+    _SECRETS.prefetch(SECRET_NAMES)
     try:
         ensure_table()
         ensure_state_table()
@@ -393,7 +451,16 @@ def hello_http(request):
 
         pids = testrail_project_ids()
         if not pids:
-            return (jsonify({"status":"ERROR","message":"No TESTRAIL_PROJECT_IDS/TESTRAIL_PROJECT_ID configured"}), 500)
+            return (
+                jsonify(
+                    {
+                        "status": "ERROR",
+                        "message": "No TESTRAIL_PROJECT_IDS/TESTRAIL_PROJECT_ID configured",
+                        "instrumentation": instrumentation.finish(status="error"),
+                    }
+                ),
+                500,
+            )
         state = load_project_state(pids)
 
         rows: List[Dict[str, Any]] = []
@@ -405,6 +472,7 @@ def hello_http(request):
         next_token: Optional[Dict[str, Any]] = None
         default_start = datetime.now(timezone.utc) - timedelta(days=30)
 
+        instrumentation.phase("api_fetch")
         for pid in pids:
             pid_state = state.get(pid, {})
             state_ts = pid_state.get("cursor_created_on") or default_start
@@ -454,6 +522,7 @@ def hello_http(request):
                     "latency_ms": round((time.monotonic() - run_started) * 1000, 2),
                     "next_offset": next_offset,
                 }))
+                instrumentation.incr("records_parsed", len(results))
 
                 for res in results:
                     created_on = res.get("created_on")
@@ -517,8 +586,9 @@ def hello_http(request):
             if next_token or runs_scanned >= MAX_RUNS_PER_INVOCATION or (time.monotonic() - started) > (MAX_RUNTIME_SECONDS - 10):
                 break
 
+        instrumentation.phase("bq_write")
         if rows:
-            errors = bq.insert_rows_json(TABLE_ID, rows, row_ids=row_ids)
+            errors = bq_sink.write_rows(_bq(), _table_id(), rows, row_ids=row_ids)
             if errors:
                 raise RuntimeError(errors)
 
@@ -549,7 +619,18 @@ def hello_http(request):
             "rows_inserted": len(rows),
             "continuation_token": json.dumps(next_token) if next_token else None,
             "runtime_seconds": round(time.monotonic() - started, 2),
+            "instrumentation": instrumentation.finish(status="ok" if not next_token else "partial"),
         }), 200)
 
     except Exception as e:
-        return (jsonify({"status":"ERROR","message":str(e), "runtime_seconds": round(time.monotonic() - started, 2)}), 500)
+        return (
+            jsonify(
+                {
+                    "status": "ERROR",
+                    "message": str(e),
+                    "runtime_seconds": round(time.monotonic() - started, 2),
+                    "instrumentation": instrumentation.finish(status="error"),
+                }
+            ),
+            500,
+        )
@@ -20,12 +20,20 @@ HTTP body overrides:
 import json
 import os
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterable, List, Set, Tuple
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import functions_framework
 import requests
 from google.cloud import bigquery
 
+import bq_backend
+import bq_sink
+import http_session
+import instrumentation
+import profiling
+import rate_limit
+
 
 BQ_DATASET_ID = os.environ.get("BQ_DATASET_ID", "qa_metrics")
 BQ_TABLE_ID = os.environ.get("BQ_TABLE_ID", "testrail_users")
@@ -47,6 +55,7 @@ def _error_response(error_type: str, code: str, message: str, status_code: int,
     }
     if details is not None:
         payload["error"]["details"] = details
+    payload["instrumentation"] = instrumentation.finish(status="error")
     return (json.dumps(payload), status_code, {"Content-Type": "application/json"})
 
 
@@ -61,17 +70,18 @@ def _get_project_id() -> str:
     return bigquery.Client().project
 
 
+@lru_cache(maxsize=1)
 def _auth() -> requests.auth.HTTPBasicAuth:
     if not (TESTRAIL_EMAIL and TESTRAIL_API_KEY):
         raise RuntimeError("Missing TESTRAIL_EMAIL/TESTRAIL_USER or TESTRAIL_API_KEY")
     return requests.auth.HTTPBasicAuth(TESTRAIL_EMAIL, TESTRAIL_API_KEY)
 
 
-def _get(path: str) -> Any:
+def _get(path: str, limiter: Optional[rate_limit.AdaptiveRateLimiter] = None) -> Any:
     if not TESTRAIL_URL:
         raise RuntimeError("Missing TESTRAIL_URL")
     url = TESTRAIL_URL.rstrip("/") + path
-    r = requests.get(url, auth=_auth(), timeout=60)
+    r = http_session.request("GET", url, auth=_auth(), timeout=60, limiter=limiter or rate_limit.get_limiter("testrail"))
     r.raise_for_status()
     return r.json()
 
@@ -136,6 +146,8 @@ def _to_bool_or_none(value: Any) -> Any:
 
 @functions_framework.http
 def ingest_testrail_users(request):
+    instrumentation.start_run("ingest-testrail-users")
+    instrumentation.phase("config")
     req = request.get_json(silent=True) or {}
 
     proj_raw = req.get("project_ids") or TESTRAIL_PROJECT_IDS
@@ -148,7 +160,7 @@ def ingest_testrail_users(request):
             400,
         )
 
-    bq = bigquery.Client(project=_get_project_id())
+    bq = bq_backend.get_client(_get_project_id())
     table_ref = bq.dataset(BQ_DATASET_ID).table(BQ_TABLE_ID)
     _ensure_table(bq, table_ref)
 
@@ -158,6 +170,7 @@ def ingest_testrail_users(request):
     seen: Set[Tuple[int, int]] = set()
     failures: List[str] = []
 
+    instrumentation.phase("api_fetch")
     for pid in project_ids:
         try:
             pid_int = int(pid)
@@ -177,6 +190,7 @@ def ingest_testrail_users(request):
         if not isinstance(users, list):
             failures.append(f"Unexpected response type for project {pid_int}: {type(users)}")
             continue
+        instrumentation.incr("records_parsed", len(users))
 
         for u in users:
             if not isinstance(u, dict):
@@ -212,8 +226,9 @@ def ingest_testrail_users(request):
         print("; ".join(failures))
         return _error_response("runtime_error", "testrail_users_ingest_failed", "No users ingested", 502, failures[:5])
 
+    instrumentation.phase("bq_write")
     if rows:
-        errors = bq.insert_rows_json(table_ref, rows)
+        errors = bq_sink.write_rows(bq, table_ref, rows)
         if errors:
             print("BigQuery insert errors (first 3):", errors[:3])
             return _error_response("runtime_error", "bigquery_insert_failed", "BigQuery insert failed", 500, errors[:3])
@@ -226,6 +241,7 @@ def ingest_testrail_users(request):
                 "rows_inserted": len(rows),
                 "warnings": failures[:5],
                 "bq_table": f"{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}",
+                "instrumentation": instrumentation.finish(status="ok"),
             }
         ),
         200,
@@ -233,6 +249,7 @@ def ingest_testrail_users(request):
     )
 
 
+@profiling.profiled("ingest-testrail-users")
 def hello_http(request):
     if request.path.endswith("/healthz") or request.method == "GET":
         return (json.dumps({"ok": True, "service": "ingest-testrail-users", "ready": True}), 200, {"Content-Type": "application/json"})
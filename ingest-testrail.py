@@ -3,22 +3,25 @@ import os
 import time
 import random
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
-import google.auth
 import requests
 from flask import jsonify
-from google.cloud import bigquery, secretmanager
 
-# ----------------- GCP / BigQuery -----------------
-_, PROJECT_ID = google.auth.default()
+import bq_current
+import bq_sink
+import content_hash
+import http_session
+import instrumentation
+import payload_store
+import profiling
+import rate_limit
+import secret_cache
 
+# ----------------- GCP / BigQuery -----------------
 DATASET_ID = os.environ.get("BQ_DATASET", "qa_metrics")
 TABLE_NAME = os.environ.get("BQ_TABLE", "testrail_runs")
-TABLE_ID = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_NAME}"
-
-bq = bigquery.Client(project=PROJECT_ID)
-sm = secretmanager.SecretManagerServiceClient()
 
 # Config
 OVERLAP_DAYS = int(os.environ.get("OVERLAP_DAYS", "14"))
@@ -27,12 +30,52 @@ MAX_RETRIES = int(os.environ.get("MAX_RETRIES", "6"))
 BASE_BACKOFF = float(os.environ.get("BASE_BACKOFF_SECONDS", "1.0"))
 MAX_BACKOFF = float(os.environ.get("MAX_BACKOFF_SECONDS", "45.0"))
 
+# GCP clients, the project and secrets are resolved on first use, so importing
+# the module and answering healthz never touch credentials or the metadata server.
+@lru_cache(maxsize=1)
+def _project_id() -> str:
+    import google.auth
+
+    return google.auth.default()[1]
+
+@lru_cache(maxsize=1)
+def _bq():
+    import bq_backend
+
+    return bq_backend.get_client(_project_id())
+
+@lru_cache(maxsize=1)
+def _sm():
+    from google.cloud import secretmanager
+
+    return secretmanager.SecretManagerServiceClient()
+
+def _table_id() -> str:
+    return f"{_project_id()}.{DATASET_ID}.{TABLE_NAME}"
+
+@lru_cache(maxsize=1)
+def _payloads() -> payload_store.PayloadStore:
+    # PAYLOAD_STORE=table|blob moves `payload` out of the rows (see payload_store.py).
+    return payload_store.PayloadStore(_bq(), "testrail_runs")
+
 # ----------------- Secrets -----------------
-def get_secret(name: str) -> str:
-    secret_name = f"projects/{PROJECT_ID}/secrets/{name}/versions/latest"
-    resp = sm.access_secret_version(request={"name": secret_name})
+def _access_secret(name: str) -> str:
+    secret_name = f"projects/{_project_id()}/secrets/{name}/versions/latest"
+    resp = _sm().access_secret_version(request={"name": secret_name})
     return resp.payload.data.decode("utf-8").strip()
 
+def _secret_clients() -> None:
+    # Build the lru_cache'd project id and client before prefetch starts its threads.
+    _project_id()
+    _sm()
+
+# Everything a run reads, prefetched in parallel when the run starts.
+SECRET_NAMES = ("TESTRAIL_BASE_URL", "TESTRAIL_USER", "TESTRAIL_API_KEY", "TESTRAIL_PROJECT_IDS", "TESTRAIL_PROJECT_ID")
+_SECRETS = secret_cache.SecretCache(_access_secret, prepare=_secret_clients)
+
+def get_secret(name: str) -> str:
+    return _SECRETS.get(name)
+
 def testrail_auth() -> Tuple[str, str]:
     return (get_secret("TESTRAIL_USER"), get_secret("TESTRAIL_API_KEY"))
 
@@ -43,19 +86,23 @@ def testrail_base_url() -> str:
     return base
 
 def testrail_project_ids() -> List[int]:
-    # Prefer plural secret if present, fallback to single
+    # Prefer plural secret if present, fallback to single. Missing secrets are
+    # negatively cached, so absent ones cost no round-trip on warm instances.
     try:
-        s = get_secret("TESTRAIL_PROJECT_IDS")
+        s = _SECRETS.get_optional("TESTRAIL_PROJECT_IDS") or ""
         ids = [int(x.strip()) for x in s.split(",") if x.strip()]
         if ids:
             return ids
-    except Exception:
-        pass
+    except Exception as exc:
+        print(json.dumps({"event": "testrail_secret_unusable", "secret": "TESTRAIL_PROJECT_IDS", "error": str(exc)}))
 
     try:
-        return [int(get_secret("TESTRAIL_PROJECT_ID"))]
-    except Exception:
-        return [int(os.environ.get("TESTRAIL_PROJECT_ID", "0"))] if os.environ.get("TESTRAIL_PROJECT_ID") else []
+        s = _SECRETS.get_optional("TESTRAIL_PROJECT_ID")
+        if s is not None:
+            return [int(s)]
+    except Exception as exc:
+        print(json.dumps({"event": "testrail_secret_unusable", "secret": "TESTRAIL_PROJECT_ID", "error": str(exc)}))
+    return [int(os.environ.get("TESTRAIL_PROJECT_ID", "0"))] if os.environ.get("TESTRAIL_PROJECT_ID") else []
 
 def as_int(value: Any) -> Optional[int]:
     if value is None or value == "":
@@ -73,6 +120,8 @@ def as_timestamp_iso(value: Any) -> Optional[str]:
 
 # ----------------- BigQuery -----------------
 def ensure_table() -> None:
+    from google.cloud import bigquery
+
     schema = [
         bigquery.SchemaField("project_id", "INT64"),
         bigquery.SchemaField("run_id", "INT64"),
@@ -94,21 +143,23 @@ def ensure_table() -> None:
         bigquery.SchemaField("config", "STRING"),
         bigquery.SchemaField("_ingested_at", "TIMESTAMP"),
         bigquery.SchemaField("payload", "STRING"),
+        bigquery.SchemaField("content_hash", "STRING"),
     ]
 
-    table = bigquery.Table(TABLE_ID, schema=schema)
+    table = bigquery.Table(_table_id(), schema=schema)
     table.time_partitioning = bigquery.TimePartitioning(
         type_=bigquery.TimePartitioningType.DAY, field="created_on"
     )
     table.clustering_fields = ["project_id", "run_id", "is_completed"]
-    bq.create_table(table, exists_ok=True)
+    _bq().create_table(table, exists_ok=True)
+    content_hash.ensure_column(_bq(), _table_id())
 
 def get_last_created_on() -> datetime:
     sql = f"""
       SELECT COALESCE(MAX(created_on), TIMESTAMP('1970-01-01')) AS last_created
-      FROM `{TABLE_ID}`
+      FROM `{_table_id()}`
     """
-    rows = list(bq.query(sql))
+    rows = list(_bq().query(sql))
     ts = rows[0]["last_created"]
     if ts is None or getattr(ts, "year", 1970) == 1970:
         return datetime.now(timezone.utc) - timedelta(days=30)
@@ -121,11 +172,18 @@ def get_last_created_on() -> datetime:
     return ts - timedelta(days=OVERLAP_DAYS)
 
 # ----------------- HTTP -----------------
-def request_with_retries(method: str, url: str, *, auth: Tuple[str,str]) -> requests.Response:
+def request_with_retries(
+    method: str,
+    url: str,
+    *,
+    auth: Tuple[str, str],
+    limiter: Optional[rate_limit.AdaptiveRateLimiter] = None,
+) -> requests.Response:
+    limiter = limiter or rate_limit.get_limiter("testrail")
     last_exc: Optional[Exception] = None
     for attempt in range(MAX_RETRIES):
         try:
-            r = requests.request(method, url, auth=auth, timeout=HTTP_TIMEOUT)
+            r = http_session.request(method, url, auth=auth, timeout=HTTP_TIMEOUT, limiter=limiter)
             if r.status_code in (429, 500, 502, 503, 504):
                 backoff = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt))
                 jitter = random.uniform(0, 0.25 * backoff)
@@ -244,15 +302,20 @@ def insert_rows(rows: List[Dict[str, Any]]) -> None:
         else:
             row_ids.append(None)
 
-    errors = bq.insert_rows_json(TABLE_ID, rows, row_ids=row_ids)
+    _payloads().offload(_table_id(), rows, "payload")
+    errors = bq_sink.write_rows(_bq(), _table_id(), rows, row_ids=row_ids)
     if errors:
         raise RuntimeError(errors)
 
 # ----------------- Entry -----------------
+@profiling.profiled("ingest-testrail")
 def hello_http(request):
     if request.path.endswith("/healthz") or request.method == "GET":
         return (jsonify({"status": "OK", "service": "ingest-testrail", "ready": True}), 200)
 
+    instrumentation.start_run("ingest-testrail")
+    instrumentation.phase("config")
+    _SECRETS.prefetch(SECRET_NAMES)
     try:
         body = request.get_json(silent=True) or {}
         days_raw = body.get("days")
@@ -260,7 +323,16 @@ def hello_http(request):
         if days_raw is not None:
             days_applied = as_int(days_raw)
             if days_applied is None or days_applied < 1 or days_applied > 90:
-                return (jsonify({"status": "ERROR", "message": "Invalid 'days'. Expected integer in range 1..90."}), 400)
+                return (
+                    jsonify(
+                        {
+                            "status": "ERROR",
+                            "message": "Invalid 'days'. Expected integer in range 1..90.",
+                            "instrumentation": instrumentation.finish(status="error"),
+                        }
+                    ),
+                    400,
+                )
 
         ensure_table()
         auth = testrail_auth()
@@ -275,24 +347,44 @@ def hello_http(request):
 
         pids = testrail_project_ids()
         if not pids:
-            return (jsonify({"status":"ERROR","message":"No TESTRAIL_PROJECT_IDS/TESTRAIL_PROJECT_ID configured"}), 500)
-
+            return (
+                jsonify(
+                    {
+                        "status": "ERROR",
+                        "message": "No TESTRAIL_PROJECT_IDS/TESTRAIL_PROJECT_ID configured",
+                        "instrumentation": instrumentation.finish(status="error"),
+                    }
+                ),
+                500,
+            )
+
+        # Runs whose content is unchanged since their newest stored row are not re-inserted.
+        hashes = content_hash.load_cache(_bq(), _table_id(), ["run_id"])
         all_rows: List[Dict[str, Any]] = []
+        instrumentation.phase("api_fetch")
         for pid in pids:
-            all_rows.extend(fetch_runs(pid, since_ts, auth=auth, base=base))
+            runs = fetch_runs(pid, since_ts, auth=auth, base=base)
+            instrumentation.incr("records_parsed", len(runs))
+            all_rows.extend(hashes.changed(runs))
 
+        instrumentation.phase("bq_write")
         insert_rows(all_rows)
+        instrumentation.phase("bq_merge")
+        current_table = bq_current.merge_run(_bq(), _table_id()) if bq_current.merge_enabled(body) else None
         return (
             jsonify(
                 {
                     "status": "OK",
                     "rows": len(all_rows),
+                    "skipped_unchanged": hashes.skipped,
+                    "current_table": current_table,
                     "since": since_ts.isoformat(),
                     "effective_since": since_ts.isoformat(),
                     "days_applied": days_applied,
+                    "instrumentation": instrumentation.finish(status="ok"),
                 }
             ),
             200,
         )
     except Exception as e:
-        return (jsonify({"status":"ERROR","message":str(e)}), 500)
+        return (jsonify({"status":"ERROR","message":str(e), "instrumentation": instrumentation.finish(status="error")}), 500)
@@ -0,0 +1,52 @@
+"""Incremental refresh of the materialized Jira rollup tables in `qa_metrics`.
+
+`refresh_active_bug_count_daily` runs `bigquery/jira_active_bug_count_daily_refresh.sql`
+(the same script used for manual backfills) after an ingest has written new
+issues or status changes. The script only recomputes days from the first one
+whose opened/fixed counts changed, so a routine run touches a handful of rows.
+
+Env vars:
+- JIRA_ROLLUPS_REFRESH: "false" skips the refresh (e.g. while backfilling).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+ACTIVE_BUG_COUNT_REFRESH_SQL = Path(__file__).resolve().parent / "bigquery" / "jira_active_bug_count_daily_refresh.sql"
+# Dataset the .sql files are written against.
+_SQL_DATASET = "qa_metrics"
+
+
+def refresh_enabled() -> bool:
+    raw = (os.environ.get("JIRA_ROLLUPS_REFRESH") or "true").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _render(sql: str, dataset_id: str) -> str:
+    if dataset_id == _SQL_DATASET:
+        return sql
+    return sql.replace(f"`{_SQL_DATASET}.", f"`{dataset_id}.")
+
+
+def refresh_active_bug_count_daily(client: Any, dataset_id: str = _SQL_DATASET) -> Dict[str, Any]:
+    """Bring `jira_active_bug_count_daily` up to date; returns a summary for the HTTP response.
+
+    Best effort: failures are logged and reported (`ok: false`) instead of failing
+    the ingest that triggered the refresh; the next run picks the change up again.
+    """
+    if not refresh_enabled():
+        return {"ok": True, "skipped": True}
+    try:
+        sql = _render(ACTIVE_BUG_COUNT_REFRESH_SQL.read_text(encoding="utf-8"), dataset_id)
+        rows = list(client.query(sql).result())
+    except Exception as exc:  # noqa: BLE001 - a stale rollup must not fail the ingest
+        LOGGER.warning("ACTIVE_BUG_COUNT_REFRESH_FAILED dataset=%s error=%s", dataset_id, exc)
+        return {"ok": False, "error": str(exc)[:500]}
+    refresh_from: Optional[Any] = rows[0][0] if rows else None
+    return {"ok": True, "refreshed_from": refresh_from.isoformat() if refresh_from else None}
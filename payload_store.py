@@ -0,0 +1,294 @@
+"""Offload raw API payloads out of the main ingest rows (opt-in).
+
+The legacy writers keep the full upstream JSON in every row (`raw_json` for
+Jira issues/changelog and GameBench, `payload` for Bugsnag/TestRail). Those are
+by far the widest columns, so every `SELECT *` (the `*_latest` views included)
+reads them and every streaming insert ships them.
+
+`PAYLOAD_STORE` selects where they go:
+- "inline" (default): unchanged, the payload stays in its column.
+- "table": one row per distinct payload in `PAYLOAD_TABLE_ID` (default
+  `raw_payloads`, same dataset as the ingest table), partitioned by `_stored_at`
+  and clustered by `payload_hash`.
+- "blob": one object per distinct payload under `PAYLOAD_BLOB_URI`, either
+  `gs://bucket/prefix` (needs `google-cloud-storage`) or a local directory, at
+  `<uri>/<source>/<hash[:2]>/<hash>.json[.zst]`.
+
+In both offload modes the payload column is written as NULL and the row gets a
+`payload_hash` column (sha256 of the UTF-8 JSON text, added to the table on
+first use). Payloads are written before the rows that reference them, and each
+hash is written once: within a process via an in-memory set, and across runs
+because table mode first asks the side table which hashes it already holds (one
+query per batch) and blob mode skips objects that already exist. `gs://`
+uploads run on up to `PAYLOAD_UPLOAD_WORKERS` threads (default 8).
+`PAYLOAD_COMPRESSION` is "zstd" (default,
+level `PAYLOAD_ZSTD_LEVEL`, needs `zstandard`) or "none"; the table's
+`encoding` column records which one was used.
+
+Reading a payload back from the table (uncompressed rows only; zstd ones go
+through `load_payload`):
+
+    SELECT SAFE_CONVERT_BYTES_TO_STRING(payload) FROM `qa_metrics.raw_payloads`
+    WHERE payload_hash = @hash AND encoding = 'identity'
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import bq_sink
+
+LOGGER = logging.getLogger(__name__)
+
+HASH_COLUMN = "payload_hash"
+_SEEN_LIMIT = 200_000
+
+
+def _upload_workers() -> int:
+    try:
+        return max(1, int(os.environ.get("PAYLOAD_UPLOAD_WORKERS", "8")))
+    except ValueError:
+        return 8
+
+
+def store_mode() -> str:
+    mode = (os.environ.get("PAYLOAD_STORE") or "inline").strip().lower()
+    if mode not in {"inline", "table", "blob"}:
+        raise ValueError(f"Unsupported PAYLOAD_STORE={mode!r}; expected inline, table or blob")
+    return mode
+
+
+def _compression() -> str:
+    raw = (os.environ.get("PAYLOAD_COMPRESSION") or "zstd").strip().lower()
+    if raw not in {"zstd", "none"}:
+        raise ValueError(f"Unsupported PAYLOAD_COMPRESSION={raw!r}; expected zstd or none")
+    return raw
+
+
+def payload_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "identity":
+        return data
+    import zstandard
+
+    level = int(os.environ.get("PAYLOAD_ZSTD_LEVEL", "3"))
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "identity":
+        return data
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _table_fqn(table_id: Any) -> str:
+    if isinstance(table_id, str):
+        return table_id
+    return f"{table_id.project}.{table_id.dataset_id}.{table_id.table_id}"
+
+
+class PayloadStore:
+    """Per-process payload writer for one ingest source (e.g. "jira_issues")."""
+
+    def __init__(self, client: Any, source: str, mode: Optional[str] = None) -> None:
+        self.client = client
+        self.source = source
+        self.mode = mode or store_mode()
+        self.encoding = "zstd" if self.enabled and _compression() == "zstd" else "identity"
+        self._lock = threading.Lock()
+        self._seen: set = set()
+        self._hash_columns: set = set()
+        self._side_tables: set = set()
+        self._bucket: Any = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "inline"
+
+    def offload(self, table_id: Any, rows: List[Dict[str, Any]], column: str) -> List[Dict[str, Any]]:
+        """Move `column` of every row into the store and stamp `payload_hash`.
+
+        Returns the rows unchanged when the store is inline. Payloads are
+        persisted before returning, so callers write the rows afterwards.
+        """
+        if not self.enabled or not rows:
+            return rows
+        fqn = _table_fqn(table_id)
+        self._ensure_hash_column(fqn)
+        pending: Dict[str, str] = {}
+        for row in rows:
+            text = row.get(column)
+            if text is None:
+                continue
+            digest = payload_hash(text)
+            row[column] = None
+            row[HASH_COLUMN] = digest
+            pending.setdefault(digest, text)
+        with self._lock:
+            fresh = [(h, t) for h, t in pending.items() if h not in self._seen]
+        if fresh:
+            if self.mode == "table":
+                self._write_table(fqn, fresh)
+            else:
+                self._write_blobs(fresh)
+            with self._lock:
+                if len(self._seen) > _SEEN_LIMIT:
+                    self._seen.clear()
+                self._seen.update(h for h, _ in fresh)
+        return rows
+
+    def _ensure_hash_column(self, fqn: str) -> None:
+        if fqn in self._hash_columns:
+            return
+        from google.cloud import bigquery
+
+        table = self.client.get_table(fqn)
+        if all(f.name != HASH_COLUMN for f in table.schema):
+            table.schema = list(table.schema) + [bigquery.SchemaField(HASH_COLUMN, "STRING")]
+            self.client.update_table(table, ["schema"])
+            LOGGER.info("PAYLOAD_HASH_COLUMN_ADDED table=%s", fqn)
+        self._hash_columns.add(fqn)
+
+    def _side_table(self, fqn: str) -> str:
+        project, dataset, _ = fqn.split(".")
+        side = f"{project}.{dataset}.{os.environ.get('PAYLOAD_TABLE_ID', 'raw_payloads')}"
+        if side not in self._side_tables:
+            from google.cloud import bigquery
+
+            table = bigquery.Table(
+                side,
+                schema=[
+                    bigquery.SchemaField("payload_hash", "STRING"),
+                    bigquery.SchemaField("source", "STRING"),
+                    bigquery.SchemaField("encoding", "STRING"),
+                    bigquery.SchemaField("size_bytes", "INT64"),
+                    bigquery.SchemaField("payload", "BYTES"),
+                    bigquery.SchemaField("_stored_at", "TIMESTAMP"),
+                ],
+            )
+            table.time_partitioning = bigquery.TimePartitioning(field="_stored_at")
+            table.clustering_fields = ["payload_hash"]
+            self.client.create_table(table, exists_ok=True)
+            self._side_tables.add(side)
+        return side
+
+    def _stored_hashes(self, side: str, digests: Iterable[str]) -> Set[str]:
+        """Hashes of `digests` already in the side table (empty when the lookup fails)."""
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ArrayQueryParameter("hashes", "STRING", list(digests))]
+        )
+        try:
+            job = self.client.query(
+                f"SELECT DISTINCT payload_hash FROM `{side}` WHERE payload_hash IN UNNEST(@hashes)",
+                job_config=job_config,
+            )
+            return {row["payload_hash"] for row in job.result()}
+        except Exception as exc:  # noqa: BLE001 - a duplicate payload row is harmless, a failed run is not
+            LOGGER.warning("PAYLOAD_STORED_LOOKUP_FAILED table=%s error=%s", side, exc)
+            return set()
+
+    def _write_table(self, fqn: str, payloads: Sequence[Tuple[str, str]]) -> None:
+        side = self._side_table(fqn)
+        stored = self._stored_hashes(side, [digest for digest, _ in payloads])
+        if stored:
+            LOGGER.info("PAYLOAD_ALREADY_STORED table=%s skipped=%s", side, len(stored))
+            payloads = [(digest, text) for digest, text in payloads if digest not in stored]
+            if not payloads:
+                return
+        stored_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        rows = []
+        for digest, text in payloads:
+            data = text.encode("utf-8")
+            rows.append(
+                {
+                    "payload_hash": digest,
+                    "source": self.source,
+                    "encoding": self.encoding,
+                    "size_bytes": len(data),
+                    "payload": base64.b64encode(_compress(data, self.encoding)).decode("ascii"),
+                    "_stored_at": stored_at,
+                }
+            )
+        # insertId = hash: a retried batch does not duplicate payloads.
+        errors = bq_sink.write_rows(self.client, side, rows, row_ids=[r["payload_hash"] for r in rows])
+        if errors:
+            raise RuntimeError(f"Payload store insert failed: {errors[:3]}")
+
+    def _blob_name(self, digest: str) -> str:
+        suffix = ".json.zst" if self.encoding == "zstd" else ".json"
+        return f"{self.source}/{digest[:2]}/{digest}{suffix}"
+
+    def _write_blobs(self, payloads: Sequence[Tuple[str, str]]) -> None:
+        uri = (os.environ.get("PAYLOAD_BLOB_URI") or "").strip().rstrip("/")
+        if not uri:
+            raise ValueError("PAYLOAD_STORE=blob requires PAYLOAD_BLOB_URI")
+        if uri.startswith("gs://"):
+            self._upload_gcs(uri, payloads)
+            return
+        root = Path(uri[len("file://"):] if uri.startswith("file://") else uri)
+        for digest, text in payloads:
+            path = root / self._blob_name(digest)
+            if path.exists():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(_compress(text.encode("utf-8"), self.encoding))
+
+    def _upload_gcs(self, uri: str, payloads: Sequence[Tuple[str, str]]) -> None:
+        bucket_name, _, prefix = uri[len("gs://"):].partition("/")
+        if self._bucket is None or self._bucket.name != bucket_name:
+            from google.cloud import storage
+
+            self._bucket = storage.Client().bucket(bucket_name)
+        bucket = self._bucket
+
+        def upload(digest: str, text: str) -> bool:
+            name = f"{prefix}/{self._blob_name(digest)}" if prefix else self._blob_name(digest)
+            blob = bucket.blob(name)
+            if blob.exists():
+                return False
+            try:
+                # if_generation_match=0: only create; a concurrent writer of the same hash wins harmlessly.
+                blob.upload_from_string(_compress(text.encode("utf-8"), self.encoding), if_generation_match=0)
+            except Exception as exc:
+                if getattr(exc, "code", None) != 412:
+                    raise
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=min(_upload_workers(), len(payloads)), thread_name_prefix="payloads") as pool:
+            futures = [pool.submit(upload, digest, text) for digest, text in payloads]
+        uploaded = sum(1 for f in futures if f.result())
+        LOGGER.info("PAYLOAD_BLOBS_WRITTEN bucket=%s uploaded=%s skipped=%s", bucket_name, uploaded, len(payloads) - uploaded)
+
+
+def load_payload(client: Any, table_id: Any, digest: str) -> Optional[str]:
+    """Fetch a payload back from the side table by hash (None when missing)."""
+    from google.cloud import bigquery
+
+    project, dataset, _ = _table_fqn(table_id).split(".")
+    side = f"{project}.{dataset}.{os.environ.get('PAYLOAD_TABLE_ID', 'raw_payloads')}"
+    job = client.query(
+        f"SELECT encoding, payload FROM `{side}` WHERE payload_hash = @hash LIMIT 1",
+        job_config=bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("hash", "STRING", digest)]
+        ),
+    )
+    rows = list(job.result())
+    if not rows:
+        return None
+    return _decompress(rows[0]["payload"], rows[0]["encoding"]).decode("utf-8")
@@ -0,0 +1,164 @@
+"""Per-process Secret Manager cache for the legacy ingest scripts.
+
+Every Secret Manager round-trip sits on the critical path of an invocation
+(50-200 ms each), and warm instances used to pay them again on every run.
+`SecretCache` wraps the script's own fetch function (`name -> value`):
+
+- values are kept for SECRET_CACHE_TTL_SECONDS (default 600), so a rotated
+  secret is picked up within that window without a redeploy;
+- a secret that does not exist (NotFound / 404) is remembered for
+  SECRET_NEGATIVE_TTL_SECONDS (default 60) and raises `SecretNotFound` without
+  another round-trip; `get_optional` turns that into a default;
+- `prefetch(names)` fetches everything a service declares in parallel (missing
+  ones are negatively cached, other errors are left for the `get` that needs
+  the value), so a cold run pays one round-trip instead of one per secret;
+- concurrent lookups of the same name share a single fetch;
+- `prepare`, if given, runs once before the prefetch threads start, so the
+  lazily built Secret Manager client and project id are resolved on one thread
+  instead of by every worker at once on a cold instance.
+
+Fetches are recorded as the `secretmanager access` endpoint of the active
+instrumentation run, with `secret_cache_hits` / `secret_cache_misses` counters.
+SECRET_CACHE_TTL_SECONDS=0 disables caching (every `get` fetches).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import instrumentation
+
+LOGGER = logging.getLogger(__name__)
+
+_MAX_PREFETCH_WORKERS = 8
+
+
+class SecretNotFound(KeyError):
+    """The secret (or its `latest` version) does not exist."""
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.environ.get(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _is_not_found(exc: BaseException) -> bool:
+    # google.api_core.exceptions.NotFound carries code == HTTPStatus.NOT_FOUND;
+    # checking the code keeps api_core out of the import path.
+    return isinstance(exc, SecretNotFound) or getattr(exc, "code", None) == 404
+
+
+class SecretCache:
+    """TTL cache in front of `fetch(name) -> str`, with negative caching and parallel prefetch."""
+
+    def __init__(
+        self,
+        fetch: Callable[[str], str],
+        *,
+        ttl_s: Optional[float] = None,
+        negative_ttl_s: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        prepare: Optional[Callable[[], object]] = None,
+    ) -> None:
+        self._fetch = fetch
+        self._prepare = prepare
+        self.ttl_s = _env_float("SECRET_CACHE_TTL_SECONDS", 600.0) if ttl_s is None else ttl_s
+        self.negative_ttl_s = _env_float("SECRET_NEGATIVE_TTL_SECONDS", 60.0) if negative_ttl_s is None else negative_ttl_s
+        self._clock = clock
+        # name -> (expires_at, value); value None marks a missing secret.
+        self._entries: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _cached(self, name: str) -> Optional[Tuple[float, Optional[str]]]:
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] > self._clock():
+            return entry
+        return None
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(name)
+            if lock is None:
+                lock = self._locks[name] = threading.Lock()
+            return lock
+
+    def _load(self, name: str) -> Optional[str]:
+        entry = self._cached(name)
+        if entry is not None:
+            instrumentation.incr("secret_cache_hits")
+            return entry[1]
+        with self._lock_for(name):
+            entry = self._cached(name)  # filled by a concurrent caller while we waited
+            if entry is not None:
+                instrumentation.incr("secret_cache_hits")
+                return entry[1]
+            instrumentation.incr("secret_cache_misses")
+            value: Optional[str]
+            try:
+                with instrumentation.timed("secretmanager access"):
+                    value = self._fetch(name)
+                ttl = self.ttl_s
+            except Exception as exc:
+                if not _is_not_found(exc):
+                    raise
+                LOGGER.info("SECRET_NOT_FOUND name=%s", name)
+                value, ttl = None, self.negative_ttl_s
+            if ttl > 0:
+                self._entries[name] = (self._clock() + ttl, value)
+            return value
+
+    def get(self, name: str) -> str:
+        """Value of `name`; raises `SecretNotFound` if it does not exist."""
+        value = self._load(name)
+        if value is None:
+            raise SecretNotFound(name)
+        return value
+
+    def get_optional(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Value of `name`, or `default` if it does not exist. Other errors propagate."""
+        value = self._load(name)
+        return default if value is None else value
+
+    def prefetch(self, names: Iterable[str]) -> List[str]:
+        """Fetch every name not already cached, in parallel; returns the ones that failed."""
+        pending = [n for n in dict.fromkeys(names) if self._cached(n) is None]
+        if not pending:
+            return []
+        if self._prepare is not None:
+            try:
+                self._prepare()
+            except Exception as exc:
+                # Same failure every fetch would hit; leave it to the `get` that needs a value.
+                LOGGER.warning("SECRET_PREFETCH_FAILED names=%s error=%s", ",".join(pending), exc)
+                return pending
+        if len(pending) == 1:
+            try:
+                self._load(pending[0])
+                return []
+            except Exception as exc:
+                LOGGER.warning("SECRET_PREFETCH_FAILED name=%s error=%s", pending[0], exc)
+                return pending
+        failed: List[str] = []
+        with ThreadPoolExecutor(max_workers=min(_MAX_PREFETCH_WORKERS, len(pending)), thread_name_prefix="secrets") as pool:
+            futures = {name: pool.submit(self._load, name) for name in pending}
+        for name, future in futures.items():
+            exc = future.exception()
+            if exc is not None:
+                LOGGER.warning("SECRET_PREFETCH_FAILED name=%s error=%s", name, exc)
+                failed.append(name)
+        return failed
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop `name` (or everything) so the next `get` fetches again."""
+        if name is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(name, None)
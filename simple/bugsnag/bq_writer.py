@@ -0,0 +1,243 @@
+"""Background BigQuery writer that overlaps row inserts with upstream fetching.
+
+Fetch loops hand row batches to `BackgroundWriter.submit`; a single writer thread
+drains them through `bq.insert_rows` while the caller keeps paging the API.
+
+- Backpressure: at most `BQ_WRITER_MAX_PENDING` batches (default 4) wait in the
+  queue; `submit` blocks once it is full.
+- Deadline: `close(deadline_epoch=...)` waits for queued batches until the
+  deadline, then discards whatever has not started (reported as `dropped_rows`
+  and `dropped_tags`). Spooled bulk rows count the same way: no load job starts
+  after the deadline, so rows still in the spool then are dropped and reported.
+  Callers treat a non-zero `dropped_rows` as a partial run.
+- Errors: the first insert failure stops the writer and is re-raised as
+  `BackgroundWriteError` in the caller on the next `submit`/`flush`/`close`.
+  A failed bulk load names its table and the tags of every spooled batch (`tags`).
+
+`BQ_WRITER_ENABLED=false` makes `submit` insert inline (no thread).
+
+With a `load_fn`, batches beyond `BQ_BULK_THRESHOLD_ROWS` per table are spooled
+(`bq_sink.BulkLoader`) and appended with one load job on `flush`/`close`.
+
+This file is duplicated in every simple/<service>/ dir; keep the copies identical.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import bq_sink
+
+LOGGER = logging.getLogger(__name__)
+
+InsertFn = Callable[[Any, str, List[Dict[str, Any]]], int]
+LoadFn = Callable[[Any, str, str], int]
+
+
+class BackgroundWriteError(RuntimeError):
+    """Raised in the caller thread when a background insert failed."""
+
+    def __init__(self, table: str, tag: Optional[str], cause: BaseException, *, tags: Optional[set] = None):
+        super().__init__(f"BigQuery background insert into {table} failed: {cause}")
+        self.table = table
+        self.tag = tag
+        self.cause = cause
+        self.tags = set(tags) if tags is not None else ({tag} if tag is not None else set())
+
+
+def writer_enabled() -> bool:
+    raw = (os.environ.get("BQ_WRITER_ENABLED") or "true").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _max_pending() -> int:
+    try:
+        return max(1, int(os.environ.get("BQ_WRITER_MAX_PENDING", "4")))
+    except ValueError:
+        return 4
+
+
+class BackgroundWriter:
+    """Single-thread, bounded-queue writer around an `insert_rows(client, table, rows)` callable."""
+
+    def __init__(
+        self,
+        client: Any,
+        insert_fn: InsertFn,
+        *,
+        load_fn: Optional[LoadFn] = None,
+        max_pending: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ) -> None:
+        self._client = client
+        self._insert_fn = insert_fn
+        self._bulk: Optional[bq_sink.BulkLoader] = None
+        if load_fn is not None:
+            self._bulk = bq_sink.BulkLoader(lambda table, path: load_fn(client, table, path))
+        self._enabled = writer_enabled() if enabled is None else enabled
+        self._queue: "queue.Queue[Optional[Tuple[str, List[Dict[str, Any]], Optional[str]]]]" = queue.Queue(
+            maxsize=max_pending or _max_pending()
+        )
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._discard = False
+        self._error: Optional[BackgroundWriteError] = None
+        self._inserted: Dict[str, int] = {}
+        self.dropped_rows = 0
+        self.dropped_tags: set = set()
+        self._thread: Optional[threading.Thread] = None
+        if self._enabled:
+            self._thread = threading.Thread(target=self._run, name="bq-writer", daemon=True)
+            self._thread.start()
+
+    # -- caller side -------------------------------------------------------
+
+    def submit(self, table: str, rows: List[Dict[str, Any]], *, tag: Optional[str] = None) -> None:
+        """Queue a batch for insertion (blocks while the queue is full)."""
+        self._raise_if_failed()
+        if not rows:
+            return
+        batch = list(rows)
+        if not self._enabled:
+            try:
+                self._write(table, batch, tag)
+            except Exception as exc:
+                raise BackgroundWriteError(table, tag, exc) from exc
+            return
+        with self._cond:
+            self._pending += 1
+        while True:
+            try:
+                self._queue.put((table, batch, tag), timeout=0.5)
+                return
+            except queue.Full:
+                if self._error is not None:
+                    with self._cond:
+                        self._pending -= 1
+                        self._cond.notify_all()
+                    self._raise_if_failed()
+
+    def flush(self, deadline_epoch: Optional[float] = None) -> bool:
+        """Wait until every queued batch is written; False if the deadline came first."""
+        with self._cond:
+            while self._pending > 0 and self._error is None:
+                if deadline_epoch is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline_epoch - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            drained = self._pending == 0
+        self._raise_if_failed()
+        if drained:
+            self._finish_bulk(deadline_epoch)
+        return drained
+
+    def close(self, deadline_epoch: Optional[float] = None) -> Dict[str, int]:
+        """Flush (bounded by `deadline_epoch`), stop the thread and return rows inserted per table."""
+        try:
+            if not self.flush(deadline_epoch):
+                self._discard = True
+                LOGGER.warning("BQ_WRITER_DEADLINE_DISCARD pending_batches=%s", self._pending)
+        finally:
+            self._stop()
+        self._raise_if_failed()
+        if self._discard:
+            self._finish_bulk(deadline_epoch)
+        return dict(self._inserted)
+
+    def abort(self) -> None:
+        """Stop without waiting for queued batches (used when the caller already failed)."""
+        self._discard = True
+        self._stop()
+        if self._bulk is not None:
+            self._bulk.abort()
+
+    def inserted(self, table: str) -> int:
+        return self._inserted.get(table, 0)
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # -- writer thread -----------------------------------------------------
+
+    def _stop(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _count(self, table: str, n: int) -> None:
+        self._inserted[table] = self._inserted.get(table, 0) + int(n or 0)
+
+    def _write(self, table: str, rows: List[Dict[str, Any]], tag: Optional[str] = None) -> None:
+        if self._bulk is not None and self._bulk.route(table, rows, tag=tag):
+            return
+        self._count(table, self._insert_fn(self._client, table, rows))
+
+    def _finish_bulk(self, deadline_epoch: Optional[float] = None) -> None:
+        if self._bulk is None or not self._bulk.pending_rows():
+            return
+        if deadline_epoch is not None and time.time() >= deadline_epoch:
+            self._drop_bulk()
+            return
+        try:
+            loaded = self._bulk.finish()
+        except bq_sink.BulkLoadError as exc:
+            tag = next(iter(exc.tags)) if len(exc.tags) == 1 else None
+            self._error = BackgroundWriteError(str(exc.table), tag, exc.cause, tags=exc.tags)
+            raise self._error from exc
+        except Exception as exc:
+            self._error = BackgroundWriteError("<bulk load>", None, exc)
+            raise self._error from exc
+        for table, n in loaded.items():
+            self._count(table, n)
+
+    def _drop_bulk(self) -> None:
+        spooled, tags = self._bulk.pending_rows(), self._bulk.pending_tags()
+        self._bulk.abort()
+        self.dropped_rows += spooled
+        self.dropped_tags |= tags
+        LOGGER.warning("BQ_WRITER_DEADLINE_DISCARD spooled_rows=%s", spooled)
+
+    def _drop(self, rows: List[Dict[str, Any]], tag: Optional[str]) -> None:
+        self.dropped_rows += len(rows)
+        if tag is not None:
+            self.dropped_tags.add(tag)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            table, rows, tag = item
+            try:
+                if self._discard or self._error is not None:
+                    self._drop(rows, tag)
+                else:
+                    self._write(table, rows, tag)
+            except Exception as exc:
+                LOGGER.error("BQ_WRITER_INSERT_FAILED table=%s tag=%s error=%s", table, tag, exc)
+                self._error = BackgroundWriteError(table, tag, exc)
+                self._drop(rows, tag)
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify_all()
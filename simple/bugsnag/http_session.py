@@ -0,0 +1,225 @@
+"""Pooled keep-alive HTTP sessions shared by the ingest services.
+
+Every upstream host (Jira, TestRail, Bugsnag, GameBench) gets exactly one
+``requests.Session`` with a sized connection pool, so paginated calls reuse
+TCP/TLS connections instead of paying a fresh handshake per request.
+
+Env vars:
+- HTTP_POOL_CONNECTIONS: number of urllib3 host pools cached per session (default 4).
+- HTTP_POOL_MAXSIZE: max connections kept open per host (default 10).
+- HTTP_KEEPALIVE: "true" (default) keeps connections open between calls;
+  "false" sends ``Connection: close`` on every request.
+- HTTP_TCP_KEEPALIVE_S: idle seconds before TCP keep-alive probes are sent on
+  pooled sockets (default 60, 0 disables the socket option).
+- HTTP_MAX_CONCURRENCY_PER_HOST: max in-flight requests per host across all
+  threads (default: HTTP_POOL_MAXSIZE).
+- HTTP_MAX_COOLDOWN_S: upper bound for the shared 429 ``Retry-After`` cooldown
+  (default 15).
+
+A 429 answer with ``Retry-After`` puts the whole host on cooldown, so worker
+threads sharing a host back off together instead of hammering it one by one.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import instrumentation
+
+_SESSIONS: Dict[str, requests.Session] = {}
+_HOST_SLOTS: Dict[str, threading.BoundedSemaphore] = {}
+_COOLDOWN_UNTIL: Dict[str, float] = {}
+_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = (os.environ.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return default
+
+
+def _keepalive_enabled() -> bool:
+    raw = (os.environ.get("HTTP_KEEPALIVE") or "true").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _socket_options(idle_s: int) -> List[Tuple[int, int, int]]:
+    from urllib3.connection import HTTPConnection
+
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle_s))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, idle_s // 4)))
+    return options
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that enables TCP keep-alive probes on pooled sockets."""
+
+    def __init__(self, *, tcp_keepalive_s: int, **kwargs: Any) -> None:
+        self._tcp_keepalive_s = tcp_keepalive_s
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        if self._tcp_keepalive_s > 0:
+            kwargs["socket_options"] = _socket_options(self._tcp_keepalive_s)
+        super().init_poolmanager(*args, **kwargs)
+
+
+def host_key(url: str) -> str:
+    """Return the ``scheme://host[:port]`` pool key for a URL."""
+    parts = urlsplit(url)
+    return f"{(parts.scheme or 'https').lower()}://{parts.netloc.lower()}"
+
+
+def _new_session() -> requests.Session:
+    pool_maxsize = max(1, _env_int("HTTP_POOL_MAXSIZE", 10))
+    adapter = _KeepAliveAdapter(
+        tcp_keepalive_s=_env_int("HTTP_TCP_KEEPALIVE_S", 60),
+        pool_connections=max(1, _env_int("HTTP_POOL_CONNECTIONS", 4)),
+        pool_maxsize=pool_maxsize,
+        # Retries stay in the callers, which already handle 429/5xx and Retry-After.
+        max_retries=0,
+        pool_block=False,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not _keepalive_enabled():
+        session.headers["Connection"] = "close"
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the shared session for the host of ``url`` (created on first use)."""
+    key = host_key(url)
+    session = _SESSIONS.get(key)
+    if session is not None:
+        return session
+    with _LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = _new_session()
+            _SESSIONS[key] = session
+    return session
+
+
+def _host_slot(key: str) -> threading.BoundedSemaphore:
+    slot = _HOST_SLOTS.get(key)
+    if slot is not None:
+        return slot
+    with _LOCK:
+        slot = _HOST_SLOTS.get(key)
+        if slot is None:
+            limit = _env_int("HTTP_MAX_CONCURRENCY_PER_HOST", _env_int("HTTP_POOL_MAXSIZE", 10))
+            slot = threading.BoundedSemaphore(max(1, limit))
+            _HOST_SLOTS[key] = slot
+    return slot
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header (delta-seconds or HTTP-date) into seconds."""
+    raw = (value or "").strip()
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def note_retry_after(url: str, seconds: float) -> None:
+    """Put the host of ``url`` on cooldown for ``seconds`` (capped by HTTP_MAX_COOLDOWN_S)."""
+    seconds = min(max(0.0, seconds), float(_env_int("HTTP_MAX_COOLDOWN_S", 15)))
+    if seconds <= 0:
+        return
+    key = host_key(url)
+    until = time.monotonic() + seconds
+    with _LOCK:
+        if until > _COOLDOWN_UNTIL.get(key, 0.0):
+            _COOLDOWN_UNTIL[key] = until
+
+
+def _wait_for_cooldown(key: str) -> None:
+    remaining = _COOLDOWN_UNTIL.get(key, 0.0) - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+def _endpoint(method: str, url: str, limiter: Any) -> str:
+    return instrumentation.endpoint_name(method, url, getattr(limiter, "name", None))
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    limiter: Any = None,
+    deadline_epoch: Optional[float] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """Drop-in replacement for ``requests.request`` that reuses pooled connections.
+
+    Waits out any shared 429 cooldown for the host and caps in-flight requests
+    per host; a 429 with ``Retry-After`` starts a new cooldown for every caller.
+    With ``limiter`` (see ``rate_limit.py``) a token is taken before sending and
+    the response is fed back so the limiter can adapt its rate; a limiter wait that
+    would pass ``deadline_epoch`` raises ``TimeoutError`` instead. Latency and
+    status are recorded per endpoint in the active ``instrumentation`` run.
+    """
+    key = host_key(url)
+    if limiter is not None:
+        limiter.acquire(deadline_epoch)
+    _wait_for_cooldown(key)
+    run = instrumentation.current()
+    started = time.perf_counter()
+    try:
+        with _host_slot(key):
+            resp = get_session(url).request(method, url, **kwargs)
+    except Exception:
+        if run is not None:
+            run.observe(_endpoint(method, url, limiter), (time.perf_counter() - started) * 1000, error=True)
+        raise
+    if run is not None:
+        run.observe(_endpoint(method, url, limiter), (time.perf_counter() - started) * 1000, status=resp.status_code)
+    if limiter is not None:
+        limiter.observe(resp)
+    if resp.status_code == 429:
+        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+        if retry_after is not None:
+            note_retry_after(url, retry_after)
+    return resp
+
+
+def close_all() -> None:
+    """Close every pooled session (mainly for tests and benchmarks)."""
+    with _LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+        _HOST_SLOTS.clear()
+        _COOLDOWN_UNTIL.clear()
+    for session in sessions:
+        session.close()
@@ -8,7 +8,12 @@ from typing import Any, Dict, List, Optional
 import requests
 from flask import jsonify
 
-from bq import get_client, insert_rows, run_query, table_ref
+import http_session
+import instrumentation
+import profiling
+from bq import fetch_rows, get_client, insert_rows, load_rows_file, run_query, table_ref
+from bq_writer import BackgroundWriteError, BackgroundWriter
+from rate_limit import AdaptiveRateLimiter, get_limiter, retry_delay
 
 try:
     from bq import validate_bq_env as _validate_bq_env
@@ -95,37 +100,47 @@ def _request_with_backoff(
     max_retries: int = 5,
     max_sleep_s: int = 15,
     deadline_epoch: float | None = None,
+    limiter: AdaptiveRateLimiter | None = None,
 ) -> requests.Response:
-    backoff = 2
-    for _ in range(max_retries):
+    """GET/POST with up to `max_retries` attempts on 429.
+
+    Between attempts it sleeps the shared limiter's pause (Retry-After, halved
+    rate), but never less than an exponential backoff (2s doubling, capped at
+    `max_sleep_s`). Sleeps are cut at `deadline_epoch`; a wait that would cross
+    it raises TimeoutError. The last 429 response is returned when retries run out.
+    """
+    limiter = limiter or get_limiter("bugsnag")
+    for attempt in range(1, max_retries + 1):
         if deadline_epoch is not None:
             remaining_s = int(deadline_epoch - time.time())
             if remaining_s <= 1:
                 raise TimeoutError("Deadline reached before BugSnag request")
             timeout = max(1, min(timeout, remaining_s - 1))
 
-        resp = requests.request(method=method, url=url, headers=headers, params=params, timeout=timeout)
+        resp = http_session.request(
+            method=method,
+            url=url,
+            headers=headers,
+            params=params,
+            timeout=timeout,
+            limiter=limiter,
+            deadline_epoch=None if deadline_epoch is None else deadline_epoch - 1,
+        )
         if resp.status_code != 429:
             return resp
+        if attempt == max_retries:
+            break
 
-        retry_after = resp.headers.get("Retry-After")
-        sleep_s = None
-        if retry_after and retry_after.isdigit():
-            sleep_s = int(retry_after)
-        if sleep_s is None:
-            sleep_s = backoff
-
-        sleep_budget = min(sleep_s, max_sleep_s)
+        sleep_budget = retry_delay(limiter, attempt, base_s=2.0, cap_s=max_sleep_s)
         if deadline_epoch is not None:
             remaining_s = int(deadline_epoch - time.time())
             if remaining_s <= 1:
                 raise TimeoutError("Deadline reached during BugSnag backoff")
             sleep_budget = min(sleep_budget, max(0, remaining_s - 1))
-
         if sleep_budget > 0:
             time.sleep(sleep_budget)
-        backoff = min(backoff * 2, max_sleep_s)
 
+    logger.warning("BUGSNAG_RATE_LIMIT_RETRIES_EXHAUSTED url=%s attempts=%s", url, max_retries)
     return resp
 
 
@@ -269,7 +284,7 @@ SELECT
   today,
   today,
   today,
-  "{}",
+  "{{}}",
   COUNT(*) * 1.0,
   NULL,
   NULL,
@@ -322,7 +337,7 @@ SELECT
   today,
   today,
   today,
-  "{}",
+  "{{}}",
   0.0,
   NULL,
   NULL,
@@ -350,7 +365,7 @@ SELECT
   today,
   today,
   today,
-  "{}",
+  "{{}}",
   COUNT(*) * 1.0,
   NULL,
   NULL,
@@ -368,7 +383,7 @@ SELECT
   today,
   today,
   today,
-  "{}",
+  "{{}}",
   0.0,
   NULL,
   NULL,
@@ -446,7 +461,7 @@ SELECT
   today,
   start90,
   today,
-  "{}",
+  "{{}}",
   COUNT(*) * 1.0,
   NULL,
   NULL,
@@ -536,17 +551,19 @@ LEFT JOIN present p USING(metric_id)
 WHERE p.metric_id IS NULL
 ORDER BY e.metric_id
 """
-    rows = list(run_query(client, sql, job_labels={"pipeline": "qa-metrics", "source": "bugsnag"}).result())
+    rows = fetch_rows(client, sql)
     return [str(r["metric_id"]) for r in rows]
 
 
+@profiling.profiled("bugsnag")
 def hello_http(request):
     if request.method not in ("POST", "GET"):
         return ("Method not allowed", 405)
 
     source = "bugsnag/main.py"
     service = (os.environ.get("K_SERVICE") or "unknown").strip() or "unknown"
-    current_phase = "config"
+    ingest_run = instrumentation.start_run("bugsnag")
+    current_phase = ingest_run.phase("config")
     current_project_id: Optional[str] = None
     bq_dataset = (os.environ.get("BQ_DATASET") or "qa_metrics_simple").strip()
     bq_location = (os.environ.get("BQ_LOCATION") or "EU").strip()
@@ -601,7 +618,7 @@ def hello_http(request):
         ingest_deadline = deadline - kpi_reserve_s
 
         ingest_ts = to_rfc3339(utc_now())
-        current_phase = "bq_setup"
+        current_phase = ingest_run.phase("bq_setup")
         client = get_client()
         _ensure_bugsnag_run_table()
 
@@ -611,41 +628,61 @@ def hello_http(request):
         deadline_projects: List[str] = []
         failed_projects: List[Dict[str, str]] = []
 
-        current_phase = "api_bugsnag"
-        for project_id in project_ids:
-            current_project_id = str(project_id)
-            if time.time() >= ingest_deadline:
-                deadline_projects.append(str(project_id))
-                continue
-
-            try:
-                errors, was_rl, hit_deadline = _list_errors(
-                    base_url,
-                    project_id,
-                    token,
-                    deadline_epoch=ingest_deadline,
-                    lookback_days=lookback_days,
-                )
-                if was_rl:
-                    rate_limited_projects.append(project_id)
-                if hit_deadline:
-                    deadline_projects.append(project_id)
-
-                total_source_errors += len(errors)
-                rows: List[Dict[str, Any]] = [_parse_error(e, ingest_ts, project_id) for e in errors]
-                if not rows and not was_rl and not hit_deadline:
-                    rows = [_empty_project_snapshot(ingest_ts, project_id)]
-
-                current_phase = "bq_write"
-                for i in range(0, len(rows), 500):
-                    if time.time() >= ingest_deadline:
+        current_phase = ingest_run.phase("api_bugsnag")
+        # BigQuery inserts run on a background writer so the next project's fetch
+        # overlaps the previous project's writes.
+        writer = BackgroundWriter(client, insert_rows, load_fn=load_rows_file)
+        try:
+            for project_id in project_ids:
+                current_project_id = str(project_id)
+                if time.time() >= ingest_deadline:
+                    deadline_projects.append(str(project_id))
+                    continue
+
+                try:
+                    errors, was_rl, hit_deadline = _list_errors(
+                        base_url,
+                        project_id,
+                        token,
+                        deadline_epoch=ingest_deadline,
+                        lookback_days=lookback_days,
+                    )
+                    if was_rl:
+                        rate_limited_projects.append(project_id)
+                    if hit_deadline:
                         deadline_projects.append(project_id)
-                        break
-                    total_inserted += insert_rows(client, "bugsnag_errors", rows[i : i + 500])
-                current_phase = "api_bugsnag"
 
-            except Exception as e:
+                    total_source_errors += len(errors)
+                    with instrumentation.span("parse"):
+                        rows: List[Dict[str, Any]] = [_parse_error(e, ingest_ts, project_id) for e in errors]
+                    instrumentation.incr("records_parsed", len(rows))
+                    if not rows and not was_rl and not hit_deadline:
+                        rows = [_empty_project_snapshot(ingest_ts, project_id)]
+
+                    for i in range(0, len(rows), 500):
+                        if time.time() >= ingest_deadline:
+                            deadline_projects.append(project_id)
+                            break
+                        writer.submit("bugsnag_errors", rows[i : i + 500], tag=str(project_id))
+
+                except BackgroundWriteError:
+                    raise
+                except Exception as e:
+                    failed_projects.append({"project_id": str(project_id), "error": str(e)})
+
+            current_phase = ingest_run.phase("bq_write")
+            total_inserted = writer.close(deadline_epoch=ingest_deadline).get("bugsnag_errors", 0)
+            deadline_projects.extend(sorted(writer.dropped_tags))
+        except BackgroundWriteError as e:
+            writer.abort()
+            # A failed bulk load loses rows from every project spooled into it.
+            for project_id in sorted(e.tags) or [e.table]:
                 failed_projects.append({"project_id": str(project_id), "error": str(e)})
+            total_inserted = writer.inserted("bugsnag_errors")
+        except BaseException:
+            writer.abort()
+            raise
+        current_phase = ingest_run.phase("api_bugsnag")
 
         if not failed_projects and not rate_limited_projects and not deadline_projects:
             api_ingest_status = "ok"
@@ -670,7 +707,7 @@ def hello_http(request):
         kpi_partial_coverage = has_usable_subset and not ingest_completed
         kpi_skipped_due_to_deadline = False
         if time.time() < deadline - 5:
-            current_phase = "kpis"
+            current_phase = ingest_run.phase("kpis")
             _compute_bugsnag_kpis()
             kpi_computed = True
             kpi_refresh_without_changes = total_source_errors == 0
@@ -707,7 +744,7 @@ def hello_http(request):
         else:
             run_status = "partial"
 
-        current_phase = "bq_run_marker"
+        current_phase = ingest_run.phase("bq_run_marker")
         _insert_bugsnag_run_marker(
             client,
             run_ts=ingest_ts,
@@ -753,6 +790,7 @@ def hello_http(request):
                 "deadline_projects": deadline_projects,
                 "failed_projects": failed_projects,
                 "lookback_days": lookback_days,
+                "instrumentation": ingest_run.finish(status=run_status),
             }
         )
     except ConfigError as e:
@@ -768,7 +806,7 @@ def hello_http(request):
                 "error": str(e),
             },
         )
-        return jsonify({"status": "error", "error": str(e)}), 400
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 400
     except Exception as e:
         logger.exception(
             "bugsnag ingest failed",
@@ -782,4 +820,4 @@ def hello_http(request):
                 "error": str(e),
             },
         )
-        return jsonify({"status": "error", "error": str(e)}), 500
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 500
@@ -0,0 +1,41 @@
+"""Where services get their BigQuery client: BigQuery, or the local stand-in.
+
+`get_client()` returns `bigquery.Client(project=...)`. With `BQ_BACKEND=local`
+it returns the DuckDB-backed `LocalBigQueryClient` from
+`benchmarks/local_bigquery.py` instead, so a full run executes on one machine
+without GCP. That module is development-only: it is imported only in local
+mode, from a repo checkout with the repo root on `sys.path` (the benchmark
+runner, or a root script started from the repo root), and is not part of the
+service images.
+
+Env vars:
+- BQ_BACKEND: `bigquery` (default) or `local` (see `benchmarks/local_bigquery.py`
+  for BQ_LOCAL_PATH, BQ_LOCAL_INIT_SQL and BQ_LOCAL_STRICT).
+
+This file is duplicated in every simple/<service>/ dir; keep the copies identical.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Optional
+
+
+def backend() -> str:
+    return (os.environ.get("BQ_BACKEND") or "bigquery").strip().lower()
+
+
+def get_client(project: Optional[str] = None) -> Any:
+    """`bigquery.Client(project=...)`, or the process-wide local client with `BQ_BACKEND=local`."""
+    if backend() != "local":
+        from google.cloud import bigquery
+
+        return bigquery.Client(project=project)
+    try:
+        from benchmarks import local_bigquery
+    except ImportError as exc:
+        raise RuntimeError(
+            "BQ_BACKEND=local needs benchmarks/local_bigquery.py: run from a repo checkout "
+            "with the repo root on sys.path (e.g. python -m benchmarks.run)"
+        ) from exc
+    return local_bigquery.get_client(project)
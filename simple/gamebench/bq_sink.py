@@ -0,0 +1,535 @@
+"""Pluggable BigQuery row sinks shared by the ingest services.
+
+`BQ_WRITE_SINK` selects how ingest rows reach BigQuery:
+- "streaming" (default): legacy insertAll via `client.insert_rows_json`.
+- "storage_write": BigQuery Storage Write API with protobuf rows built from the
+  table schema. `BQ_STORAGE_WRITE_MODE` picks the stream type:
+  - "committed" (default): rows are visible as each append lands. Appends carry
+    explicit offsets, so a retried append inside one `write()` is de-duplicated
+    by the server.
+  - "pending": rows become visible atomically when the stream is committed.
+
+Storage Write rows skip the streaming buffer, so downstream MERGE/DELETE
+statements can touch them right away. Each `write()` opens a new stream, and
+`row_ids` (insertId) only apply to the streaming sink: under "storage_write" a
+caller that retries a failed or timed-out call appends the rows again, so the
+tables it writes must be deduplicated downstream (the `*_latest` views, DISTINCT
+readers).
+
+Bulk mode: above `BQ_BULK_THRESHOLD_ROWS` rows (default 5000, 0 disables) rows
+are spooled to a local gzip NDJSON file and appended with a single
+`load_table_from_file` job instead of many streaming calls. `write_rows` does this
+for one oversized call; `BulkLoader` does it across the many small batches of a
+paging loop (rows up to the threshold still go through the sink, the rest are
+spooled and loaded on `finish()`). Load jobs have no insertId de-duplication.
+
+Every sink returns an `insert_rows_json`-style error list, so callers keep their
+existing `if errors: raise ...` checks. This file is duplicated in every
+simple/<service>/ dir; keep the copies identical to the repo-root one.
+"""
+
+from __future__ import annotations
+
+import base64
+import datetime as dt
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import instrumentation
+
+LOGGER = logging.getLogger(__name__)
+
+_EPOCH_DATE = dt.date(1970, 1, 1)
+# AppendRows requests are capped at 10 MB; keep headroom for the request envelope.
+_MAX_APPEND_BYTES = 9 * 1024 * 1024
+_APPEND_ATTEMPTS = 3
+
+
+def sink_name() -> str:
+    return (os.environ.get("BQ_WRITE_SINK") or "streaming").strip().lower()
+
+
+def bulk_threshold() -> int:
+    try:
+        return max(0, int(os.environ.get("BQ_BULK_THRESHOLD_ROWS", "5000")))
+    except ValueError:
+        return 5000
+
+
+class StreamingSink:
+    """tabledata.insertAll via `client.insert_rows_json` (the historical behaviour)."""
+
+    name = "streaming"
+
+    def write(
+        self,
+        client: Any,
+        table_id: Any,
+        rows: List[Dict[str, Any]],
+        *,
+        row_ids: Optional[Sequence[Optional[str]]] = None,
+        ignore_unknown_values: bool = False,
+    ) -> List[Dict[str, Any]]:
+        kwargs: Dict[str, Any] = {"ignore_unknown_values": ignore_unknown_values}
+        if row_ids is not None:
+            kwargs["row_ids"] = list(row_ids)
+        return client.insert_rows_json(table_id, rows, **kwargs)
+
+
+# -----------------------------
+# Storage Write API
+# -----------------------------
+
+def _field_type(field: Any) -> str:
+    return str(field.field_type or "STRING").upper()
+
+
+def build_proto_descriptor(schema: Sequence[Any], name: str = "Row") -> Any:
+    """Translate a BigQuery schema into a self-contained protobuf DescriptorProto."""
+    from google.protobuf import descriptor_pb2
+
+    fdp = descriptor_pb2.FieldDescriptorProto
+    scalar_types = {
+        "STRING": fdp.TYPE_STRING,
+        "BYTES": fdp.TYPE_BYTES,
+        "INTEGER": fdp.TYPE_INT64,
+        "INT64": fdp.TYPE_INT64,
+        "FLOAT": fdp.TYPE_DOUBLE,
+        "FLOAT64": fdp.TYPE_DOUBLE,
+        "BOOLEAN": fdp.TYPE_BOOL,
+        "BOOL": fdp.TYPE_BOOL,
+        # TIMESTAMP: int64 microseconds since epoch; DATE: int32 days since epoch.
+        "TIMESTAMP": fdp.TYPE_INT64,
+        "DATE": fdp.TYPE_INT32,
+    }
+
+    def _build(fields: Sequence[Any], msg_name: str, path: str) -> Any:
+        desc = descriptor_pb2.DescriptorProto(name=msg_name)
+        for number, field in enumerate(fields, start=1):
+            proto_field = desc.field.add(name=field.name, number=number)
+            proto_field.label = fdp.LABEL_REPEATED if (field.mode or "").upper() == "REPEATED" else fdp.LABEL_OPTIONAL
+            ftype = _field_type(field)
+            if ftype in ("RECORD", "STRUCT"):
+                nested_name = f"{field.name}_record"
+                desc.nested_type.append(_build(field.fields, nested_name, f"{path}.{nested_name}"))
+                proto_field.type = fdp.TYPE_MESSAGE
+                proto_field.type_name = f"{path}.{nested_name}"
+            else:
+                # DATETIME/TIME/NUMERIC/BIGNUMERIC/JSON/GEOGRAPHY are accepted as strings.
+                proto_field.type = scalar_types.get(ftype, fdp.TYPE_STRING)
+        return desc
+
+    return _build(schema, name, f".{name}")
+
+
+def _message_class(descriptor_proto: Any) -> Any:
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    file_proto = descriptor_pb2.FileDescriptorProto(name=f"bq_sink_{descriptor_proto.name}.proto", syntax="proto2")
+    file_proto.message_type.add().CopyFrom(descriptor_proto)
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    descriptor = pool.FindMessageTypeByName(descriptor_proto.name)
+    if hasattr(message_factory, "GetMessageClass"):
+        return message_factory.GetMessageClass(descriptor)
+    return message_factory.MessageFactory(pool).GetPrototype(descriptor)
+
+
+def _timestamp_micros(value: Any) -> int:
+    if isinstance(value, dt.datetime):
+        ts = value
+    elif isinstance(value, (int, float)):
+        return int(round(float(value) * 1_000_000))
+    else:
+        raw = str(value).strip().replace(" ", "T", 1)
+        if raw.endswith("Z"):
+            raw = raw[:-1] + "+00:00"
+        ts = dt.datetime.fromisoformat(raw)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt.timezone.utc)
+    delta = ts - dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _date_days(value: Any) -> int:
+    if isinstance(value, dt.datetime):
+        value = value.date()
+    if not isinstance(value, dt.date):
+        value = dt.date.fromisoformat(str(value).strip()[:10])
+    return (value - _EPOCH_DATE).days
+
+
+def _scalar(value: Any, ftype: str) -> Any:
+    if ftype == "TIMESTAMP":
+        return _timestamp_micros(value)
+    if ftype == "DATE":
+        return _date_days(value)
+    if ftype in ("INTEGER", "INT64"):
+        return int(value)
+    if ftype in ("FLOAT", "FLOAT64"):
+        return float(value)
+    if ftype in ("BOOLEAN", "BOOL"):
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "1")
+        return bool(value)
+    if ftype == "BYTES":
+        # insertAll/load-job JSON carries BYTES base64-encoded; accept the same rows here.
+        return value if isinstance(value, bytes) else base64.b64decode(str(value))
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _fill_message(msg: Any, row: Dict[str, Any], fields: Sequence[Any], *, ignore_unknown_values: bool) -> None:
+    by_name = {f.name: f for f in fields}
+    if not ignore_unknown_values:
+        unknown = [k for k in row if k not in by_name]
+        if unknown:
+            raise ValueError(f"no such field: {', '.join(sorted(unknown))}")
+    for name, field in by_name.items():
+        value = row.get(name)
+        if value is None:
+            continue
+        ftype = _field_type(field)
+        repeated = (field.mode or "").upper() == "REPEATED"
+        if ftype in ("RECORD", "STRUCT"):
+            items = value if repeated else [value]
+            for item in items:
+                child = getattr(msg, name).add() if repeated else getattr(msg, name)
+                _fill_message(child, item, field.fields, ignore_unknown_values=ignore_unknown_values)
+        elif repeated:
+            getattr(msg, name).extend(_scalar(v, ftype) for v in value if v is not None)
+        else:
+            setattr(msg, name, _scalar(value, ftype))
+
+
+def serialize_rows(
+    message_cls: Any,
+    schema: Sequence[Any],
+    rows: List[Dict[str, Any]],
+    *,
+    ignore_unknown_values: bool,
+) -> Tuple[List[bytes], List[Dict[str, Any]]]:
+    """Serialize rows to protobuf bytes; returns (serialized, insert_rows_json-style errors)."""
+    serialized: List[bytes] = []
+    errors: List[Dict[str, Any]] = []
+    for index, row in enumerate(rows):
+        msg = message_cls()
+        try:
+            _fill_message(msg, row, schema, ignore_unknown_values=ignore_unknown_values)
+        except (TypeError, ValueError) as exc:
+            errors.append({"index": index, "errors": [{"reason": "invalid", "message": str(exc)}]})
+            continue
+        serialized.append(msg.SerializeToString())
+    return serialized, errors
+
+
+def _chunk_by_bytes(serialized: List[bytes], max_bytes: int) -> List[List[bytes]]:
+    chunks: List[List[bytes]] = []
+    current: List[bytes] = []
+    size = 0
+    for payload in serialized:
+        if current and size + len(payload) > max_bytes:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(payload)
+        size += len(payload)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class StorageWriteSink:
+    """Storage Write API sink (committed or pending streams; offsets dedup appends within one call).
+
+    `row_ids` are not supported by the API and are ignored (logged once per table).
+    """
+
+    name = "storage_write"
+
+    def __init__(self, mode: Optional[str] = None) -> None:
+        self.mode = (mode or os.environ.get("BQ_STORAGE_WRITE_MODE") or "committed").strip().lower()
+        if self.mode not in ("committed", "pending"):
+            raise ValueError(f"BQ_STORAGE_WRITE_MODE must be 'committed' or 'pending', got {self.mode!r}")
+        self._write_client: Any = None
+        self._tables: Dict[str, Tuple[Any, Any, Any]] = {}
+        self._ignored_row_ids: set = set()
+        self._lock = threading.Lock()
+
+    def _client(self) -> Any:
+        if self._write_client is None:
+            from google.cloud import bigquery_storage_v1
+
+            self._write_client = bigquery_storage_v1.BigQueryWriteClient()
+        return self._write_client
+
+    def _table_plan(self, client: Any, table_id: str) -> Tuple[Any, Any, Any]:
+        with self._lock:
+            plan = self._tables.get(table_id)
+        if plan is None:
+            table = client.get_table(table_id)
+            descriptor = build_proto_descriptor(table.schema, name="Row")
+            plan = (table, descriptor, _message_class(descriptor))
+            with self._lock:
+                self._tables[table_id] = plan
+        return plan
+
+    def write(
+        self,
+        client: Any,
+        table_id: Any,
+        rows: List[Dict[str, Any]],
+        *,
+        row_ids: Optional[Sequence[Optional[str]]] = None,
+        ignore_unknown_values: bool = False,
+    ) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        table, descriptor, message_cls = self._table_plan(client, table_id)
+        if row_ids is not None and table_id not in self._ignored_row_ids:
+            self._ignored_row_ids.add(table_id)
+            LOGGER.warning("BQ_STORAGE_WRITE_ROW_IDS_IGNORED table=%s (no insertId dedup on this sink)", table_id)
+        serialized, errors = serialize_rows(message_cls, table.schema, rows, ignore_unknown_values=ignore_unknown_values)
+        if errors:
+            # insertAll semantics: an invalid row fails the whole request.
+            return errors
+
+        from google.cloud.bigquery_storage_v1 import types
+
+        write_client = self._client()
+        parent = write_client.table_path(table.project, table.dataset_id, table.table_id)
+        stream_type = types.WriteStream.Type.PENDING if self.mode == "pending" else types.WriteStream.Type.COMMITTED
+        stream = write_client.create_write_stream(parent=parent, write_stream=types.WriteStream(type_=stream_type))
+
+        template = types.AppendRowsRequest(
+            write_stream=stream.name,
+            proto_rows=types.AppendRowsRequest.ProtoData(writer_schema=types.ProtoSchema(proto_descriptor=descriptor)),
+        )
+        offset = 0
+        for chunk in _chunk_by_bytes(serialized, _MAX_APPEND_BYTES):
+            request = types.AppendRowsRequest(
+                offset=offset,
+                proto_rows=types.AppendRowsRequest.ProtoData(rows=types.ProtoRows(serialized_rows=chunk)),
+            )
+            self._append(write_client, template, request)
+            offset += len(chunk)
+
+        write_client.finalize_write_stream(name=stream.name)
+        if self.mode == "pending":
+            response = write_client.batch_commit_write_streams(
+                types.BatchCommitWriteStreamsRequest(parent=parent, write_streams=[stream.name])
+            )
+            if response.stream_errors:
+                return [
+                    {"index": None, "errors": [{"reason": "commit_failed", "message": str(err.error_message)}]}
+                    for err in response.stream_errors
+                ]
+        LOGGER.info("BQ_STORAGE_WRITE table=%s mode=%s rows=%s", table_id, self.mode, offset)
+        return []
+
+    def _append(self, write_client: Any, template: Any, request: Any) -> None:
+        from google.api_core import exceptions as gexc
+        from google.cloud.bigquery_storage_v1 import writer
+
+        for attempt in range(1, _APPEND_ATTEMPTS + 1):
+            append_stream = writer.AppendRowsStream(write_client, template)
+            try:
+                append_stream.send(request).result()
+                return
+            except gexc.AlreadyExists:
+                # The offset was already persisted by an earlier attempt: exactly-once holds.
+                return
+            except (gexc.ServiceUnavailable, gexc.InternalServerError, gexc.Aborted, gexc.DeadlineExceeded):
+                if attempt == _APPEND_ATTEMPTS:
+                    raise
+                LOGGER.warning("BQ_STORAGE_WRITE_RETRY offset=%s attempt=%s", request.offset, attempt)
+            finally:
+                append_stream.close()
+
+
+# -----------------------------
+# Bulk mode (load jobs)
+# -----------------------------
+
+class NdjsonSpool:
+    """Gzip-compressed newline-delimited JSON temp file for one table."""
+
+    def __init__(self) -> None:
+        handle, self.path = tempfile.mkstemp(prefix="bq_bulk_", suffix=".ndjson.gz")
+        self._raw = os.fdopen(handle, "wb")
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=5)
+        self.rows = 0
+
+    def add(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._gz.write(json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+            self._gz.write(b"\n")
+        self.rows += len(rows)
+
+    def close(self) -> str:
+        if not self._gz.closed:
+            self._gz.close()
+            self._raw.close()
+        return self.path
+
+    def cleanup(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def load_ndjson_file(client: Any, table_id: Any, path: str, *, ignore_unknown_values: bool = False) -> int:
+    """Append a (gzip) NDJSON file to `table_id` with one load job; returns rows loaded."""
+    from google.cloud import bigquery
+
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        ignore_unknown_values=ignore_unknown_values,
+    )
+    with instrumentation.timed(f"bigquery load {_table_name(table_id)}"):
+        with open(path, "rb") as fh:
+            job = client.load_table_from_file(fh, table_id, job_config=job_config)
+        job.result()
+    loaded = int(job.output_rows or 0)
+    instrumentation.incr("bq_rows_loaded", loaded)
+    LOGGER.info("BQ_BULK_LOAD table=%s rows=%s job_id=%s", table_id, loaded, job.job_id)
+    return loaded
+
+
+class BulkLoadError(RuntimeError):
+    """A `BulkLoader.finish` load job failed; names the table and the tags of its spooled rows."""
+
+    def __init__(self, table: Any, tags: set, cause: BaseException):
+        super().__init__(f"BigQuery load into {_table_name(table)} failed: {cause}")
+        self.table = table
+        self.tags = set(tags)
+        self.cause = cause
+
+
+class BulkLoader:
+    """Per-run router: batches stay on the sink up to the threshold, the rest go to one load job per table.
+
+    `load_fn(table, path) -> rows_loaded` performs the load (e.g. `load_ndjson_file`
+    bound to a client, or a service helper that adds dataset fallback).
+    """
+
+    def __init__(self, load_fn: Callable[[Any, str], int], *, threshold: Optional[int] = None) -> None:
+        self._load_fn = load_fn
+        self.threshold = bulk_threshold() if threshold is None else max(0, threshold)
+        self._seen: Dict[Any, int] = {}
+        self._spools: Dict[Any, NdjsonSpool] = {}
+        self._tags: Dict[Any, set] = {}
+
+    def route(self, table: Any, rows: List[Dict[str, Any]], *, tag: Optional[str] = None) -> bool:
+        """Spool `rows` when `table` is (now) above the threshold; False means write them normally.
+
+        `tag` (e.g. a project id) is remembered per spooled table for `pending_tags`.
+        """
+        if not rows or self.threshold <= 0:
+            return False
+        spool = self._spools.get(table)
+        if spool is None:
+            seen = self._seen.get(table, 0)
+            if seen + len(rows) <= self.threshold:
+                self._seen[table] = seen + len(rows)
+                return False
+            LOGGER.info("BQ_BULK_SWITCH table=%s streamed_rows=%s threshold=%s", table, seen, self.threshold)
+            spool = self._spools[table] = NdjsonSpool()
+        spool.add(rows)
+        if tag is not None:
+            self._tags.setdefault(table, set()).add(tag)
+        return True
+
+    def pending_rows(self) -> int:
+        return sum(spool.rows for spool in self._spools.values())
+
+    def pending_tags(self) -> set:
+        return {tag for table in self._spools for tag in self._tags.get(table, ())}
+
+    def finish(self) -> Dict[Any, int]:
+        """Run one load job per spooled table; returns rows loaded per table.
+
+        A failed load raises `BulkLoadError` (the remaining spools are dropped).
+        """
+        loaded: Dict[Any, int] = {}
+        try:
+            while self._spools:
+                table, spool = next(iter(self._spools.items()))
+                if spool.rows:
+                    try:
+                        loaded[table] = self._load_fn(table, spool.close())
+                    except Exception as exc:
+                        raise BulkLoadError(table, self._tags.get(table, set()), exc) from exc
+                spool.cleanup()
+                del self._spools[table]
+                self._tags.pop(table, None)
+        finally:
+            self.abort()
+        return loaded
+
+    def abort(self) -> None:
+        """Drop spooled rows and remove temp files."""
+        for spool in self._spools.values():
+            spool.cleanup()
+        self._spools.clear()
+        self._tags.clear()
+
+
+_SINKS: Dict[str, Any] = {}
+_SINKS_LOCK = threading.Lock()
+
+
+def get_sink(name: Optional[str] = None) -> Any:
+    """Return the (cached) sink selected by `name` or `BQ_WRITE_SINK`."""
+    key = (name or sink_name()).strip().lower()
+    with _SINKS_LOCK:
+        sink = _SINKS.get(key)
+        if sink is None:
+            if key == "streaming":
+                sink = StreamingSink()
+            elif key == "storage_write":
+                sink = StorageWriteSink()
+            else:
+                raise ValueError(f"Unknown BQ_WRITE_SINK={key!r}; expected 'streaming' or 'storage_write'")
+            _SINKS[key] = sink
+    return sink
+
+
+def write_rows(
+    client: Any,
+    table_id: Any,
+    rows: List[Dict[str, Any]],
+    *,
+    row_ids: Optional[Sequence[Optional[str]]] = None,
+    ignore_unknown_values: bool = False,
+) -> List[Dict[str, Any]]:
+    """Write rows through the configured sink; same return contract as `insert_rows_json`.
+
+    A single call above the bulk threshold is appended with one load job instead.
+    """
+    threshold = bulk_threshold()
+    if threshold and len(rows) > threshold:
+        spool = NdjsonSpool()
+        try:
+            spool.add(rows)
+            load_ndjson_file(client, table_id, spool.close(), ignore_unknown_values=ignore_unknown_values)
+        finally:
+            spool.cleanup()
+        return []
+    sink = get_sink()
+    with instrumentation.timed(f"bigquery {sink.name} {_table_name(table_id)}"):
+        errors = sink.write(client, table_id, rows, row_ids=row_ids, ignore_unknown_values=ignore_unknown_values)
+    instrumentation.incr("bq_rows_written", len(rows) - len(errors))
+    return errors
+
+
+def _table_name(table_id: Any) -> str:
+    return str(getattr(table_id, "table_id", table_id)).split(".")[-1]
@@ -45,18 +45,25 @@ import logging
 import os
 import statistics
 import time
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import requests
 from flask import jsonify
 
 import bq
+import http_session
+import instrumentation
+import profiling
+from bq_writer import BackgroundWriter
+from rate_limit import AdaptiveRateLimiter, get_limiter, retry_delay
 from time_utils import to_rfc3339, utc_now
 
 
 fetch_rows = bq.fetch_rows
 get_client = bq.get_client
 insert_rows = bq.insert_rows
+load_rows_file = bq.load_rows_file
 run_query = bq.run_query
 table_ref = bq.table_ref
 
@@ -159,9 +166,12 @@ def _request_with_backoff(
     json_body: Optional[Dict[str, Any]] = None,
     timeout: int = 30,
     max_retries: int = 5,
+    limiter: Optional[AdaptiveRateLimiter] = None,
 ) -> requests.Response:
-    delay = 2
-    for _ in range(max_retries):
+    # 429 pacing (Retry-After, halved rate) lives in the shared limiter; between
+    # attempts we also keep the exponential backoff (2s doubling, capped at 15s).
+    limiter = limiter or get_limiter("gamebench")
+    for attempt in range(1, max_retries + 1):
         headers = {"accept": "application/json", "content-type": "application/json"}
         kwargs: Dict[str, Any] = {}
 
@@ -170,28 +180,21 @@ def _request_with_backoff(
         else:
             kwargs["auth"] = (user, token)
 
-        resp = requests.request(
+        resp = http_session.request(
             method=method,
             url=url,
             params=params,
             json=json_body,
             timeout=timeout,
             headers=headers,
+            limiter=limiter,
             **kwargs,
         )
 
         if resp.status_code != 429:
             return resp
-
-        retry_after = resp.headers.get("Retry-After")
-        if retry_after:
-            try:
-                delay = max(delay, int(retry_after))
-            except Exception:
-                pass
-
-        time.sleep(min(delay, 15))
-        delay = min(delay * 2, 15)
+        if attempt < max_retries:
+            time.sleep(retry_delay(limiter, attempt, base_s=2.0, cap_s=15.0))
 
     return resp
 
@@ -210,11 +213,13 @@ class GameBenchClient:
         *,
         auth_mode: str = "basic",
         company_id: Optional[str] = None,
+        limiter: Optional[AdaptiveRateLimiter] = None,
     ) -> None:
         self.user = user
         self.token = token
         self.auth_mode = (auth_mode or "basic").lower().strip()
         self.company_id = company_id
+        self.limiter = limiter or get_limiter("gamebench")
 
     def advanced_search_sessions(
         self,
@@ -282,6 +287,7 @@ class GameBenchClient:
                     params=params,
                     json_body=body,
                     timeout=30,
+                    limiter=self.limiter,
                 )
 
                 if resp.status_code in (401, 403) and scoped_company:
@@ -341,7 +347,9 @@ class GameBenchClient:
 
     def get_session_details(self, session_id: str) -> Dict[str, Any]:
         url = f"{self.BASE_URL}/sessions/{session_id}"
-        resp = _request_with_backoff("GET", url, auth_mode=self.auth_mode, user=self.user, token=self.token, timeout=30)
+        resp = _request_with_backoff(
+            "GET", url, auth_mode=self.auth_mode, user=self.user, token=self.token, timeout=30, limiter=self.limiter
+        )
         if not resp.ok:
             raise RuntimeError(
                 f"GameBench session details retrieval failed for session {session_id}: {resp.status_code} {resp.text}"
@@ -353,7 +361,9 @@ class GameBenchClient:
 
     def get_fps(self, session_id: str) -> List[float]:
         url = f"{self.BASE_URL}/sessions/{session_id}/fps"
-        resp = _request_with_backoff("GET", url, auth_mode=self.auth_mode, user=self.user, token=self.token, timeout=30)
+        resp = _request_with_backoff(
+            "GET", url, auth_mode=self.auth_mode, user=self.user, token=self.token, timeout=30, limiter=self.limiter
+        )
         if not resp.ok:
             raise RuntimeError(
                 f"GameBench FPS retrieval failed for session {session_id}: {resp.status_code} {resp.text}"
@@ -362,7 +372,9 @@ class GameBenchClient:
 
     def get_fps_stability(self, session_id: str) -> List[float]:
         url = f"{self.BASE_URL}/sessions/{session_id}/fpsStability"
-        resp = _request_with_backoff("GET", url, auth_mode=self.auth_mode, user=self.user, token=self.token, timeout=30)
+        resp = _request_with_backoff(
+            "GET", url, auth_mode=self.auth_mode, user=self.user, token=self.token, timeout=30, limiter=self.limiter
+        )
         if not resp.ok:
             raise RuntimeError(
                 f"GameBench FPS stability retrieval failed for session {session_id}: {resp.status_code} {resp.text}"
@@ -417,6 +429,112 @@ def _existing_session_ids(client, lookback_days: int) -> set:
     return existing
 
 
+def _fetch_workers() -> int:
+    raw = os.environ.get("GAMEBENCH_FETCH_WORKERS", "4")
+    try:
+        return max(1, min(int(raw), 16))
+    except (TypeError, ValueError):
+        return 4
+
+
+def _map_ordered(fn: Callable[[Any], Any], items: List[Any], *, max_workers: int) -> Iterator[Any]:
+    """Apply ``fn`` to ``items`` on a bounded thread pool, yielding results in input order.
+
+    Per-host concurrency and 429 cooldowns are enforced by `http_session`, so workers
+    sharing GameBench back off together. ``max_workers=1`` keeps the sequential path.
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gamebench-fetch") as pool:
+        yield from pool.map(fn, items)
+
+
+def _build_session_row(
+    gb: GameBenchClient,
+    s: Dict[str, Any],
+    *,
+    ingest_ts: str,
+    end_dt: datetime.datetime,
+    platform_filter: str,
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Fetch details/FPS for one search hit and build its BigQuery row.
+
+    Returns ``("ok", row)``, ``("skipped_platform", None)`` or ``("failed", None)``.
+    """
+    session_id = s.get("sessionId") or s.get("id") or s.get("_id")
+    user_email = s.get("userEmail") or s.get("user") or s.get("email")
+
+    app = s.get("app") or s.get("appInfo") or {}
+    device = s.get("device") or s.get("deviceInfo") or {}
+
+    app_name = app.get("name")
+    app_package = app.get("package") or app.get("packageName") or s.get("appPackage")
+    device_model = device.get("model")
+
+    platform = _infer_platform_from_sources(
+        s.get("platform"),
+        s.get("os"),
+        app.get("platform"),
+        app.get("os"),
+        device.get("platform"),
+        device.get("os"),
+    )
+
+    time_pushed_dt = _parse_ts(s.get("timePushed") or s.get("time_pushed") or s.get("timePushedMs"))
+    if not time_pushed_dt:
+        time_pushed_dt = end_dt
+
+    try:
+        detail = gb.get_session_details(session_id)
+        detail_app = detail.get("app") or detail.get("appInfo") or {}
+        detail_device = detail.get("device") or detail.get("deviceInfo") or {}
+
+        app_name = app_name or detail_app.get("name")
+        app_package = app_package or detail_app.get("package") or detail_app.get("packageName") or detail.get("appPackage")
+        device_model = device_model or detail_device.get("model")
+
+        platform = _infer_platform_from_sources(
+            platform,
+            detail.get("platform"),
+            detail.get("os"),
+            detail_app.get("platform"),
+            detail_app.get("os"),
+            detail_device.get("platform"),
+            detail_device.get("os"),
+            detail_device.get("osName"),
+        )
+        if platform_filter != "unknown" and platform != platform_filter:
+            return "skipped_platform", None
+
+        detail_time_pushed = _parse_ts(detail.get("timePushed") or detail.get("time_pushed") or detail.get("timePushedMs"))
+        if detail_time_pushed:
+            time_pushed_dt = detail_time_pushed
+
+        fps_values = gb.get_fps(session_id)
+        median_fps = statistics.median(fps_values) if fps_values else None
+
+        stab_values = gb.get_fps_stability(session_id)
+        fps_stability = statistics.median(stab_values) if stab_values else None
+    except Exception as e:
+        logger.warning("Skipping session %s due to metric fetch failure: %s", session_id, e)
+        return "failed", None
+
+    return "ok", {
+        "ingest_timestamp": ingest_ts,
+        "session_id": session_id,
+        "user_email": user_email,
+        "app_name": app_name,
+        "app_package": app_package,
+        "device_model": device_model,
+        "platform": platform,
+        "time_pushed": to_rfc3339(time_pushed_dt),
+        "median_fps": float(median_fps) if median_fps is not None else None,
+        "fps_stability_pct": float(fps_stability) if fps_stability is not None else None,
+    }
+
+
 def ingest_gamebench(*, request_overrides: Optional[Dict[str, Any]] = None) -> Tuple[int, int]:
 
     request_overrides = request_overrides or {}
@@ -515,12 +633,9 @@ def ingest_gamebench(*, request_overrides: Optional[Dict[str, Any]] = None) -> T
 
     ingest_ts = to_rfc3339(end_dt)
 
-    rows: List[Dict[str, Any]] = []
-    inserted = 0
-    skipped_sessions = 0
+    candidates: List[Dict[str, Any]] = []
     skipped_existing = 0
     skipped_missing_id = 0
-    skipped_platform = 0
     for s in sessions:
         session_id = s.get("sessionId") or s.get("id") or s.get("_id")
         if not session_id:
@@ -531,90 +646,48 @@ def ingest_gamebench(*, request_overrides: Optional[Dict[str, Any]] = None) -> T
             skipped_existing += 1
             continue
 
-        user_email = s.get("userEmail") or s.get("user") or s.get("email")
-
-        app = s.get("app") or s.get("appInfo") or {}
-        device = s.get("device") or s.get("deviceInfo") or {}
+        candidates.append(s)
 
-        app_name = app.get("name")
-        app_package = app.get("package") or app.get("packageName") or s.get("appPackage")
-        device_model = device.get("model")
+    fetch_workers = _fetch_workers()
+    logger.info("GAMEBENCH_FETCH_START candidate_sessions=%s workers=%s", len(candidates), fetch_workers)
 
-        platform = _infer_platform_from_sources(
-            s.get("platform"),
-            s.get("os"),
-            app.get("platform"),
-            app.get("os"),
-            device.get("platform"),
-            device.get("os"),
-        )
-
-        time_pushed_dt = _parse_ts(s.get("timePushed") or s.get("time_pushed") or s.get("timePushedMs"))
-        if not time_pushed_dt:
-            time_pushed_dt = end_dt
-
-        try:
-            detail = gb.get_session_details(session_id)
-            detail_app = detail.get("app") or detail.get("appInfo") or {}
-            detail_device = detail.get("device") or detail.get("deviceInfo") or {}
-
-            app_name = app_name or detail_app.get("name")
-            app_package = app_package or detail_app.get("package") or detail_app.get("packageName") or detail.get("appPackage")
-            device_model = device_model or detail_device.get("model")
-
-            platform = _infer_platform_from_sources(
-                platform,
-                detail.get("platform"),
-                detail.get("os"),
-                detail_app.get("platform"),
-                detail_app.get("os"),
-                detail_device.get("platform"),
-                detail_device.get("os"),
-                detail_device.get("osName"),
-            )
-            if platform_filter != "unknown" and platform != platform_filter:
+    rows: List[Dict[str, Any]] = []
+    skipped_sessions = 0
+    skipped_platform = 0
+    outcomes = _map_ordered(
+        lambda s: _build_session_row(gb, s, ingest_ts=ingest_ts, end_dt=end_dt, platform_filter=platform_filter),
+        candidates,
+        max_workers=fetch_workers,
+    )
+    # BigQuery inserts run on a background writer so session fetches never wait on them.
+    writer = BackgroundWriter(client, insert_rows, load_fn=load_rows_file)
+    try:
+        for outcome, row in outcomes:
+            if outcome == "skipped_platform":
                 skipped_platform += 1
                 continue
+            if outcome == "failed":
+                skipped_sessions += 1
+                continue
 
-            detail_time_pushed = _parse_ts(detail.get("timePushed") or detail.get("time_pushed") or detail.get("timePushedMs"))
-            if detail_time_pushed:
-                time_pushed_dt = detail_time_pushed
-
-            fps_values = gb.get_fps(session_id)
-            median_fps = statistics.median(fps_values) if fps_values else None
-
-            stab_values = gb.get_fps_stability(session_id)
-            fps_stability = statistics.median(stab_values) if stab_values else None
-        except Exception as e:
-            skipped_sessions += 1
-            logger.warning("Skipping session %s due to metric fetch failure: %s", session_id, e)
-            continue
+            rows.append(row)
+            instrumentation.incr("records_parsed")
 
-        rows.append(
-            {
-                "ingest_timestamp": ingest_ts,
-                "session_id": session_id,
-                "user_email": user_email,
-                "app_name": app_name,
-                "app_package": app_package,
-                "device_model": device_model,
-                "platform": platform,
-                "time_pushed": to_rfc3339(time_pushed_dt),
-                "median_fps": float(median_fps) if median_fps is not None else None,
-                "fps_stability_pct": float(fps_stability) if fps_stability is not None else None,
-            }
-        )
+            if len(rows) >= 250:
+                logger.info("GAMEBENCH_BQ_INSERT_QUEUED chunk_size=%s", len(rows))
+                writer.submit("gamebench_sessions", rows)
+                rows = []
 
-        if len(rows) >= 250:
-            chunk_size = len(rows)
-            inserted += insert_rows(client, "gamebench_sessions", rows)
-            logger.info("GAMEBENCH_BQ_INSERT chunk_size=%s cumulative_inserted=%s", chunk_size, inserted)
-            rows = []
+        if rows:
+            logger.info("GAMEBENCH_BQ_INSERT_QUEUED chunk_size=%s", len(rows))
+            writer.submit("gamebench_sessions", rows)
 
-    if rows:
-        chunk_size = len(rows)
-        inserted += insert_rows(client, "gamebench_sessions", rows)
-        logger.info("GAMEBENCH_BQ_INSERT chunk_size=%s cumulative_inserted=%s", chunk_size, inserted)
+        with instrumentation.span("bq_write"):
+            inserted = writer.close().get("gamebench_sessions", 0)
+    except BaseException:
+        writer.abort()
+        raise
+    logger.info("GAMEBENCH_BQ_INSERT cumulative_inserted=%s", inserted)
 
     logger.info(
         "GAMEBENCH_INGEST_SUMMARY unique_sessions=%s inserted=%s skipped_existing=%s skipped_missing_id=%s skipped_platform=%s skipped_metric_fetch=%s platform_filter=%s",
@@ -782,6 +855,7 @@ WHERE NOT EXISTS (SELECT 1 FROM latest_build);
 # HTTP entrypoint
 # -----------------------------
 
+@profiling.profiled("gamebench")
 def hello_http(request):
     source = "gamebench/main.py"
     service = (os.environ.get("K_SERVICE") or "unknown").strip() or "unknown"
@@ -789,12 +863,15 @@ def hello_http(request):
         "gamebench_ingest_start",
         extra={"source": source, "service": service, "method": request.method},
     )
+    ingest_run = instrumentation.start_run("gamebench")
+    ingest_run.phase("config")
 
     try:
         _validate_bq_env_compat()
         req_json = request.get_json(silent=True) or {}
         if not isinstance(req_json, dict):
             req_json = {}
+        ingest_run.phase("api_fetch")
         inserted, skipped_sessions = ingest_gamebench(request_overrides=req_json)
         logger.info(
             "GAMEBENCH_HTTP_RESULT inserted_session_rows=%s skipped_sessions=%s",
@@ -803,6 +880,7 @@ def hello_http(request):
             extra={"source": source, "service": service},
         )
         kpi_status = "ok"
+        ingest_run.phase("kpis")
         try:
             _compute_gamebench_kpis()
         except Exception as e:
@@ -827,6 +905,7 @@ def hello_http(request):
                 "inserted_session_rows": inserted,
                 "skipped_sessions": skipped_sessions,
                 "kpi_status": kpi_status,
+                "instrumentation": ingest_run.finish(status=status),
             }
         )
     except Exception as e:
@@ -834,4 +913,4 @@ def hello_http(request):
             "GameBench ingestion failed",
             extra={"source": source, "service": service, "error": str(e)},
         )
-        return jsonify({"status": "error", "error": str(e)}), 500
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 500
@@ -85,5 +85,19 @@ class EnvironmentEmptyFallbackTest(unittest.TestCase):
         self.assertNotIn("environment", second_body["appInfo"])
 
 
+class MapOrderedTest(unittest.TestCase):
+    def test_concurrent_results_keep_input_order(self):
+        import random
+        import time
+
+        def _slow_identity(x):
+            time.sleep(random.uniform(0, 0.01))
+            return x
+
+        items = list(range(40))
+        self.assertEqual(list(main._map_ordered(_slow_identity, items, max_workers=8)), items)
+        self.assertEqual(list(main._map_ordered(_slow_identity, items, max_workers=1)), items)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -8,6 +8,10 @@ from typing import Any, Dict, List, Optional
 from google.api_core.exceptions import BadRequest, NotFound
 from google.cloud import bigquery
 
+import bq_backend
+import bq_sink
+import instrumentation
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -80,8 +84,7 @@ def table_ref(table: str, dataset: Optional[str] = None) -> str:
 
 
 def get_client() -> bigquery.Client:
-    project = get_bq_project() or None
-    return bigquery.Client(project=project)
+    return bq_backend.get_client(get_bq_project() or None)
 
 
 def resolve_query_location(client: bigquery.Client) -> Optional[str]:
@@ -161,7 +164,7 @@ def insert_rows(client: bigquery.Client, table: str, rows: List[Dict[str, Any]],
     if not rows:
         return 0
     try:
-        errors = client.insert_rows_json(table_ref(table), rows, ignore_unknown_values=ignore_unknown_values)
+        errors = bq_sink.write_rows(client, table_ref(table), rows, ignore_unknown_values=ignore_unknown_values)
     except (NotFound, BadRequest) as exc:
         if not _is_dataset_not_found_error(exc):
             raise exc
@@ -170,7 +173,7 @@ def insert_rows(client: bigquery.Client, table: str, rows: List[Dict[str, Any]],
             _raise_dataset_error(exc, operation="insert", fallback_attempted=False, failure_reason="fallback_disabled_or_same_as_primary")
         _log_fallback_used("insert", exc, fallback_dataset)
         try:
-            errors = client.insert_rows_json(table_ref(table, dataset=fallback_dataset), rows, ignore_unknown_values=ignore_unknown_values)
+            errors = bq_sink.write_rows(client, table_ref(table, dataset=fallback_dataset), rows, ignore_unknown_values=ignore_unknown_values)
         except (NotFound, BadRequest) as fallback_exc:
             _raise_dataset_error(
                 fallback_exc,
@@ -184,6 +187,35 @@ def insert_rows(client: bigquery.Client, table: str, rows: List[Dict[str, Any]],
     return len(rows)
 
 
+def load_rows_file(client: bigquery.Client, table: str, path: str, *, ignore_unknown_values: bool = True) -> int:
+    """Append a gzip NDJSON spool file to `table` with one load job (bulk mode, see bq_sink)."""
+    try:
+        return bq_sink.load_ndjson_file(client, table_ref(table), path, ignore_unknown_values=ignore_unknown_values)
+    except (NotFound, BadRequest) as exc:
+        if not _is_dataset_not_found_error(exc):
+            raise exc
+        fallback_dataset = get_bq_dataset_fallback()
+        if not fallback_dataset:
+            _raise_dataset_error(exc, operation="load", fallback_attempted=False, failure_reason="fallback_disabled_or_same_as_primary")
+        _log_fallback_used("load", exc, fallback_dataset)
+        try:
+            return bq_sink.load_ndjson_file(
+                client,
+                table_ref(table, dataset=fallback_dataset),
+                path,
+                ignore_unknown_values=ignore_unknown_values,
+            )
+        except (NotFound, BadRequest) as fallback_exc:
+            _raise_dataset_error(
+                fallback_exc,
+                operation="load",
+                fallback_attempted=True,
+                failure_reason=f"fallback_dataset_failed fallback_dataset={fallback_dataset} primary_error={exc}",
+            )
+    return 0
+
+
+@instrumentation.timed("bigquery query")
 def run_query(client: bigquery.Client, sql: str, job_labels: Optional[Dict[str, str]] = None) -> None:
     job_config = bigquery.QueryJobConfig()
     if job_labels:
@@ -211,6 +243,7 @@ def run_query(client: bigquery.Client, sql: str, job_labels: Optional[Dict[str,
             )
 
 
+@instrumentation.timed("bigquery fetch")
 def fetch_scalar(client: bigquery.Client, sql: str) -> Any:
     try:
         rows = list(client.query(sql, location=resolve_query_location(client)).result())
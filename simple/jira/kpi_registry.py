@@ -0,0 +1,259 @@
+"""Metric-definition registry for `qa_executive_kpis`.
+
+A KPI is described once as a `Metric` (filter, breakdowns, date key, window) and
+grouped with the other KPIs that read the same relation in a `MetricSource`.
+`render_insert` turns a source into ONE `INSERT ... SELECT` that scans the
+relation once and produces every metric row through `GROUPING SETS`:
+
+- each source row is fanned out to the metrics whose filter it matches;
+- one `GROUP BY GROUPING SETS` covers the union of all breakdowns;
+- rows are kept only for the (metric, breakdown) pairs the registry declares.
+
+Single-value metrics (no `day`) always get their overall row, with 0 when nothing
+matches, like a plain `SELECT COUNT(1) ... WHERE` would.
+
+Time-series shapes that need a date spine (running counts, ratios of two counts)
+do not fit a single grouped pass and stay hand-written next to the registry.
+
+Only `simple/jira` builds KPIs from the registry, so it lives there alone.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+KPI_COLUMNS = (
+    "computed_at",
+    "metric_id",
+    "metric_name",
+    "metric_date",
+    "window_start",
+    "window_end",
+    "dimensions",
+    "value",
+    "numerator",
+    "denominator",
+    "source",
+)
+
+OVERALL: Tuple[str, ...] = ()
+
+
+class Metric:
+    """One KPI computed from a `MetricSource`.
+
+    - where: SQL predicate over the source relation.
+    - breakdowns: grouping sets written for the metric; `()` is the overall row
+      (`dimensions = '{}'`), `("priority",)` one row per priority, etc. Names must
+      be columns of the source.
+    - day: row expression giving one `metric_date` per day (e.g. `DATE(created, "UTC")`);
+      None writes a single row dated `today`.
+    - distinct: source column to COUNT(DISTINCT ...); None counts matching rows.
+    - window_start / window_end: script expressions for the window columns.
+    - aliases: extra metric_ids that get an identical copy of every row.
+    """
+
+    def __init__(
+        self,
+        metric_id: str,
+        name: str,
+        *,
+        where: str = "TRUE",
+        breakdowns: Sequence[Tuple[str, ...]] = (OVERALL,),
+        day: Optional[str] = None,
+        distinct: Optional[str] = None,
+        window_start: str = "today",
+        window_end: str = "today",
+        aliases: Sequence[str] = (),
+    ) -> None:
+        if not breakdowns:
+            raise ValueError(f"{metric_id}: at least one breakdown is required")
+        self.metric_id = metric_id
+        self.name = name
+        self.where = where
+        self.breakdowns = tuple(tuple(b) for b in breakdowns)
+        self.day = day
+        self.distinct = distinct
+        self.window_start = window_start
+        self.window_end = window_end
+        self.aliases = tuple(aliases)
+
+    @property
+    def metric_ids(self) -> Tuple[str, ...]:
+        return (self.metric_id,) + self.aliases
+
+
+class MetricSource:
+    """A relation scanned once for all of its metrics.
+
+    - relation: FROM clause (a temp table, or a join/UNNEST over temp tables).
+    - columns: output name -> SQL expression, for the breakdown and distinct
+      columns; NULL-safe expressions (`COALESCE(priority, 'Unknown')`) keep
+      breakdown keys distinguishable from the grouping-set rollup.
+    """
+
+    def __init__(self, name: str, relation: str, columns: Dict[str, str], metrics: Iterable[Metric]) -> None:
+        self.name = name
+        self.relation = relation
+        self.columns = dict(columns)
+        self.metrics = list(metrics)
+        seen = set()
+        for m in self.metrics:
+            for mid in m.metric_ids:
+                if mid in seen:
+                    raise ValueError(f"{name}: metric {mid} is defined twice")
+                seen.add(mid)
+            for col in [c for b in m.breakdowns for c in b] + ([m.distinct] if m.distinct else []):
+                if col not in self.columns:
+                    raise ValueError(f"{name}: metric {m.metric_id} uses unknown column {col!r}")
+
+
+def _q(value: str) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _in_list(values: Iterable[str]) -> str:
+    return ", ".join(_q(v) for v in values)
+
+
+def _grouping_key(breakdown: Tuple[str, ...]) -> str:
+    return "".join(f"|{c}" for c in breakdown)
+
+
+def _case(subject: str, mapping: List[Tuple[str, str]], default: str) -> str:
+    """`CASE subject WHEN ... END`, collapsing to `default` when every branch equals it."""
+    branches = [(k, v) for k, v in mapping if v != default]
+    if not branches:
+        return default
+    whens = "\n    ".join(f"WHEN {_q(k)} THEN {v}" for k, v in branches)
+    return f"CASE {subject}\n    {whens}\n    ELSE {default}\n  END"
+
+
+def render_insert(
+    source: MetricSource,
+    *,
+    target: str,
+    kpi_source: str,
+    date_scope: Optional[str] = None,
+) -> str:
+    """Render one `INSERT INTO target ... SELECT` statement for every metric of `source`.
+
+    `date_scope` names an ARRAY<DATE> script variable; per-day metrics then only
+    produce the dates it contains (single-value metrics are dated `today`, which
+    the caller keeps in scope).
+    """
+    metrics = source.metrics
+    columns = list(source.columns.items())
+    breakdowns: List[Tuple[str, ...]] = []
+    for m in metrics:
+        for b in m.breakdowns:
+            if b not in breakdowns:
+                breakdowns.append(b)
+    dims = [c for c in source.columns if any(c in b for b in breakdowns)]
+    distinct_cols = sorted({m.distinct for m in metrics if m.distinct})
+
+    fanout = []
+    for m in metrics:
+        where = m.where
+        if m.day and date_scope:
+            where = f"({where}) AND {m.day} IN UNNEST({date_scope})"
+        fanout.append(
+            f"STRUCT({_q(m.metric_id)} AS metric_id, {m.day or 'today'} AS metric_date, IFNULL({where}, FALSE) AS hit)"
+        )
+    fanout_sql = ",\n      ".join(fanout)
+    column_sql = "".join(f",\n    {expr} AS {name}" for name, expr in columns)
+
+    seeded = [m.metric_id for m in metrics if m.day is None and OVERALL in m.breakdowns]
+    seed_sql = ""
+    if seeded:
+        nulls = "".join(",\n    NULL" for _ in columns)
+        seed_sql = f"""
+  UNION ALL
+  -- zero rows, so single-value metrics are written even when nothing matches
+  SELECT
+    metric_id,
+    today,
+    FALSE{nulls}
+  FROM UNNEST([{_in_list(seeded)}]) AS metric_id"""
+
+    key_sql = "CONCAT(" + ", ".join(f"IF(GROUPING({c}) = 0, '|{c}', '')" for c in dims) + ")" if dims else "''"
+    sets_sql = ",\n    ".join("(" + ", ".join(("metric_id", "metric_date") + b) + ")" for b in breakdowns)
+    distinct_sql = "".join(f",\n    COUNT(DISTINCT {c}) AS distinct_{c}" for c in distinct_cols)
+    dim_select = "".join(f",\n    {c}" for c in dims)
+
+    names = _case("metric_id", [(m.metric_id, _q(m.name)) for m in metrics], _q(metrics[0].name))
+    window_start = _case("metric_id", [(m.metric_id, m.window_start) for m in metrics], "today")
+    window_end = _case("metric_id", [(m.metric_id, m.window_end) for m in metrics], "today")
+    dimensions = _case(
+        "grouping_key",
+        [
+            (_grouping_key(b), "TO_JSON_STRING(STRUCT(" + ", ".join(f"{c} AS {c}" for c in b) + "))")
+            for b in breakdowns
+            if b
+        ],
+        "'{}'",
+    )
+    value = _case("metric_id", [(m.metric_id, f"distinct_{m.distinct}") for m in metrics if m.distinct], "row_count")
+
+    keep = []
+    for b in breakdowns:
+        ids = [m.metric_id for m in metrics if b in m.breakdowns]
+        # Overall rows of seeded metrics may legitimately be 0; every other group needs a real row.
+        zero_ok = [i for i in ids if b == OVERALL and i in seeded]
+        needs_rows = [i for i in ids if i not in zero_ok]
+        key = _q(_grouping_key(b))
+        if zero_ok:
+            keep.append(f"(metric_id IN ({_in_list(zero_ok)}) AND grouping_key = {key})")
+        if needs_rows:
+            keep.append(f"(metric_id IN ({_in_list(needs_rows)}) AND grouping_key = {key} AND row_count > 0)")
+    keep_sql = "\n  OR ".join(keep)
+
+    aliased = [m for m in metrics if m.aliases]
+    out_id = "metric_id"
+    alias_sql = ""
+    if aliased:
+        out_id = "out_id"
+        whens = "\n    ".join(f"WHEN {_q(m.metric_id)} THEN [{_in_list(m.metric_ids)}]" for m in aliased)
+        alias_sql = f",\nUNNEST(\n  CASE metric_id\n    {whens}\n    ELSE [metric_id]\n  END\n) AS out_id"
+
+    return f"""
+-- {source.name}: {", ".join(i for m in metrics for i in m.metric_ids)}
+INSERT INTO {target}
+  ({", ".join(KPI_COLUMNS)})
+WITH hits AS (
+  SELECT
+    m.metric_id,
+    m.metric_date,
+    TRUE AS counted{column_sql}
+  FROM {source.relation}
+  CROSS JOIN UNNEST([
+      {fanout_sql}
+  ]) AS m
+  WHERE m.hit{seed_sql}
+),
+agg AS (
+  SELECT
+    metric_id,
+    metric_date,
+    {key_sql} AS grouping_key{dim_select},
+    COUNTIF(counted) AS row_count{distinct_sql}
+  FROM hits
+  GROUP BY GROUPING SETS (
+    {sets_sql}
+  )
+)
+SELECT
+  CURRENT_TIMESTAMP(),
+  {out_id},
+  {names},
+  metric_date,
+  {window_start},
+  {window_end},
+  {dimensions},
+  {value} * 1.0,
+  NULL,
+  NULL,
+  {_q(kpi_source)}
+FROM agg{alias_sql}
+WHERE {keep_sql};
+"""
@@ -16,6 +16,21 @@ Optional env vars:
 - JIRA_SEVERITY_FIELD  default customfield_10074
 - JIRA_POD_FIELD       default customfield_10001
 - JIRA_LOOKBACK_DAYS   default 90
+- JIRA_SEARCH_CONCURRENCY  default 4 (parallel partitioned search; 1 = single sequential JQL)
+- JIRA_SEARCH_SLICE_DAYS   default 15 (width of each `updated` slice per project)
+- JIRA_SEARCH_MAX_ATTEMPTS default 5 (tries per search page on 429 / 503 with Retry-After)
+- JIRA_INCREMENTAL         default false. When true, each project only pulls issues
+                           updated since its `updated` watermark in `ingestion_state`
+                           and the deltas are merged into `jira_issues_current`
+                           (the table KPIs read). Request body `{"incremental": true}`
+                           also enables it; `{"full_refresh": true}` ignores watermarks
+                           and drops issues that no longer match from the current table.
+- JIRA_INCREMENTAL_OVERLAP_MIN  default 10 (minutes re-read before each watermark)
+- JIRA_KPI_MODE          default full. `incremental` recomputes only the metric_dates
+                           touched since the last KPI run (`kpi_snapshot_watermark`
+                           in `ingestion_state`) and MERGEs them into
+                           `qa_executive_kpis` on (metric_id, metric_date, dimensions).
+                           Request body `{"kpi_mode": "incremental"}` overrides it.
 
 BigQuery dataset defaults:
 - BQ_PROJECT = GOOGLE_CLOUD_PROJECT
@@ -28,16 +43,36 @@ Deploy settings:
 
 from __future__ import annotations
 
+import asyncio
 import base64
+import datetime
 import logging
 import os
+import queue
+import threading
 import time
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-import requests
 from flask import jsonify
 
-from bq import get_bq_dataset, get_bq_location, get_bq_project, get_client, insert_rows, run_query, table_ref, validate_bq_env
+import http_session
+import instrumentation
+import profiling
+from bq import (
+    fetch_scalar,
+    get_bq_dataset,
+    get_bq_location,
+    get_bq_project,
+    get_client,
+    insert_rows,
+    load_rows_file,
+    run_query,
+    table_ref,
+    validate_bq_env,
+)
+from bq_writer import BackgroundWriter
+from kpi_registry import OVERALL, Metric, MetricSource, render_insert
+from rate_limit import AdaptiveRateLimiter, get_limiter, retry_delay
 from time_utils import jira_to_rfc3339, to_rfc3339, utc_now
 
 
@@ -77,6 +112,13 @@ def _env_any(*names: str, default: Optional[str] = None) -> str:
     raise KeyError(" | ".join(names))
 
 
+def _env_int(name: str, default: int, *, minimum: int = 0) -> int:
+    try:
+        return max(minimum, int(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
 def _split_csv(value: str) -> List[str]:
     return [x.strip() for x in value.split(",") if x.strip()]
 
@@ -146,6 +188,66 @@ def _pick_field_value(v: Any) -> Optional[str]:
 # Jira API
 # -----------------------------
 
+def _fetch_search_page(
+    url: str,
+    headers: Dict[str, str],
+    jql: str,
+    fields: List[str],
+    *,
+    max_results: int,
+    timeout: int,
+    next_page_token: Optional[str],
+    start_at: int,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+) -> Dict[str, Any]:
+    params: Dict[str, Any] = {
+        "jql": jql,
+        "maxResults": max_results,
+        "fields": ",".join(fields),
+        "expand": "changelog",
+        "validateQuery": "none",
+    }
+
+    # Prefer the enhanced pagination if available
+    if next_page_token:
+        params["nextPageToken"] = next_page_token
+    else:
+        params["startAt"] = start_at
+
+    # Throttled pages (429, or 503 with Retry-After) are retried after the shared
+    # limiter's pause with an exponential floor; a page that stays throttled, or
+    # any other error, raises and ends the search.
+    limiter = limiter or get_limiter("jira")
+    max_attempts = _env_int("JIRA_SEARCH_MAX_ATTEMPTS", 5, minimum=1)
+    for attempt in range(1, max_attempts + 1):
+        resp = http_session.request("GET", url, headers=headers, params=params, timeout=timeout, limiter=limiter)
+        if resp.ok:
+            return resp.json() or {}
+        throttled = resp.status_code == 429 or (resp.status_code == 503 and resp.headers.get("Retry-After"))
+        if not throttled or attempt == max_attempts:
+            break
+        wait_s = retry_delay(limiter, attempt, base_s=1.0, cap_s=30.0)
+        LOGGER.warning("JIRA_SEARCH_THROTTLED status=%s attempt=%s/%s wait_s=%.1f", resp.status_code, attempt, max_attempts, wait_s)
+        time.sleep(wait_s)
+    raise JiraAPIError(resp.status_code, resp.text)
+
+
+def _next_page_cursor(data: Dict[str, Any], start_at: int, max_results: int) -> Optional[Tuple[Optional[str], int]]:
+    """Return the (nextPageToken, startAt) cursor for the next page, or None on the last page."""
+    # Enhanced pagination
+    if data.get("isLast") is True:
+        return None
+    if data.get("nextPageToken"):
+        return data.get("nextPageToken"), start_at
+
+    # Legacy pagination fallback
+    total = int(data.get("total", 0) or 0)
+    start_at = int(data.get("startAt", start_at) or 0) + int(data.get("maxResults", max_results) or max_results)
+    if start_at >= total:
+        return None
+    return None, start_at
+
+
 def _search_issues(
     base_url: str,
     headers: Dict[str, str],
@@ -154,6 +256,7 @@ def _search_issues(
     max_results: int = 100,
     timeout: int = 60,
     deadline_epoch: Optional[float] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
 ) -> Iterable[Dict[str, Any]]:
     """Generator over Jira issues (handles both nextPageToken and startAt pagination)."""
 
@@ -166,41 +269,218 @@ def _search_issues(
         if deadline_epoch is not None and time.time() >= deadline_epoch:
             break
 
-        params: Dict[str, Any] = {
-            "jql": jql,
-            "maxResults": max_results,
-            "fields": ",".join(fields),
-            "expand": "changelog",
-            "validateQuery": "none",
-        }
-
-        # Prefer the enhanced pagination if available
-        if next_page_token:
-            params["nextPageToken"] = next_page_token
-        else:
-            params["startAt"] = start_at
-
-        resp = requests.get(url, headers=headers, params=params, timeout=timeout)
-        if not resp.ok:
-            raise JiraAPIError(resp.status_code, resp.text)
-
-        data = resp.json() or {}
-        issues = data.get("issues", []) or []
-        for issue in issues:
+        data = _fetch_search_page(
+            url,
+            headers,
+            jql,
+            fields,
+            max_results=max_results,
+            timeout=timeout,
+            next_page_token=next_page_token,
+            start_at=start_at,
+            limiter=limiter,
+        )
+        for issue in data.get("issues", []) or []:
             yield issue
 
-        # Enhanced pagination
-        if data.get("isLast") is True:
+        cursor = _next_page_cursor(data, start_at, max_results)
+        if cursor is None:
             break
-        if data.get("nextPageToken"):
-            next_page_token = data.get("nextPageToken")
+        next_page_token, start_at = cursor
+
+
+# startAt paging needs a stable order; `key` does not shift when issues are updated mid-run.
+_PARTITION_ORDER = " ORDER BY key ASC"
+
+
+def _jql_ts(ts: datetime.datetime) -> str:
+    return ts.strftime("%Y-%m-%d %H:%M")
+
+
+def _partition_jql(
+    project_keys: List[str],
+    base_filter: str,
+    *,
+    lookback_days: int,
+    slice_days: int,
+    now: datetime.datetime,
+) -> List[str]:
+    """Split the search into disjoint per-project `updated` slices.
+
+    Boundaries are absolute minutes shared by neighbouring slices (`>=` / `<`), so
+    slices never overlap. The newest slice is open-ended (catches updates made
+    while the run is paging) and the oldest one catches long-open issues. Every
+    slice is ordered by key so its pages do not skip or repeat issues.
+    """
+    slice_days = max(1, slice_days)
+    now_minute = now.replace(second=0, microsecond=0)
+    bounds = [now_minute - datetime.timedelta(days=d) for d in range(0, lookback_days, slice_days)]
+    bounds.append(now_minute - datetime.timedelta(days=lookback_days))
+
+    partitions: List[str] = []
+    for key in project_keys:
+        prefix = f"project = {key} AND {base_filter}"
+        partitions.append(f'{prefix} AND updated >= "{_jql_ts(bounds[0])}"{_PARTITION_ORDER}')
+        for newer, older in zip(bounds, bounds[1:]):
+            partitions.append(f'{prefix} AND updated >= "{_jql_ts(older)}" AND updated < "{_jql_ts(newer)}"{_PARTITION_ORDER}')
+        partitions.append(f'{prefix} AND updated < "{_jql_ts(bounds[-1])}"{_PARTITION_ORDER}')
+    return partitions
+
+
+def _incremental_partitions(
+    project_keys: List[str],
+    base_filter: str,
+    delta_filter: str,
+    watermarks: Dict[str, datetime.datetime],
+    *,
+    lookback_days: int,
+    slice_days: int,
+    overlap_minutes: int,
+    now: datetime.datetime,
+) -> List[str]:
+    """JQL per project for incremental mode.
+
+    Projects with a watermark only ask for issues updated since it (minus the
+    overlap). The window is relative (`updated >= -Nm`), so it does not depend on
+    the Jira user's profile timezone. Projects without one get the full
+    `_partition_jql` slices, which seeds their watermark.
+    """
+    partitions: List[str] = []
+    for key in project_keys:
+        mark = watermarks.get(key)
+        if mark is None:
+            partitions.extend(
+                _partition_jql([key], base_filter, lookback_days=lookback_days, slice_days=slice_days, now=now)
+            )
             continue
+        minutes = max(0, int((now - mark).total_seconds() // 60) + 1) + max(0, overlap_minutes)
+        partitions.append(f"project = {key} AND {delta_filter} AND updated >= -{minutes}m{_PARTITION_ORDER}")
+    return partitions
 
-        # Legacy pagination fallback
-        total = int(data.get("total", 0) or 0)
-        start_at = int(data.get("startAt", start_at) or 0) + int(data.get("maxResults", max_results) or max_results)
-        if start_at >= total:
-            break
+
+def _parse_rfc3339(ts: Optional[str]) -> Optional[datetime.datetime]:
+    if not ts:
+        return None
+    try:
+        d = datetime.datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=datetime.timezone.utc)
+    return d
+
+
+def _note_updated(marks: Dict[str, datetime.datetime], row: Dict[str, Any]) -> None:
+    """Track the newest `updated` per project key (issue key prefix)."""
+    issue_key = row.get("issue_key") or ""
+    updated = _parse_rfc3339(row.get("updated"))
+    if "-" not in issue_key or updated is None:
+        return
+    project = issue_key.rsplit("-", 1)[0]
+    if project not in marks or updated > marks[project]:
+        marks[project] = updated
+
+
+def _search_issues_partitioned(
+    base_url: str,
+    headers: Dict[str, str],
+    partitions: List[str],
+    fields: List[str],
+    *,
+    concurrency: int,
+    max_results: int = 100,
+    timeout: int = 60,
+    deadline_epoch: Optional[float] = None,
+    limiter: Optional[AdaptiveRateLimiter] = None,
+) -> Iterable[Dict[str, Any]]:
+    """Generator over Jira issues paged concurrently across disjoint JQL partitions.
+
+    An asyncio loop on a worker thread pages every partition (at most `concurrency`
+    requests in flight, paced by the shared `jira` rate limiter) and hands pages over through
+    a bounded queue, so callers keep the same streaming/flush behaviour as
+    `_search_issues`. Issues are de-duplicated by id in case one moves between
+    `updated` slices mid-run.
+    """
+
+    url = f"{base_url}/rest/api/3/search/jql"
+    pages: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=max(2, concurrency * 2))
+    stop = threading.Event()
+
+    def _put(item: Tuple[str, Any]) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def _page_partition(jql: str, slots: asyncio.Semaphore) -> None:
+        next_page_token: Optional[str] = None
+        start_at = 0
+        while not stop.is_set():
+            if deadline_epoch is not None and time.time() >= deadline_epoch:
+                return
+            async with slots:
+                if stop.is_set():
+                    return
+                data = await asyncio.to_thread(
+                    _fetch_search_page,
+                    url,
+                    headers,
+                    jql,
+                    fields,
+                    max_results=max_results,
+                    timeout=timeout,
+                    next_page_token=next_page_token,
+                    start_at=start_at,
+                    limiter=limiter,
+                )
+            issues = data.get("issues", []) or []
+            if issues and not await asyncio.to_thread(_put, ("page", issues)):
+                return
+            cursor = _next_page_cursor(data, start_at, max_results)
+            if cursor is None:
+                return
+            next_page_token, start_at = cursor
+
+    async def _run_all() -> None:
+        slots = asyncio.Semaphore(max(1, concurrency))
+        tasks = [asyncio.create_task(_page_partition(jql, slots)) for jql in partitions]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _producer() -> None:
+        try:
+            asyncio.run(_run_all())
+        except BaseException as exc:  # surfaced to the consumer below
+            _put(("error", exc))
+        finally:
+            _put(("done", None))
+
+    worker = threading.Thread(target=_producer, name="jira-search", daemon=True)
+    worker.start()
+
+    seen_ids: set = set()
+    try:
+        while True:
+            kind, payload = pages.get()
+            if kind == "done":
+                break
+            if kind == "error":
+                raise payload
+            for issue in payload:
+                issue_id = issue.get("id") or issue.get("key")
+                if issue_id in seen_ids:
+                    continue
+                seen_ids.add(issue_id)
+                yield issue
+    finally:
+        stop.set()
+        worker.join(timeout=timeout)
 
 
 # -----------------------------
@@ -281,6 +561,134 @@ def _parse_changelog(issue: Dict[str, Any]) -> List[Dict[str, Any]]:
     return out
 
 
+# -----------------------------
+# Incremental snapshot (JIRA_INCREMENTAL)
+# -----------------------------
+
+CURRENT_SNAPSHOT_TABLE = "jira_issues_current"
+
+_SNAPSHOT_COLUMNS = (
+    "snapshot_timestamp",
+    "issue_id",
+    "issue_key",
+    "issue_type",
+    "summary",
+    "status",
+    "status_category",
+    "status_category_changed_date",
+    "priority",
+    "severity",
+    "pod_team",
+    "fix_versions",
+    "assignee_email",
+    "reporter_email",
+    "created",
+    "updated",
+)
+
+
+def _incremental_enabled(request_overrides: Optional[Dict[str, Any]] = None) -> bool:
+    override = (request_overrides or {}).get("incremental")
+    if override is not None:
+        return str(override).strip().lower() in {"1", "true", "yes", "on"}
+    raw = (os.environ.get("JIRA_INCREMENTAL") or "false").strip().lower()
+    return raw in {"1", "true", "yes", "on"}
+
+
+def _watermark_key(project_key: str) -> str:
+    return f"issues_updated_{project_key}"
+
+
+def _get_updated_watermarks(client, project_keys: List[str]) -> Dict[str, datetime.datetime]:
+    """Read the per-project `updated` high-water marks from ingestion_state."""
+    state_table = table_ref("ingestion_state")
+    marks: Dict[str, datetime.datetime] = {}
+    for key in project_keys:
+        sql = f"""
+          SELECT UNIX_SECONDS(last_run)
+          FROM `{state_table}`
+          WHERE source = "jira" AND state_key = "{_watermark_key(key)}"
+          ORDER BY last_run DESC
+          LIMIT 1
+        """
+        v = fetch_scalar(client, sql)
+        if v is not None:
+            marks[key] = datetime.datetime.fromtimestamp(int(v), tz=datetime.timezone.utc)
+    return marks
+
+
+def _set_updated_watermarks(client, marks: Dict[str, datetime.datetime]) -> None:
+    rows = [
+        {"source": "jira", "state_key": _watermark_key(key), "last_run": to_rfc3339(mark)}
+        for key, mark in sorted(marks.items())
+    ]
+    if rows:
+        insert_rows(client, "ingestion_state", rows)
+
+
+def _merge_current_snapshot(
+    client,
+    snapshot_ts: str,
+    *,
+    lookback_days: int,
+    prune_projects: Optional[List[str]] = None,
+) -> None:
+    """Upsert this run's deltas into `jira_issues_current` and re-stamp it.
+
+    Every row of the current table carries the latest `snapshot_timestamp`, so
+    `_compute_jira_kpis` keeps its "latest snapshot" filter unchanged. Done issues
+    older than the lookback are pruned, mirroring the full-pull JQL. With
+    `prune_projects` (full refresh) issues of those projects missing from this run
+    are deleted as well.
+    """
+    snap_table = table_ref("jira_issues_snapshot")
+    current_table = table_ref(CURRENT_SNAPSHOT_TABLE)
+    update_set = ",\n    ".join(f"{c} = S.{c}" for c in _SNAPSHOT_COLUMNS if c != "issue_key")
+    insert_cols = ", ".join(_SNAPSHOT_COLUMNS)
+    insert_vals = ", ".join(f"S.{c}" for c in _SNAPSHOT_COLUMNS)
+    prune_clause = ""
+    if prune_projects:
+        projects = ", ".join(f"'{p}'" for p in prune_projects)
+        prune_clause = (
+            "\nWHEN NOT MATCHED BY SOURCE\n"
+            f"  AND SPLIT(T.issue_key, '-')[SAFE_OFFSET(0)] IN ({projects}) THEN\n"
+            "  DELETE"
+        )
+
+    sql = f"""
+CREATE TABLE IF NOT EXISTS `{current_table}`
+CLUSTER BY issue_key, status_category, priority
+AS SELECT {insert_cols} FROM `{snap_table}` WHERE FALSE;
+
+MERGE `{current_table}` T
+USING (
+  SELECT * EXCEPT(rn)
+  FROM (
+    SELECT {insert_cols}, ROW_NUMBER() OVER (PARTITION BY issue_key ORDER BY updated DESC) AS rn
+    FROM `{snap_table}`
+    WHERE snapshot_timestamp = TIMESTAMP("{snapshot_ts}")
+      AND issue_key IS NOT NULL
+  )
+  WHERE rn = 1
+) S
+ON T.issue_key = S.issue_key
+WHEN MATCHED THEN UPDATE SET
+    {update_set}
+WHEN NOT MATCHED THEN
+  INSERT ({insert_cols})
+  VALUES ({insert_vals}){prune_clause};
+
+DELETE FROM `{current_table}`
+WHERE LOWER(COALESCE(status_category, '')) = 'done'
+  AND updated < TIMESTAMP_SUB(TIMESTAMP("{snapshot_ts}"), INTERVAL {int(lookback_days)} DAY);
+
+UPDATE `{current_table}`
+SET snapshot_timestamp = TIMESTAMP("{snapshot_ts}")
+WHERE snapshot_timestamp != TIMESTAMP("{snapshot_ts}");
+"""
+    run_query(client, sql, job_labels={"pipeline": "qa-metrics", "source": "jira", "step": "merge_current"})
+
+
 def ingest_jira(
     *,
     deadline_epoch: Optional[float] = None,
@@ -323,11 +731,12 @@ def ingest_jira(
 
     # Include Bug and Defect issue types; keep active + recently updated items.
     projects_jql = ",".join(project_keys)
-    jql = (
-        f"project in ({projects_jql}) AND issuetype in (Bug, Defect) AND "
-        f"(statusCategory != Done OR updated >= -{lookback_days}d) "
-        f"ORDER BY updated DESC"
-    )
+    base_filter = f"issuetype in (Bug, Defect) AND (statusCategory != Done OR updated >= -{lookback_days}d)"
+    jql = f"project in ({projects_jql}) AND {base_filter} ORDER BY updated DESC"
+
+    search_concurrency = _env_int("JIRA_SEARCH_CONCURRENCY", 4, minimum=1)
+    incremental = _incremental_enabled(request_overrides)
+    full_refresh = incremental and bool(request_overrides.get("full_refresh"))
 
     fields = [
         "summary",
@@ -352,40 +761,126 @@ def ingest_jira(
     snap_rows: List[Dict[str, Any]] = []
     chg_rows: List[Dict[str, Any]] = []
 
-    inserted_snap = 0
-    inserted_chg = 0
     deadline_reached = False
+    seen_marks: Dict[str, datetime.datetime] = {}
+
+    if incremental:
+        watermarks = {} if full_refresh else _get_updated_watermarks(client, project_keys)
+        partitions = _incremental_partitions(
+            project_keys,
+            base_filter,
+            "issuetype in (Bug, Defect)",
+            watermarks,
+            lookback_days=lookback_days,
+            slice_days=_env_int("JIRA_SEARCH_SLICE_DAYS", 15, minimum=1),
+            overlap_minutes=_env_int("JIRA_INCREMENTAL_OVERLAP_MIN", 10),
+            now=utc_now(),
+        )
+        LOGGER.info(
+            "JIRA_SEARCH_INCREMENTAL partitions=%s projects_with_watermark=%s full_refresh=%s",
+            len(partitions),
+            len(watermarks),
+            full_refresh,
+        )
+        issues_iter = _search_issues_partitioned(
+            site,
+            headers,
+            partitions,
+            fields,
+            concurrency=search_concurrency,
+            max_results=100,
+            deadline_epoch=deadline_epoch,
+        )
+    elif search_concurrency > 1:
+        partitions = _partition_jql(
+            project_keys,
+            base_filter,
+            lookback_days=lookback_days,
+            slice_days=_env_int("JIRA_SEARCH_SLICE_DAYS", 15, minimum=1),
+            now=utc_now(),
+        )
+        LOGGER.info(
+            "JIRA_SEARCH_PARTITIONED partitions=%s concurrency=%s",
+            len(partitions),
+            search_concurrency,
+        )
+        issues_iter = _search_issues_partitioned(
+            site,
+            headers,
+            partitions,
+            fields,
+            concurrency=search_concurrency,
+            max_results=100,
+            deadline_epoch=deadline_epoch,
+        )
+    else:
+        issues_iter = _search_issues(site, headers, jql, fields=fields, max_results=100, deadline_epoch=deadline_epoch)
 
-    for issue in _search_issues(site, headers, jql, fields=fields, max_results=100, deadline_epoch=deadline_epoch):
-        if deadline_epoch is not None and time.time() >= deadline_epoch:
-            deadline_reached = True
-            break
-
-        snap_rows.append(_parse_issue_snapshot(issue, snapshot_ts, severity_field=severity_field, pod_field=pod_field))
-        chg_rows.extend(_parse_changelog(issue))
-
-        # Flush periodically to reduce memory.
-        if len(snap_rows) >= 500:
-            if deadline_epoch is not None and time.time() >= deadline_epoch:
-                deadline_reached = True
-                break
-            inserted_snap += insert_rows(client, "jira_issues_snapshot", snap_rows)
-            snap_rows = []
-        if len(chg_rows) >= 1000:
+    # BigQuery inserts run on a background writer so Jira paging never waits on them.
+    writer = BackgroundWriter(client, insert_rows, load_fn=load_rows_file)
+    try:
+        for issue in issues_iter:
             if deadline_epoch is not None and time.time() >= deadline_epoch:
                 deadline_reached = True
                 break
-            inserted_chg += insert_rows(client, "jira_changelog", chg_rows)
-            chg_rows = []
 
-    if snap_rows:
-        inserted_snap += insert_rows(client, "jira_issues_snapshot", snap_rows)
-    if chg_rows:
-        inserted_chg += insert_rows(client, "jira_changelog", chg_rows)
+            with instrumentation.span("parse"):
+                snap_row = _parse_issue_snapshot(issue, snapshot_ts, severity_field=severity_field, pod_field=pod_field)
+                snap_rows.append(snap_row)
+                if incremental:
+                    _note_updated(seen_marks, snap_row)
+                chg_rows.extend(_parse_changelog(issue))
+            instrumentation.incr("records_parsed")
+
+            # Flush periodically to reduce memory.
+            if len(snap_rows) >= 500:
+                if deadline_epoch is not None and time.time() >= deadline_epoch:
+                    deadline_reached = True
+                    break
+                writer.submit("jira_issues_snapshot", snap_rows)
+                snap_rows = []
+            if len(chg_rows) >= 1000:
+                if deadline_epoch is not None and time.time() >= deadline_epoch:
+                    deadline_reached = True
+                    break
+                writer.submit("jira_changelog", chg_rows)
+                chg_rows = []
+
+        # Stop the search producer now, not when the generator is garbage-collected.
+        issues_iter.close()
+        if snap_rows:
+            writer.submit("jira_issues_snapshot", snap_rows)
+        if chg_rows:
+            writer.submit("jira_changelog", chg_rows)
+
+        write_deadline = None if deadline_epoch is None else deadline_epoch + _env_int("BQ_WRITER_GRACE_S", 10)
+        with instrumentation.span("bq_write"):
+            inserted = writer.close(deadline_epoch=write_deadline)
+    except BaseException:
+        issues_iter.close()
+        writer.abort()
+        raise
+
+    inserted_snap = inserted.get("jira_issues_snapshot", 0)
+    inserted_chg = inserted.get("jira_changelog", 0)
+    if writer.dropped_rows:
+        deadline_reached = True
 
     if deadline_epoch is not None and time.time() >= deadline_epoch:
         deadline_reached = True
 
+    # Watermarks only move after a complete run whose deltas reached the current table;
+    # a partial run is simply re-read next time.
+    if incremental and not deadline_reached:
+        with instrumentation.span("bq_merge"):
+            _merge_current_snapshot(
+                client,
+                snapshot_ts,
+                lookback_days=lookback_days,
+                prune_projects=project_keys if full_refresh else None,
+            )
+        _set_updated_watermarks(client, {k: v for k, v in seen_marks.items() if k in project_keys})
+
     return inserted_snap, inserted_chg, deadline_reached
 
 
@@ -393,17 +888,263 @@ def ingest_jira(
 # KPI Computation (EXEC-01..EXEC-14)
 # -----------------------------
 
-def _compute_jira_kpis() -> None:
+JIRA_KPI_IDS = tuple(f"EXEC-{n:02d}" for n in range(1, 15))
+KPI_WATERMARK_KEY = "kpi_snapshot_watermark"
+# Jira `updated` vs. our snapshot clock; issues this close to the last KPI run are recomputed again.
+KPI_WATERMARK_OVERLAP = datetime.timedelta(hours=1)
+
+
+def _kpi_mode(request_overrides: Optional[Dict[str, Any]] = None) -> str:
+    raw = (request_overrides or {}).get("kpi_mode") or os.environ.get("JIRA_KPI_MODE") or "full"
+    mode = str(raw).strip().lower()
+    if mode not in {"full", "incremental"}:
+        raise ValueError(f"Unsupported kpi_mode={raw!r}; expected 'full' or 'incremental'")
+    return mode
+
+
+def _get_kpi_watermark(client) -> Optional[datetime.datetime]:
+    state_table = table_ref("ingestion_state")
+    v = fetch_scalar(
+        client,
+        f"""
+          SELECT UNIX_SECONDS(last_run)
+          FROM `{state_table}`
+          WHERE source = "jira" AND state_key = "{KPI_WATERMARK_KEY}"
+          ORDER BY last_run DESC
+          LIMIT 1
+        """,
+    )
+    if v is None:
+        return None
+    return datetime.datetime.fromtimestamp(int(v), tz=datetime.timezone.utc)
+
+
+def _incremental_kpi_sql(kpi_table: str, kpi_since: Optional[datetime.datetime]) -> Dict[str, str]:
+    """SQL fragments that turn the KPI script into recompute-touched-dates + MERGE.
+
+    Touched dates are today plus the created dates of snapshot rows and the change
+    dates of changelog rows newer than `kpi_since` (every date of the window when
+    there is no watermark yet). Per-day registry metrics (EXEC-08/12) and EXEC-13
+    only recompute those dates; EXEC-11 is
+    a running count, so its 90 daily rows are always rebuilt. The MERGE upserts on
+    (metric_id, metric_date, dimensions) and deletes Jira rows in the recomputed
+    scope that no longer exist (e.g. a priority bucket that dropped to zero).
+    """
+    since_sql = f'TIMESTAMP("{to_rfc3339(kpi_since)}")' if kpi_since else "CAST(NULL AS TIMESTAMP)"
+    metric_ids = ", ".join(f"'{m}'" for m in JIRA_KPI_IDS)
+    columns = (
+        "computed_at",
+        "metric_id",
+        "metric_name",
+        "metric_date",
+        "window_start",
+        "window_end",
+        "dimensions",
+        "value",
+        "numerator",
+        "denominator",
+        "source",
+    )
+    update_set = ",\n  ".join(
+        f"{c} = S.{c}" for c in columns if c not in ("metric_id", "metric_date", "dimensions")
+    )
+    return {
+        "declares": f"""DECLARE kpi_since TIMESTAMP DEFAULT {since_sql};
+DECLARE touched_dates ARRAY<DATE>;
+""",
+        "setup": f"""
+-- Incremental mode: only dates touched since the last KPI run are recomputed
+SET touched_dates = ARRAY(
+  SELECT DISTINCT d
+  FROM (
+    SELECT today AS d
+    UNION ALL
+    SELECT DATE(created, "UTC") FROM snap WHERE kpi_since IS NULL OR updated >= kpi_since
+    UNION ALL
+    SELECT DATE(change_timestamp, "UTC") FROM chlog WHERE kpi_since IS NULL OR change_timestamp >= kpi_since
+    UNION ALL
+    SELECT d FROM UNNEST(GENERATE_DATE_ARRAY(start90, today)) AS d WHERE kpi_since IS NULL
+  )
+  WHERE d BETWEEN start90 AND today
+);
+
+CREATE TEMP TABLE kpi_new AS
+SELECT * FROM `{kpi_table}` WHERE FALSE;
+""",
+        "target": "kpi_new",
+        "scope_var": "touched_dates",
+        "date_scope": "\nWHERE d IN UNNEST(touched_dates)",
+        "merge": f"""
+MERGE `{kpi_table}` T
+USING kpi_new S
+ON T.metric_id = S.metric_id
+  AND T.metric_date = S.metric_date
+  AND IFNULL(T.dimensions, '{{}}') = IFNULL(S.dimensions, '{{}}')
+WHEN MATCHED THEN UPDATE SET
+  {update_set}
+WHEN NOT MATCHED THEN
+  INSERT ({", ".join(columns)})
+  VALUES ({", ".join(f"S.{c}" for c in columns)})
+WHEN NOT MATCHED BY SOURCE
+  AND T.source = 'Jira'
+  AND T.metric_id IN ({metric_ids})
+  AND (
+    T.metric_date IN UNNEST(touched_dates)
+    OR (T.metric_id = 'EXEC-11' AND T.metric_date BETWEEN start90 AND today)
+  ) THEN
+  DELETE;
+""",
+    }
+
+
+_IS_BUG = "LOWER(COALESCE(issue_type, '')) IN ('bug','defect')"
+_IS_ACTIVE_BUG = f"{_IS_BUG} AND LOWER(COALESCE(status_category, '')) != 'done'"
+_CREATED_IN_WINDOW = f'{_IS_BUG} AND DATE(created, "UTC") BETWEEN start90 AND today'
+_CLOSED = "LOWER(COALESCE(c.to_value, '')) = 'closed'"
+
+# EXEC-01..EXEC-14 except the date-spine series (EXEC-11, EXEC-13), one grouped pass per
+# relation. `snap` / `chlog` are the temp tables built at the top of the KPI script.
+JIRA_KPI_SOURCES = [
+    MetricSource(
+        "Snapshot",
+        "snap",
+        {
+            "priority": "COALESCE(priority, 'Unknown')",
+            "severity": "COALESCE(severity, 'Unknown')",
+            "pod_team": "COALESCE(pod_team, 'Unknown')",
+            "status": "COALESCE(status, 'Unknown')",
+        },
+        [
+            Metric(
+                "EXEC-01",
+                "Bugs entered today (UTC)",
+                where=f'{_IS_BUG} AND DATE(created, "UTC") = today',
+                breakdowns=[OVERALL, ("priority",), ("severity",)],
+            ),
+            Metric(
+                "EXEC-03",
+                "Active bugs now (statusCategory != Done)",
+                where=_IS_ACTIVE_BUG,
+                breakdowns=[OVERALL, ("pod_team",), ("priority",)],
+            ),
+            Metric(
+                "EXEC-04",
+                "Awaiting QA verification (Resolved)",
+                where=f"{_IS_BUG} AND LOWER(COALESCE(status, '')) = 'resolved'",
+            ),
+            # EXEC-06 has always been the same query; keep writing it for existing tiles.
+            Metric(
+                "EXEC-05",
+                "Bugs entered (last 90d, UTC) by Severity",
+                where=_CREATED_IN_WINDOW,
+                breakdowns=[("severity",)],
+                window_start="start90",
+                aliases=["EXEC-06"],
+            ),
+            Metric(
+                "EXEC-08",
+                "Bugs entered by day (last 90d, UTC) - Priority",
+                where=_CREATED_IN_WINDOW,
+                breakdowns=[("priority",)],
+                day='DATE(created, "UTC")',
+                window_start="start90",
+            ),
+            Metric("EXEC-09", "Active bugs by POD", where=_IS_ACTIVE_BUG, breakdowns=[("pod_team",)]),
+            Metric("EXEC-10", "Active bugs by status", where=_IS_ACTIVE_BUG, breakdowns=[("status",)]),
+        ],
+    ),
+    MetricSource(
+        "Status changelog",
+        "chlog c LEFT JOIN snap s USING(issue_key)",
+        {
+            "priority": "COALESCE(s.priority, 'Unknown')",
+            "issue_key": "issue_key",
+        },
+        [
+            Metric(
+                "EXEC-02",
+                "Fixes today (Closed, UTC)",
+                where=f'{_CLOSED} AND DATE(c.change_timestamp, "UTC") = today',
+                breakdowns=[OVERALL, ("priority",)],
+                distinct="issue_key",
+            ),
+            Metric(
+                "EXEC-07",
+                "Bugs fixed (last 90d, UTC) by Priority",
+                where=f'{_CLOSED} AND DATE(c.change_timestamp, "UTC") BETWEEN start90 AND today',
+                breakdowns=[("priority",)],
+                distinct="issue_key",
+                window_start="start90",
+            ),
+            Metric(
+                "EXEC-12",
+                "Reopened over time (90d, UTC)",
+                where="LOWER(COALESCE(c.to_value, '')) = 'reopened'",
+                day='DATE(c.change_timestamp, "UTC")',
+                distinct="issue_key",
+                window_start="start90",
+            ),
+        ],
+    ),
+    MetricSource(
+        "Active bugs by fixVersion",
+        """snap,
+UNNEST(
+  CASE
+    WHEN fix_versions IS NULL OR ARRAY_LENGTH(fix_versions) = 0 THEN ['None']
+    ELSE fix_versions
+  END
+) AS fixv""",
+        {"fixVersion": "fixv"},
+        [
+            Metric(
+                "EXEC-14",
+                "Active bugs by milestone (fixVersion)",
+                where=_IS_ACTIVE_BUG,
+                breakdowns=[("fixVersion",)],
+            ),
+        ],
+    ),
+]
+
+
+def _compute_jira_kpis(snapshot_table: str = "jira_issues_snapshot", *, mode: str = "full") -> None:
+    """Compute EXEC-01..EXEC-14 from the latest snapshot + 90d changelog.
+
+    mode="full" appends every row of the 90d window (qa_executive_kpis_latest dedups).
+    mode="incremental" recomputes only the metric_dates touched since the previous
+    KPI run and MERGEs them, keeping qa_executive_kpis bounded.
+    """
     client = get_client()
 
-    snap_table = table_ref("jira_issues_snapshot")
+    snap_table = table_ref(snapshot_table)
     chlog_table = table_ref("jira_changelog")
     kpi_table = table_ref("qa_executive_kpis")
 
+    incremental = mode == "incremental"
+    snapshot_ts = None
+    parts = {
+        "declares": "",
+        "setup": "",
+        "target": f"`{kpi_table}`",
+        "scope_var": None,
+        "date_scope": "",
+        "merge": "",
+    }
+    if incremental:
+        snapshot_ts = fetch_scalar(client, f"SELECT MAX(snapshot_timestamp) FROM `{snap_table}`")
+        watermark = _get_kpi_watermark(client)
+        parts = _incremental_kpi_sql(kpi_table, watermark - KPI_WATERMARK_OVERLAP if watermark else None)
+
+    registry_sql = "".join(
+        render_insert(src, target=parts["target"], kpi_source="Jira", date_scope=parts["scope_var"])
+        for src in JIRA_KPI_SOURCES
+    )
+
     sql = f"""
 DECLARE today DATE DEFAULT CURRENT_DATE("UTC");
 DECLARE start90 DATE DEFAULT DATE_SUB(today, INTERVAL 89 DAY);
-
+{parts["declares"]}
 -- Latest snapshot (one run)
 CREATE TEMP TABLE snap AS
 SELECT *
@@ -420,293 +1161,7 @@ SELECT
 FROM `{chlog_table}`
 WHERE field = 'status'
   AND DATE(change_timestamp, "UTC") BETWEEN start90 AND today;
-
--- EXEC-01 Bugs entered today in UTC (overall)
-INSERT INTO `{kpi_table}`
-  (computed_at, metric_id, metric_name, metric_date, window_start, window_end, dimensions, value, numerator, denominator, source)
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-01',
-  'Bugs entered today (UTC)',
-  today,
-  today,
-  today,
-  '{}',
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM snap
-WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
-  AND DATE(created, "UTC") = today;
-
--- EXEC-01 Breakdown by priority
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-01',
-  'Bugs entered today (UTC)',
-  today,
-  today,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(priority, 'Unknown') AS priority)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM snap
-WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
-  AND DATE(created, "UTC") = today
-GROUP BY priority;
-
--- EXEC-01 Breakdown by severity
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-01',
-  'Bugs entered today (UTC)',
-  today,
-  today,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(severity, 'Unknown') AS severity)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM snap
-WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
-  AND DATE(created, "UTC") = today
-GROUP BY severity;
-
--- EXEC-02 Fixes today (Closed, UTC)
-CREATE TEMP TABLE fixes_today AS
-SELECT DISTINCT issue_key
-FROM chlog
-WHERE LOWER(COALESCE(to_value, '')) = 'closed'
-  AND DATE(change_timestamp, "UTC") = today;
-
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-02',
-  'Fixes today (Closed, UTC)',
-  today,
-  today,
-  today,
-  '{}',
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM fixes_today;
-
--- EXEC-02 Breakdown by priority
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-02',
-  'Fixes today (Closed, UTC)',
-  today,
-  today,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(s.priority, 'Unknown') AS priority)),
-  COUNT(DISTINCT f.issue_key) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM fixes_today f
-LEFT JOIN snap s USING(issue_key)
-GROUP BY s.priority;
-
--- EXEC-03 Active bugs now (statusCategory != Done)
-CREATE TEMP TABLE active_now AS
-SELECT *
-FROM snap
-WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
-  AND LOWER(COALESCE(status_category, '')) != 'done';
-
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-03',
-  'Active bugs now (statusCategory != Done)',
-  today,
-  today,
-  today,
-  '{}',
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM active_now;
-
--- EXEC-03 Active by POD
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-03',
-  'Active bugs now (statusCategory != Done)',
-  today,
-  today,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(pod_team, 'Unknown') AS pod_team)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM active_now
-GROUP BY pod_team;
-
--- EXEC-03 Active by priority
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-03',
-  'Active bugs now (statusCategory != Done)',
-  today,
-  today,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(priority, 'Unknown') AS priority)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM active_now
-GROUP BY priority;
-
--- EXEC-04 Awaiting QA verification (Resolved)
-CREATE TEMP TABLE awaiting_qa AS
-SELECT *
-FROM snap
-WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
-  AND LOWER(COALESCE(status, '')) = 'resolved';
-
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-04',
-  'Awaiting QA verification (Resolved)',
-  today,
-  today,
-  today,
-  '{}',
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM awaiting_qa;
-
--- EXEC-05 Bugs entered (last 90d, UTC) by Severity
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-05',
-  'Bugs entered (last 90d, UTC) by Severity',
-  today,
-  start90,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(severity, 'Unknown') AS severity)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM snap
-WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
-  AND DATE(created, "UTC") BETWEEN start90 AND today
-GROUP BY severity;
-
--- EXEC-06 Bugs entered (last 90d, UTC) by Severity
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-06',
-  'Bugs entered (last 90d, UTC) by Severity',
-  today,
-  start90,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(severity, 'Unknown') AS severity)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM snap
-WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
-  AND DATE(created, "UTC") BETWEEN start90 AND today
-GROUP BY severity;
-
--- EXEC-07 Bugs fixed (last 90d, UTC) by Priority
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-07',
-  'Bugs fixed (last 90d, UTC) by Priority',
-  today,
-  start90,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(s.priority, 'Unknown') AS priority)),
-  COUNT(DISTINCT c.issue_key) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM chlog c
-LEFT JOIN snap s USING(issue_key)
-WHERE LOWER(COALESCE(c.to_value, '')) = 'closed'
-  AND DATE(c.change_timestamp, "UTC") BETWEEN start90 AND today
-GROUP BY s.priority;
-
--- EXEC-08 Bugs entered by day (last 90d, UTC) - Priority
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-08',
-  'Bugs entered by day (last 90d, UTC) - Priority',
-  DATE(created, "UTC") AS metric_date,
-  start90,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(priority, 'Unknown') AS priority)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM snap
-WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
-  AND DATE(created, "UTC") BETWEEN start90 AND today
-GROUP BY metric_date, priority;
-
--- EXEC-09 Active bugs by POD
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-09',
-  'Active bugs by POD',
-  today,
-  today,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(pod_team, 'Unknown') AS pod_team)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM active_now
-GROUP BY pod_team;
-
--- EXEC-10 Active bugs by status
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-10',
-  'Active bugs by status',
-  today,
-  today,
-  today,
-  TO_JSON_STRING(STRUCT(COALESCE(status, 'Unknown') AS status)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM active_now
-GROUP BY status;
-
+{parts["setup"]}{registry_sql}
 -- Build a continuous day-by-day trend using the latest snapshot available
 -- EXEC-11 Active bug count over time (90d, UTC)
 -- Active on day d iff:
@@ -715,8 +1170,9 @@ GROUP BY status;
 --     current statusCategory != Done
 --     OR d < statusCategoryChangedDate (fallback when currently Done)
 --   )
--- This avoids sparse snapshot artefacts and uses the status-category transition date
--- as the historical boundary when available.
+-- Computed as a running SUM of +1 (created) / -1 (moved to Done) events per day
+-- instead of a date spine CROSS JOIN every bug. The status-category transition
+-- date is the historical boundary when available.
 CREATE TEMP TABLE bug_lifecycle AS
 SELECT
   issue_key,
@@ -727,47 +1183,45 @@ FROM snap
 WHERE LOWER(COALESCE(issue_type, '')) IN ('bug','defect')
   AND created IS NOT NULL;
 
-INSERT INTO `{kpi_table}`
+CREATE TEMP TABLE bug_event_days AS
+SELECT d, SUM(delta) AS delta
+FROM (
+  SELECT created_date AS d, 1 AS delta
+  FROM bug_lifecycle
+  UNION ALL
+  SELECT GREATEST(status_category_changed_date, created_date), -1
+  FROM bug_lifecycle
+  WHERE status_category_lc = 'done'
+    AND status_category_changed_date IS NOT NULL
+)
+GROUP BY d;
+
+INSERT INTO {parts["target"]}
+WITH active_before AS (
+  SELECT IFNULL(SUM(delta), 0) AS n
+  FROM bug_event_days
+  WHERE d < start90
+),
+days AS (
+  SELECT day AS metric_date, IFNULL(e.delta, 0) AS delta
+  FROM UNNEST(GENERATE_DATE_ARRAY(start90, today)) AS day
+  LEFT JOIN bug_event_days e
+    ON e.d = day
+)
 SELECT
   CURRENT_TIMESTAMP(),
   'EXEC-11',
   'Active bug count over time',
-  d AS metric_date,
-  start90,
-  today,
-  '{}',
-  COUNTIF(
-    bl.created_date <= d
-    AND (
-      bl.status_category_lc != 'done'
-      OR bl.status_category_changed_date IS NULL
-      OR d < bl.status_category_changed_date
-    )
-  ) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM UNNEST(GENERATE_DATE_ARRAY(start90, today)) AS d
-LEFT JOIN bug_lifecycle bl ON TRUE
-GROUP BY metric_date;
-
--- EXEC-12 Reopened over time (90d, UTC)
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-12',
-  'Reopened over time (90d, UTC)',
-  DATE(change_timestamp, "UTC") AS metric_date,
+  metric_date,
   start90,
   today,
-  '{}',
-  COUNT(DISTINCT issue_key) * 1.0,
+  '{{}}',
+  (ab.n + SUM(delta) OVER (ORDER BY metric_date)) * 1.0,
   NULL,
   NULL,
   'Jira'
-FROM chlog
-WHERE LOWER(COALESCE(to_value, '')) = 'reopened'
-GROUP BY metric_date;
+FROM days
+CROSS JOIN active_before ab;
 
 -- EXEC-13 Fix fail rate over time (90d, UTC)
 CREATE TEMP TABLE closed_by_day AS
@@ -787,7 +1241,7 @@ WHERE LOWER(COALESCE(from_value, '')) IN ('closed', 'resolved', 'verified')
   AND LOWER(COALESCE(to_value, '')) = 'reopened'
 GROUP BY d;
 
-INSERT INTO `{kpi_table}`
+INSERT INTO {parts["target"]}
 SELECT
   CURRENT_TIMESTAMP(),
   'EXEC-13',
@@ -795,7 +1249,7 @@ SELECT
   d,
   start90,
   today,
-  '{}',
+  '{{}}',
   SAFE_DIVIDE(COALESCE(r.reopened_count, 0), NULLIF(COALESCE(c.closed_count, 0), 0)) * 1.0,
   COALESCE(r.reopened_count, 0),
   COALESCE(c.closed_count, 0),
@@ -804,42 +1258,29 @@ FROM UNNEST(GENERATE_DATE_ARRAY(start90, today)) AS d
 LEFT JOIN reopened_by_day r
   ON r.d = d
 LEFT JOIN closed_by_day c
-  ON c.d = d;
-
--- EXEC-14 Active bugs by milestone (fixVersion)
-INSERT INTO `{kpi_table}`
-SELECT
-  CURRENT_TIMESTAMP(),
-  'EXEC-14',
-  'Active bugs by milestone (fixVersion)',
-  today,
-  today,
-  today,
-  TO_JSON_STRING(STRUCT(fixv AS fixVersion)),
-  COUNT(1) * 1.0,
-  NULL,
-  NULL,
-  'Jira'
-FROM active_now,
-UNNEST(
-  CASE
-    WHEN fix_versions IS NULL OR ARRAY_LENGTH(fix_versions) = 0 THEN ['None']
-    ELSE fix_versions
-  END
-) AS fixv
-GROUP BY fixv;
-"""
+  ON c.d = d{parts["date_scope"]};
+{parts["merge"]}"""
 
     run_query(client, sql, job_labels={"pipeline": "qa-metrics", "source": "jira"})
 
+    if incremental and snapshot_ts is not None:
+        insert_rows(
+            client,
+            "ingestion_state",
+            [{"source": "jira", "state_key": KPI_WATERMARK_KEY, "last_run": to_rfc3339(snapshot_ts)}],
+        )
+
 
 # -----------------------------
 # HTTP entrypoint
 # -----------------------------
 
+@profiling.profiled("jira")
 def hello_http(request):
     source = "jira/main.py"
     service = (os.environ.get("K_SERVICE") or "unknown").strip() or "unknown"
+    ingest_run = instrumentation.start_run("jira")
+    ingest_run.phase("config")
 
     LOGGER.info(
         "hello_http_start",
@@ -866,6 +1307,10 @@ def hello_http(request):
         req_json = request.get_json(silent=True) or {}
         if not isinstance(req_json, dict):
             req_json = {}
+        # Reject bad overrides before the ingest writes anything.
+        incremental = _incremental_enabled(req_json)
+        kpi_mode = _kpi_mode(req_json)
+        ingest_run.phase("api_fetch")
         inserted_snap, inserted_chg, deadline_reached = ingest_jira(
             deadline_epoch=deadline_epoch,
             request_overrides=req_json,
@@ -873,7 +1318,8 @@ def hello_http(request):
 
         kpis_computed = False
         if not deadline_reached and time.time() < deadline_epoch - 10:
-            _compute_jira_kpis()
+            ingest_run.phase("kpis")
+            _compute_jira_kpis(CURRENT_SNAPSHOT_TABLE if incremental else "jira_issues_snapshot", mode=kpi_mode)
             kpis_computed = True
 
         status = "partial" if deadline_reached else "ok"
@@ -884,9 +1330,11 @@ def hello_http(request):
                     "source": source,
                     "service": service,
                     "status": status,
+                    "mode": "incremental" if incremental else "full",
                     "inserted_snapshot_rows": inserted_snap,
                     "inserted_changelog_rows": inserted_chg,
                     "kpis_computed": kpis_computed,
+                    "kpi_mode": kpi_mode,
                     "deadline_reached": deadline_reached,
                 }
             },
@@ -894,21 +1342,24 @@ def hello_http(request):
         return jsonify(
             {
                 "status": status,
+                "mode": "incremental" if incremental else "full",
                 "inserted_snapshot_rows": inserted_snap,
                 "inserted_changelog_rows": inserted_chg,
                 "kpis_computed": kpis_computed,
+                "kpi_mode": kpi_mode,
                 "deadline_reached": deadline_reached,
+                "instrumentation": ingest_run.finish(status=status),
             }
         )
     except ConfigError as e:
         LOGGER.warning("hello_http_config_error", extra={"json_fields": {"source": source, "service": service, "error": str(e)}})
-        return jsonify({"status": "error", "error": str(e)}), 400
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 400
     except KeyError as e:
         LOGGER.warning("hello_http_missing_env", extra={"json_fields": {"source": source, "service": service, "error": str(e)}})
-        return jsonify({"status": "error", "error": f"Missing required env var: {e}"}), 400
+        return jsonify({"status": "error", "error": f"Missing required env var: {e}", "instrumentation": ingest_run.finish(status="error")}), 400
     except ValueError as e:
         LOGGER.warning("hello_http_value_error", extra={"json_fields": {"source": source, "service": service, "error": str(e)}})
-        return jsonify({"status": "error", "error": str(e)}), 400
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 400
     except JiraAPIError as e:
         LOGGER.exception(
             "hello_http_jira_api_error",
@@ -917,7 +1368,7 @@ def hello_http(request):
         # Jira 4xx means our request/config is invalid; treat as client/config error.
         # Jira 5xx is an upstream outage, so expose as bad gateway.
         status_code = 400 if 400 <= e.status_code < 500 else 502
-        return jsonify({"status": "error", "error": str(e)}), status_code
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), status_code
     except RuntimeError as e:
         LOGGER.exception("hello_http_runtime_error", extra={"json_fields": {"source": source, "service": service, "error": str(e)}})
         if "Data not available right now" in str(e):
@@ -930,11 +1381,12 @@ def hello_http(request):
                             "Please verify BQ_PROJECT, BQ_DATASET, and BQ_LOCATION."
                         ),
                         "details": str(e),
+                        "instrumentation": ingest_run.finish(status="error"),
                     }
                 ),
                 503,
             )
-        return jsonify({"status": "error", "error": str(e)}), 500
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 500
     except Exception as e:
         LOGGER.exception("hello_http_unhandled_error", extra={"json_fields": {"source": source, "service": service, "error": str(e)}})
-        return jsonify({"status": "error", "error": str(e)}), 500
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 500
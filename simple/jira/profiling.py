@@ -0,0 +1,235 @@
+"""Opt-in sampling profiler for `hello_http`, triggered per request.
+
+Send `{"profile": true}` (or `?profile=1`) to a handler decorated with
+`@profiling.profiled("<service>")` and that one invocation is sampled:
+
+- a background thread snapshots the stacks of the handler thread and of every
+  thread it starts (BigQuery writer, fetch pools) every PROFILE_INTERVAL_MS;
+  worker threads parked on an idle wait are not counted;
+- the stacks are written in collapsed format (`thread;file.py:func;... count`,
+  the input of flamegraph.pl / speedscope / inferno) to PROFILE_DIR, or logged
+  as one `PROFILE_STACKS` record with PROFILE_OUTPUT=log (Cloud Run disks are
+  per-instance);
+- the JSON response gets a `profile` object: samples, where the stacks went and
+  the top-N frames by self and total share of the samples.
+
+Samples are wall-clock, so time blocked on the network or on BigQuery shows up
+under the frame that waits. Requests without the flag run untouched.
+
+Env vars:
+- PROFILE_REQUESTS: "false" ignores the request flag (default: honoured).
+- PROFILE_INTERVAL_MS: sampling interval (default 5).
+- PROFILE_TOP_N: hotspots returned (default 15; `"profile_top": N` overrides).
+- PROFILE_OUTPUT: "file" (default) or "log".
+- PROFILE_DIR: directory for `.collapsed` files (default: the temp dir).
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# (file, function) leaves where a worker thread is parked, not working.
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+_TRUE = {"1", "true", "yes", "on"}
+
+
+def _env_int(name: str, default: int, *, minimum: int = 1) -> int:
+    try:
+        return max(minimum, int(os.environ.get(name, str(default))))
+    except ValueError:
+        return default
+
+
+def requested(request: Any) -> bool:
+    """True when the request asks for a profile and PROFILE_REQUESTS allows it."""
+    if (os.environ.get("PROFILE_REQUESTS") or "true").strip().lower() in {"0", "false", "no", "off"}:
+        return False
+    body = request.get_json(silent=True) if hasattr(request, "get_json") else None
+    if isinstance(body, dict) and "profile" in body:
+        return str(body.get("profile")).strip().lower() in _TRUE
+    args = getattr(request, "args", None) or {}
+    return str(args.get("profile", "")).strip().lower() in _TRUE
+
+
+class Sampler:
+    """Samples the stacks of the starting thread and the threads spawned after `start()`."""
+
+    def __init__(self, interval_s: float) -> None:
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._labels: Dict[Any, str] = {}
+        self._names: Dict[int, str] = {}
+        self._target = threading.get_ident()
+        self._excluded: Set[int] = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._excluded = {t.ident for t in threading.enumerate() if t.ident is not None} - {self._target}
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        self._excluded.add(threading.get_ident())
+        while not self._stop.wait(self.interval_s):
+            self._sample()
+
+    def _label(self, code: Any) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        return label
+
+    def _thread_name(self, ident: int) -> str:
+        name = self._names.get(ident)
+        if name is None:
+            self._names.update({t.ident: t.name for t in threading.enumerate() if t.ident is not None})
+            name = self._names.setdefault(ident, f"thread-{ident}")
+        return name
+
+    def _sample(self) -> None:
+        self.samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident in self._excluded:
+                continue
+            stack: List[str] = []
+            f = frame
+            while f is not None:
+                stack.append(self._label(f.f_code))
+                f = f.f_back
+            if ident != self._target:
+                file, _, func = stack[0].partition(":")
+                if (file, func) in _IDLE_LEAVES:
+                    continue
+            stack.append(self._thread_name(ident))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def hotspots(self, top_n: int) -> List[Dict[str, Any]]:
+        total = sum(self.stacks.values())
+        if not total:
+            return []
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += n
+            for frame in set(frames):
+                total_counts[frame] += n
+        ranked = sorted(total_counts, key=lambda f: (-self_counts[f], -total_counts[f], f))[:top_n]
+        return [
+            {
+                "frame": frame,
+                "self_pct": round(100.0 * self_counts[frame] / total, 1),
+                "total_pct": round(100.0 * total_counts[frame] / total, 1),
+                "self_samples": self_counts[frame],
+            }
+            for frame in ranked
+        ]
+
+
+def _write(service: str, sampler: Sampler) -> str:
+    collapsed = sampler.collapsed()
+    if (os.environ.get("PROFILE_OUTPUT") or "file").strip().lower() == "log":
+        LOGGER.info("PROFILE_STACKS service=%s samples=%s\n%s", service, sampler.samples, collapsed)
+        return "log"
+    directory = os.environ.get("PROFILE_DIR") or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{service}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}.collapsed")
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(collapsed)
+    return path
+
+
+def _top_n(request: Any) -> int:
+    body = request.get_json(silent=True) if hasattr(request, "get_json") else None
+    if isinstance(body, dict) and body.get("profile_top") is not None:
+        try:
+            return max(1, int(body["profile_top"]))
+        except (TypeError, ValueError):
+            pass
+    return _env_int("PROFILE_TOP_N", 15)
+
+
+def _attach(response: Any, profile: Dict[str, Any]) -> Any:
+    """Add `profile` to a JSON response: a flask Response, or a `(body, status[, headers])` tuple."""
+    rest: Tuple[Any, ...] = ()
+    body = response
+    if isinstance(response, tuple):
+        body, rest = response[0], response[1:]
+    if isinstance(body, (str, bytes)):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return response
+        if isinstance(payload, dict):
+            payload["profile"] = profile
+            body = json.dumps(payload, default=str)
+    elif hasattr(body, "get_json") and hasattr(body, "set_data"):
+        payload = body.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload["profile"] = profile
+            body.set_data(json.dumps(payload, default=str))
+    return (body, *rest) if isinstance(response, tuple) else body
+
+
+def profiled(service: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorate a `hello_http(request)` so `{"profile": true}` requests are sampled."""
+
+    def decorator(handler: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(handler)
+        def wrapper(request: Any, *args: Any, **kwargs: Any) -> Any:
+            if not requested(request):
+                return handler(request, *args, **kwargs)
+            sampler = Sampler(_env_int("PROFILE_INTERVAL_MS", 5) / 1000.0)
+            sampler.start()
+            try:
+                response = handler(request, *args, **kwargs)
+            finally:
+                sampler.stop()
+                try:
+                    output: Optional[str] = _write(service, sampler)
+                except OSError as exc:
+                    LOGGER.warning("PROFILE_WRITE_FAILED service=%s error=%s", service, exc)
+                    output = None
+            profile = {
+                "samples": sampler.samples,
+                "interval_ms": round(sampler.interval_s * 1000, 1),
+                "duration_ms": round(sampler.elapsed * 1000, 1),
+                "output": output,
+                "top": sampler.hotspots(_top_n(request)),
+            }
+            LOGGER.info("PROFILE_SUMMARY service=%s %s", service, json.dumps(profile, sort_keys=True))
+            return _attach(response, profile)
+
+        return wrapper
+
+    return decorator
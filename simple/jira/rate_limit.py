@@ -0,0 +1,255 @@
+"""Adaptive per-upstream token-bucket rate limiter shared by the ingest services.
+
+One limiter per upstream (``jira``, ``testrail``, ``bugsnag``, ``gamebench``) is
+shared by every thread of the process. Callers take a token before each request
+(``acquire``) and hand the response back (``observe``); ``http_session.request``
+does both when given ``limiter=...``.
+
+The rate adapts to what the upstream says:
+- 429 / 503 with ``Retry-After``: pause the bucket until then and halve the rate.
+- 429 without ``Retry-After``: halve the rate and pause for one token interval.
+- ``X-RateLimit-Remaining`` + ``X-RateLimit-Reset``: never spend faster than the
+  remaining budget allows until the reset; ``Remaining: 0`` pauses until reset.
+- Any other answer: additive increase back towards the configured ceiling.
+
+Retry loops sleep ``retry_delay(limiter, attempt)`` between throttled attempts:
+the limiter's pause, but never less than an exponential backoff floor.
+
+Env vars (``<NAME>`` is the upper-cased upstream, e.g. ``JIRA``):
+- RATE_LIMIT_<NAME>_RPS: ceiling in requests/second (defaults below; 0 disables pacing,
+  pauses from ``Retry-After`` still apply).
+- RATE_LIMIT_<NAME>_BURST: bucket size (default: the ceiling rounded up, min 1).
+- RATE_LIMIT_MIN_RPS: floor the rate never drops below when backing off (default 0.2).
+- RATE_LIMIT_MAX_PAUSE_S: upper bound for a single learned pause (default 60).
+
+This file is duplicated in every simple/<service>/ dir; keep the copies identical.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+_DEFAULT_RPS = {
+    "jira": 10.0,
+    "testrail": 3.0,
+    "bugsnag": 5.0,
+    "gamebench": 5.0,
+}
+
+_LIMITERS: Dict[str, "AdaptiveRateLimiter"] = {}
+_LOCK = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = (os.environ.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return default
+
+
+def _parse_delay(value: Optional[str], now_epoch: float) -> Optional[float]:
+    """Seconds until ``value`` (delta-seconds, epoch seconds/millis, ISO or HTTP date)."""
+    raw = (value or "").strip()
+    if not raw:
+        return None
+    try:
+        number = float(raw)
+    except ValueError:
+        number = None
+    if number is not None:
+        if number > 1e12:  # epoch millis
+            return max(0.0, number / 1000.0 - now_epoch)
+        if number > 1e9:  # epoch seconds
+            return max(0.0, number - now_epoch)
+        return max(0.0, number)
+    try:
+        at = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            at = parsedate_to_datetime(raw)
+        except (TypeError, ValueError):
+            return None
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return max(0.0, at.timestamp() - now_epoch)
+
+
+def _header_int(headers: Any, *names: str) -> Optional[int]:
+    for name in names:
+        raw = headers.get(name)
+        if raw is None:
+            continue
+        try:
+            return int(float(str(raw).strip()))
+        except ValueError:
+            continue
+    return None
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe token bucket whose rate follows the upstream's rate-limit signals."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_rate: float,
+        burst: Optional[float] = None,
+        min_rate: Optional[float] = None,
+        max_pause_s: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.max_rate = max(0.0, max_rate)
+        self.min_rate = min(self.max_rate, _env_float("RATE_LIMIT_MIN_RPS", 0.2) if min_rate is None else min_rate)
+        self.burst = max(1.0, burst if burst else math.ceil(self.max_rate))
+        self.max_pause_s = _env_float("RATE_LIMIT_MAX_PAUSE_S", 60.0) if max_pause_s is None else max_pause_s
+        self._rate = self.max_rate
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.waited_s = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    # -- caller side -------------------------------------------------------
+
+    def acquire(self, deadline_epoch: Optional[float] = None) -> float:
+        """Block until a request may be sent; returns the seconds waited.
+
+        Raises ``TimeoutError`` instead of waiting past ``deadline_epoch``.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Tokens accrue from `_last`, which sits at the end of any active pause.
+            wait_s = max(now, self._paused_until, self._last) - now
+            if self._rate > 0:
+                self._tokens -= 1.0
+                if self._tokens < 0:
+                    wait_s += -self._tokens / self._rate
+            if deadline_epoch is not None and time.time() + wait_s > deadline_epoch:
+                if self._rate > 0:
+                    self._tokens += 1.0
+                raise TimeoutError(f"{self.name} rate limit wait of {wait_s:.1f}s exceeds the deadline")
+            self.requests += 1
+            self.waited_s += wait_s
+        if wait_s > 0:
+            time.sleep(wait_s)
+        return wait_s
+
+    def observe(self, resp: Any) -> None:
+        """Adapt the rate from one upstream response (status + rate-limit headers)."""
+        status = int(getattr(resp, "status_code", 0) or 0)
+        headers = getattr(resp, "headers", None) or {}
+        now_epoch = time.time()
+        retry_after = _parse_delay(headers.get("Retry-After"), now_epoch)
+        remaining = _header_int(headers, "X-RateLimit-Remaining", "RateLimit-Remaining")
+        reset_in = _parse_delay(headers.get("X-RateLimit-Reset") or headers.get("RateLimit-Reset"), now_epoch)
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if status == 429 or (status == 503 and retry_after is not None):
+                self.throttled += 1
+                self._rate = max(self.min_rate, self._rate / 2.0) if self._rate > 0 else 0.0
+                pause = retry_after
+                if pause is None:
+                    pause = 1.0 / self._rate if self._rate > 0 else 1.0
+                self._pause(now, pause)
+                return
+
+            if remaining is not None and reset_in is not None:
+                if remaining <= 0:
+                    self._pause(now, reset_in)
+                    return
+                budget_rate = remaining / max(reset_in, 1.0)
+                if self.max_rate > 0 and budget_rate < self._rate:
+                    self._rate = max(self.min_rate, budget_rate)
+                    return
+
+            if 200 <= status < 400 and self._rate < self.max_rate:
+                # Additive increase: back to the ceiling after ~20 clean answers.
+                self._rate = min(self.max_rate, self._rate + self.max_rate / 20.0)
+
+    def pause_remaining(self) -> float:
+        """Seconds until the current pause (Retry-After, 429, exhausted budget) ends."""
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_s": round(self._rate, 3),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "waited_s": round(self.waited_s, 3),
+        }
+
+    # -- internals ---------------------------------------------------------
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+            self._last = now
+
+    def _pause(self, now: float, seconds: float) -> None:
+        until = now + min(max(0.0, seconds), self.max_pause_s)
+        if until > self._paused_until:
+            self._paused_until = until
+        # No burst right after the pause: tokens start accruing when it ends.
+        self._tokens = min(self._tokens, 0.0)
+        self._last = max(self._last, self._paused_until)
+
+
+def retry_delay(
+    limiter: Optional[AdaptiveRateLimiter],
+    attempt: int,
+    *,
+    base_s: float = 1.0,
+    cap_s: float = 60.0,
+) -> float:
+    """Seconds to sleep before retry ``attempt`` (1 = first retry) of a throttled call.
+
+    ``max(limiter pause, min(cap_s, base_s * 2**(attempt - 1)))``: the limiter's
+    pause honours ``Retry-After``, and the exponential floor keeps retries spaced
+    when the upstream sends none (the limiter alone would only wait ``1/rate``).
+    Sleeping this long also covers the pause the next ``acquire`` would wait.
+    """
+    floor = min(cap_s, base_s * (2 ** max(0, attempt - 1)))
+    return max(limiter.pause_remaining() if limiter is not None else 0.0, floor)
+
+
+def get_limiter(upstream: str) -> AdaptiveRateLimiter:
+    """Return the process-wide limiter for ``upstream`` (created from env on first use)."""
+    key = upstream.strip().lower()
+    limiter = _LIMITERS.get(key)
+    if limiter is not None:
+        return limiter
+    with _LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            prefix = f"RATE_LIMIT_{key.upper()}"
+            max_rate = _env_float(f"{prefix}_RPS", _DEFAULT_RPS.get(key, 10.0))
+            limiter = AdaptiveRateLimiter(key, max_rate=max_rate, burst=_env_float(f"{prefix}_BURST", 0.0) or None)
+            _LIMITERS[key] = limiter
+    return limiter
+
+
+def reset_all() -> None:
+    """Forget every limiter (mainly for tests and benchmarks)."""
+    with _LOCK:
+        _LIMITERS.clear()
@@ -0,0 +1,217 @@
+import datetime as dt
+import importlib.util
+import os
+from pathlib import Path
+import types
+import unittest
+from unittest.mock import patch
+
+from google.api_core.exceptions import BadRequest, NotFound
+from google.cloud import bigquery
+
+_DIR = Path(__file__).resolve().parent
+
+
+def _load(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+bq_backend = _load("jira_bq_backend", _DIR / "bq_backend.py")
+# The stand-in itself is development-only and lives with the benchmarks.
+local_bigquery = _load("benchmarks.local_bigquery", _DIR.parents[1] / "benchmarks" / "local_bigquery.py")
+# What `from benchmarks import local_bigquery` resolves to, without the repo root on sys.path.
+_BENCHMARKS = types.ModuleType("benchmarks")
+_BENCHMARKS.local_bigquery = local_bigquery
+
+_HAS_DUCKDB = importlib.util.find_spec("duckdb") is not None
+if _HAS_DUCKDB:
+    # Import once up front: patch.dict(sys.modules) below would otherwise drop it on
+    # exit, and duckdb's C extension cannot be imported a second time.
+    import duckdb  # noqa: F401
+_UTC = dt.timezone.utc
+
+
+class GetClientTests(unittest.TestCase):
+    def test_defaults_to_bigquery(self):
+        with patch.dict(os.environ, {"BQ_BACKEND": ""}), patch.object(bigquery, "Client") as client_cls:
+            self.assertIs(bq_backend.get_client("demo-proj"), client_cls.return_value)
+        client_cls.assert_called_once_with(project="demo-proj")
+
+    @unittest.skipUnless(_HAS_DUCKDB, "duckdb not installed")
+    def test_local_backend_is_shared_per_path(self):
+        env = {"BQ_BACKEND": "local", "BQ_LOCAL_PATH": "", "BQ_LOCAL_INIT_SQL": ""}
+        modules = {"benchmarks": _BENCHMARKS, "benchmarks.local_bigquery": local_bigquery}
+        with patch.dict(os.environ, env), patch.dict("sys.modules", modules), patch.dict(local_bigquery._CLIENTS, clear=True):
+            first = bq_backend.get_client("demo-proj")
+            self.assertIsInstance(first, local_bigquery.LocalBigQueryClient)
+            self.assertTrue(first.strict)
+            self.assertIs(bq_backend.get_client("demo-proj"), first)
+
+
+@unittest.skipUnless(_HAS_DUCKDB, "duckdb not installed")
+class LocalBigQueryClientTests(unittest.TestCase):
+    def setUp(self):
+        with patch.dict(os.environ, {"BQ_LOCAL_STRICT": "", "BQ_LOCAL_INIT_SQL": ""}):
+            self.client = local_bigquery.LocalBigQueryClient(project="demo-proj")
+        self.addCleanup(self.client.close)
+
+    def _rows(self, sql, params=None):
+        config = bigquery.QueryJobConfig(query_parameters=params or [])
+        return list(self.client.query(sql, job_config=config).result())
+
+    def test_insert_rows_json_creates_typed_table(self):
+        errors = self.client.insert_rows_json(
+            "demo-proj.ds.issues",
+            [
+                {"issue_key": "PC-1", "updated": "2024-05-01T12:00:00.000+0200", "points": 3, "labels": ["a"]},
+                {"issue_key": "PC-2", "updated": None, "points": None},
+            ],
+        )
+
+        self.assertEqual(errors, [])
+        table = self.client.get_table("demo-proj.ds.issues")
+        self.assertEqual(
+            [(f.name, f.field_type, f.mode) for f in table.schema],
+            [
+                ("issue_key", "STRING", "NULLABLE"),
+                ("updated", "TIMESTAMP", "NULLABLE"),
+                ("points", "INTEGER", "NULLABLE"),
+                ("labels", "STRING", "REPEATED"),
+            ],
+        )
+        self.assertEqual(table.num_rows, 2)
+        rows = self._rows("SELECT issue_key, updated FROM `demo-proj.ds.issues` ORDER BY issue_key")
+        self.assertEqual(rows[0]["updated"], dt.datetime(2024, 5, 1, 10, 0, tzinfo=_UTC))
+        self.assertIsNone(rows[1].get("updated"))
+
+    def test_strict_insert_reports_unknown_fields_per_row(self):
+        self.client.insert_rows_json("demo-proj.ds.t", [{"a": 1}])
+
+        errors = self.client.insert_rows_json("demo-proj.ds.t", [{"a": 2, "b": "x"}])
+
+        self.assertEqual(errors[0]["index"], 0)
+        self.assertEqual(errors[0]["errors"][0]["location"], "b")
+
+    def test_create_and_update_table(self):
+        table = bigquery.Table(
+            "demo-proj.ds.runs",
+            schema=[bigquery.SchemaField("run_id", "INT64", mode="REQUIRED"), bigquery.SchemaField("name", "STRING")],
+        )
+        self.client.create_table(table)
+        self.client.create_table(table, exists_ok=True)
+
+        table.schema = list(table.schema) + [bigquery.SchemaField("tags", "STRING", mode="REPEATED")]
+        updated = self.client.update_table(table, ["schema"])
+
+        self.assertEqual([f.name for f in updated.schema], ["run_id", "name", "tags"])
+        self.assertEqual(updated.schema[0].mode, "REQUIRED")
+        self.client.delete_table("demo-proj.ds.runs")
+        with self.assertRaises(NotFound):
+            self.client.get_table("demo-proj.ds.runs")
+
+    def test_merge_upserts_latest_row_per_key(self):
+        self.client.insert_rows_json(
+            "demo-proj.ds.raw",
+            [
+                {"k": "A", "v": 1, "updated": "2024-01-01T00:00:00Z"},
+                {"k": "A", "v": 2, "updated": "2024-01-02T00:00:00Z"},
+                {"k": "B", "v": 3, "updated": "2024-01-01T00:00:00Z"},
+            ],
+        )
+        self._rows("CREATE TABLE IF NOT EXISTS `demo-proj.ds.cur` CLUSTER BY k AS SELECT * FROM `demo-proj.ds.raw` WHERE FALSE")
+        merge = """
+MERGE `demo-proj.ds.cur` T
+USING (
+  SELECT * EXCEPT(rn)
+  FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY k ORDER BY updated DESC) AS rn FROM `demo-proj.ds.raw`)
+  WHERE rn = 1
+) S
+ON T.k = S.k
+WHEN MATCHED AND S.updated >= T.updated THEN UPDATE SET T.v = S.v, T.updated = S.updated
+WHEN NOT MATCHED THEN INSERT ROW
+"""
+        job = self.client.query(merge)
+        job.result()
+        self.assertEqual(job.num_dml_affected_rows, 2)
+        self.client.query(merge).result()
+
+        rows = self._rows("SELECT k, v FROM `demo-proj.ds.cur` ORDER BY k")
+        self.assertEqual([(r["k"], r["v"]) for r in rows], [("A", 2), ("B", 3)])
+
+    def test_script_with_variables_and_unnest_alias(self):
+        rows = self._rows(
+            """
+DECLARE today DATE DEFAULT DATE '2024-03-03';
+DECLARE start DATE DEFAULT DATE_SUB(today, INTERVAL 2 DAY);
+CREATE TEMP TABLE hits AS SELECT DATE '2024-03-02' AS d, 5 AS n;
+SELECT d, IFNULL(h.n, 0) AS n
+FROM UNNEST(GENERATE_DATE_ARRAY(start, today)) AS d
+LEFT JOIN hits h ON h.d = d
+ORDER BY d
+"""
+        )
+
+        self.assertEqual(
+            [(r["d"], r["n"]) for r in rows],
+            [(dt.date(2024, 3, 1), 0), (dt.date(2024, 3, 2), 5), (dt.date(2024, 3, 3), 0)],
+        )
+
+    def test_array_params_with_offset(self):
+        rows = self._rows(
+            """
+SELECT issue_key, seen
+FROM UNNEST(@issue_keys) AS issue_key WITH OFFSET i
+JOIN UNNEST(@updated) AS seen WITH OFFSET j ON i = j
+WHERE issue_key IN UNNEST(@wanted)
+""",
+            [
+                bigquery.ArrayQueryParameter("issue_keys", "STRING", ["PC-1", "PC-2"]),
+                bigquery.ArrayQueryParameter("updated", "TIMESTAMP", ["2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z"]),
+                bigquery.ArrayQueryParameter("wanted", "STRING", ["PC-2"]),
+            ],
+        )
+
+        self.assertEqual([(r["issue_key"], r["seen"]) for r in rows], [("PC-2", dt.datetime(2024, 1, 2, tzinfo=_UTC))])
+
+    def test_if_block_and_information_schema(self):
+        self.client.insert_rows_json("demo-proj.ds.t", [{"a": 1}])
+
+        rows = self._rows(
+            """
+DECLARE has_table BOOL DEFAULT FALSE;
+SET has_table = EXISTS(SELECT 1 FROM ds.INFORMATION_SCHEMA.TABLES WHERE table_name = 't');
+IF has_table THEN
+  EXECUTE IMMEDIATE "ALTER TABLE `demo-proj.ds.t` ADD COLUMN IF NOT EXISTS b STRING";
+END IF;
+SELECT column_name FROM `demo-proj.ds.INFORMATION_SCHEMA.COLUMNS` WHERE table_name = 't' ORDER BY ordinal_position
+"""
+        )
+
+        self.assertEqual([r["column_name"] for r in rows], ["a", "b"])
+
+    def test_failed_script_rolls_back(self):
+        with self.assertRaises(NotFound):
+            self._rows("CREATE TABLE `demo-proj.ds.partial` (a INT64); SELECT * FROM `demo-proj.ds.missing`")
+        with self.assertRaises(NotFound):
+            self.client.get_table("demo-proj.ds.partial")
+
+    def test_non_strict_failure_returns_no_rows(self):
+        self.client.strict = False
+
+        job = self.client.query("SELECT * FROM `demo-proj.ds.missing`")
+
+        self.assertEqual(list(job.result()), [])
+        self.assertIn("missing", job.local_error)
+        self.assertEqual(self.client.stats()["failed_queries"], 1)
+
+    def test_unsupported_statement_is_bad_request(self):
+        with self.assertRaises(BadRequest):
+            self._rows("LOOP SELECT 1; END LOOP")
+
+
+if __name__ == "__main__":
+    unittest.main()
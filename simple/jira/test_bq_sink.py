@@ -0,0 +1,128 @@
+import gzip
+import importlib.util
+import json
+from pathlib import Path
+import unittest
+from unittest.mock import Mock, patch
+
+from google.cloud import bigquery
+
+_SINK_PATH = Path(__file__).resolve().parent / "bq_sink.py"
+_SPEC = importlib.util.spec_from_file_location("jira_bq_sink", _SINK_PATH)
+bq_sink = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(bq_sink)
+
+_SCHEMA = [
+    bigquery.SchemaField("issue_key", "STRING"),
+    bigquery.SchemaField("snapshot_timestamp", "TIMESTAMP"),
+    bigquery.SchemaField("metric_date", "DATE"),
+    bigquery.SchemaField("fix_versions", "STRING", mode="REPEATED"),
+    bigquery.SchemaField("value", "FLOAT"),
+]
+
+
+class ProtoSerializationTests(unittest.TestCase):
+    def test_rows_round_trip_through_schema_descriptor(self):
+        descriptor = bq_sink.build_proto_descriptor(_SCHEMA)
+        message_cls = bq_sink._message_class(descriptor)
+
+        serialized, errors = bq_sink.serialize_rows(
+            message_cls,
+            _SCHEMA,
+            [
+                {
+                    "issue_key": "PC-1",
+                    "snapshot_timestamp": "1970-01-01T00:00:01.5Z",
+                    "metric_date": "1970-01-03",
+                    "fix_versions": ["1.0", None, "1.1"],
+                    "value": 2,
+                    "extra": "ignored",
+                }
+            ],
+            ignore_unknown_values=True,
+        )
+
+        self.assertEqual(errors, [])
+        msg = message_cls()
+        msg.ParseFromString(serialized[0])
+        self.assertEqual(msg.issue_key, "PC-1")
+        self.assertEqual(msg.snapshot_timestamp, 1_500_000)
+        self.assertEqual(msg.metric_date, 2)
+        self.assertEqual(list(msg.fix_versions), ["1.0", "1.1"])
+        self.assertEqual(msg.value, 2.0)
+
+    def test_unknown_fields_are_reported_like_insert_all(self):
+        message_cls = bq_sink._message_class(bq_sink.build_proto_descriptor(_SCHEMA))
+        serialized, errors = bq_sink.serialize_rows(message_cls, _SCHEMA, [{"nope": 1}], ignore_unknown_values=False)
+
+        self.assertEqual(serialized, [])
+        self.assertEqual(errors[0]["index"], 0)
+        self.assertIn("nope", errors[0]["errors"][0]["message"])
+
+    def test_bytes_accept_insert_all_base64_strings(self):
+        schema = [bigquery.SchemaField("payload", "BYTES")]
+        message_cls = bq_sink._message_class(bq_sink.build_proto_descriptor(schema))
+        serialized, errors = bq_sink.serialize_rows(
+            message_cls, schema, [{"payload": "AAF7fQ=="}, {"payload": b"\x00\x01"}], ignore_unknown_values=False
+        )
+
+        self.assertEqual(errors, [])
+        parsed = []
+        for chunk in serialized:
+            msg = message_cls()
+            msg.ParseFromString(chunk)
+            parsed.append(msg.payload)
+        self.assertEqual(parsed, [b"\x00\x01{}", b"\x00\x01"])
+
+
+class SinkSelectionTests(unittest.TestCase):
+    def test_streaming_sink_is_default(self):
+        client = Mock()
+        client.insert_rows_json.return_value = []
+        with patch.dict("os.environ", {"BQ_WRITE_SINK": ""}, clear=False):
+            self.assertEqual(bq_sink.write_rows(client, "p.d.t", [{"a": 1}], row_ids=["r1"]), [])
+        client.insert_rows_json.assert_called_once_with("p.d.t", [{"a": 1}], ignore_unknown_values=False, row_ids=["r1"])
+
+    def test_unknown_sink_is_rejected(self):
+        with self.assertRaises(ValueError):
+            bq_sink.get_sink("carrier_pigeon")
+
+
+class BulkLoaderTests(unittest.TestCase):
+    def test_spools_rows_past_threshold_into_one_load(self):
+        loads = []
+
+        def _load(table, path):
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                loads.append((table, [json.loads(line)["n"] for line in fh]))
+            return len(loads[-1][1])
+
+        bulk = bq_sink.BulkLoader(_load, threshold=2)
+        self.assertFalse(bulk.route("t", [{"n": 1}, {"n": 2}]))
+        self.assertTrue(bulk.route("t", [{"n": 3}], tag="A"))
+        self.assertTrue(bulk.route("t", [{"n": 4}], tag="B"))
+
+        self.assertEqual(bulk.pending_rows(), 2)
+        self.assertEqual(bulk.pending_tags(), {"A", "B"})
+        self.assertEqual(bulk.finish(), {"t": 2})
+        self.assertEqual(loads, [("t", [3, 4])])
+        self.assertEqual(bulk.pending_rows(), 0)
+        self.assertEqual(bulk.pending_tags(), set())
+
+    def test_failed_load_raises_with_table_and_tags(self):
+        def _load(_table, _path):
+            raise RuntimeError("quota")
+
+        bulk = bq_sink.BulkLoader(_load, threshold=1)
+        bulk.route("t", [{"n": 1}, {"n": 2}], tag="P1")
+
+        with self.assertRaises(bq_sink.BulkLoadError) as ctx:
+            bulk.finish()
+
+        self.assertEqual((ctx.exception.table, ctx.exception.tags), ("t", {"P1"}))
+        self.assertEqual(bulk.pending_rows(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import importlib.util
+from pathlib import Path
+import threading
+import time
+import unittest
+
+_WRITER_PATH = Path(__file__).resolve().parent / "bq_writer.py"
+_SPEC = importlib.util.spec_from_file_location("jira_bq_writer", _WRITER_PATH)
+bq_writer = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(bq_writer)
+
+
+class BackgroundWriterTests(unittest.TestCase):
+    def test_writes_batches_in_submit_order(self):
+        written = []
+
+        def _insert(_client, table, rows):
+            written.append((table, [r["n"] for r in rows]))
+            return len(rows)
+
+        writer = bq_writer.BackgroundWriter(object(), _insert, max_pending=1)
+        writer.submit("t", [{"n": 1}, {"n": 2}])
+        writer.submit("t", [{"n": 3}])
+        writer.submit("other", [{"n": 4}])
+
+        self.assertEqual(writer.close(), {"t": 3, "other": 1})
+        self.assertEqual(written, [("t", [1, 2]), ("t", [3]), ("other", [4])])
+
+    def test_insert_error_is_raised_in_caller(self):
+        def _insert(_client, _table, _rows):
+            raise RuntimeError("boom")
+
+        writer = bq_writer.BackgroundWriter(object(), _insert)
+        writer.submit("t", [{"n": 1}], tag="P1")
+        with self.assertRaises(bq_writer.BackgroundWriteError) as ctx:
+            writer.close()
+
+        self.assertEqual(ctx.exception.tag, "P1")
+        self.assertIn("boom", str(ctx.exception))
+
+    def test_close_discards_pending_batches_after_deadline(self):
+        release = threading.Event()
+
+        def _insert(_client, _table, rows):
+            release.wait(timeout=5)
+            return len(rows)
+
+        writer = bq_writer.BackgroundWriter(object(), _insert, max_pending=4)
+        writer.submit("t", [{"n": 1}], tag="A")
+        writer.submit("t", [{"n": 2}], tag="B")
+        threading.Timer(0.2, release.set).start()
+
+        inserted = writer.close(deadline_epoch=time.time() + 0.05)
+
+        self.assertEqual(inserted, {"t": 1})
+        self.assertEqual(writer.dropped_rows, 1)
+        self.assertEqual(writer.dropped_tags, {"B"})
+
+    def test_spooled_rows_left_at_deadline_are_dropped_like_batches(self):
+        release = threading.Event()
+        loads = []
+
+        def _insert(_client, _table, rows):
+            release.wait(timeout=5)
+            return len(rows)
+
+        writer = bq_writer.BackgroundWriter(object(), _insert, load_fn=lambda *args: loads.append(args) or 0)
+        writer._bulk.threshold = 1
+        writer.submit("big", [{"n": 1}, {"n": 2}], tag="A")
+        writer.submit("t", [{"n": 3}], tag="B")
+        writer.submit("t", [{"n": 4}], tag="C")
+        threading.Timer(0.2, release.set).start()
+
+        inserted = writer.close(deadline_epoch=time.time() + 0.05)
+
+        self.assertEqual(inserted, {"t": 1})
+        self.assertEqual(writer.dropped_rows, 3)
+        self.assertEqual(writer.dropped_tags, {"A", "C"})
+        self.assertEqual(loads, [])
+
+    def test_bulk_load_does_not_start_after_deadline(self):
+        loads = []
+        writer = bq_writer.BackgroundWriter(
+            object(), lambda _c, _t, rows: len(rows), load_fn=lambda *args: loads.append(args) or 0, enabled=False
+        )
+        writer._bulk.threshold = 1
+        writer.submit("t", [{"n": 1}, {"n": 2}], tag="A")
+
+        self.assertEqual(writer.close(deadline_epoch=time.time() - 1), {})
+        self.assertEqual(writer.dropped_rows, 2)
+        self.assertEqual(writer.dropped_tags, {"A"})
+        self.assertEqual(loads, [])
+    def test_failed_bulk_load_names_table_and_spooled_tags(self):
+        def _load(_client, _table, _path):
+            raise RuntimeError("load boom")
+
+        writer = bq_writer.BackgroundWriter(object(), lambda _c, _t, rows: len(rows), load_fn=_load, enabled=False)
+        writer._bulk.threshold = 1
+        writer.submit("t", [{"n": 1}, {"n": 2}], tag="A")
+        writer.submit("t", [{"n": 3}], tag="B")
+
+        with self.assertRaises(bq_writer.BackgroundWriteError) as ctx:
+            writer.close()
+
+        self.assertEqual(ctx.exception.table, "t")
+        self.assertIsNone(ctx.exception.tag)
+        self.assertEqual(ctx.exception.tags, {"A", "B"})
+        self.assertIn("load boom", str(ctx.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import importlib.util
+import os
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+_PATH = Path(__file__).resolve().parent / "instrumentation.py"
+_SPEC = importlib.util.spec_from_file_location("jira_instrumentation", _PATH)
+instrumentation = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(instrumentation)
+
+
+class RunTests(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, instrumentation, "_ACTIVE", None)
+
+    def test_summary_has_phases_counters_and_endpoints(self):
+        run = instrumentation.start_run("jira")
+        run.phase("config")
+        run.phase("api_fetch")
+        run.phase("api_fetch")
+        with instrumentation.span("parse"):
+            pass
+        with instrumentation.span("parse"):
+            pass
+        instrumentation.incr("records_parsed", 3)
+        instrumentation.observe("jira GET /search", 7.0, status=200)
+        instrumentation.observe("jira GET /search", 300.0, status=429)
+        instrumentation.observe("jira GET /search", 40.0, error=True)
+
+        with self.assertLogs(instrumentation.LOGGER, "INFO") as logs:
+            summary = run.finish(status="ok")
+
+        self.assertEqual(summary["service"], "jira")
+        self.assertEqual(summary["status"], "ok")
+        self.assertEqual(set(summary["spans"]), {"config", "api_fetch", "parse"})
+        self.assertEqual(summary["spans"]["api_fetch"]["count"], 1)
+        self.assertEqual(summary["spans"]["parse"]["count"], 2)
+        self.assertEqual(summary["counters"], {"records_parsed": 3})
+        endpoint = summary["endpoints"]["jira GET /search"]
+        self.assertEqual(endpoint["count"], 3)
+        self.assertEqual(endpoint["errors"], 1)
+        self.assertEqual(endpoint["status"], {"2xx": 1, "429": 1})
+        self.assertEqual(endpoint["p50_ms"], 50.0)
+        self.assertEqual(endpoint["p95_ms"], 300.0)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("INGEST_RUN_SUMMARY", logs.output[0])
+
+    def test_finish_is_idempotent_and_releases_the_run(self):
+        run = instrumentation.start_run("bugsnag")
+
+        first = run.finish(status="ok")
+
+        self.assertIsNone(instrumentation.current())
+        self.assertIs(run.finish(status="error"), first)
+        self.assertEqual(instrumentation.finish(status="error"), {})
+        instrumentation.incr("ignored")
+        self.assertNotIn("ignored", first["counters"])
+
+    def test_timed_records_errors(self):
+        run = instrumentation.start_run("testrail")
+
+        @instrumentation.timed("bigquery query")
+        def query(fail):
+            if fail:
+                raise RuntimeError("boom")
+
+        query(False)
+        with self.assertRaises(RuntimeError):
+            query(True)
+
+        endpoint = run.summary()["endpoints"]["bigquery query"]
+        self.assertEqual((endpoint["count"], endpoint["errors"]), (2, 1))
+
+    def test_disabled_run_records_nothing(self):
+        with patch.dict(os.environ, {"INSTRUMENTATION_ENABLED": "false"}):
+            run = instrumentation.start_run("gamebench")
+        run.phase("config")
+        instrumentation.incr("records_parsed")
+
+        with self.assertNoLogs(instrumentation.LOGGER, "INFO"):
+            summary = run.finish()
+
+        self.assertEqual((summary["spans"], summary["counters"], summary["endpoints"]), ({}, {}, {}))
+
+
+class EndpointNameTests(unittest.TestCase):
+    def test_collapses_ids_and_keeps_api_version(self):
+        self.assertEqual(
+            instrumentation.endpoint_name("get", "https://x.atlassian.net/rest/api/3/issue/PC-12/changelog", "jira"),
+            "jira GET /rest/api/3/issue/{id}/changelog",
+        )
+
+    def test_uses_testrail_query_path(self):
+        self.assertEqual(
+            instrumentation.endpoint_name("GET", "https://tr.example/index.php?/api/v2/get_results_for_run/42&offset=250"),
+            "GET /api/v2/get_results_for_run/{id}",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
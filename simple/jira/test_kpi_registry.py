@@ -0,0 +1,69 @@
+import importlib.util
+from pathlib import Path
+import unittest
+
+_REGISTRY_PATH = Path(__file__).resolve().parent / "kpi_registry.py"
+_SPEC = importlib.util.spec_from_file_location("jira_kpi_registry", _REGISTRY_PATH)
+kpi_registry = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(kpi_registry)
+
+Metric = kpi_registry.Metric
+MetricSource = kpi_registry.MetricSource
+OVERALL = kpi_registry.OVERALL
+
+
+def _source():
+    return MetricSource(
+        "Snapshot",
+        "snap",
+        {"priority": "COALESCE(priority, 'Unknown')", "issue_key": "issue_key"},
+        [
+            Metric("K-01", "Open now", where="is_open", breakdowns=[OVERALL, ("priority",)]),
+            Metric(
+                "K-02",
+                "Created by day",
+                where="TRUE",
+                breakdowns=[("priority",)],
+                day='DATE(created, "UTC")',
+                distinct="issue_key",
+                window_start="start90",
+                aliases=["K-03"],
+            ),
+        ],
+    )
+
+
+class RenderInsertTests(unittest.TestCase):
+    def test_one_grouped_statement_per_source(self):
+        sql = kpi_registry.render_insert(_source(), target="kpi_new", kpi_source="Jira")
+
+        self.assertEqual(sql.count("INSERT INTO kpi_new"), 1)
+        self.assertEqual(sql.count("FROM snap"), 1)
+        self.assertIn("(metric_id, metric_date),\n    (metric_id, metric_date, priority)", sql)
+        self.assertIn("WHEN 'K-02' THEN ['K-02', 'K-03']", sql)
+        self.assertIn("WHEN 'K-02' THEN distinct_issue_key", sql)
+        self.assertNotIn("UNNEST(touched_dates)", sql)
+
+    def test_only_single_value_overall_rows_are_zero_filled(self):
+        sql = kpi_registry.render_insert(_source(), target="kpi_new", kpi_source="Jira")
+
+        self.assertIn("FROM UNNEST(['K-01']) AS metric_id", sql)
+        self.assertIn("(metric_id IN ('K-01') AND grouping_key = '')\n", sql)
+        self.assertIn("(metric_id IN ('K-01', 'K-02') AND grouping_key = '|priority' AND row_count > 0)", sql)
+
+    def test_date_scope_only_restricts_per_day_metrics(self):
+        sql = kpi_registry.render_insert(_source(), target="kpi_new", kpi_source="Jira", date_scope="touched_dates")
+
+        self.assertIn("IFNULL(is_open, FALSE)", sql)
+        self.assertIn('IFNULL((TRUE) AND DATE(created, "UTC") IN UNNEST(touched_dates), FALSE)', sql)
+
+    def test_rejects_duplicate_ids_and_unknown_columns(self):
+        with self.assertRaises(ValueError):
+            MetricSource("s", "t", {}, [Metric("A", "a"), Metric("B", "b", aliases=["A"])])
+        with self.assertRaises(ValueError):
+            MetricSource("s", "t", {}, [Metric("A", "a", breakdowns=[("priority",)])])
+
+
+if __name__ == "__main__":
+    unittest.main()
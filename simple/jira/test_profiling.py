@@ -0,0 +1,96 @@
+import importlib.util
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import flask
+
+_PATH = Path(__file__).resolve().parent / "profiling.py"
+_SPEC = importlib.util.spec_from_file_location("jira_profiling", _PATH)
+profiling = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(profiling)
+
+
+def _request(body=None, args=None):
+    request = Mock()
+    request.get_json.return_value = body
+    request.args = args or {}
+    return request
+
+
+def _busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+    return n
+
+
+class ProfiledTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        env = patch.dict(os.environ, {"PROFILE_DIR": self.dir, "PROFILE_INTERVAL_MS": "1", "PROFILE_OUTPUT": "file"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_unflagged_request_is_untouched(self):
+        response = ("{}", 200, {"Content-Type": "application/json"})
+        handler = Mock(return_value=response)
+
+        result = profiling.profiled("jira")(handler)(_request({"lookback_days": 3}))
+
+        self.assertIs(result, response)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_flagged_request_writes_collapsed_stacks_and_hotspots(self):
+        @profiling.profiled("jira")
+        def hello_http(request):
+            _busy_loop(0.15)
+            return (json.dumps({"ok": True}), 200, {"Content-Type": "application/json"})
+
+        body, status, _ = hello_http(_request({"profile": True, "profile_top": 3}))
+
+        payload = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertTrue(payload["ok"])
+        profile = payload["profile"]
+        self.assertGreater(profile["samples"], 0)
+        self.assertLessEqual(len(profile["top"]), 3)
+        self.assertEqual(profile["top"][0]["frame"], "test_profiling.py:_busy_loop")
+        with open(profile["output"], encoding="utf-8") as fh:
+            lines = fh.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertIn("test_profiling.py:hello_http;test_profiling.py:_busy_loop", stack)
+        self.assertGreater(int(count), 0)
+
+    def test_query_flag_and_flask_response(self):
+        app = flask.Flask("profiling_test")
+
+        @profiling.profiled("bugsnag")
+        def hello_http(request):
+            _busy_loop(0.02)
+            return flask.jsonify({"status": "ok"}), 200
+
+        with app.test_request_context("/?profile=1", method="POST"):
+            response, status = hello_http(flask.request)
+
+        self.assertEqual(status, 200)
+        self.assertIn("profile", response.get_json())
+
+    def test_kill_switch_ignores_flag(self):
+        handler = Mock(return_value=("{}", 200))
+
+        with patch.dict(os.environ, {"PROFILE_REQUESTS": "false"}):
+            self.assertEqual(profiling.profiled("jira")(handler)(_request({"profile": True})), ("{}", 200))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import importlib.util
+from pathlib import Path
+import time
+import unittest
+
+_PATH = Path(__file__).resolve().parent / "rate_limit.py"
+_SPEC = importlib.util.spec_from_file_location("jira_rate_limit", _PATH)
+rate_limit = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(rate_limit)
+
+
+class _Resp:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class AdaptiveRateLimiterTests(unittest.TestCase):
+    def test_burst_is_free_then_paced(self):
+        limiter = rate_limit.AdaptiveRateLimiter("t", max_rate=100.0, burst=2, min_rate=1.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertGreater(limiter.acquire(), 0.0)
+
+    def test_429_halves_rate_and_pauses_for_retry_after(self):
+        limiter = rate_limit.AdaptiveRateLimiter("t", max_rate=10.0, min_rate=1.0)
+        limiter.observe(_Resp(429, {"Retry-After": "0.2"}))
+
+        self.assertEqual(limiter.rate, 5.0)
+        self.assertEqual(limiter.throttled, 1)
+        started = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    def test_remaining_budget_caps_rate_and_successes_recover_it(self):
+        limiter = rate_limit.AdaptiveRateLimiter("t", max_rate=10.0, min_rate=0.5)
+        limiter.observe(_Resp(200, {"X-RateLimit-Remaining": "20", "X-RateLimit-Reset": "10"}))
+        self.assertEqual(limiter.rate, 2.0)
+
+        for _ in range(20):
+            limiter.observe(_Resp(200))
+        self.assertEqual(limiter.rate, 10.0)
+
+    def test_wait_past_deadline_raises(self):
+        limiter = rate_limit.AdaptiveRateLimiter("t", max_rate=1.0, min_rate=1.0)
+        limiter.observe(_Resp(429, {"Retry-After": "30"}))
+        with self.assertRaises(TimeoutError):
+            limiter.acquire(deadline_epoch=time.time() + 1)
+
+
+class RetryDelayTests(unittest.TestCase):
+    def test_exponential_floor_without_retry_after(self):
+        limiter = rate_limit.AdaptiveRateLimiter("t", max_rate=10.0, min_rate=1.0)
+        limiter.observe(_Resp(429))
+
+        delays = [rate_limit.retry_delay(limiter, attempt, base_s=1.0, cap_s=6.0) for attempt in range(1, 5)]
+
+        self.assertEqual(delays, [1.0, 2.0, 4.0, 6.0])
+
+    def test_retry_after_longer_than_floor_wins(self):
+        limiter = rate_limit.AdaptiveRateLimiter("t", max_rate=10.0, min_rate=1.0)
+        limiter.observe(_Resp(429, {"Retry-After": "30"}))
+
+        self.assertGreater(rate_limit.retry_delay(limiter, 1), 29.0)
+        self.assertEqual(rate_limit.retry_delay(None, 3, base_s=2.0), 8.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
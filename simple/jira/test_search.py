@@ -0,0 +1,193 @@
+import datetime
+import importlib.util
+import sys
+from pathlib import Path
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import flask
+
+_DIR = Path(__file__).resolve().parent
+
+
+def _load(name: str, filename: str):
+    spec = importlib.util.spec_from_file_location(name, _DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+# Load this service's siblings under unique names so other services' `main`/`bq` don't collide.
+with patch.dict(
+    sys.modules,
+    {
+        "bq": _load("jira_bq", "bq.py"),
+        "time_utils": _load("jira_time_utils", "time_utils.py"),
+        "http_session": _load("jira_http_session", "http_session.py"),
+        "rate_limit": _load("jira_rate_limit", "rate_limit.py"),
+    },
+):
+    jira_main = _load("jira_main", "main.py")
+
+
+class PartitionJqlTests(unittest.TestCase):
+    def test_slices_are_disjoint_and_cover_both_ends(self):
+        now = datetime.datetime(2026, 3, 1, 12, 30, 45, tzinfo=datetime.timezone.utc)
+        partitions = jira_main._partition_jql(["PC", "XYZ"], "issuetype = Bug", lookback_days=30, slice_days=10, now=now)
+
+        # head + 3 slices + tail per project
+        self.assertEqual(len(partitions), 10)
+        self.assertEqual(partitions[0], 'project = PC AND issuetype = Bug AND updated >= "2026-03-01 12:30" ORDER BY key ASC')
+        self.assertEqual(
+            partitions[1],
+            'project = PC AND issuetype = Bug AND updated >= "2026-02-19 12:30" AND updated < "2026-03-01 12:30" ORDER BY key ASC',
+        )
+        self.assertEqual(partitions[4], 'project = PC AND issuetype = Bug AND updated < "2026-01-30 12:30" ORDER BY key ASC')
+        self.assertTrue(all(p.startswith("project = XYZ") for p in partitions[5:]))
+
+
+class PartitionedSearchTests(unittest.TestCase):
+    def test_pages_all_partitions_and_dedupes_moved_issues(self):
+        pages = {
+            ("A", None): {"issues": [{"id": "1"}, {"id": "2"}], "nextPageToken": "t2"},
+            ("A", "t2"): {"issues": [{"id": "3"}], "isLast": True},
+            ("B", None): {"issues": [{"id": "2"}, {"id": "4"}], "isLast": True},
+        }
+
+        def _fake_page(url, headers, jql, fields, *, max_results, timeout, next_page_token, start_at, limiter=None):
+            return pages[(jql, next_page_token)]
+
+        with patch.object(jira_main, "_fetch_search_page", side_effect=_fake_page):
+            issues = list(
+                jira_main._search_issues_partitioned(
+                    "https://jira.example", {}, ["A", "B"], ["summary"], concurrency=2
+                )
+            )
+
+        self.assertEqual(sorted(i["id"] for i in issues), ["1", "2", "3", "4"])
+
+    def test_closing_the_generator_stops_the_producer(self):
+        calls = []
+
+        def _endless_page(url, headers, jql, fields, *, max_results, timeout, next_page_token, start_at, limiter=None):
+            calls.append(jql)
+            return {"issues": [{"id": f"{jql}-{len(calls)}"}], "nextPageToken": f"t{len(calls)}"}
+
+        with patch.object(jira_main, "_fetch_search_page", side_effect=_endless_page):
+            issues = jira_main._search_issues_partitioned("https://jira.example", {}, ["A", "B"], ["summary"], concurrency=2)
+            next(issues)
+            issues.close()
+            fetched = len(calls)
+            time.sleep(0.2)
+
+        self.assertEqual(len(calls), fetched)
+
+    def test_propagates_jira_errors(self):
+        def _fail(*_args, **_kwargs):
+            raise jira_main.JiraAPIError(400, "bad jql")
+
+        with patch.object(jira_main, "_fetch_search_page", side_effect=_fail):
+            with self.assertRaises(jira_main.JiraAPIError):
+                list(jira_main._search_issues_partitioned("https://jira.example", {}, ["A"], [], concurrency=2))
+
+
+class FetchSearchPageTests(unittest.TestCase):
+    def _resp(self, status, headers=None, body=None):
+        resp = Mock(status_code=status, ok=200 <= status < 300, headers=headers or {}, text="err")
+        resp.json.return_value = body
+        return resp
+
+    def _fetch(self, responses):
+        with patch.object(jira_main.http_session, "request", side_effect=responses) as request, patch.object(
+            jira_main, "retry_delay", return_value=0.0
+        ):
+            try:
+                return jira_main._fetch_search_page(
+                    "u", {}, "jql", [], max_results=1, timeout=1, next_page_token=None, start_at=0
+                )
+            finally:
+                self.calls = request.call_count
+
+    def test_throttled_page_is_retried(self):
+        data = self._fetch([self._resp(429), self._resp(503, {"Retry-After": "1"}), self._resp(200, body={"issues": []})])
+
+        self.assertEqual(data, {"issues": []})
+        self.assertEqual(self.calls, 3)
+
+    def test_other_errors_and_exhausted_retries_raise(self):
+        with self.assertRaises(jira_main.JiraAPIError):
+            self._fetch([self._resp(400)])
+        self.assertEqual(self.calls, 1)
+
+        with patch.dict("os.environ", {"JIRA_SEARCH_MAX_ATTEMPTS": "2"}):
+            with self.assertRaises(jira_main.JiraAPIError) as ctx:
+                self._fetch([self._resp(429), self._resp(429)])
+        self.assertEqual((ctx.exception.status_code, self.calls), (429, 2))
+
+
+class IncrementalPartitionTests(unittest.TestCase):
+    def test_projects_with_watermark_use_relative_delta_window(self):
+        now = datetime.datetime(2026, 3, 1, 12, 0, 30, tzinfo=datetime.timezone.utc)
+        marks = {"PC": now - datetime.timedelta(minutes=90)}
+
+        partitions = jira_main._incremental_partitions(
+            ["PC", "XYZ"],
+            "issuetype = Bug AND statusCategory != Done",
+            "issuetype = Bug",
+            marks,
+            lookback_days=30,
+            slice_days=10,
+            overlap_minutes=10,
+            now=now,
+        )
+
+        self.assertEqual(partitions[0], "project = PC AND issuetype = Bug AND updated >= -101m ORDER BY key ASC")
+        # No watermark yet: XYZ gets the full sliced pull (head + 3 slices + tail).
+        self.assertEqual(len(partitions), 6)
+        self.assertTrue(all(p.startswith("project = XYZ AND issuetype = Bug AND statusCategory") for p in partitions[1:]))
+
+    def test_note_updated_keeps_newest_per_project(self):
+        marks = {}
+        jira_main._note_updated(marks, {"issue_key": "PC-1", "updated": "2026-03-01T10:00:00Z"})
+        jira_main._note_updated(marks, {"issue_key": "PC-2", "updated": "2026-03-01T09:00:00.123Z"})
+        jira_main._note_updated(marks, {"issue_key": "XYZ-7", "updated": "2026-02-01T00:00:00+00:00"})
+        jira_main._note_updated(marks, {"issue_key": "PC-3", "updated": None})
+
+        self.assertEqual(marks["PC"], datetime.datetime(2026, 3, 1, 10, 0, tzinfo=datetime.timezone.utc))
+        self.assertEqual(sorted(marks), ["PC", "XYZ"])
+
+
+
+class IncrementalKpiTests(unittest.TestCase):
+    def test_kpi_mode_prefers_request_body(self):
+        with patch.dict("os.environ", {"JIRA_KPI_MODE": "incremental"}):
+            self.assertEqual(jira_main._kpi_mode({}), "incremental")
+            self.assertEqual(jira_main._kpi_mode({"kpi_mode": "FULL"}), "full")
+        with self.assertRaises(ValueError):
+            jira_main._kpi_mode({"kpi_mode": "daily"})
+
+    def test_invalid_kpi_mode_is_rejected_before_ingest(self):
+        app = flask.Flask("jira_test")
+        with app.test_request_context("/", method="POST", json={"kpi_mode": "daily"}), patch.object(
+            jira_main, "validate_bq_env"
+        ), patch.object(jira_main, "ingest_jira") as ingest:
+            response = jira_main.hello_http(flask.request)
+
+        ingest.assert_not_called()
+        self.assertEqual(response[1], 400)
+
+    def test_merge_is_keyed_on_metric_date_and_dimensions(self):
+        since = datetime.datetime(2026, 3, 1, 11, 0, tzinfo=datetime.timezone.utc)
+        parts = jira_main._incremental_kpi_sql("p.d.qa_executive_kpis", since)
+
+        self.assertIn('TIMESTAMP("2026-03-01T11:00:00Z")', parts["declares"])
+        self.assertIn("IFNULL(T.dimensions, '{}') = IFNULL(S.dimensions, '{}')", parts["merge"])
+        self.assertIn("WHEN NOT MATCHED BY SOURCE", parts["merge"])
+        self.assertNotIn("metric_id = S.metric_id,", parts["merge"])
+        self.assertIn("CAST(NULL AS TIMESTAMP)", jira_main._incremental_kpi_sql("t", None)["declares"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import datetime
+import importlib.util
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+_SPEC = importlib.util.spec_from_file_location("jira_time_utils_test", Path(__file__).resolve().parent / "time_utils.py")
+time_utils = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(time_utils)
+
+_UTC = datetime.timezone.utc
+
+
+class ParseJiraTsTests(unittest.TestCase):
+    def test_fixed_jira_shape_keeps_offset(self):
+        for native in (True, False):
+            with patch.object(time_utils, "_NATIVE_ISO", native):
+                parsed = time_utils.parse_jira_ts("2026-02-26T16:57:11.469-0700")
+                self.assertEqual(parsed.utcoffset(), datetime.timedelta(hours=-7))
+                self.assertEqual(parsed.astimezone(_UTC), datetime.datetime(2026, 2, 26, 23, 57, 11, 469000, tzinfo=_UTC))
+                self.assertEqual(
+                    time_utils.parse_jira_ts(" 2026-02-26T16:57:11Z "), datetime.datetime(2026, 2, 26, 16, 57, 11, tzinfo=_UTC)
+                )
+                self.assertIsNone(time_utils.parse_jira_ts("2026-13-26T16:57:11.469+0000"))
+                self.assertIsNone(time_utils.parse_jira_ts(None))
+
+
+class JiraToRfc3339Tests(unittest.TestCase):
+    def test_matches_isoformat_output(self):
+        self.assertEqual(time_utils.jira_to_rfc3339("2026-02-26T16:57:11.469+0000"), "2026-02-26T16:57:11.469000Z")
+        self.assertEqual(time_utils.jira_to_rfc3339("2026-02-26T16:57:11.000+0000"), "2026-02-26T16:57:11Z")
+        self.assertEqual(time_utils.jira_to_rfc3339("2026-02-26T16:57:11.469+0530"), "2026-02-26T11:27:11.469000Z")
+        self.assertEqual(time_utils.jira_to_rfc3339("2026-02-26T16:57:11+02:00"), "2026-02-26T16:57:11+02:00")
+        self.assertEqual(time_utils.jira_to_rfc3339("not a date"), "not a date")
+
+
+if __name__ == "__main__":
+    unittest.main()
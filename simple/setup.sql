@@ -71,6 +71,28 @@ CREATE TABLE IF NOT EXISTS `qa_metrics_simple.jira_issues_snapshot` (
 PARTITION BY DATE(snapshot_timestamp)
 CLUSTER BY issue_key, status_category, priority;
 
+-- Current snapshot maintained by JIRA_INCREMENTAL=true (one row per issue, MERGEd
+-- from each run's deltas; every row carries the latest snapshot_timestamp).
+CREATE TABLE IF NOT EXISTS `qa_metrics_simple.jira_issues_current` (
+  snapshot_timestamp TIMESTAMP NOT NULL,
+  issue_id STRING,
+  issue_key STRING,
+  issue_type STRING,
+  summary STRING,
+  status STRING,
+  status_category STRING,
+  status_category_changed_date TIMESTAMP,
+  priority STRING,
+  severity STRING,
+  pod_team STRING,
+  fix_versions ARRAY<STRING>,
+  assignee_email STRING,
+  reporter_email STRING,
+  created TIMESTAMP,
+  updated TIMESTAMP
+)
+CLUSTER BY issue_key, status_category, priority;
+
 CREATE TABLE IF NOT EXISTS `qa_metrics_simple.jira_changelog` (
   change_timestamp TIMESTAMP NOT NULL,
   issue_id STRING,
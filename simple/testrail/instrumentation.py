@@ -0,0 +1,319 @@
+"""Per-run phase timings, counters and latency histograms for the ingest handlers.
+
+Every `hello_http` opens one run and marks its phases; everything else records
+into whichever run is active, from any thread:
+
+    run = instrumentation.start_run("bugsnag")
+    current_phase = run.phase("config")        # closes the previous phase
+    ...
+    with instrumentation.span("parse"):       # nested / repeated blocks
+        rows = [parse(e) for e in items]
+    instrumentation.incr("rows_parsed", len(rows))
+    ...
+    body["instrumentation"] = run.finish(status="ok")
+
+Handlers that do not keep the `Run` around (the root `ingest-*.py` scripts) use
+the module-level `phase()` / `finish()`, which act on the active run.
+
+`http_session.request` records every upstream call as an endpoint
+(`jira GET /rest/api/3/search/jql`, ids in paths become `{id}`), and
+`bq_sink` / `bq.py` record BigQuery inserts, load jobs and queries, so the
+summary tells whether a slow run went to the upstream API, BigQuery or parsing:
+
+- spans: count / total_ms / max_ms per phase or span name. Spans from worker
+  threads overlap, so totals can exceed wall_ms.
+- counters: named integers (rows parsed, pages fetched, ...).
+- endpoints: calls, errors, status classes and a latency histogram per
+  endpoint. p50/p95 are the upper bound of the histogram bucket holding that
+  rank (capped at max_ms).
+
+`finish()` logs the summary once as `INGEST_RUN_SUMMARY {json}` and returns
+it for the HTTP response. Outside a run all recording calls are no-ops. A
+process has one active run at a time; an instance serving overlapping
+requests attributes worker-thread records to the newest run.
+
+Env vars:
+- INSTRUMENTATION_ENABLED: "false" turns recording off (summaries are then empty).
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+LOGGER = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency buckets; one overflow bucket follows.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Numeric ids, issue keys (PC-123) and long hex / uuid ids.
+_ID_SEGMENT = re.compile(r"^(\d+|[A-Za-z][A-Za-z0-9]*-\d+|[0-9a-fA-F-]{12,})$")
+_ACTIVE: Optional["Run"] = None
+_ACTIVE_LOCK = threading.Lock()
+
+
+def enabled() -> bool:
+    raw = (os.environ.get("INSTRUMENTATION_ENABLED") or "true").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (milliseconds)."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value_ms: float) -> None:
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.999999))
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max
+                return round(min(bound, self.max), 1)
+        return round(self.max, 1)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 1),
+            "mean_ms": round(self.total / self.count, 1) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max, 1),
+            "buckets": {
+                (f"le_{LATENCY_BUCKETS_MS[i]}" if i < len(LATENCY_BUCKETS_MS) else "inf"): n
+                for i, n in enumerate(self.buckets)
+                if n
+            },
+        }
+
+
+class _Endpoint:
+    __slots__ = ("latency", "errors", "status")
+
+    def __init__(self) -> None:
+        self.latency = Histogram()
+        self.errors = 0
+        self.status: Dict[str, int] = {}
+
+
+class Run:
+    """Timings and counters of one handler invocation (thread-safe)."""
+
+    def __init__(self, service: str) -> None:
+        self.service = service
+        self.recording = enabled()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._spans: Dict[str, List[float]] = {}  # name -> [count, total_ms, max_ms]
+        self._counters: Dict[str, int] = {}
+        self._endpoints: Dict[str, _Endpoint] = {}
+        self._phase: Optional[str] = None
+        self._phase_started = 0.0
+        self._summary: Optional[Dict[str, Any]] = None
+
+    # -- recording
+
+    def add_span(self, name: str, elapsed_ms: float) -> None:
+        if not self.recording:
+            return
+        with self._lock:
+            stat = self._spans.get(name)
+            if stat is None:
+                self._spans[name] = [1, elapsed_ms, elapsed_ms]
+            else:
+                stat[0] += 1
+                stat[1] += elapsed_ms
+                if elapsed_ms > stat[2]:
+                    stat[2] = elapsed_ms
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, (time.perf_counter() - started) * 1000)
+
+    def phase(self, name: str) -> str:
+        """Close the current phase (if any) and start `name`; returns `name`.
+
+        Re-entering the phase that is already open keeps it running.
+        """
+        if name != self._phase:
+            self._switch_phase(name)
+        return name
+
+    def _switch_phase(self, name: Optional[str]) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            previous, previous_started = self._phase, self._phase_started
+            self._phase, self._phase_started = name, now
+        if previous is not None:
+            self.add_span(previous, (now - previous_started) * 1000)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        if not self.recording:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, endpoint: str, elapsed_ms: float, *, status: Any = None, error: bool = False) -> None:
+        if not self.recording:
+            return
+        with self._lock:
+            stat = self._endpoints.get(endpoint)
+            if stat is None:
+                stat = self._endpoints[endpoint] = _Endpoint()
+            stat.latency.add(elapsed_ms)
+            if error:
+                stat.errors += 1
+            if status is not None:
+                key = str(status) if status == 429 or not isinstance(status, int) else f"{status // 100}xx"
+                stat.status[key] = stat.status.get(key, 0) + 1
+
+    # -- reporting
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = {name: {"count": int(s[0]), "total_ms": round(s[1], 1), "max_ms": round(s[2], 1)} for name, s in self._spans.items()}
+            if self._phase is not None and self.recording:
+                open_ms = round((time.perf_counter() - self._phase_started) * 1000, 1)
+                s = spans.setdefault(self._phase, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                s["count"] += 1
+                s["total_ms"] = round(s["total_ms"] + open_ms, 1)
+                s["max_ms"] = max(s["max_ms"], open_ms)
+            endpoints = {
+                name: {**e.latency.summary(), "errors": e.errors, "status": dict(sorted(e.status.items()))}
+                for name, e in sorted(self._endpoints.items())
+            }
+            return {
+                "service": self.service,
+                "wall_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                "spans": spans,
+                "counters": dict(sorted(self._counters.items())),
+                "endpoints": endpoints,
+            }
+
+    def finish(self, **fields: Any) -> Dict[str, Any]:
+        """Close the last phase, log the summary once and return it (later calls return the same dict)."""
+        global _ACTIVE
+        if self._summary is not None:
+            return self._summary
+        self._switch_phase(None)
+        summary = self.summary()
+        summary.update(fields)
+        self._summary = summary
+        with _ACTIVE_LOCK:
+            if _ACTIVE is self:
+                _ACTIVE = None
+        if self.recording:
+            LOGGER.info("INGEST_RUN_SUMMARY %s", json.dumps(summary, sort_keys=True, default=str))
+        return summary
+
+
+def start_run(service: str) -> Run:
+    """Start a run and make it the active one for this process."""
+    global _ACTIVE
+    run = Run(service)
+    with _ACTIVE_LOCK:
+        _ACTIVE = run
+    return run
+
+
+def current() -> Optional[Run]:
+    return _ACTIVE
+
+
+def phase(name: str) -> str:
+    """Switch the active run to phase `name` (no-op without one); returns `name`."""
+    run = _ACTIVE
+    if run is not None:
+        run.phase(name)
+    return name
+
+
+def finish(**fields: Any) -> Dict[str, Any]:
+    """Finish the active run (see `Run.finish`); `{}` without one."""
+    run = _ACTIVE
+    return run.finish(**fields) if run is not None else {}
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block into the active run's spans (no-op without one)."""
+    run = _ACTIVE
+    if run is None:
+        yield
+        return
+    with run.span(name):
+        yield
+
+
+def incr(name: str, n: int = 1) -> None:
+    run = _ACTIVE
+    if run is not None:
+        run.incr(name, n)
+
+
+def observe(endpoint: str, elapsed_ms: float, *, status: Any = None, error: bool = False) -> None:
+    run = _ACTIVE
+    if run is not None:
+        run.observe(endpoint, elapsed_ms, status=status, error=error)
+
+
+@contextmanager
+def timed(endpoint: str) -> Iterator[None]:
+    """Record a call (BigQuery insert, query, ...) as `endpoint`; exceptions count as errors."""
+    run = _ACTIVE
+    if run is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        run.observe(endpoint, (time.perf_counter() - started) * 1000, error=True)
+        raise
+    run.observe(endpoint, (time.perf_counter() - started) * 1000)
+
+
+def endpoint_name(method: str, url: str, upstream: Optional[str] = None) -> str:
+    """`<upstream> GET /path/{id}/...` with ids collapsed so pages share one endpoint.
+
+    TestRail routes through `index.php?/api/v2/<call>/<id>`, so its query path is used.
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if path.endswith("/index.php") and parts.query.startswith("/"):
+        path = parts.query.split("&", 1)[0]
+    segments = path.split("/")
+    for i, seg in enumerate(segments):
+        # Keep API versions (`/rest/api/3/`).
+        if _ID_SEGMENT.match(seg) and not (i and segments[i - 1] == "api"):
+            segments[i] = "{id}"
+    name = f"{method.upper()} {'/'.join(segments)}"
+    return f"{upstream} {name}" if upstream else name
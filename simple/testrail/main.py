@@ -9,7 +9,12 @@ import requests
 from flask import jsonify
 from google.api_core.exceptions import BadRequest, GoogleAPICallError, NotFound
 
-from bq import get_bq_dataset, get_bq_location, get_bq_project, get_client, insert_rows, run_query, fetch_scalar, table_ref, validate_bq_env
+import http_session
+import instrumentation
+import profiling
+from bq import get_bq_dataset, get_bq_location, get_bq_project, get_client, insert_rows, load_rows_file, run_query, fetch_scalar, table_ref, validate_bq_env
+from bq_writer import BackgroundWriteError, BackgroundWriter
+from rate_limit import AdaptiveRateLimiter, get_limiter
 from time_utils import unix_to_utc_ts, utc_now
 
 
@@ -86,7 +91,7 @@ def _env_any(*names: str, default: Optional[str] = None) -> str:
         if value is not None and str(value).strip() != "":
             return str(value).strip()
 
-    if default is not None and str(default).strip() != "":
+    if default is not None:
         return str(default).strip()
 
     raise RuntimeError(f"Missing required env var: {'/'.join(names)}")
@@ -143,14 +148,15 @@ def _api_base(base_url: str) -> str:
 
 
 class TestRailClient:
-    def __init__(self, base_url: str, user: str, api_key: str) -> None:
+    def __init__(self, base_url: str, user: str, api_key: str, *, limiter: Optional[AdaptiveRateLimiter] = None) -> None:
         self.base_url = _api_base(base_url)
         self.auth = (user, api_key)
+        self.limiter = limiter or get_limiter("testrail")
 
     def get_json(self, path: str) -> Any:
         url = f"{self.base_url}/{path.lstrip('/')}"
         try:
-            resp = requests.get(url, auth=self.auth, timeout=60)
+            resp = http_session.request("GET", url, auth=self.auth, timeout=60, limiter=self.limiter)
         except requests.RequestException as e:
             raise TestRailUpstreamError(
                 f"TestRail API request failed for path={path}: {type(e).__name__}: {e}",
@@ -359,7 +365,7 @@ SELECT
   d AS metric_date,
   start90,
   today,
-  "{}",
+  "{{}}",
   executed_cnt * 1.0,
   NULL,
   NULL,
@@ -406,7 +412,7 @@ SELECT
   metric_date,
   start90,
   today,
-  "{}",
+  "{{}}",
   SAFE_DIVIDE(passed, executed),
   passed * 1.0,
   executed * 1.0,
@@ -476,6 +482,7 @@ FROM agg;
     run_query(client, sql, job_labels={"pipeline": "qa-metrics", "source": "testrail"})
 
 
+@profiling.profiled("testrail")
 def hello_http(request):
     if request.method not in ("POST", "GET"):
         return ("Method not allowed", 405)
@@ -497,7 +504,8 @@ def hello_http(request):
         bq_location=bq_location,
     )
 
-    current_phase = "config"
+    ingest_run = instrumentation.start_run("testrail")
+    current_phase = ingest_run.phase("config")
     current_project_id: Optional[int] = None
     current_run_id: Optional[int] = None
 
@@ -516,7 +524,7 @@ def hello_http(request):
         )
 
         # Make schema resilient for older tables.
-        current_phase = "config"
+        current_phase = ingest_run.phase("config")
         try:
             _ensure_testrail_schema()
         except (GoogleAPICallError, BadRequest, NotFound) as e:
@@ -549,54 +557,63 @@ def hello_http(request):
         default_since = int(now.timestamp()) - (lookback_days * 86400)
         ingest_ts = now.isoformat().replace("+00:00", "Z")
 
-        total_inserted = 0
-
-        for pid in project_ids:
-            current_phase = "api_testrail"
-            current_project_id = pid
-            suites = tr.get_suites(pid)
-            since_ts = _get_last_created_on(client, pid, default_since)
-
-            runs = tr.get_runs(pid, default_since)
-
-            max_seen_created_on = since_ts
-            batch: List[Dict[str, Any]] = []
-
-            for run in runs:
-                current_run_id = int(run["id"]) if run.get("id") is not None else None
-                suite_id = run.get("suite_id")
-                suite_name = suites.get(int(suite_id)) if suite_id is not None else None
-
-                results = tr.get_results_for_run(int(run["id"]), created_after=since_ts)
-                for r in results:
-                    row = _parse_result(pid, run, suite_name, ingest_ts, r)
-                    batch.append(row)
-                    try:
-                        created_on = int(r.get("created_on") or 0)
-                        if created_on > max_seen_created_on:
-                            max_seen_created_on = created_on
-                    except Exception:
-                        pass
-
-                if len(batch) >= 500:
-                    current_phase = "bq_write"
-                    total_inserted += insert_rows(client, "testrail_results", batch)
-                    batch = []
-                    current_phase = "api_testrail"
-
-            if batch:
-                current_phase = "bq_write"
-                total_inserted += insert_rows(client, "testrail_results", batch)
-                current_phase = "api_testrail"
-
-            if max_seen_created_on > since_ts:
-                current_phase = "bq_write"
-                _set_last_created_on(client, pid, max_seen_created_on)
-                current_phase = "api_testrail"
-
-            current_run_id = None
-
-        current_phase = "kpis"
+        # BigQuery inserts run on a background writer so TestRail paging never waits on them.
+        writer = BackgroundWriter(client, insert_rows, load_fn=load_rows_file)
+        try:
+            for pid in project_ids:
+                current_phase = ingest_run.phase("api_testrail")
+                current_project_id = pid
+                suites = tr.get_suites(pid)
+                since_ts = _get_last_created_on(client, pid, default_since)
+
+                runs = tr.get_runs(pid, default_since)
+
+                max_seen_created_on = since_ts
+                batch: List[Dict[str, Any]] = []
+
+                for run in runs:
+                    current_run_id = int(run["id"]) if run.get("id") is not None else None
+                    suite_id = run.get("suite_id")
+                    suite_name = suites.get(int(suite_id)) if suite_id is not None else None
+
+                    results = tr.get_results_for_run(int(run["id"]), created_after=since_ts)
+                    with instrumentation.span("parse"):
+                        for r in results:
+                            row = _parse_result(pid, run, suite_name, ingest_ts, r)
+                            batch.append(row)
+                            try:
+                                created_on = int(r.get("created_on") or 0)
+                                if created_on > max_seen_created_on:
+                                    max_seen_created_on = created_on
+                            except Exception:
+                                pass
+                    instrumentation.incr("records_parsed", len(results))
+
+                    if len(batch) >= 500:
+                        writer.submit("testrail_results", batch, tag=str(pid))
+                        batch = []
+
+                if batch:
+                    writer.submit("testrail_results", batch, tag=str(pid))
+
+                if max_seen_created_on > since_ts:
+                    current_phase = ingest_run.phase("bq_write")
+                    # Only advance the cursor once this project's rows are in BigQuery.
+                    writer.flush()
+                    _set_last_created_on(client, pid, max_seen_created_on)
+                    current_phase = ingest_run.phase("api_testrail")
+
+                current_run_id = None
+
+            current_phase = ingest_run.phase("bq_write")
+            total_inserted = writer.close().get("testrail_results", 0)
+        except BaseException as exc:
+            writer.abort()
+            if isinstance(exc, BackgroundWriteError):
+                current_phase = ingest_run.phase("bq_write")
+            raise
+
+        current_phase = ingest_run.phase("kpis")
         _log_event(
             logging.INFO,
             "ingest_config_resolved",
@@ -618,7 +635,7 @@ def hello_http(request):
             inserted_rows=total_inserted,
             projects=len(project_ids),
         )
-        return jsonify({"status": "ok", "inserted_rows": total_inserted})
+        return jsonify({"status": "ok", "inserted_rows": total_inserted, "instrumentation": ingest_run.finish(status="ok")})
 
     except ConfigError as e:
         _log_event(
@@ -635,7 +652,7 @@ def hello_http(request):
             project_id=current_project_id,
             run_id=current_run_id,
         )
-        return jsonify({"status": "error", "error": str(e)}), 400
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 400
     except TestRailAuthError as e:
         _log_event(
             logging.ERROR,
@@ -653,7 +670,7 @@ def hello_http(request):
             status_code=e.status_code,
             body=e.body_snippet,
         )
-        return jsonify({"status": "error", "error": str(e)}), e.status_code
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), e.status_code
     except TestRailUpstreamError as e:
         _log_event(
             logging.ERROR,
@@ -672,7 +689,7 @@ def hello_http(request):
             body=e.body_snippet,
         )
         http_status = 503 if e.status_code is None or e.status_code == 429 else 502
-        return jsonify({"status": "error", "error": str(e)}), http_status
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), http_status
     except Exception as e:
         error_status_code = _extract_error_status_code(e)
         _log_event(
@@ -690,4 +707,4 @@ def hello_http(request):
             run_id=current_run_id,
             status_code=error_status_code,
         )
-        return jsonify({"status": "error", "error": str(e)}), 500
+        return jsonify({"status": "error", "error": str(e), "instrumentation": ingest_run.finish(status="error")}), 500
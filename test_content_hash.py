@@ -0,0 +1,108 @@
+import importlib.util
+import os
+from pathlib import Path
+import unittest
+from unittest.mock import Mock, patch
+
+_PATH = Path(__file__).resolve().parent / "content_hash.py"
+_SPEC = importlib.util.spec_from_file_location("content_hash", _PATH)
+content_hash = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(content_hash)
+
+
+def _issue(**overrides):
+    rec = {"issue_key": "QA-1", "status": "Open", "labels": '["crash"]', "_ingested_at": "2026-01-01T00:00:00Z"}
+    rec.update(overrides)
+    return rec
+
+
+class RecordHashTests(unittest.TestCase):
+    def test_ignores_per_run_fields(self):
+        base = content_hash.record_hash(_issue())
+        self.assertEqual(content_hash.record_hash(_issue(_ingested_at="2026-02-02T00:00:00Z")), base)
+        self.assertEqual(content_hash.record_hash(_issue(payload_hash="abc")), base)
+        self.assertEqual(content_hash.record_hash(_issue(content_hash="stale")), base)
+
+    def test_ignores_key_order(self):
+        rec = _issue()
+        reordered = dict(reversed(list(rec.items())))
+        self.assertEqual(content_hash.record_hash(reordered), content_hash.record_hash(rec))
+
+    def test_content_change_changes_hash(self):
+        self.assertNotEqual(content_hash.record_hash(_issue(status="Done")), content_hash.record_hash(_issue()))
+
+
+class HashCacheTests(unittest.TestCase):
+    def test_repeats_within_a_run_are_skipped(self):
+        cache = content_hash.HashCache(["issue_key"])
+
+        first, repeat = _issue(), _issue(_ingested_at="later")
+        self.assertFalse(cache.seen(first))
+        self.assertTrue(cache.seen(repeat))
+        self.assertEqual(first["content_hash"], repeat["content_hash"])
+        self.assertEqual(cache.skipped, 1)
+
+    def test_preloaded_hash_skips_unchanged_and_keeps_changed(self):
+        known = content_hash.record_hash(_issue())
+        cache = content_hash.HashCache(["issue_key"], {("QA-1",): known})
+
+        self.assertTrue(cache.seen(_issue()))
+        changed = _issue(status="Done")
+        self.assertFalse(cache.seen(changed))
+        self.assertEqual(cache.hashes[("QA-1",)], changed["content_hash"])
+
+    def test_unknown_or_incomplete_keys_are_written(self):
+        cache = content_hash.HashCache(["project_id", "run_id"])
+
+        self.assertFalse(cache.seen({"project_id": 1, "run_id": 2}))
+        no_key = {"project_id": 1, "run_id": None}
+        self.assertFalse(cache.seen(no_key))
+        self.assertFalse(cache.seen(dict(no_key)))
+        self.assertIn("content_hash", no_key)
+
+    def test_disabled_cache_stamps_but_never_skips(self):
+        cache = content_hash.HashCache(["issue_key"], enabled=False)
+
+        self.assertEqual(cache.changed([_issue(), _issue()]), [_issue(content_hash=content_hash.record_hash(_issue()))] * 2)
+        self.assertEqual(cache.skipped, 0)
+
+
+class LoadCacheTests(unittest.TestCase):
+    def test_preloads_newest_hash_per_key(self):
+        known = content_hash.record_hash(_issue())
+        client = Mock()
+        client.query.return_value.result.return_value = [{"issue_key": "QA-1", "content_hash": known}]
+
+        with patch.dict(os.environ, {"CONTENT_HASH_SKIP": "", "CONTENT_HASH_CACHE_DAYS": "30"}):
+            cache = content_hash.load_cache(client, "p.d.jira_issues", ["issue_key"])
+
+        sql = client.query.call_args[0][0]
+        self.assertIn("FROM `p.d.jira_issues`", sql)
+        self.assertIn("INTERVAL 30 DAY", sql)
+        self.assertTrue(cache.seen(_issue()))
+
+    def test_failed_preload_writes_everything(self):
+        client = Mock()
+        client.query.side_effect = RuntimeError("table not found")
+
+        with patch.dict(os.environ, {"CONTENT_HASH_SKIP": ""}):
+            cache = content_hash.load_cache(client, "p.d.jira_issues", ["issue_key"])
+
+        self.assertTrue(cache.enabled)
+        self.assertEqual(cache.hashes, {})
+        self.assertEqual(len(cache.changed([_issue(), _issue(issue_key="QA-2")])), 2)
+
+    def test_skip_disabled_does_not_query(self):
+        client = Mock()
+
+        with patch.dict(os.environ, {"CONTENT_HASH_SKIP": "false"}):
+            cache = content_hash.load_cache(client, "p.d.jira_issues", ["issue_key"])
+
+        client.query.assert_not_called()
+        self.assertFalse(cache.enabled)
+        self.assertEqual(len(cache.changed([_issue(), _issue()])), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
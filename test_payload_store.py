@@ -0,0 +1,146 @@
+import importlib.util
+import os
+from pathlib import Path
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from google.cloud import bigquery
+
+_PATH = Path(__file__).resolve().parent / "payload_store.py"
+_SPEC = importlib.util.spec_from_file_location("payload_store", _PATH)
+payload_store = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(payload_store)
+
+_TABLE = "p.d.jira_issues"
+
+
+def _client(stored=()):
+    client = Mock()
+    client.get_table.return_value.schema = [bigquery.SchemaField("payload_hash", "STRING")]
+    client.query.return_value.result.return_value = [{"payload_hash": h} for h in stored]
+    return client
+
+
+def _rows(*texts):
+    return [{"issue_key": f"QA-{i}", "raw_json": t} for i, t in enumerate(texts)]
+
+
+def _precondition():
+    err = RuntimeError("precondition failed")
+    err.code = 412
+    return err
+
+
+class _Blob:
+    def __init__(self, bucket, name):
+        self.bucket, self.name = bucket, name
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def upload_from_string(self, data, if_generation_match=None):
+        with self.bucket.lock:
+            if if_generation_match == 0 and self.name in self.bucket.objects:
+                raise _precondition()
+            self.bucket.objects[self.name] = data
+            self.bucket.uploads.append(self.name)
+
+
+class _Bucket:
+    name = "bkt"
+
+    def __init__(self, objects=()):
+        self.objects = dict.fromkeys(objects, b"")
+        self.uploads = []
+        self.lock = threading.Lock()
+
+    def blob(self, name):
+        return _Blob(self, name)
+
+
+@patch.dict(os.environ, {"PAYLOAD_COMPRESSION": "none"})
+class TableModeTests(unittest.TestCase):
+    def test_hashes_already_in_side_table_are_not_rewritten(self):
+        old = payload_store.payload_hash("old")
+        client = _client(stored=[old])
+        store = payload_store.PayloadStore(client, "jira_issues", mode="table")
+
+        with patch.object(payload_store.bq_sink, "write_rows", return_value=[]) as write_rows:
+            rows = store.offload(_TABLE, _rows("old", "new", "new"), "raw_json")
+
+        self.assertEqual([r["raw_json"] for r in rows], [None, None, None])
+        written = write_rows.call_args[0][2]
+        self.assertEqual([r["payload_hash"] for r in written], [payload_store.payload_hash("new")])
+        params = client.query.call_args.kwargs["job_config"].query_parameters
+        self.assertEqual(sorted(params[0].values), sorted([old, payload_store.payload_hash("new")]))
+
+    def test_failed_lookup_writes_everything(self):
+        client = _client()
+        client.query.side_effect = RuntimeError("boom")
+        store = payload_store.PayloadStore(client, "jira_issues", mode="table")
+
+        with patch.object(payload_store.bq_sink, "write_rows", return_value=[]) as write_rows:
+            store.offload(_TABLE, _rows("a", "b"), "raw_json")
+
+        self.assertEqual(len(write_rows.call_args[0][2]), 2)
+
+    def test_second_batch_in_process_skips_lookup(self):
+        client = _client()
+        store = payload_store.PayloadStore(client, "jira_issues", mode="table")
+
+        with patch.object(payload_store.bq_sink, "write_rows", return_value=[]) as write_rows:
+            store.offload(_TABLE, _rows("a"), "raw_json")
+            store.offload(_TABLE, _rows("a"), "raw_json")
+
+        self.assertEqual(client.query.call_count, 1)
+        self.assertEqual(write_rows.call_count, 1)
+
+
+@patch.dict(os.environ, {"PAYLOAD_COMPRESSION": "none"})
+class BlobModeTests(unittest.TestCase):
+    def test_gcs_uploads_only_missing_objects(self):
+        existing = f"raw/jira_issues/{payload_store.payload_hash('old')[:2]}/{payload_store.payload_hash('old')}.json"
+        bucket = _Bucket([existing])
+        store = payload_store.PayloadStore(_client(), "jira_issues", mode="blob")
+        store._bucket = bucket
+
+        texts = ["old"] + [f"p{i}" for i in range(20)]
+        with patch.dict(os.environ, {"PAYLOAD_BLOB_URI": "gs://bkt/raw", "PAYLOAD_UPLOAD_WORKERS": "4"}):
+            store.offload(_TABLE, _rows(*texts), "raw_json")
+
+        self.assertEqual(len(bucket.uploads), 20)
+        self.assertNotIn(existing, bucket.uploads)
+
+    def test_gcs_object_created_concurrently_is_not_an_error(self):
+        blob = Mock()
+        blob.exists.return_value = False
+        blob.upload_from_string.side_effect = _precondition()
+        bucket = Mock()
+        bucket.name = "bkt"
+        bucket.blob.return_value = blob
+        store = payload_store.PayloadStore(_client(), "jira_issues", mode="blob")
+        store._bucket = bucket
+
+        with patch.dict(os.environ, {"PAYLOAD_BLOB_URI": "gs://bkt"}):
+            store.offload(_TABLE, _rows("a"), "raw_json")
+
+        self.assertEqual(blob.upload_from_string.call_args.kwargs["if_generation_match"], 0)
+
+    def test_local_directory_keeps_existing_files(self):
+        store = payload_store.PayloadStore(_client(), "jira_issues", mode="blob")
+        with tempfile.TemporaryDirectory() as root, patch.dict(os.environ, {"PAYLOAD_BLOB_URI": root}):
+            path = Path(root) / store._blob_name(payload_store.payload_hash("a"))
+            path.parent.mkdir(parents=True)
+            path.write_bytes(b"original")
+
+            store.offload(_TABLE, _rows("a", "b"), "raw_json")
+
+            self.assertEqual(path.read_bytes(), b"original")
+            self.assertEqual((Path(root) / store._blob_name(payload_store.payload_hash("b"))).read_bytes(), b"b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import importlib.util
+from pathlib import Path
+import threading
+import time
+import unittest
+
+_PATH = Path(__file__).resolve().parent / "secret_cache.py"
+_SPEC = importlib.util.spec_from_file_location("secret_cache", _PATH)
+secret_cache = importlib.util.module_from_spec(_SPEC)
+assert _SPEC and _SPEC.loader
+_SPEC.loader.exec_module(secret_cache)
+
+
+class _NotFound(Exception):
+    code = 404
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Fetch:
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+
+    def __call__(self, name):
+        self.calls.append(name)
+        value = self.values[name]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+class SecretCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+
+    def _cache(self, fetch, **kwargs):
+        kwargs.setdefault("ttl_s", 600.0)
+        kwargs.setdefault("negative_ttl_s", 60.0)
+        return secret_cache.SecretCache(fetch, clock=self.clock, **kwargs)
+
+    def test_value_is_cached_until_ttl_expires(self):
+        fetch = _Fetch({"TOKEN": "a"})
+        cache = self._cache(fetch)
+
+        self.assertEqual(cache.get("TOKEN"), "a")
+        self.clock.now += 599
+        fetch.values["TOKEN"] = "b"
+        self.assertEqual(cache.get("TOKEN"), "a")
+        self.clock.now += 2
+        self.assertEqual(cache.get("TOKEN"), "b")
+        self.assertEqual(fetch.calls, ["TOKEN", "TOKEN"])
+
+    def test_zero_ttl_fetches_every_time(self):
+        fetch = _Fetch({"TOKEN": "a"})
+        cache = self._cache(fetch, ttl_s=0.0)
+
+        cache.get("TOKEN")
+        cache.get("TOKEN")
+        self.assertEqual(fetch.calls, ["TOKEN", "TOKEN"])
+
+    def test_missing_secret_is_negatively_cached(self):
+        fetch = _Fetch({"MISSING": _NotFound("nope")})
+        cache = self._cache(fetch)
+
+        with self.assertRaises(secret_cache.SecretNotFound):
+            cache.get("MISSING")
+        with self.assertRaises(KeyError):
+            cache.get("MISSING")
+        self.assertEqual(fetch.calls, ["MISSING"])
+
+        self.clock.now += 61
+        fetch.values["MISSING"] = "created"
+        self.assertEqual(cache.get("MISSING"), "created")
+        self.assertEqual(fetch.calls, ["MISSING", "MISSING"])
+
+    def test_other_errors_propagate_and_are_not_cached(self):
+        fetch = _Fetch({"TOKEN": RuntimeError("permission denied")})
+        cache = self._cache(fetch)
+
+        with self.assertRaises(RuntimeError):
+            cache.get("TOKEN")
+        fetch.values["TOKEN"] = "a"
+        self.assertEqual(cache.get("TOKEN"), "a")
+        self.assertEqual(fetch.calls, ["TOKEN", "TOKEN"])
+
+    def test_get_optional_returns_default_for_missing_only(self):
+        fetch = _Fetch({"MISSING": _NotFound(), "EMPTY": "", "BROKEN": RuntimeError("boom")})
+        cache = self._cache(fetch)
+
+        self.assertIsNone(cache.get_optional("MISSING"))
+        self.assertEqual(cache.get_optional("MISSING", "fallback"), "fallback")
+        self.assertEqual(cache.get_optional("EMPTY", "fallback"), "")
+        with self.assertRaises(RuntimeError):
+            cache.get_optional("BROKEN")
+
+    def test_concurrent_gets_share_one_fetch(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch(name):
+            calls.append(name)
+            started.set()
+            release.wait(5)
+            return "v"
+
+        cache = self._cache(fetch)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("TOKEN"))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        self.assertTrue(started.wait(5))
+        time.sleep(0.05)  # let the other threads queue on the per-name lock
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(calls, ["TOKEN"])
+        self.assertEqual(results, ["v"] * 8)
+
+    def test_prefetch_fetches_in_parallel_and_reports_failures(self):
+        fetch = _Fetch({"A": "a", "B": _NotFound(), "C": RuntimeError("boom")})
+        cache = self._cache(fetch)
+
+        self.assertEqual(cache.prefetch(["A", "B", "C", "A"]), ["C"])
+        self.assertEqual(sorted(fetch.calls), ["A", "B", "C"])
+        self.assertEqual(cache.get("A"), "a")
+        self.assertIsNone(cache.get_optional("B"))
+        self.assertEqual(cache.prefetch(["A", "B"]), [])
+        self.assertEqual(len(fetch.calls), 3)
+
+    def test_prepare_runs_once_before_prefetch_threads(self):
+        order = []
+        fetch = _Fetch({"A": "a", "B": "b"})
+        cache = self._cache(lambda name: order.append(name) or fetch(name), prepare=lambda: order.append("prepare"))
+
+        cache.prefetch(["A", "B"])
+        self.assertEqual(order[0], "prepare")
+        self.assertEqual(order.count("prepare"), 1)
+
+    def test_prepare_failure_leaves_errors_to_get(self):
+        def prepare():
+            raise RuntimeError("no credentials")
+
+        fetch = _Fetch({"A": "a", "B": "b"})
+        cache = self._cache(fetch, prepare=prepare)
+
+        self.assertEqual(cache.prefetch(["A", "B"]), ["A", "B"])
+        self.assertEqual(fetch.calls, [])
+
+    def test_invalidate_forces_a_refetch(self):
+        fetch = _Fetch({"A": "a"})
+        cache = self._cache(fetch)
+
+        cache.get("A")
+        cache.invalidate("A")
+        cache.get("A")
+        cache.invalidate()
+        cache.get("A")
+        self.assertEqual(fetch.calls, ["A", "A", "A"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Timestamp helpers shared by the ingest services.
+
+`parse_jira_ts` / `jira_to_rfc3339` run for every Jira created/updated/history
+timestamp. The fixed `YYYY-MM-DDTHH:MM:SS.mmm+0000` shape takes a fast path (one
+C-level `fromisoformat`, or plain slicing for the UTC RFC3339 string); other
+spellings fall back to the regex normalization
+(`benchmarks/bench_jira_timestamps.py` compares them with the previous helpers).
+
+This file is duplicated in every simple/<service>/ dir; keep the copies identical
+to the repo-root one.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+import sys
+from typing import Optional
+
+
+def utc_now() -> dt.datetime:
+    """Timezone-aware UTC 'now'."""
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def to_rfc3339(ts: dt.datetime) -> str:
+    """Convert a datetime to RFC3339 string with Z suffix."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt.timezone.utc)
+    return ts.astimezone(dt.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def unix_to_utc_ts(seconds: Optional[int]) -> Optional[str]:
+    """Unix seconds -> RFC3339 UTC timestamp string."""
+    if seconds is None:
+        return None
+    return dt.datetime.fromtimestamp(int(seconds), tz=dt.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+_JIRA_TZ_RE = re.compile(r"([+-])(\d{2})(\d{2})$")
+_RFC3339_TZ_RE = re.compile(r"[+-]\d{2}:\d{2}$")
+_UTC = dt.timezone.utc
+# 3.11+ `fromisoformat` reads `+0000` and `Z` itself (in C); older versions need the colon.
+_NATIVE_ISO = sys.version_info >= (3, 11)
+
+
+def _is_jira_fixed(ts: str) -> bool:
+    """True for the fixed Jira shape `YYYY-MM-DDTHH:MM:SS.mmm+HHMM` (28 chars)."""
+    return len(ts) == 28 and ts[10] == "T" and ts[19] == "." and (ts[23] == "+" or ts[23] == "-")
+
+
+def parse_jira_ts(ts: Optional[str]) -> Optional[dt.datetime]:
+    """Parse a Jira timestamp (e.g. 2026-02-26T16:57:11.469+0000) keeping its offset; None if invalid."""
+    if not ts:
+        return None
+    try:
+        if _NATIVE_ISO:
+            return dt.datetime.fromisoformat(ts)
+        if _is_jira_fixed(ts):
+            return dt.datetime.fromisoformat(f"{ts[:26]}:{ts[26:]}")
+    except ValueError:
+        pass
+    # Slow path: surrounding whitespace, `Z`/`+HHMM` spellings on older Pythons.
+    ts = ts.strip()
+    if ts.endswith("Z"):
+        ts = ts[:-1] + "+00:00"
+    else:
+        ts = _JIRA_TZ_RE.sub(r"\1\2:\3", ts)
+    try:
+        return dt.datetime.fromisoformat(ts)
+    except ValueError:
+        return None
+
+
+def jira_to_rfc3339(ts: Optional[str]) -> Optional[str]:
+    """Convert Jira timestamps like 2026-02-26T16:57:11.469+0000 to RFC3339 (UTC)."""
+    if not ts:
+        return None
+
+    # Fast path: already UTC, so only the offset spelling changes.
+    if _is_jira_fixed(ts) and ts.endswith("+0000"):
+        return (ts[:19] if ts[20:23] == "000" else ts[:23] + "000") + "Z"
+
+    ts = ts.strip()
+
+    # If already has Z or +HH:MM, return as-is (BigQuery accepts it).
+    if ts.endswith("Z") or _RFC3339_TZ_RE.search(ts):
+        return ts
+
+    d = parse_jira_ts(ts)
+    if d is None:
+        # Last resort: return raw string and let BQ attempt parsing.
+        return ts
+
+    return d.astimezone(_UTC).isoformat().replace("+00:00", "Z")